@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Agendador integrado (modo daemon)
+Executa o backup nos horários das chaves de agendamento do config.json sem depender do
+Agendador de Tarefas do Windows: o processo fica aberto (a conexão com o MongoDB é
+reaproveitada entre as execuções), nunca sobrepõe dois backups e, ao voltar de uma
+parada, executa uma vez os horários perdidos
+"""
+
+import os
+import sys
+import json
+import threading
+from datetime import datetime, timedelta
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+
+# Dias aceitos em "dias_semana" (mesma ordem de datetime.weekday())
+DIAS_SEMANA = ("Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo")
+
+# Último horário atendido pelo agendador (em backup_dir), para recuperar os perdidos
+ARQUIVO_ESTADO_AGENDADOR = "agendador.json"
+
+# Trava (em backup_dir) que impede dois backups simultâneos na mesma pasta, mesmo em
+# processos diferentes (agendador, interface, linha de comando)
+ARQUIVO_TRAVA = "backup.lock"
+
+# Intervalo máximo entre as conferências do relógio enquanto espera (ajustes de horário,
+# suspensão da máquina)
+ESPERA_MAXIMA = 60
+
+# Atraso a partir do qual um horário é considerado perdido (e registrado no log)
+ATRASO_TOLERADO = timedelta(minutes=1)
+
+
+class TravaExecucao:
+    """
+    Trava exclusiva em backup_dir/backup.lock (flock no Linux, msvcrt no Windows)
+
+    O sistema operacional libera a trava se o processo terminar, então um backup
+    interrompido não deixa a pasta bloqueada.
+    """
+
+    def __init__(self, pasta):
+        self.caminho = os.path.join(pasta, ARQUIVO_TRAVA)
+        self.arquivo = None
+
+    def adquirir(self):
+        """Tenta obter a trava sem esperar; False se outro backup a detém"""
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        arquivo = open(self.caminho, 'a+')
+        try:
+            if sys.platform == "win32":
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            arquivo.close()
+            return False
+        # PID do processo que detém a trava (apenas informativo)
+        arquivo.seek(0)
+        arquivo.truncate()
+        arquivo.write(str(os.getpid()))
+        arquivo.flush()
+        self.arquivo = arquivo
+        return True
+
+    def liberar(self):
+        if self.arquivo is None:
+            return
+        try:
+            if sys.platform == "win32":
+                self.arquivo.seek(0)
+                msvcrt.locking(self.arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self.arquivo.fileno(), fcntl.LOCK_UN)
+        finally:
+            self.arquivo.close()
+            self.arquivo = None
+
+
+def carregar_agenda(config):
+    """
+    Agenda a partir das chaves modo_agendamento, intervalo_minutos, hora_backup e dias_semana
+
+    Returns:
+        {"modo": "intervalo", "intervalo": timedelta} ou
+        {"modo": "semanal", "hora": time, "dias": [índices de weekday()]}
+
+    Raises:
+        ValueError: Configuração inválida
+    """
+    modo = config.get("modo_agendamento", "semanal")
+    if modo == "intervalo":
+        minutos = int(config.get("intervalo_minutos", 30))
+        if minutos < 1:
+            raise ValueError("O intervalo deve ser de pelo menos 1 minuto (intervalo_minutos).")
+        return {"modo": "intervalo", "intervalo": timedelta(minutes=minutos)}
+    if modo != "semanal":
+        raise ValueError(f"Modo de agendamento desconhecido: '{modo}' (use 'semanal' ou 'intervalo')")
+
+    try:
+        hora = datetime.strptime(config.get("hora_backup", "00:00"), "%H:%M").time()
+    except ValueError:
+        raise ValueError("Formato de hora inválido em hora_backup. Use HH:MM (ex: 03:00)")
+    dias = sorted(DIAS_SEMANA.index(dia) for dia, ativo in (config.get("dias_semana") or {}).items()
+                  if ativo and dia in DIAS_SEMANA)
+    if not dias:
+        raise ValueError("Selecione pelo menos um dia da semana em dias_semana.")
+    return {"modo": "semanal", "hora": hora, "dias": dias}
+
+
+def descrever_agenda(agenda):
+    if agenda["modo"] == "intervalo":
+        return f"a cada {int(agenda['intervalo'].total_seconds() // 60)} minuto(s)"
+    dias = ", ".join(DIAS_SEMANA[dia] for dia in agenda["dias"])
+    return f"às {agenda['hora'].strftime('%H:%M')} ({dias})"
+
+
+def proximo_horario(agenda, depois):
+    """Primeiro horário da agenda estritamente depois de 'depois'"""
+    if agenda["modo"] == "intervalo":
+        return depois + agenda["intervalo"]
+    for deslocamento in range(8):
+        dia = depois.date() + timedelta(days=deslocamento)
+        if dia.weekday() in agenda["dias"]:
+            horario = datetime.combine(dia, agenda["hora"])
+            if horario > depois:
+                return horario
+
+
+def horarios_vencidos(agenda, ultimo, agora):
+    """
+    Horários da agenda entre o último atendido e agora
+
+    Returns:
+        Tupla (quantidade, último horário vencido ou None, próximo horário futuro)
+    """
+    if agenda["modo"] == "intervalo":
+        quantidade = int((agora - ultimo) // agenda["intervalo"])
+        vencido = ultimo + quantidade * agenda["intervalo"] if quantidade else None
+        return quantidade, vencido, (vencido or ultimo) + agenda["intervalo"]
+
+    quantidade = 0
+    vencido = None
+    horario = proximo_horario(agenda, ultimo)
+    while horario <= agora:
+        quantidade += 1
+        vencido = horario
+        horario = proximo_horario(agenda, horario)
+    return quantidade, vencido, horario
+
+
+def ler_estado_agendador(backup_dir):
+    """Estado gravado pelo agendador (dicionário vazio se não existir ou for inválido)"""
+    try:
+        with open(os.path.join(backup_dir, ARQUIVO_ESTADO_AGENDADOR), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def salvar_estado_agendador(backup_dir, estado):
+    """Grava o estado de forma atômica (arquivo temporário + rename)"""
+    os.makedirs(backup_dir, exist_ok=True)
+    caminho = os.path.join(backup_dir, ARQUIVO_ESTADO_AGENDADOR)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, indent=4, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+class Agendador:
+    """
+    Laço do modo daemon
+
+    As execuções são sequenciais (uma nunca começa antes de a anterior terminar).
+    Horários perdidos enquanto o processo estava parado, ou durante um backup mais
+    longo que o intervalo, resultam em uma única execução assim que possível.
+    """
+
+    def __init__(self, backup_dir, agenda, executar, log=print):
+        """
+        Args:
+            agenda: Resultado de carregar_agenda
+            executar: Função sem argumentos que executa um backup e retorna True se bem-sucedido
+        """
+        self.backup_dir = backup_dir
+        self.agenda = agenda
+        self.executar = executar
+        self.log = log
+        self.parar = threading.Event()
+
+    def ultimo_horario(self):
+        """Último horário atendido; sem estado, o agendador começa a contar de agora"""
+        try:
+            return datetime.fromisoformat(ler_estado_agendador(self.backup_dir)["ultimo_horario"])
+        except (KeyError, TypeError, ValueError):
+            return datetime.now()
+
+    def executar_horario(self, horario):
+        """Executa o backup de um horário e registra o resultado no estado"""
+        inicio = datetime.now()
+        self.log(f"\nBackup agendado de {horario.strftime('%d/%m/%Y %H:%M')} iniciado.")
+        try:
+            sucesso = self.executar()
+        except Exception as e:
+            self.log(f"✗ Erro no backup agendado: {e}")
+            sucesso = False
+        try:
+            salvar_estado_agendador(self.backup_dir, {
+                "ultimo_horario": horario.isoformat(timespec="seconds"),
+                "ultima_execucao": inicio.isoformat(timespec="seconds"),
+                "sucesso": sucesso
+            })
+        except OSError as e:
+            self.log(f"⚠ Não foi possível gravar o estado do agendador: {e}")
+        return sucesso
+
+    def rodar(self):
+        """Executa os backups até parar ser sinalizado (entre duas execuções)"""
+        self.log(f"Agendador iniciado: backup {descrever_agenda(self.agenda)}.")
+        ultimo = self.ultimo_horario()
+        anunciado = None
+        while not self.parar.is_set():
+            agora = datetime.now()
+            quantidade, vencido, proximo = horarios_vencidos(self.agenda, ultimo, agora)
+            if quantidade:
+                if quantidade > 1 or agora - vencido > ATRASO_TOLERADO:
+                    self.log(f"⚠ {quantidade} horário(s) perdido(s) desde {ultimo.strftime('%d/%m/%Y %H:%M')}. "
+                             "Executando o backup agora.")
+                self.executar_horario(vencido)
+                ultimo = vencido
+                continue
+            if proximo != anunciado:
+                self.log(f"Próximo backup: {proximo.strftime('%d/%m/%Y %H:%M')}")
+                anunciado = proximo
+            self.parar.wait(min(ESPERA_MAXIMA, max(0.0, (proximo - agora).total_seconds())))
+        self.log("Agendador encerrado.")
@@ -8,37 +8,461 @@ Exporta todos os bancos de dados MongoDB para pastas organizadas
 import subprocess
 import os
 import sys
-from datetime import datetime
+import time
+import hashlib
+import argparse
+import signal
+import threading
+import multiprocessing
+from datetime import datetime, timezone
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError, PyMongoError
+
+from compressao import (
+    COMPRESSAO_PADRAO, EXTENSOES, despejar_saida, alimentar_entrada, despejar_para_archive,
+    restaurar_de_archive, abrir_leitura, nome_arquivo_archive, identificar_archive, localizar_archive, validar_codec
+)
+from deduplicacao import (
+    caminho_repositorio, nome_manifesto, identificar_manifesto, localizar_manifesto,
+    ler_manifesto, armazenar_stream, LeitorManifesto
+)
+from catalogo import registrar_execucao, listar_execucoes, bancos_da_execucao, bancos_mais_lentos, formatar_bytes
+from incremental import (
+    ARQUIVO_OPLOG, PASTA_INCREMENTOS, INTERVALO_BASE_HORAS_PADRAO,
+    PASTA_OPLOG_SNAPSHOT, LEITURA_OPLOG,
+    listar_incrementos, ultimo_ts_oplog, primeiro_ts_oplog, ts_minimo_replica, consulta_intervalo_oplog,
+    ts_para_dict, dict_para_ts,
+    datetime_para_ts, formatar_oplog_limit, interpretar_data_hora,
+    criar_estado, salvar_estado, ler_estado, localizar_base_incremental, escolher_base_para_alvo,
+    incrementos_ate
+)
+import motor_nativo
+from motor_nativo import MOTORES, MOTOR_PADRAO
+from ferramentas import executar_ferramenta, uri_para_ferramenta
+from retomada import (
+    BANCO_JORNAIS_RESTAURACAO, JornalBackup, JornalRestauracao, localizar_backup_interrompido, padrao_namespace
+)
+from retencao import FORMATO_PASTA, NIVEIS, normalizar_politica, politica_ativa, aplicar_retencao
+from planejamento import (
+    MODOS_ESPACO, MODO_ESPACO_PADRAO, estatisticas_colecoes, tamanhos_em_disco, planejar_backup,
+    bancos_que_cabem, formatar_plano
+)
+from construcao_indices import (
+    INDICES_PARALELOS_PADRAO, construir_indices, indices_dos_metadados, metadados_da_pasta, opcoes_carga_rapida,
+    write_concern_carga
+)
+from filtros import (
+    carregar_filtros, resolver_filtros, filtro_da_colecao, banco_filtrado, argumentos_mongodump, descrever_filtro
+)
+from indice import (
+    IndiceArchive, localizar_indice, abrir_colecoes, blocos_das_colecoes, bancos_selecionados, colecoes_selecionadas,
+    separar_padroes, filtros_namespace, metadados_do_preludio
+)
+from metricas import MetricasExecucao, gravar_jsonl, gravar_prometheus
+from agendador import TravaExecucao, Agendador, carregar_agenda
+from limitacao import LimitacaoBackup, mesclar_limitacao
+from origens import (
+    CONCORRENCIA_ORIGENS_PADRAO, CONCORRENCIA_HOST_PADRAO, OrquestradorOrigens, carregar_origens,
+    pasta_origem, filtrar_bancos, log_da_origem
+)
+from progresso import ProgressoBackup, LeitorContador, formatar_resumo
+from verificacao import (
+    ARQUIVO_MANIFESTO, PROCESSOS_VERIFICACAO_PADRAO, gerar_manifesto, verificar_backup, identificar_backup
+)
+
+
+# Número padrão de processos mongodump simultâneos
+PARALELISMO_PADRAO = 1
+
+# Coleções exportadas em paralelo dentro de cada mongodump --archive (--numParallelCollections)
+COLECOES_PARALELAS_PADRAO = 4
+
+# Intervalo mínimo (segundos) entre duas linhas de progresso no log
+INTERVALO_LOG_PROGRESSO = 10.0
+
+# Formatos de saída: "pasta" (árvore de .bson do --out), "archive" (um arquivo comprimido
+# por banco) ou "dedup" (blocos deduplicados em backup_dir/.repositorio + manifesto por banco)
+FORMATOS_BACKUP = ("pasta", "archive", "dedup")
+FORMATO_PADRAO = "pasta"
+
+# Preferências de leitura aceitas (mongodump --readPreference e pymongo)
+PREFERENCIAS_LEITURA = ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest")
+
+# Padrões da restauração paralela (mongorestore)
+RESTORE_PARALELISMO_PADRAO = 1
+RESTORE_COLECOES_PARALELAS_PADRAO = 4
+RESTORE_WORKERS_INSERCAO_PADRAO = 1
+RESTORE_LIMITE_TOTAL_PADRAO = 16
+
+
+def obter_pasta_base():
+    """Retorna a pasta do script ou do executável (compatível com PyInstaller)"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def localizar_ferramenta(nome):
+    """
+    Localiza uma ferramenta do MongoDB (mongodump, mongorestore...)
+    
+    Procura primeiro o .exe ao lado do script/executável e, se não
+    existir, usa o nome simples para que seja resolvido pelo PATH.
+    """
+    caminho = os.path.join(obter_pasta_base(), f"{nome}.exe")
+    if os.path.exists(caminho):
+        return caminho
+    return nome
+
+
+def ordenar_bancos_por_tamanho(client, bancos):
+    """
+    Ordena os bancos do maior para o menor (sizeOnDisk do listDatabases)
+    
+    Assim os bancos mais lentos começam primeiro e não ficam no fim da fila
+    quando o backup roda em paralelo. Bancos sem tamanho conhecido vão para o fim.
+    """
+    try:
+        tamanhos = {info["name"]: info.get("sizeOnDisk", 0) for info in client.list_databases()}
+    except Exception:
+        return list(bancos)
+    return sorted(bancos, key=lambda banco: tamanhos.get(banco, 0), reverse=True)
+
+
+def tamanho_pasta(caminho):
+    """Soma o tamanho (em bytes) de todos os arquivos dentro de uma pasta"""
+    if os.path.isfile(caminho):
+        return os.path.getsize(caminho)
+    total = 0
+    for raiz, _, arquivos in os.walk(caminho):
+        for arquivo in arquivos:
+            try:
+                total += os.path.getsize(os.path.join(raiz, arquivo))
+            except OSError:
+                pass
+    return total
+
+
+def sincronizar_disco(caminho):
+    """Força a gravação no disco (fsync) de um arquivo ou de todos os arquivos de uma pasta"""
+    if os.path.isfile(caminho):
+        arquivos = [caminho]
+    else:
+        arquivos = [os.path.join(raiz, arquivo) for raiz, _, nomes in os.walk(caminho) for arquivo in nomes]
+    for arquivo in arquivos:
+        # Aberto para escrita (sem alterar nada): o fsync do Windows exige esse modo
+        with open(arquivo, 'rb+') as f:
+            os.fsync(f.fileno())
+
+
+def checksum_pasta(caminho):
+    """SHA-256 do conteúdo de uma pasta (caminhos relativos e bytes de cada arquivo, em ordem)"""
+    resumo = hashlib.sha256()
+    for raiz, pastas, arquivos in os.walk(caminho):
+        pastas.sort()
+        for arquivo in sorted(arquivos):
+            completo = os.path.join(raiz, arquivo)
+            resumo.update(os.path.relpath(completo, caminho).replace(os.sep, "/").encode("utf-8"))
+            with open(completo, 'rb') as f:
+                for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                    resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def listar_bancos_backup(pasta):
+    """
+    Lista os bancos contidos em uma pasta de backup
+    
+    Cada subpasta é um banco (formato "pasta"), cada arquivo banco.archive[.ext]
+    é um banco no formato archive e cada banco.dedup.json um banco deduplicado.
+    A pasta de incrementos de oplog é ignorada.
+    
+    Se a pasta estiver registrada no catálogo de backup_dir (pasta pai), a lista vem
+    do catálogo, sem varrer o diretório.
+    """
+    pasta = os.path.normpath(pasta)
+    registrados = bancos_da_execucao(os.path.dirname(pasta), os.path.basename(pasta), somente_ok=True)
+    if registrados:
+        return [banco["nome"] for banco in registrados]
+    
+    itens = os.listdir(pasta)
+    bancos = [item for item in itens
+              if os.path.isdir(os.path.join(pasta, item))
+              and not item.startswith('.')
+              and item != PASTA_INCREMENTOS]
+    for item in itens:
+        archive = identificar_archive(item)
+        banco = archive[0] if archive else identificar_manifesto(item)
+        if banco and os.path.isfile(os.path.join(pasta, item)) and banco not in bancos:
+            bancos.append(banco)
+    return bancos
+
+
+def tamanho_banco_backup(pasta_backup, nome_banco):
+    """Tamanho de um banco dentro do backup (pasta, archive ou tamanho lógico do manifesto)"""
+    archive = localizar_archive(pasta_backup, nome_banco)
+    if archive:
+        return os.path.getsize(archive[0])
+    manifesto = localizar_manifesto(pasta_backup, nome_banco)
+    if manifesto:
+        try:
+            return ler_manifesto(manifesto).get("tamanho", 0)
+        except (OSError, ValueError):
+            return 0
+    return tamanho_pasta(os.path.join(pasta_backup, nome_banco))
+
+
+def pasta_restauracao_banco(pasta_backup, nome_banco):
+    """
+    Retorna a pasta que deve ser passada ao mongorestore para um banco
+    
+    Backups antigos (e o CLI) têm estrutura aninhada: backup/dbName/dbName/arquivo.bson
+    """
+    pasta_banco = os.path.join(pasta_backup, nome_banco)
+    pasta_aninhada = os.path.join(pasta_banco, nome_banco)
+    if os.path.exists(pasta_aninhada):
+        return pasta_aninhada
+    return pasta_banco
+
+
+def colecoes_do_backup(pasta_backup, nome_banco):
+    """
+    Coleções de um banco no backup (pelo índice ou pelos arquivos da pasta)
+    
+    None para archives e bancos deduplicados sem índice (backups anteriores a ele).
+    """
+    indice = localizar_indice(pasta_backup, nome_banco)
+    if indice is not None:
+        return sorted(colecao for colecao in indice["colecoes"] if colecao)
+    if localizar_archive(pasta_backup, nome_banco) or localizar_manifesto(pasta_backup, nome_banco):
+        return None
+    pasta = pasta_restauracao_banco(pasta_backup, nome_banco)
+    return sorted(motor_nativo.colecoes_no_backup(pasta)) if os.path.isdir(pasta) else []
+
+
+def abrir_selecao(pasta_backup, nome_banco, padroes, archive, manifesto, log=print):
+    """
+    Stream só com as coleções escolhidas de um archive ou banco deduplicado
+    
+    None sem padrões ou sem índice (o stream inteiro é lido e o mongorestore descarta
+    o que não foi escolhido pelo --nsInclude).
+    """
+    if not padroes:
+        return None
+    indice = localizar_indice(pasta_backup, nome_banco)
+    aberto = None
+    if indice is not None:
+        escolhidas = colecoes_selecionadas(nome_banco, [nome for nome in indice["colecoes"] if nome], padroes)
+        aberto = abrir_colecoes(indice, escolhidas, archive, manifesto)
+    if aberto is None:
+        log(f"⚠ '{nome_banco}' não tem índice de coleções: o backup é lido por inteiro.")
+        return None
+    log(f"  '{nome_banco}': {len(escolhidas)} coleção(ões) pelo índice "
+        f"({formatar_bytes(aberto[1])} de {formatar_bytes(indice['tamanho'])} do archive)")
+    return aberto[0]
+
+
+def blocos_da_selecao(pasta_backup, bancos, padroes):
+    """
+    Blocos do repositório que a restauração seletiva lê, por banco deduplicado com índice
+    
+    A verificação prévia confere só esses blocos (ver verificar_backup). Os archives são
+    conferidos inteiros, pelo hash do arquivo comprimido, sem descomprimir nada.
+    """
+    blocos = {}
+    for nome_banco in bancos:
+        manifesto = localizar_manifesto(pasta_backup, nome_banco)
+        indice = localizar_indice(pasta_backup, nome_banco) if manifesto else None
+        if indice is None:
+            continue
+        escolhidas = colecoes_selecionadas(nome_banco, [nome for nome in indice["colecoes"] if nome], padroes)
+        try:
+            blocos[nome_banco] = blocos_das_colecoes(indice, escolhidas, manifesto)
+        except (OSError, ValueError):
+            # Manifesto ilegível: a verificação confere o banco inteiro (e aponta o problema)
+            continue
+    return blocos
+
+
+def colecoes_ignoradas(pasta, nome_banco, padroes, log=print):
+    """Coleções da pasta de um banco (formato "pasta") que os padrões deixam de fora"""
+    if not padroes:
+        return set()
+    todas = motor_nativo.colecoes_no_backup(pasta)
+    ignoradas = set(todas) - set(colecoes_selecionadas(nome_banco, todas, padroes))
+    log(f"  '{nome_banco}': {len(todas) - len(ignoradas)} de {len(todas)} coleção(ões) selecionada(s)")
+    return ignoradas
+
+
+def indices_do_backup(pasta_backup, nome_banco, padroes=None):
+    """
+    Índices a construir no fim da restauração rápida: lista de (coleção, especificação)
+    
+    Vêm dos .metadata.json (formato "pasta") ou do prelúdio do archive, lido sem
+    percorrer os dados; na restauração seletiva, só os das coleções escolhidas.
+    """
+    archive = localizar_archive(pasta_backup, nome_banco)
+    manifesto = localizar_manifesto(pasta_backup, nome_banco)
+    if archive:
+        with abrir_leitura(*archive) as origem:
+            metadados = metadados_do_preludio(origem)
+    elif manifesto:
+        with LeitorManifesto(manifesto) as origem:
+            metadados = metadados_do_preludio(origem)
+    else:
+        metadados = metadados_da_pasta(pasta_restauracao_banco(pasta_backup, nome_banco))
+    colecoes = colecoes_selecionadas(nome_banco, list(metadados), padroes) if padroes else None
+    return indices_dos_metadados(metadados, colecoes)
+
+
+def calcular_processos_restore(paralelismo, colecoes_paralelas, workers_insercao, limite_total):
+    """
+    Calcula quantos mongorestore podem rodar ao mesmo tempo
+    
+    Cada processo usa até colecoes_paralelas * workers_insercao conexões de
+    escrita; o número de processos é reduzido para que o total não passe do
+    limite configurado (sempre pelo menos 1 processo).
+    """
+    por_processo = max(1, colecoes_paralelas) * max(1, workers_insercao)
+    return max(1, min(max(1, paralelismo), max(1, limite_total) // por_processo))
 
 
 class MongoDBBackup:
-    def __init__(self, backup_dir="C:\\backup\\mongodb", mongo_uri="mongodb://localhost:27017/"):
+    def __init__(self, backup_dir="C:\\backup\\mongodb", mongo_uri="mongodb://localhost:27017/",
+                 paralelismo=PARALELISMO_PADRAO, formato=FORMATO_PADRAO, compressao=COMPRESSAO_PADRAO,
+                 incremental=False, intervalo_base_horas=INTERVALO_BASE_HORAS_PADRAO,
+                 processos_verificacao=PROCESSOS_VERIFICACAO_PADRAO, colecoes_paralelas=COLECOES_PARALELAS_PADRAO,
+                 motor=MOTOR_PADRAO, retencao=None, espaco_insuficiente=MODO_ESPACO_PADRAO,
+                 metricas_prometheus=None, limitacao=None, preferencia_leitura=None, tags_leitura=None,
+                 snapshot_consistente=False, incluir_bancos=None, excluir_bancos=None, origem=None,
+                 filtros=None, log=print, ao_progresso=None):
         """
         Inicializa o sistema de backup
         
         Args:
             backup_dir: Diretório onde os backups serão salvos
             mongo_uri: URI de conexão do MongoDB
+            paralelismo: Quantidade máxima de processos mongodump simultâneos (no formato
+                "pasta" cada processo exporta uma coleção)
+            formato: "pasta" (mongodump --out), "archive" (arquivo comprimido por banco)
+                ou "dedup" (repositório deduplicado)
+            compressao: Codec do modo archive ("gzip", "zstd", "lz4" ou "nenhuma")
+            incremental: Após uma base completa, captura apenas o oplog novo
+            intervalo_base_horas: Idade máxima da base antes de fazer uma nova base completa
+            processos_verificacao: Processos usados no cálculo do manifesto de checksums
+            colecoes_paralelas: --numParallelCollections de cada mongodump no formato archive
+            motor: "mongodump" (ferramenta externa) ou "nativo" (pymongo, só no formato "pasta")
+            retencao: Política {horarios, diarios, semanais, mensais} aplicada em segundo plano
+                depois de cada backup completo sem falhas (None = nenhum backup é apagado)
+            espaco_insuficiente: Se a saída estimada não cabe em backup_dir: "recusar" (nada é
+                exportado) ou "parcial" (só os bancos que cabem; os demais ficam para a retomada)
+            metricas_prometheus: Pasta do coletor textfile do node_exporter onde as métricas de
+                cada execução são gravadas (None = apenas backup_dir/metricas.jsonl)
+            limitacao: Limites de carga {leitura_mb_s, escrita_mb_s, prioridade_cpu,
+                prioridade_io, latencia_alvo_ms, fila_alvo} (None = sem limites)
+            preferencia_leitura: Membro do replica set de onde os dados são lidos ("secondary",
+                "secondaryPreferred", "nearest"...; None = padrão da URI)
+            tags_leitura: Tags do membro ({"uso": "backup"}) ou lista de conjuntos, em ordem
+            snapshot_consistente: Captura o oplog do período da exportação (como o --oplog do
+                mongodump) para que todos os bancos sejam restaurados no mesmo instante
+            incluir_bancos: Padrões (fnmatch) dos bancos exportados (None = todos)
+            excluir_bancos: Padrões dos bancos que ficam fora do backup
+            origem: Nome da origem no backup de vários servidores (rótulo das métricas)
+            filtros: Exportação parcial {"banco.colecao": {consulta, projecao}} (ver
+                filtros.carregar_filtros; só no formato "pasta")
+            log: Função que recebe as mensagens de progresso (padrão: print)
+            ao_progresso: Função que recebe o resumo do progresso (ver ProgressoBackup.resumo)
         """
+        if formato not in FORMATOS_BACKUP:
+            raise ValueError(f"Formato de backup inválido: '{formato}'. Opções: {', '.join(FORMATOS_BACKUP)}")
+        if formato == "archive":
+            validar_codec(compressao)
+        if motor not in MOTORES:
+            raise ValueError(f"Motor inválido: '{motor}'. Opções: {', '.join(MOTORES)}")
+        if motor == "nativo" and formato != "pasta":
+            raise ValueError("O motor nativo grava apenas o formato 'pasta' (.bson compatível com o mongodump)")
+        if espaco_insuficiente not in MODOS_ESPACO:
+            raise ValueError(f"Opção de espaço insuficiente inválida: '{espaco_insuficiente}'. "
+                             f"Opções: {', '.join(MODOS_ESPACO)}")
+        if preferencia_leitura is not None and preferencia_leitura not in PREFERENCIAS_LEITURA:
+            raise ValueError(f"Preferência de leitura inválida: '{preferencia_leitura}'. "
+                             f"Opções: {', '.join(PREFERENCIAS_LEITURA)}")
+        if tags_leitura and preferencia_leitura in (None, "primary"):
+            raise ValueError("tags_leitura exige uma preferência de leitura diferente de 'primary'")
+        if filtros and formato != "pasta":
+            raise ValueError("Os filtros de exportação exigem o formato 'pasta' "
+                             "(o mongodump só aplica --query a uma coleção por vez)")
+        if filtros and (incremental or snapshot_consistente):
+            raise ValueError("Os filtros de exportação não podem ser usados com o backup incremental nem com o "
+                             "snapshot consistente (o oplog reaplicado traria os documentos filtrados)")
+        
         self.backup_dir = backup_dir
         self.mongo_uri = mongo_uri
+        self.paralelismo = max(1, int(paralelismo))
+        self.formato = formato
+        self.compressao = compressao
+        self.incremental = incremental
+        self.intervalo_base_horas = intervalo_base_horas
+        self.processos_verificacao = max(1, int(processos_verificacao))
+        self.colecoes_paralelas = max(1, int(colecoes_paralelas))
+        self.motor = motor
+        self.retencao = normalizar_politica(retencao)
+        self.espaco_insuficiente = espaco_insuficiente
+        self.metricas_prometheus = metricas_prometheus
+        self.limitacao = LimitacaoBackup(limitacao, log)
+        self.preferencia_leitura = preferencia_leitura
+        # Um conjunto de tags ou uma lista deles (tentados em ordem; {} aceita qualquer membro)
+        self.tags_leitura = [tags_leitura] if isinstance(tags_leitura, dict) else list(tags_leitura or [])
+        self.snapshot_consistente = snapshot_consistente
+        self.incluir_bancos = list(incluir_bancos or [])
+        self.excluir_bancos = list(excluir_bancos or [])
+        self.origem = origem
+        self.filtros = carregar_filtros(filtros)
+        self.filtros_execucao = {}
+        self.log = log
+        self.ao_progresso = ao_progresso
         self.client = None
+        self.resultados = {}
+        self.estatisticas = {}
+        self.resumo = None
+        self.progresso = ProgressoBackup(self.notificar_progresso)
+        self.metricas = MetricasExecucao("completo")
+        self.jornal = None
+        self.thread_retencao = None
+        self._ultimo_log_progresso = 0.0
         
     def conectar_mongodb(self):
-        """Conecta ao MongoDB e retorna True se bem-sucedido"""
+        """
+        Conecta ao MongoDB e retorna True se bem-sucedido
+        
+        Uma conexão já aberta (modo daemon) é reaproveitada enquanto responder.
+        """
+        if self.client is not None:
+            try:
+                self.client.admin.command("ping")
+                self.log("✓ Conexão com o MongoDB reaproveitada.")
+                return True
+            except PyMongoError:
+                self.fechar_conexao()
+        opcoes = {}
+        if self.preferencia_leitura:
+            opcoes["readPreference"] = self.preferencia_leitura
+        if self.tags_leitura:
+            opcoes["readPreferenceTags"] = [",".join(f"{chave}:{valor}" for chave, valor in tags.items())
+                                            for tags in self.tags_leitura]
         try:
-            print("Conectando ao MongoDB...")
-            self.client = MongoClient(self.mongo_uri, serverSelectionTimeoutMS=5000)
+            self.log("Conectando ao MongoDB...")
+            self.client = MongoClient(self.mongo_uri, serverSelectionTimeoutMS=5000, **opcoes)
             # Testa a conexão
             self.client.server_info()
-            print("✓ Conexão estabelecida com sucesso!")
+            self.log("✓ Conexão estabelecida com sucesso!")
             return True
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
-            print(f"✗ Erro ao conectar ao MongoDB: {e}")
-            print("Verifique se o MongoDB está rodando e acessível.")
+            self.log(f"✗ Erro ao conectar ao MongoDB: {e}")
+            self.log("Verifique se o MongoDB está rodando e acessível.")
             return False
     
     def listar_bancos_dados(self):
@@ -48,181 +472,1815 @@ class MongoDBBackup:
             # Remove bancos de sistema padrão (opcional)
             bancos_sistema = ['admin', 'config', 'local']
             bancos_uteis = [b for b in bancos if b not in bancos_sistema]
+            bancos_uteis = filtrar_bancos(bancos_uteis, self.incluir_bancos, self.excluir_bancos)
+            bancos_uteis = ordenar_bancos_por_tamanho(self.client, bancos_uteis)
             
-            print(f"\nBancos de dados encontrados: {len(bancos_uteis)}")
+            self.log(f"\nBancos de dados encontrados: {len(bancos_uteis)}")
             for banco in bancos_uteis:
-                print(f"  - {banco}")
+                self.log(f"  - {banco}")
             
             return bancos_uteis
         except Exception as e:
-            print(f"✗ Erro ao listar bancos de dados: {e}")
+            self.log(f"✗ Erro ao listar bancos de dados: {e}")
             return []
     
     def criar_pasta_backup(self):
         """Cria a pasta de backup com timestamp"""
-        data_hora = datetime.now().strftime("%d-%m-%Y - %H-%M-%S")
+        data_hora = datetime.now().strftime(FORMATO_PASTA)
         pasta_backup = os.path.join(self.backup_dir, data_hora)
         
         try:
             os.makedirs(pasta_backup, exist_ok=True)
-            print(f"\nPasta de backup criada: {pasta_backup}")
+            self.log(f"\nPasta de backup criada: {pasta_backup}")
             return pasta_backup
         except Exception as e:
-            print(f"✗ Erro ao criar pasta de backup: {e}")
+            self.log(f"✗ Erro ao criar pasta de backup: {e}")
             return None
     
+    def estatisticas_colecoes(self, nome_banco):
+        """
+        Documentos e bytes de cada coleção do banco (origem), para o planejamento e o catálogo
+        
+        Coletadas uma vez por execução (o planejamento e a exportação usam as mesmas).
+        """
+        if nome_banco not in self.estatisticas:
+            try:
+                self.estatisticas[nome_banco] = estatisticas_colecoes(self.client, nome_banco)
+            except Exception as e:
+                self.log(f"⚠ Não foi possível coletar estatísticas de '{nome_banco}': {e}")
+                self.estatisticas[nome_banco] = []
+        return self.estatisticas[nome_banco]
+    
+    def preparar_banco(self, nome_banco):
+        """Cria o registro do banco em self.resultados com as estatísticas de cada coleção"""
+        registro = {"nome": nome_banco, "status": "falha",
+                    "colecoes": [dict(colecao) for colecao in self.estatisticas_colecoes(nome_banco)]}
+        for colecao in registro["colecoes"]:
+            filtro = filtro_da_colecao(self.filtros_execucao, nome_banco, colecao["nome"])
+            if filtro is not None:
+                colecao["filtro"] = descrever_filtro(filtro)
+        registro["documentos"] = sum(colecao["documentos"] or 0 for colecao in registro["colecoes"])
+        registro["tentativas"] = self.jornal.registrar_tentativa(nome_banco) if self.jornal is not None else 1
+        self.resultados[nome_banco] = registro
+        return registro
+    
     def exportar_banco(self, nome_banco, pasta_destino):
         """
         Exporta um banco de dados usando mongodump
         
+        O resultado (status, bytes, checksum, duração e coleções) fica em
+        self.resultados[nome_banco] para o catálogo.
+        
         Args:
             nome_banco: Nome do banco de dados a ser exportado
             pasta_destino: Pasta onde o backup será salvo
         """
+        inicio = time.monotonic()
+        registro = self.resultados.get(nome_banco) or self.preparar_banco(nome_banco)
+        if nome_banco not in self.progresso.itens:
+            self.registrar_progresso_banco(registro)
+        self.progresso.iniciar(nome_banco)
+        
         try:
-            # Cria pasta específica para este banco
-            pasta_banco = os.path.join(pasta_destino, nome_banco)
-            os.makedirs(pasta_banco, exist_ok=True)
+            mongodump_exe = localizar_ferramenta("mongodump")
             
-            # Determinar caminho do mongodump
-            if getattr(sys, 'frozen', False):
-                base_dir = os.path.dirname(sys.executable)
+            if self.formato == "archive":
+                with self.metricas.medir_banco(nome_banco, "exportacao"):
+                    registro.update(self.exportar_banco_archive(nome_banco, pasta_destino, mongodump_exe))
+                saida = os.path.join(pasta_destino, nome_arquivo_archive(nome_banco, self.compressao))
+            elif self.formato == "dedup":
+                with self.metricas.medir_banco(nome_banco, "exportacao"):
+                    registro.update(self.exportar_banco_dedup(nome_banco, pasta_destino, mongodump_exe))
+                saida = os.path.join(pasta_destino, nome_manifesto(nome_banco))
             else:
-                base_dir = os.path.dirname(os.path.abspath(__file__))
+                registro.update(self.exportar_banco_pasta(nome_banco, pasta_destino, mongodump_exe))
+                saida = os.path.join(pasta_destino, nome_banco)
             
-            mongodump_exe = os.path.join(base_dir, "mongodump.exe")
-            if not os.path.exists(mongodump_exe):
-                mongodump_exe = "mongodump" # Tenta usar do PATH
-                
-            print(f"\nExportando banco '{nome_banco}'...")
-            
-            # Comando mongodump
-            comando = [
-                mongodump_exe,
-                "--db", nome_banco,
-                "--out", pasta_banco
-            ]
-            
-            # Executa o comando
-            resultado = subprocess.run(
-                comando,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            print(f"✓ Banco '{nome_banco}' exportado com sucesso!")
+            # O diário só marca o banco como concluído depois que os arquivos estão no disco
+            with self.metricas.medir_banco(nome_banco, "fsync"):
+                sincronizar_disco(saida)
+            registro["status"] = "ok"
+            self.concluir_metricas_banco(registro)
+            if self.jornal is not None:
+                self.jornal.concluir_banco(registro)
+            self.log(f"✓ Banco '{nome_banco}' exportado com sucesso!")
             return True
             
         except subprocess.CalledProcessError as e:
-            print(f"✗ Erro ao exportar banco '{nome_banco}': {e.stderr}")
+            registro["erro"] = e.stderr
+            self.log(f"✗ Erro ao exportar banco '{nome_banco}': {e.stderr}")
             return False
         except FileNotFoundError:
-            print("✗ Erro: 'mongodump' não encontrado!")
-            print("Certifique-se de que o MongoDB está instalado e mongodump está no PATH.")
+            registro["erro"] = "mongodump não encontrado"
+            self.log("✗ Erro: 'mongodump' não encontrado!")
+            self.log("Certifique-se de que o MongoDB está instalado e mongodump está no PATH.")
             return False
         except Exception as e:
-            print(f"✗ Erro inesperado ao exportar '{nome_banco}': {e}")
+            registro["erro"] = str(e)
+            self.log(f"✗ Erro inesperado ao exportar '{nome_banco}': {e}")
             return False
+        finally:
+            registro["duracao"] = time.monotonic() - inicio
+            self.progresso.concluir(nome_banco, registro["status"] == "ok")
     
-    def executar_backup(self):
-        """Executa o processo completo de backup"""
-        print("=" * 60)
-        print("SISTEMA DE BACKUP MONGODB")
-        print("=" * 60)
+    def registrar_progresso_banco(self, registro):
+        """Registra um banco inteiro como item do progresso (formatos de stream único)"""
+        self.progresso.registrar(registro["nome"], registro["documentos"],
+                                 sum(colecao["bytes"] or 0 for colecao in registro["colecoes"]))
+    
+    def exportar_por_banco(self, bancos, pasta_backup):
+        """
+        Exporta os bancos (maiores primeiro) com até N mongodump simultâneos, um por banco
         
-        # Conecta ao MongoDB
-        if not self.conectar_mongodb():
+        Na retomada, os bancos que o diário registra como concluídos são mantidos.
+        
+        Returns:
+            Tupla (sucessos, falhas)
+        """
+        sucessos = 0
+        falhas = 0
+        pendentes = []
+        for banco in bancos:
+            if self.retomar_banco(banco):
+                sucessos += 1
+                continue
+            self.registrar_progresso_banco(self.preparar_banco(banco))
+            pendentes.append(banco)
+        
+        with ThreadPoolExecutor(max_workers=self.paralelismo) as executor:
+            futuros = [executor.submit(self.exportar_banco, banco, pasta_backup) for banco in pendentes]
+            for futuro in as_completed(futuros):
+                if futuro.result():
+                    sucessos += 1
+                else:
+                    falhas += 1
+        return sucessos, falhas
+    
+    def exportar_por_colecao(self, bancos, pasta_backup):
+        """
+        Exporta as coleções de todos os bancos em uma única fila (formato "pasta")
+        
+        Cada tarefa é um mongodump --collection; as maiores coleções (de qualquer banco)
+        começam primeiro, então um banco grande não fica preso a um único processo.
+        Bancos sem coleções listadas são exportados inteiros (--db). Na retomada, os
+        bancos e coleções que o diário registra como concluídos não são exportados de novo.
+        
+        Returns:
+            Tupla (sucessos, falhas) contados por banco
+        """
+        tarefas = []
+        restantes = {}
+        erros = {}
+        sucessos = 0
+        falhas = 0
+        for banco in bancos:
+            if self.retomar_banco(banco):
+                sucessos += 1
+                continue
+            registro = self.preparar_banco(banco)
+            erros[banco] = []
+            if not registro["colecoes"]:
+                if banco_filtrado(self.filtros_execucao, banco):
+                    self.log(f"⚠ '{banco}': coleções não listadas; o banco é exportado inteiro, sem os filtros.")
+                self.registrar_progresso_banco(registro)
+                tarefas.append((banco, None, 0))
+                continue
+            concluidas = self.jornal.colecoes_concluidas(banco) if self.jornal is not None else set()
+            pendentes = [colecao for colecao in registro["colecoes"] if colecao["nome"] not in concluidas]
+            restantes[banco] = len(pendentes)
+            registro["inicio"] = None
+            if concluidas:
+                self.log(f"Retomando '{banco}': {len(registro['colecoes']) - len(pendentes)} coleção(ões) já exportada(s)")
+            if not pendentes:
+                # Todas as coleções terminaram, mas a interrupção veio antes de fechar o banco
+                registro["inicio"] = time.monotonic()
+                if self.finalizar_banco_colecoes(banco, pasta_backup, []):
+                    sucessos += 1
+                else:
+                    falhas += 1
+                continue
+            for colecao in pendentes:
+                self.progresso.registrar(f"{banco}.{colecao['nome']}", colecao["documentos"], colecao["bytes"])
+                tarefas.append((banco, colecao["nome"], colecao["bytes"] or 0))
+        tarefas.sort(key=lambda tarefa: tarefa[2], reverse=True)
+        
+        with ThreadPoolExecutor(max_workers=self.paralelismo) as executor:
+            futuros = {}
+            for banco, colecao, _ in tarefas:
+                if colecao is None:
+                    futuros[executor.submit(self.exportar_banco, banco, pasta_backup)] = (banco, None)
+                else:
+                    futuros[executor.submit(self.exportar_colecao, banco, colecao, pasta_backup)] = (banco, colecao)
+            
+            for futuro in as_completed(futuros):
+                banco, colecao = futuros[futuro]
+                if colecao is None:
+                    if futuro.result():
+                        sucessos += 1
+                    else:
+                        falhas += 1
+                    continue
+                
+                erro = futuro.result()
+                if erro:
+                    erros[banco].append(f"{colecao}: {erro}")
+                restantes[banco] -= 1
+                if restantes[banco] == 0:
+                    if self.finalizar_banco_colecoes(banco, pasta_backup, erros[banco]):
+                        sucessos += 1
+                    else:
+                        falhas += 1
+        return sucessos, falhas
+    
+    def exportar_colecao(self, nome_banco, nome_colecao, pasta_destino):
+        """
+        Exporta uma coleção (mongodump --collection) para a pasta do banco
+        
+        Gera a mesma estrutura do mongodump --db (pasta_banco/banco/colecao.bson), com o
+        mongodump ou, no motor nativo, pelo cursor do próprio MongoClient. Uma coleção com
+        filtro de exportação recebe a consulta (--query); com projeção, que o mongodump não
+        aceita, ela é exportada pelo cursor mesmo com o motor mongodump.
+        
+        Returns:
+            None se bem-sucedido, senão a mensagem de erro
+        """
+        chave = f"{nome_banco}.{nome_colecao}"
+        registro = self.resultados[nome_banco]
+        if registro["inicio"] is None:
+            registro["inicio"] = time.monotonic()
+        pasta_banco = os.path.join(pasta_destino, nome_banco)
+        os.makedirs(pasta_banco, exist_ok=True)
+        
+        filtro = filtro_da_colecao(self.filtros_execucao, nome_banco, nome_colecao)
+        
+        self.progresso.iniciar(chave)
+        sucesso = False
+        try:
+            with self.metricas.medir_colecao(nome_banco, nome_colecao):
+                if self.motor == "nativo" or (filtro is not None and filtro["projecao"]):
+                    motor_nativo.exportar_colecao(
+                        self.client, nome_banco, nome_colecao, pasta_banco,
+                        ao_gravar=lambda quantidade: self.transferir_bytes(chave, quantidade, gravados=True),
+                        filtro=filtro and filtro["consulta"], projecao=filtro and filtro["projecao"])
+                else:
+                    comando, opcoes = self.comando_mongodump(localizar_ferramenta("mongodump"), [
+                        "--db", nome_banco,
+                        "--collection", nome_colecao,
+                        "--out", pasta_banco
+                    ] + argumentos_mongodump(filtro))
+                    executar_ferramenta(comando, lambda evento: self.registrar_evento(chave, evento), opcoes)
+            sucesso = True
+            if filtro is not None:
+                self.registrar_colecao_parcial(registro, nome_colecao, pasta_banco)
+            if self.jornal is not None:
+                self.jornal.concluir_colecao(nome_banco, nome_colecao)
+            return None
+        except subprocess.CalledProcessError as e:
+            self.log(f"✗ Erro ao exportar '{chave}': {e.stderr}")
+            return e.stderr
+        except FileNotFoundError:
+            self.log(f"✗ Erro ao exportar '{chave}': 'mongodump' não encontrado!")
+            return "mongodump não encontrado"
+        except Exception as e:
+            self.log(f"✗ Erro inesperado ao exportar '{chave}': {e}")
+            return str(e)
+        finally:
+            self.progresso.concluir(chave, sucesso)
+    
+    def registrar_colecao_parcial(self, registro, nome_colecao, pasta_banco):
+        """
+        Coleção exportada com filtro: o catálogo recebe o tamanho do .bson gravado
+        
+        As estatísticas da origem contam a coleção inteira; a quantidade de documentos
+        exportados não é conhecida sem ler o arquivo, então fica em branco (e fora do
+        total do banco).
+        """
+        caminho = motor_nativo.caminho_bson(pasta_banco, registro["nome"], nome_colecao)
+        for colecao in registro["colecoes"]:
+            if colecao["nome"] == nome_colecao:
+                colecao["documentos"] = None
+                colecao["bytes"] = os.path.getsize(caminho) if os.path.isfile(caminho) else 0
+        registro["documentos"] = sum(colecao["documentos"] or 0 for colecao in registro["colecoes"])
+    
+    def finalizar_banco_colecoes(self, nome_banco, pasta_destino, erros):
+        """Consolida o resultado de um banco exportado por coleção (chamado após a última coleção)"""
+        registro = self.resultados[nome_banco]
+        pasta_banco = os.path.join(pasta_destino, nome_banco)
+        registro["duracao"] = time.monotonic() - registro.pop("inicio")
+        
+        if erros:
+            registro["erro"] = "\n".join(erros)
+            self.log(f"✗ Banco '{nome_banco}' exportado com falhas em {len(erros)} coleção(ões)")
             return False
         
-        # Lista bancos de dados
-        bancos = self.listar_bancos_dados()
+        with self.metricas.medir_banco(nome_banco, "checksum"):
+            registro.update({"status": "ok", "bytes": tamanho_pasta(pasta_banco), "checksum": checksum_pasta(pasta_banco)})
+        with self.metricas.medir_banco(nome_banco, "fsync"):
+            sincronizar_disco(pasta_banco)
+        self.concluir_metricas_banco(registro)
+        if self.jornal is not None:
+            self.jornal.concluir_banco(registro)
+        self.log(f"✓ Banco '{nome_banco}' exportado com sucesso! ({len(registro['colecoes'])} coleções)")
+        return True
+    
+    def retomar_banco(self, nome_banco):
+        """
+        Na retomada, recupera do diário o resultado de um banco já exportado
         
-        if not bancos:
-            print("\nNenhum banco de dados encontrado para backup.")
+        Returns:
+            True se o banco já estava concluído (não precisa ser exportado de novo)
+        """
+        registro = self.jornal.banco_concluido(nome_banco) if self.jornal is not None else None
+        if registro is None:
             return False
+        self.resultados[nome_banco] = registro
+        self.log(f"✓ Banco '{nome_banco}' já exportado antes da interrupção (mantido)")
+        return True
+    
+    def registrar_evento(self, chave, evento):
+        """Evento do stderr do mongodump: atualiza o progresso e o tempo da coleção"""
+        self.progresso.registrar_evento(chave, evento)
+        self.metricas.registrar_evento(evento)
+    
+    def comando_mongodump(self, mongodump_exe, argumentos, preferencia=None):
+        """
+        Linha de comando do mongodump com a URI, a preferência de leitura e a prioridade configuradas
+        
+        Args:
+            preferencia: Preferência de leitura desta chamada (padrão: a configurada)
+        
+        Returns:
+            Tupla (comando, opções do Popen)
+        """
+        comando = [mongodump_exe, "--uri", uri_para_ferramenta(self.mongo_uri)]
+        if preferencia is None and self.preferencia_leitura:
+            preferencia = self.preferencia_leitura
+            if self.tags_leitura:
+                preferencia = json.dumps({"mode": preferencia, "tagSets": self.tags_leitura})
+        if preferencia:
+            comando += ["--readPreference", preferencia]
+        return self.limitacao.preparar_comando(comando + argumentos)
+    
+    def limitar_bytes(self, quantidade, gravados=True):
+        """Aplica os limites de leitura (e de escrita, se os bytes já foram gravados no disco)"""
+        self.limitacao.leitura.consumir(quantidade)
+        if gravados:
+            self.limitacao.escrita.consumir(quantidade)
+    
+    def transferir_bytes(self, chave, quantidade, gravados=False):
+        """Bytes lidos do MongoDB: progresso e limites de vazão"""
+        self.progresso.somar_bytes(chave, quantidade)
+        self.limitar_bytes(quantidade, gravados)
+    
+    def concluir_metricas_banco(self, registro):
+        """Copia para o registro do banco (catálogo e diário) o tempo das fases e de cada coleção"""
+        fases = self.metricas.fases_banco(registro["nome"])
+        if registro.get("colecoes") and "exportacao" not in fases:
+            fases["exportacao"] = round(sum(self.metricas.duracao_colecao(registro["nome"], colecao["nome"]) or 0
+                                            for colecao in registro["colecoes"]), 3)
+        registro["fases"] = fases
+        for colecao in registro.get("colecoes", []):
+            duracao = self.metricas.duracao_colecao(registro["nome"], colecao["nome"])
+            if duracao is not None:
+                colecao["duracao"] = round(duracao, 3)
+    
+    def notificar_progresso(self, resumo):
+        """Entrega o progresso a ao_progresso (barra da interface) e ao log"""
+        if self.ao_progresso is not None:
+            self.ao_progresso(resumo)
+        self.log_progresso(resumo)
+    
+    def log_progresso(self, resumo):
+        """Registra no log o percentual concluído e o tempo restante estimado (a cada INTERVALO_LOG_PROGRESSO)"""
+        agora = time.monotonic()
+        if resumo["concluidos"] < resumo["total"] and agora - self._ultimo_log_progresso < INTERVALO_LOG_PROGRESSO:
+            return
+        self._ultimo_log_progresso = agora
+        self.log(formatar_resumo(resumo))
+    
+    def exportar_banco_pasta(self, nome_banco, pasta_destino, mongodump_exe):
+        """
+        Exporta um banco para uma pasta de .bson (mongodump --out)
+        
+        Exceções são tratadas por exportar_banco.
+        """
+        # Cria pasta específica para este banco
+        pasta_banco = os.path.join(pasta_destino, nome_banco)
+        os.makedirs(pasta_banco, exist_ok=True)
+        
+        # Motor nativo: as coleções são exportadas uma a uma por exportar_colecao;
+        # aqui só chegam bancos sem coleções
+        if self.motor == "nativo":
+            return {"bytes": 0, "checksum": checksum_pasta(pasta_banco)}
+            
+        self.log(f"\nExportando banco '{nome_banco}'...")
         
-        # Cria pasta de backup
-        pasta_backup = self.criar_pasta_backup()
-        if not pasta_backup:
+        # Comando mongodump
+        comando, opcoes = self.comando_mongodump(mongodump_exe, [
+            "--db", nome_banco,
+            "--out", pasta_banco
+        ])
+        
+        # Executa o comando (o progresso de cada coleção vem do stderr)
+        with self.metricas.medir_banco(nome_banco, "exportacao"):
+            executar_ferramenta(comando, lambda evento: self.registrar_evento(nome_banco, evento), opcoes)
+        
+        with self.metricas.medir_banco(nome_banco, "checksum"):
+            return {"bytes": tamanho_pasta(pasta_banco), "checksum": checksum_pasta(pasta_banco)}
+    
+    def exportar_banco_archive(self, nome_banco, pasta_destino, mongodump_exe):
+        """
+        Exporta um banco para um único arquivo comprimido (mongodump --archive)
+        
+        A saída do mongodump é comprimida enquanto é lida, sem cópia intermediária.
+        O checksum é o SHA-256 do archive sem compressão, calculado durante a cópia, e
+        o índice das coleções (<banco>.indice.json) permite restaurar só algumas delas.
+        Exceções são tratadas por exportar_banco.
+        """
+        caminho = os.path.join(pasta_destino, nome_arquivo_archive(nome_banco, self.compressao))
+        self.log(f"\nExportando banco '{nome_banco}' para {os.path.basename(caminho)}...")
+        
+        comando, opcoes = self.comando_mongodump(mongodump_exe, [
+            "--db", nome_banco,
+            "--archive",
+            f"--numParallelCollections={self.colecoes_paralelas}"
+        ])
+        resumo = hashlib.sha256()
+        indice = IndiceArchive()
+        despejar_para_archive(comando, caminho, self.compressao, resumo,
+                              ao_ler=lambda quantidade: self.transferir_bytes(nome_banco, quantidade),
+                              ao_evento=lambda evento: self.registrar_evento(nome_banco, evento),
+                              ao_gravar=self.limitacao.escrita.consumir, opcoes_processo=opcoes, indice=indice)
+        self.gravar_indice(indice, pasta_destino, nome_banco)
+        
+        return {"bytes": os.path.getsize(caminho), "checksum": resumo.hexdigest()}
+    
+    def exportar_banco_dedup(self, nome_banco, pasta_destino, mongodump_exe):
+        """
+        Exporta um banco para o repositório deduplicado (blocos por conteúdo)
+        
+        Só os blocos que ainda não existem no repositório são gravados; a pasta do
+        backup recebe apenas o manifesto. Exceções são tratadas por exportar_banco.
+        """
+        self.log(f"\nExportando banco '{nome_banco}' (deduplicado)...")
+        
+        # Uma coleção por vez: o archive sai na mesma ordem a cada execução,
+        # o que maximiza os blocos repetidos entre backups
+        comando, opcoes = self.comando_mongodump(mongodump_exe, [
+            "--db", nome_banco,
+            "--archive",
+            "--numParallelCollections=1"
+        ])
+        repositorio = caminho_repositorio(self.backup_dir)
+        caminho = os.path.join(pasta_destino, nome_manifesto(nome_banco))
+        resultado = {}
+        indice = IndiceArchive()
+        despejar_saida(comando, lambda saida: resultado.update(armazenar_stream(
+            LeitorContador(saida, lambda quantidade: self.transferir_bytes(nome_banco, quantidade)),
+            repositorio, caminho, nome_banco, ao_gravar=self.limitacao.escrita.consumir,
+            ao_registro=indice.registrar)),
+            ao_evento=lambda evento: self.registrar_evento(nome_banco, evento), opcoes_processo=opcoes)
+        self.gravar_indice(indice, pasta_destino, nome_banco)
+        
+        total_mb = resultado["tamanho"] / (1024 * 1024)
+        novos_mb = resultado["bytes_novos"] / (1024 * 1024)
+        self.log(f"  '{nome_banco}': {total_mb:.1f} MB lógicos, {novos_mb:.1f} MB novos no repositório")
+        return {"bytes": resultado["tamanho"], "checksum": resultado["sha256"]}
+    
+    def gravar_indice(self, indice, pasta_destino, nome_banco):
+        """Grava o índice das coleções do banco (sem ele, a restauração lê o archive inteiro)"""
+        try:
+            if not indice.gravar(pasta_destino, nome_banco):
+                self.log(f"⚠ '{nome_banco}': archive em formato inesperado, gravado sem índice de coleções.")
+        except OSError as e:
+            self.log(f"⚠ '{nome_banco}': não foi possível gravar o índice de coleções: {e}")
+    
+    def executar_backup(self, bancos=None, retomar=False):
+        """
+        Executa o processo completo de backup
+        
+        Só um backup por vez é executado em backup_dir (trava entre processos): se outro
+        estiver em andamento, nada é feito e o retorno é False.
+        
+        Args:
+            bancos: Bancos a exportar (None = todos os bancos do servidor, exceto os de sistema)
+            retomar: Continua o backup interrompido mais recente de backup_dir (mesma pasta,
+                mesmos bancos), exportando só o que não foi concluído. Sem backup
+                interrompido, faz um backup novo.
+        """
+        trava = TravaExecucao(self.backup_dir)
+        if not trava.adquirir():
+            self.log(f"✗ Já existe um backup em execução em {self.backup_dir}. Nada foi feito.")
             return False
+        try:
+            return self.realizar_backup(bancos, retomar)
+        finally:
+            self.limitacao.encerrar()
+            # A trava só é liberada com a limpeza concluída: o próximo backup não pode
+            # começar enquanto a retenção apaga pastas e blocos órfãos do repositório
+            self.aguardar_retencao()
+            trava.liberar()
+    
+    def iniciar_limitacao(self):
+        """Registra os limites de carga da execução e inicia o monitor do servidor"""
+        descricao = self.limitacao.descrever()
+        if not descricao:
+            return
+        self.log(f"Limitação de carga: {descricao}")
+        if self.limitacao.limita_vazao and self.formato == "pasta" and self.motor == "mongodump":
+            self.log("⚠ No formato 'pasta' o mongodump grava direto no disco: os limites de MB/s e a "
+                     "redução adaptativa só valem com o motor nativo ou nos formatos archive/dedup.")
+        self.limitacao.iniciar(self.client)
+    
+    def realizar_backup(self, bancos, retomar):
+        """Etapas do backup (ver executar_backup)"""
+        self.log("=" * 60)
+        self.log("SISTEMA DE BACKUP MONGODB")
+        self.log("=" * 60)
         
-        # Exporta cada banco
-        print("\n" + "=" * 60)
-        print("INICIANDO EXPORTAÇÃO...")
-        print("=" * 60)
+        self.resultados = {}
+        self.estatisticas = {}
+        self.resumo = None
+        self.progresso = ProgressoBackup(self.notificar_progresso)
+        self.metricas = MetricasExecucao("completo")
+        inicio = datetime.now()
         
-        sucessos = 0
-        falhas = 0
+        # Conecta ao MongoDB
+        with self.metricas.fase("conexao"):
+            conectado = self.conectar_mongodb()
+        if not conectado:
+            return False
+        self.iniciar_limitacao()
         
-        for banco in bancos:
-            if self.exportar_banco(banco, pasta_backup):
-                sucessos += 1
+        # Exportação parcial: as datas relativas dos filtros partem do início desta execução
+        if self.filtros:
+            self.filtros_execucao = resolver_filtros(self.filtros, datetime.now(timezone.utc))
+            self.log(f"Exportação parcial: {len(self.filtros)} filtro(s) de coleção")
+        
+        # Retomada: continua o backup interrompido na mesma pasta, com os mesmos bancos
+        self.jornal = self.obter_backup_interrompido() if retomar else None
+        ts_base = None
+        ts_snapshot = None
+        if self.jornal is not None:
+            pasta_backup = self.jornal.pasta
+            bancos = ordenar_bancos_por_tamanho(self.client, self.jornal.dados["bancos"])
+            if self.jornal.dados.get("ts_base"):
+                ts_base = dict_para_ts(self.jornal.dados["ts_base"])
+            if self.jornal.dados.get("ts_snapshot"):
+                ts_snapshot = dict_para_ts(self.jornal.dados["ts_snapshot"])
+        else:
+            # Modo incremental: com uma base válida, captura apenas o oplog novo
+            if self.incremental:
+                ts_base = ultimo_ts_oplog(self.client)
+                if ts_base is None:
+                    self.log("⚠ Oplog indisponível (o servidor não é um replica set). Executando backup completo.")
+                else:
+                    base = self.obter_base_incremental()
+                    if base:
+                        return self.capturar_incremento(*base)
+            
+            # Lista bancos de dados
+            with self.metricas.fase("listagem"):
+                if bancos is None:
+                    bancos = self.listar_bancos_dados()
+                else:
+                    bancos = ordenar_bancos_por_tamanho(self.client, bancos)
+            
+            if not bancos:
+                self.log("\nNenhum banco de dados encontrado para backup.")
+                return False
+            pasta_backup = None
+        
+        # Estima a saída e confere o espaço livre antes de qualquer mongodump
+        with self.metricas.fase("planejamento"):
+            planejado = self.planejar(bancos)
+        if planejado is None:
+            return False
+        exportar, adiados = planejado
+        
+        if pasta_backup is None:
+            # Cria pasta de backup
+            pasta_backup = self.criar_pasta_backup()
+            if not pasta_backup:
+                return False
+            
+            # Snapshot consistente: o oplog é capturado a partir de antes da primeira leitura
+            if self.snapshot_consistente:
+                ts_snapshot = self.iniciar_snapshot()
+            
+            # Diário de retomada: cada banco/coleção concluído fica registrado na pasta
+            # (os bancos adiados por falta de espaço ficam pendentes para a retomada)
+            try:
+                self.jornal = JornalBackup.criar(pasta_backup, self.formato, self.compressao, self.motor, bancos,
+                                                 ts_para_dict(ts_base) if ts_base is not None else None,
+                                                 ts_para_dict(ts_snapshot) if ts_snapshot is not None else None)
+            except OSError as e:
+                self.log(f"⚠ Não foi possível criar o diário de retomada: {e}")
+        
+        # Exporta com até N mongodump simultâneos: por coleção no formato "pasta",
+        # por banco nos formatos de arquivo único (archive/dedup)
+        self.log("\n" + "=" * 60)
+        self.log("INICIANDO EXPORTAÇÃO...")
+        if self.paralelismo > 1:
+            self.log(f"Processos simultâneos: {self.paralelismo}")
+        self.log("=" * 60)
+        
+        with self.metricas.fase("exportacao"):
+            if self.formato == "pasta":
+                sucessos, falhas = self.exportar_por_colecao(exportar, pasta_backup)
             else:
-                falhas += 1
+                sucessos, falhas = self.exportar_por_banco(exportar, pasta_backup)
+        
+        for banco in adiados:
+            self.resultados[banco] = {"nome": banco, "status": "falha", "erro": "Adiado: espaço insuficiente",
+                                      "colecoes": self.estatisticas.get(banco, [])}
+        falhas += len(adiados)
+        
+        # Sem falhas, o oplog do período leva todos os bancos ao mesmo instante; com falhas,
+        # ele é capturado na retomada (a partir do mesmo início)
+        if ts_snapshot is not None and falhas == 0:
+            with self.metricas.fase("snapshot"):
+                if not self.capturar_oplog_snapshot(pasta_backup, ts_snapshot):
+                    falhas += 1
+        
+        with self.metricas.fase("manifesto"):
+            self.gravar_manifesto(pasta_backup)
         
         # Resumo final
-        print("\n" + "=" * 60)
-        print("RESUMO DO BACKUP")
-        print("=" * 60)
-        print(f"Bancos exportados com sucesso: {sucessos}")
-        print(f"Bancos com falha: {falhas}")
-        print(f"Pasta de backup: {pasta_backup}")
-        print("=" * 60)
+        self.log("\n" + "=" * 60)
+        self.log("RESUMO DO BACKUP")
+        self.log("=" * 60)
+        self.log(f"Bancos exportados com sucesso: {sucessos}")
+        self.log(f"Bancos com falha: {falhas}")
+        self.log(f"Pasta de backup: {pasta_backup}")
+        self.log("=" * 60)
+        self.resumo = {"sucessos": sucessos, "falhas": falhas, "pasta": pasta_backup}
+        
+        # A base só serve para incrementos se todos os bancos foram exportados
+        if ts_base is not None and falhas == 0:
+            salvar_estado(pasta_backup, criar_estado(ts_base))
+            self.log("Base incremental registrada. Próximas execuções capturarão apenas o oplog.")
+        
+        # O diário só some quando não falta nada; com falhas, a retomada refaz apenas o que falhou
+        if self.jornal is not None:
+            if falhas == 0:
+                self.jornal.descartar()
+            else:
+                self.log("⚠ Backup incompleto. Use --retomar para exportar apenas o que falhou.")
+        
+        self.registrar_no_catalogo(pasta_backup, "completo", inicio, falhas == 0,
+                                   [self.resultados[banco] for banco in bancos if banco in self.resultados])
+        
+        if falhas == 0:
+            self.iniciar_retencao()
         
         return falhas == 0
     
+    def planejar(self, bancos):
+        """
+        Estima a saída e a duração, confere o espaço livre e decide o que exportar
+        
+        Na retomada, os bancos e coleções já concluídos ficam fora da estimativa.
+        
+        Returns:
+            Tupla (bancos a exportar, bancos adiados), com os maiores primeiro, ou None
+            se o backup deve ser recusado por falta de espaço
+        """
+        concluidos = [banco for banco in bancos if self.jornal is not None and self.jornal.banco_concluido(banco)]
+        pendentes = [banco for banco in bancos if banco not in concluidos]
+        concluidas = {banco: self.jornal.colecoes_concluidas(banco) for banco in pendentes} if self.jornal else {}
+        for banco in pendentes:
+            self.estatisticas_colecoes(banco)
+        
+        plano = planejar_backup(pendentes, self.estatisticas, tamanhos_em_disco(self.client), self.backup_dir,
+                                self.formato, self.compressao, concluidas)
+        self.log("\nPLANEJAMENTO")
+        self.log(formatar_plano(plano))
+        if plano["cabe"]:
+            return concluidos + [item["nome"] for item in plano["bancos"]], []
+        
+        self.log(f"✗ Espaço insuficiente em {self.backup_dir}: necessário {formatar_bytes(plano['necessario'])}, "
+                 f"livre {formatar_bytes(plano['livre'])}")
+        if self.espaco_insuficiente != "parcial":
+            self.log("Backup recusado. Libere espaço (ex: 'reter') ou use espaco_insuficiente = \"parcial\".")
+            return None
+        
+        exportar, adiados = bancos_que_cabem(plano)
+        if not exportar:
+            self.log("Nenhum banco cabe no espaço livre. Backup recusado.")
+            return None
+        self.log(f"⚠ Exportando {len(exportar)} banco(s); adiados para a retomada: {', '.join(adiados)}")
+        return concluidos + exportar, adiados
+    
+    def iniciar_retencao(self):
+        """
+        Aplica a política de retenção em uma thread, enquanto o backup é encerrado
+        
+        executar_backup espera a thread (aguardar_retencao) antes de liberar a trava.
+        """
+        if not politica_ativa(self.retencao):
+            return None
+        self.thread_retencao = threading.Thread(target=self.aplicar_retencao, name="retencao")
+        self.thread_retencao.start()
+        return self.thread_retencao
+    
+    def aguardar_retencao(self):
+        """Espera a limpeza iniciada por iniciar_retencao, se houver"""
+        if self.thread_retencao is not None:
+            self.thread_retencao.join()
+            self.thread_retencao = None
+    
+    def aplicar_retencao(self):
+        """Apaga os backups fora da política de retenção (falhas apenas aparecem no log)"""
+        try:
+            aplicar_retencao(self.backup_dir, self.retencao, log=self.log)
+        except Exception as e:
+            self.log(f"⚠ Erro ao aplicar a retenção de backups: {e}")
+    
+    def obter_backup_interrompido(self):
+        """
+        Localiza o backup interrompido mais recente para retomar
+        
+        A continuação usa o formato, a compressão e o motor do backup original, para que
+        as partes já gravadas e as novas sejam iguais.
+        
+        Returns:
+            JornalBackup ou None se não houver backup interrompido
+        """
+        jornal = localizar_backup_interrompido(self.backup_dir)
+        if jornal is None:
+            self.log("Nenhum backup interrompido encontrado. Iniciando um novo backup.")
+            return None
+        
+        self.log(f"\nRetomando o backup interrompido: {jornal.pasta}")
+        self.log(f"Bancos já concluídos: {len(jornal.dados['concluidos'])}/{len(jornal.dados['bancos'])}")
+        for opcao in ("formato", "compressao", "motor"):
+            valor = jornal.dados.get(opcao)
+            if valor and valor != getattr(self, opcao):
+                self.log(f"  {opcao}: usando '{valor}' do backup original (em vez de '{getattr(self, opcao)}')")
+                setattr(self, opcao, valor)
+        return jornal
+    
+    def gravar_manifesto(self, pasta):
+        """Grava o manifesto com o SHA-256 de cada arquivo do backup (usado pelo 'verificar')"""
+        try:
+            manifesto = gerar_manifesto(pasta, self.processos_verificacao)
+            self.log(f"Manifesto de checksums gravado ({len(manifesto['arquivos'])} arquivo(s)).")
+            return True
+        except Exception as e:
+            self.log(f"⚠ Não foi possível gravar o manifesto de checksums: {e}")
+            return False
+    
+    def registrar_no_catalogo(self, pasta, tipo, inicio, sucesso, bancos):
+        """
+        Grava a execução no catálogo SQLite de backup_dir e emite as métricas
+        
+        Falhas do catálogo e das métricas não interrompem o backup.
+        """
+        for banco in bancos:
+            if "fases" not in banco:
+                self.concluir_metricas_banco(banco)
+        cpu_backup, cpu_ferramentas = self.metricas.tempo_cpu()
+        fim = datetime.now()
+        execucao = {
+            "nome": os.path.relpath(pasta, self.backup_dir),
+            "tipo": tipo,
+            "formato": self.formato,
+            "origem": self.mongo_uri,
+            "inicio": inicio.isoformat(timespec="seconds"),
+            "fim": fim.isoformat(timespec="seconds"),
+            "duracao": (fim - inicio).total_seconds(),
+            "status": "ok" if sucesso else "falha",
+            "fases": self.metricas.fases,
+            "cpu": cpu_backup + (cpu_ferramentas or 0)
+        }
+        try:
+            registrar_execucao(self.backup_dir, execucao, bancos)
+        except Exception as e:
+            self.log(f"⚠ Não foi possível atualizar o catálogo: {e}")
+        self.emitir_metricas(execucao["nome"], sucesso, bancos)
+    
+    def emitir_metricas(self, nome_execucao, sucesso, bancos):
+        """Acrescenta as métricas a backup_dir/metricas.jsonl e atualiza o arquivo do Prometheus"""
+        linhas = self.metricas.registros(nome_execucao, sucesso, bancos)
+        try:
+            gravar_jsonl(self.backup_dir, linhas)
+            if self.metricas_prometheus:
+                gravar_prometheus(self.metricas_prometheus, linhas, self.origem)
+        except OSError as e:
+            self.log(f"⚠ Não foi possível gravar as métricas: {e}")
+    
+    def obter_base_incremental(self):
+        """
+        Retorna (pasta_base, estado) da base incremental atual, se ainda for utilizável
+        
+        A base é descartada (e uma nova base completa é feita) quando está mais velha
+        que intervalo_base_horas ou quando o oplog já não contém o último ponto capturado.
+        """
+        base = localizar_base_incremental(self.backup_dir)
+        if not base:
+            self.log("Nenhuma base incremental encontrada. Executando backup completo.")
+            return None
+        
+        pasta_base, estado = base
+        try:
+            idade = datetime.now() - datetime.fromisoformat(estado["criado_em"])
+            ultimo_ts = dict_para_ts(estado["ultimo_ts"])
+        except (KeyError, TypeError, ValueError):
+            self.log(f"⚠ Estado incremental inválido em {pasta_base}. Executando backup completo.")
+            return None
+        
+        if idade.total_seconds() > self.intervalo_base_horas * 3600:
+            self.log(f"Base incremental com mais de {self.intervalo_base_horas}h. Executando nova base completa.")
+            return None
+        
+        primeiro_ts = primeiro_ts_oplog(self.client)
+        if primeiro_ts is None or primeiro_ts > ultimo_ts:
+            self.log("⚠ O oplog não cobre mais o último backup (janela excedida). Executando backup completo.")
+            return None
+        
+        return pasta_base, estado
+    
+    def capturar_incremento(self, pasta_base, estado):
+        """Exporta as entradas do oplog desde o último backup para uma pasta de incremento"""
+        self.metricas.tipo = "incremental"
+        inicio_execucao = datetime.now()
+        inicio = dict_para_ts(estado["ultimo_ts"])
+        fim = ultimo_ts_oplog(self.client)
+        
+        self.log("\n" + "=" * 60)
+        self.log("BACKUP INCREMENTAL (OPLOG)")
+        self.log("=" * 60)
+        self.log(f"Base: {pasta_base}")
+        
+        if fim is None or fim <= inicio:
+            # Nada a exportar: a execução é registrada (0 bytes) e o estado guarda até quando
+            # a base está conferida, para a restauração pontual não alertar à toa
+            self.log("Nenhuma alteração desde o último backup.")
+            estado["sem_alteracoes_ate"] = inicio_execucao.isoformat(timespec="seconds")
+            salvar_estado(pasta_base, estado)
+            self.log("=" * 60)
+            self.resumo = {"sucessos": 1, "falhas": 0, "pasta": pasta_base, "bytes": 0}
+            oplog = {
+                "nome": "local.oplog.rs",
+                "status": "ok",
+                "bytes": 0,
+                "duracao": (datetime.now() - inicio_execucao).total_seconds()
+            }
+            nome_incremento = inicio_execucao.strftime(FORMATO_PASTA)
+            self.registrar_no_catalogo(os.path.join(pasta_base, PASTA_INCREMENTOS, nome_incremento),
+                                       "incremental", inicio_execucao, True, [oplog])
+            return True
+        
+        nome_incremento = datetime.now().strftime(FORMATO_PASTA)
+        pasta_incremento = os.path.join(pasta_base, PASTA_INCREMENTOS, nome_incremento)
+        
+        try:
+            os.makedirs(pasta_incremento, exist_ok=True)
+            caminho_oplog = os.path.join(pasta_incremento, ARQUIVO_OPLOG)
+            with self.metricas.fase("exportacao"):
+                self.exportar_oplog(inicio, fim, caminho_oplog)
+            with self.metricas.fase("fsync"):
+                sincronizar_disco(caminho_oplog)
+        except subprocess.CalledProcessError as e:
+            self.log(f"✗ Erro ao capturar o oplog: {e.stderr}")
+            return False
+        except FileNotFoundError:
+            self.log("✗ Erro: 'mongodump' não encontrado!")
+            return False
+        except Exception as e:
+            self.log(f"✗ Erro inesperado ao capturar o oplog: {e}")
+            return False
+        
+        estado["ultimo_ts"] = ts_para_dict(fim)
+        estado["incrementos"].append(nome_incremento)
+        estado.setdefault("intervalos", {})[nome_incremento] = {
+            "inicio": ts_para_dict(inicio),
+            "fim": ts_para_dict(fim)
+        }
+        salvar_estado(pasta_base, estado)
+        with self.metricas.fase("manifesto"):
+            self.gravar_manifesto(pasta_incremento)
+        
+        tamanho = os.path.getsize(os.path.join(pasta_incremento, ARQUIVO_OPLOG))
+        self.log(f"✓ Incremento gravado: {pasta_incremento} ({tamanho / 1024:.1f} KB)")
+        self.log(f"Incrementos desde a base: {len(estado['incrementos'])}")
+        self.log("=" * 60)
+        self.resumo = {"sucessos": 1, "falhas": 0, "pasta": pasta_incremento, "bytes": tamanho}
+        
+        oplog = {
+            "nome": "local.oplog.rs",
+            "status": "ok",
+            "bytes": tamanho,
+            "checksum": checksum_pasta(pasta_incremento),
+            "duracao": (datetime.now() - inicio_execucao).total_seconds(),
+            "fases": {fase: round(segundos, 3) for fase, segundos in self.metricas.fases.items()
+                      if fase in ("exportacao", "fsync")}
+        }
+        self.registrar_no_catalogo(pasta_incremento, "incremental", inicio_execucao, True, [oplog])
+        return True
+    
+    def exportar_oplog(self, inicio, fim, caminho):
+        """
+        Grava as entradas do oplog com inicio < ts <= fim em caminho (.bson)
+        
+        O oplog é lido do primário quando ele está disponível (primaryPreferred), o
+        mesmo membro em que o último ts foi medido: um secundário atrasado deixaria
+        um buraco entre os intervalos capturados.
+        """
+        if self.motor == "nativo":
+            local = self.client.get_database("local", read_preference=LEITURA_OPLOG)
+            motor_nativo.exportar_consulta(local["oplog.rs"], caminho, {"ts": {"$gt": inicio, "$lte": fim}},
+                                           ao_gravar=self.limitar_bytes)
+            return
+        comando, opcoes = self.comando_mongodump(localizar_ferramenta("mongodump"), [
+            "--db", "local",
+            "--collection", "oplog.rs",
+            "--query", consulta_intervalo_oplog(inicio, fim),
+            "--out", "-"
+        ], preferencia=LEITURA_OPLOG.mongos_mode)
+        despejar_para_archive(comando, caminho, "nenhuma",
+                              ao_ler=self.limitacao.leitura.consumir,
+                              ao_gravar=self.limitacao.escrita.consumir, opcoes_processo=opcoes)
+    
+    def iniciar_snapshot(self):
+        """
+        Ponto do oplog a partir do qual o período da exportação é capturado
+        
+        É o menor optime entre os membros do replica set: com leitura em um secundário
+        atrasado, o oplog capturado ainda cobre tudo o que ele não tinha aplicado.
+        
+        Returns:
+            Timestamp BSON ou None se o servidor não tem oplog
+        """
+        ts = ts_minimo_replica(self.client) or ultimo_ts_oplog(self.client)
+        if ts is None:
+            self.log("⚠ Oplog indisponível (o servidor não é um replica set). Backup sem snapshot consistente.")
+        return ts
+    
+    def capturar_oplog_snapshot(self, pasta_backup, inicio):
+        """
+        Grava o oplog do período da exportação em pasta_backup/.oplog (equivale ao --oplog do mongodump)
+        
+        Na restauração ele é reaplicado depois dos dados, levando todos os bancos ao
+        mesmo instante (o fim da exportação).
+        
+        Returns:
+            True se o oplog foi capturado
+        """
+        fim = ultimo_ts_oplog(self.client)
+        primeiro = primeiro_ts_oplog(self.client)
+        if fim is None or primeiro is None or primeiro > inicio:
+            self.log("✗ O oplog não cobre mais o início do backup (janela excedida): snapshot consistente não capturado.")
+            return False
+        
+        pasta_oplog = os.path.join(pasta_backup, PASTA_OPLOG_SNAPSHOT)
+        caminho = os.path.join(pasta_oplog, ARQUIVO_OPLOG)
+        try:
+            os.makedirs(pasta_oplog, exist_ok=True)
+            self.exportar_oplog(inicio, fim, caminho)
+            sincronizar_disco(caminho)
+        except subprocess.CalledProcessError as e:
+            self.log(f"✗ Erro ao capturar o oplog do snapshot: {e.stderr}")
+            return False
+        except Exception as e:
+            self.log(f"✗ Erro ao capturar o oplog do snapshot: {e}")
+            return False
+        
+        segundos = fim.time - inicio.time
+        self.log(f"✓ Snapshot consistente: oplog de {segundos}s capturado "
+                 f"({os.path.getsize(caminho) / 1024:.1f} KB), bancos no instante {fim.as_datetime():%d/%m/%Y %H:%M:%S} UTC")
+        return True
+    
     def fechar_conexao(self):
         """Fecha a conexão com o MongoDB"""
         if self.client:
             self.client.close()
+            self.client = None
 
 
-def main():
-    """Função principal"""
-    # Valores padrão
-    BACKUP_DIR = "C:\\backup\\mongodb"
-    MONGO_URI = "mongodb://localhost:27017/"
+class MongoDBRestore:
+    def __init__(self, restore_uri="mongodb://localhost:27017/", preservar_dados=True,
+                 paralelismo=RESTORE_PARALELISMO_PADRAO, colecoes_paralelas=RESTORE_COLECOES_PARALELAS_PADRAO,
+                 workers_insercao=RESTORE_WORKERS_INSERCAO_PADRAO, limite_total=RESTORE_LIMITE_TOTAL_PADRAO,
+                 verificar=True, processos_verificacao=PROCESSOS_VERIFICACAO_PADRAO, motor=MOTOR_PADRAO,
+                 colecoes=None, rapida=False, indices_paralelos=INDICES_PARALELOS_PADRAO,
+                 banco_diario=BANCO_JORNAIS_RESTAURACAO, log=print, ao_progresso=None):
+        """
+        Inicializa o sistema de restauração (linha de comando e interface gráfica)
+        
+        Args:
+            restore_uri: URI do MongoDB de destino
+            preservar_dados: Se False, usa --drop e substitui os bancos existentes
+            paralelismo: Quantidade de mongorestore simultâneos
+            colecoes_paralelas: --numParallelCollections de cada mongorestore
+            workers_insercao: --numInsertionWorkersPerCollection de cada mongorestore
+            limite_total: Máximo de workers de inserção somando todos os processos
+            verificar: Confere os checksums do backup antes de alterar o destino
+            processos_verificacao: Processos usados na verificação
+            motor: "mongodump" (mongorestore) ou "nativo" (insert_many pelo pymongo, só
+                para backups no formato "pasta")
+            colecoes: Padrões banco.colecao (como no --nsInclude, com *) das coleções
+                restauradas (None = todos os bancos e coleções)
+            rapida: Carrega os dados sem índices e com write concern {w: 1, j: false} e
+                constrói os índices no fim de cada banco, em paralelo
+            indices_paralelos: Índices construídos ao mesmo tempo em cada banco (rapida)
+            banco_diario: Banco do destino que guarda o diário da restauração
+            log: Função que recebe as mensagens de progresso (padrão: print)
+            ao_progresso: Função que recebe o resumo do progresso (ver ProgressoBackup.resumo)
+        """
+        separar_padroes(colecoes or [])
+        self.restore_uri = restore_uri
+        self.preservar_dados = preservar_dados
+        self.colecoes_paralelas = max(1, colecoes_paralelas)
+        self.workers_insercao = max(1, workers_insercao)
+        self.processos = calcular_processos_restore(paralelismo, colecoes_paralelas,
+                                                    workers_insercao, limite_total)
+        self.verificar = verificar
+        self.processos_verificacao = max(1, processos_verificacao)
+        self.motor = motor
+        self.colecoes = list(colecoes or [])
+        self.rapida = rapida
+        self.indices_paralelos = max(1, int(indices_paralelos))
+        self.banco_diario = banco_diario or BANCO_JORNAIS_RESTAURACAO
+        self.log = log
+        self.ao_progresso = ao_progresso
+        self.client = None
+        self.jornal = None
+        self.resumo = None
+        self.progresso = ProgressoBackup(self.notificar_progresso)
+        self._ultimo_log_progresso = 0.0
     
-    # Determinar pasta base (compatível com executável)
-    if getattr(sys, 'frozen', False):
-        base_dir = os.path.dirname(sys.executable)
-    else:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
+    def conectar_mongodb(self):
+        """Conecta ao MongoDB de destino e retorna True se bem-sucedido"""
+        try:
+            self.log("Conectando ao MongoDB de destino...")
+            self.client = MongoClient(self.restore_uri, serverSelectionTimeoutMS=5000)
+            self.client.server_info()
+            self.log("✓ Conexão estabelecida com sucesso!")
+            return True
+        except (ConnectionFailure, ServerSelectionTimeoutError) as e:
+            self.log(f"✗ Erro ao conectar ao MongoDB: {e}")
+            self.fechar_conexao()
+            return False
+    
+    def notificar_progresso(self, resumo):
+        """Entrega o progresso a ao_progresso (barra da interface) e ao log"""
+        if self.ao_progresso is not None:
+            self.ao_progresso(resumo)
+        agora = time.monotonic()
+        if resumo["concluidos"] < resumo["total"] and agora - self._ultimo_log_progresso < INTERVALO_LOG_PROGRESSO:
+            return
+        self._ultimo_log_progresso = agora
+        self.log(formatar_resumo(resumo))
+    
+    def opcoes_mongorestore(self):
+        """Opções comuns a todas as chamadas do mongorestore que carregam dados"""
+        opcoes = [
+            "--uri", uri_para_ferramenta(self.restore_uri),
+            f"--numParallelCollections={self.colecoes_paralelas}",
+            f"--numInsertionWorkersPerCollection={self.workers_insercao}"
+        ]
+        if not self.preservar_dados:
+            opcoes.append("--drop")
+        if self.rapida:
+            opcoes += opcoes_carga_rapida()
+        return opcoes
+    
+    def restaurar_banco(self, nome_banco, pasta_backup):
+        """
+        Carrega um banco (pasta, archive ou deduplicado) no destino
+        
+        As coleções que o diário da restauração registra como carregadas são puladas
+        (--nsExclude, em todos os formatos) e só têm os índices conferidos.
+        
+        Na restauração seletiva, os archives e bancos deduplicados com índice enviam ao
+        mongorestore só o prelúdio e os trechos das coleções escolhidas; na pasta, as
+        demais coleções ficam de fora (--nsExclude).
+        
+        Na restauração rápida, os índices são construídos logo depois da carga. O oplog
+        é reaplicado uma única vez, depois de todos os bancos (ver reaplicar_oplog).
+        
+        Args:
+            nome_banco: Nome do banco a restaurar
+            pasta_backup: Pasta do backup (base)
+        """
+        if nome_banco not in self.progresso.itens:
+            self.progresso.registrar(nome_banco, None, tamanho_banco_backup(pasta_backup, nome_banco))
+        self.progresso.iniciar(nome_banco)
+        sucesso = False
+        
+        def ao_evento(evento):
+            self.progresso.registrar_evento(nome_banco, evento)
+        
+        def ao_evento_colecao(evento):
+            ao_evento(evento)
+            if self.jornal is not None:
+                self.jornal.registrar_evento(nome_banco, evento)
+        
+        def ao_concluir_colecao(nome_colecao):
+            if self.jornal is not None:
+                self.jornal.concluir_colecao(nome_banco, nome_colecao)
+        
+        def ao_inserir(documentos, quantidade):
+            # Motor nativo: a fração do banco vem dos bytes dos .bson já enviados
+            self.progresso.somar_bytes(nome_banco, quantidade)
+        
+        try:
+            mongorestore_exe = localizar_ferramenta("mongorestore")
+            self.log(f"\nRestaurando banco '{nome_banco}'...")
+            
+            filtros = filtros_namespace(nome_banco, self.colecoes)
+            archive = localizar_archive(pasta_backup, nome_banco)
+            manifesto = localizar_manifesto(pasta_backup, nome_banco)
+            pasta = pasta_restauracao_banco(pasta_backup, nome_banco)
+            if not (archive or manifesto or os.path.exists(pasta)):
+                self.log(f"✗ Pasta do banco não encontrada: {pasta}")
+                return False
+            
+            # Coleções carregadas por uma execução anterior interrompida: só os índices são
+            # conferidos (na restauração rápida os de todas as coleções são construídos no fim)
+            concluidas = self.jornal.colecoes_concluidas(nome_banco) if self.jornal is not None else set()
+            if concluidas:
+                self.log(f"  '{nome_banco}': {len(concluidas)} coleção(ões) já restaurada(s) antes")
+                if not self.rapida:
+                    self.conferir_indices(nome_banco, pasta_backup, concluidas)
+            exclusoes = self.jornal.exclusoes(nome_banco) if self.jornal is not None else []
+            
+            if archive or manifesto:
+                comando = [mongorestore_exe, "--archive"] + filtros + self.opcoes_mongorestore() + exclusoes
+                seletivo = abrir_selecao(pasta_backup, nome_banco, self.colecoes, archive, manifesto, self.log)
+                if seletivo is not None:
+                    alimentar_entrada(comando, seletivo, ao_evento_colecao)
+                elif archive:
+                    restaurar_de_archive(comando, *archive, ao_evento=ao_evento_colecao)
+                else:
+                    with LeitorManifesto(manifesto) as origem:
+                        alimentar_entrada(comando, origem, ao_evento_colecao)
+            else:
+                ignoradas = colecoes_ignoradas(pasta, nome_banco, self.colecoes, self.log)
+                if self.motor == "nativo":
+                    motor_nativo.restaurar_banco(self.client, nome_banco, pasta, drop=not self.preservar_dados,
+                                                 colecoes_paralelas=self.colecoes_paralelas,
+                                                 workers_insercao=self.workers_insercao, log=self.log,
+                                                 ignorar=concluidas | ignoradas, ao_concluir=ao_concluir_colecao,
+                                                 indices=not self.rapida,
+                                                 write_concern=write_concern_carga() if self.rapida else None,
+                                                 ao_inserir=ao_inserir)
+                else:
+                    comando = [mongorestore_exe, "--db", nome_banco] + self.opcoes_mongorestore() + exclusoes
+                    comando += [f"--nsExclude={padrao_namespace(nome_banco, colecao)}" for colecao in sorted(ignoradas)]
+                    comando.append(pasta)
+                    executar_ferramenta(comando, ao_evento_colecao)
+            
+            if self.rapida:
+                construir_indices(self.client, nome_banco, indices_do_backup(pasta_backup, nome_banco, self.colecoes),
+                                  self.indices_paralelos, log=self.log)
+            
+            if self.jornal is not None:
+                self.jornal.concluir_banco(nome_banco)
+            self.log(f"✓ Banco '{nome_banco}' restaurado com sucesso!")
+            sucesso = True
+            return True
+        
+        except subprocess.CalledProcessError as e:
+            self.log(f"✗ Erro ao restaurar banco '{nome_banco}': {e.stderr}")
+            return False
+        except FileNotFoundError:
+            self.log("✗ Erro: 'mongorestore' não encontrado!")
+            self.log("Certifique-se de que o MongoDB está instalado e mongorestore está no PATH.")
+            return False
+        except Exception as e:
+            self.log(f"✗ Erro inesperado ao restaurar '{nome_banco}': {e}")
+            return False
+        finally:
+            # Com falha, as coleções já carregadas ficam no diário para a próxima execução
+            if self.jornal is not None:
+                self.jornal.gravar()
+            self.progresso.concluir(nome_banco, sucesso)
+    
+    def conferir_indices(self, nome_banco, pasta_backup, colecoes):
+        """
+        Garante os índices do backup nas coleções informadas (createIndexes não altera os
+        índices que já existem)
+        
+        O mongorestore cria os índices depois de carregar os dados: uma coleção carregada
+        por uma execução interrompida pode ter ficado sem eles.
+        """
+        indices = {}
+        for nome_colecao, indice in indices_do_backup(pasta_backup, nome_banco):
+            if nome_colecao in colecoes:
+                indices.setdefault(nome_colecao, []).append(indice)
+        for nome_colecao, lista in indices.items():
+            motor_nativo.criar_indices(self.client[nome_banco][nome_colecao], lista)
+    
+    def reaplicar_oplog(self, pasta_backup, bancos, alvo_ts=None):
+        """
+        Reaplica o oplog do snapshot consistente e os incrementos, depois da carga de todos os bancos
+        
+        O oplog cobre o servidor inteiro: cada arquivo é reaplicado uma única vez por um
+        só mongorestore --oplogReplay, com a união dos namespaces restaurados, para que
+        as transações entre bancos (applyOps) entrem inteiras e todos os bancos cheguem
+        ao mesmo instante. Os arquivos já reaplicados (diário) são pulados.
+        
+        Args:
+            pasta_backup: Pasta do backup (base)
+            bancos: Bancos restaurados
+            alvo_ts: Timestamp BSON limite da restauração pontual (None = tudo)
+        
+        Returns:
+            True se todo o oplog foi reaplicado
+        """
+        pasta_snapshot = os.path.join(pasta_backup, PASTA_OPLOG_SNAPSHOT)
+        incrementos = incrementos_ate(pasta_backup, alvo_ts) if alvo_ts else listar_incrementos(pasta_backup)
+        oplogs = [(pasta_incremento, f"incremento {i}/{len(incrementos)} ({os.path.basename(pasta_incremento)})")
+                  for i, pasta_incremento in enumerate(incrementos, 1)]
+        if os.path.isfile(os.path.join(pasta_snapshot, ARQUIVO_OPLOG)):
+            oplogs.insert(0, (pasta_snapshot, "oplog do snapshot consistente"))
+        if self.jornal is not None:
+            oplogs = [(pasta, descricao) for pasta, descricao in oplogs
+                      if not self.jornal.oplog_concluido(os.path.basename(pasta))]
+        if not oplogs:
+            return True
         
-    # Tenta carregar do config.json primeiro
-    config_path = os.path.join(base_dir, "config.json")
-    if os.path.exists(config_path):
+        filtros = list(dict.fromkeys(filtro for banco in bancos for filtro in filtros_namespace(banco, self.colecoes)))
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                BACKUP_DIR = config.get("backup_dir", BACKUP_DIR)
-                MONGO_URI = config.get("mongo_uri", MONGO_URI)
-                print(f"Configurações carregadas de {config_path}")
+            mongorestore_exe = localizar_ferramenta("mongorestore")
+            for pasta_oplog, descricao in oplogs:
+                self.log(f"  [Oplog] Reaplicando {descricao} em {len(bancos)} banco(s)")
+                comando = [
+                    mongorestore_exe,
+                    "--uri", uri_para_ferramenta(self.restore_uri),
+                    "--oplogReplay"
+                ] + filtros
+                if alvo_ts:
+                    comando.append(f"--oplogLimit={formatar_oplog_limit(alvo_ts)}")
+                comando.append(pasta_oplog)
+                executar_ferramenta(comando)
+                if self.jornal is not None:
+                    self.jornal.concluir_oplog(os.path.basename(pasta_oplog))
+        except subprocess.CalledProcessError as e:
+            self.log(f"✗ Erro ao reaplicar o oplog: {e.stderr}")
+            return False
+        except FileNotFoundError:
+            self.log("✗ Erro: 'mongorestore' não encontrado!")
+            return False
         except Exception as e:
-            print(f"Aviso: Erro ao ler config.json: {e}. Usando padrões.")
+            self.log(f"✗ Erro inesperado ao reaplicar o oplog: {e}")
+            return False
+        self.log(f"✓ Oplog reaplicado: {len(oplogs)} arquivo(s)")
+        return True
+    
+    def executar_restore(self, pasta_backup, alvo_ts=None):
+        """
+        Restaura todos os bancos (ou as coleções escolhidas) de uma pasta de backup
+        
+        O resumo (sucessos e falhas) fica em self.resumo; None se nada foi restaurado.
+        """
+        self.resumo = None
+        self.log("=" * 60)
+        self.log("SISTEMA DE RESTAURAÇÃO MONGODB")
+        self.log("=" * 60)
+        
+        if not os.path.isdir(pasta_backup):
+            self.log(f"✗ Pasta não encontrada: {pasta_backup}")
+            return False
+        
+        bancos = sorted(listar_bancos_backup(pasta_backup),
+                        key=lambda banco: tamanho_banco_backup(pasta_backup, banco), reverse=True)
+        if not bancos:
+            self.log("\nNenhum banco de dados encontrado na pasta de backup.")
+            return False
+        if self.colecoes:
+            bancos = bancos_selecionados(bancos, self.colecoes)
+            if not bancos:
+                self.log(f"\nNenhum banco do backup corresponde a: {', '.join(self.colecoes)}")
+                return False
+        
+        self.log(f"Pasta de backup: {pasta_backup}")
+        self.log(f"Bancos encontrados: {len(bancos)}")
+        if self.colecoes:
+            self.log(f"Restauração seletiva: {', '.join(self.colecoes)}")
+        if self.rapida:
+            self.log(f"Restauração rápida: carga sem índices (w:1, sem journal); "
+                     f"até {self.indices_paralelos} índice(s) construído(s) ao mesmo tempo por banco")
+        if self.processos > 1:
+            self.log(f"Restaurações simultâneas: {self.processos}")
+        
+        # Um backup corrompido é descoberto antes de qualquer alteração no destino. Na
+        # restauração seletiva, os bancos deduplicados com índice conferem só os blocos
+        # que serão lidos; os archives são conferidos inteiros (sem descomprimir)
+        if self.verificar:
+            blocos = blocos_da_selecao(pasta_backup, bancos, self.colecoes) if self.colecoes else None
+            problemas = verificar_backup(pasta_backup, bancos, self.processos_verificacao, log=self.log,
+                                         blocos=blocos)
+            if problemas is None:
+                self.log("⚠ Backup sem manifesto de checksums; restaurando sem verificação.")
+            elif problemas:
+                self.log("✗ Restauração cancelada: o backup está corrompido. Nenhum banco foi alterado.")
+                return False
+        
+        if not self.conectar_mongodb():
+            return False
+        
+        sucessos = 0
+        falhas = 0
+        self.progresso = ProgressoBackup(self.notificar_progresso)
+        for banco in bancos:
+            self.progresso.registrar(banco, None, tamanho_banco_backup(pasta_backup, banco))
+        
+        # Diário da restauração: uma execução anterior interrompida continua de onde parou
+        try:
+            self.jornal = JornalRestauracao.abrir(self.client, identificar_backup(pasta_backup), pasta_backup,
+                                                  formatar_oplog_limit(alvo_ts) if alvo_ts else None,
+                                                  self.colecoes, banco=self.banco_diario, log=self.log)
+        except (OSError, PyMongoError) as e:
+            self.log(f"⚠ Não foi possível abrir o diário da restauração: {e}")
+            self.jornal = None
+        pendentes = bancos
+        if self.jornal is not None and self.jornal.retomada():
+            pendentes = [banco for banco in bancos if not self.jornal.banco_concluido(banco)]
+            self.log(f"Continuando a restauração anterior: {len(bancos) - len(pendentes)} banco(s) já restaurado(s)")
+            for banco in bancos:
+                if banco not in pendentes:
+                    self.progresso.concluir(banco)
+                    sucessos += 1
+        
+        oplog_reaplicado = False
+        sucesso = False
+        try:
+            with ThreadPoolExecutor(max_workers=self.processos) as executor:
+                futuros = [executor.submit(self.restaurar_banco, banco, pasta_backup) for banco in pendentes]
+                for futuro in as_completed(futuros):
+                    if futuro.result():
+                        sucessos += 1
+                    else:
+                        falhas += 1
+            
+            # O oplog só é reaplicado com todos os bancos carregados (um único instante)
+            if falhas == 0:
+                oplog_reaplicado = self.reaplicar_oplog(pasta_backup, bancos, alvo_ts)
+            elif listar_incrementos(pasta_backup) or os.path.isfile(os.path.join(pasta_backup, PASTA_OPLOG_SNAPSHOT, ARQUIVO_OPLOG)):
+                self.log("⚠ Oplog não reaplicado: há bancos com falha.")
+            
+            # O diário é removido com a conexão ainda aberta
+            sucesso = falhas == 0 and oplog_reaplicado
+            if sucesso and self.jornal is not None:
+                self.jornal.descartar()
+        finally:
+            self.fechar_conexao()
+        
+        # Resumo final
+        self.log("\n" + "=" * 60)
+        self.log("RESUMO DA RESTAURAÇÃO")
+        self.log("=" * 60)
+        self.log(f"Bancos restaurados com sucesso: {sucessos}")
+        self.log(f"Bancos com falha: {falhas}")
+        if falhas == 0 and not oplog_reaplicado:
+            self.log("Oplog: não reaplicado (falha)")
+        self.log("=" * 60)
+        
+        self.resumo = {"sucessos": sucessos, "falhas": falhas, "oplog": oplog_reaplicado}
+        if not sucesso and self.jornal is not None and self.jornal.ativo:
+            self.log("Execute a mesma restauração novamente para continuar de onde parou.")
+        
+        return sucesso
+    
+    def fechar_conexao(self):
+        """Fecha a conexão com o MongoDB de destino"""
+        if self.client:
+            self.client.close()
+            self.client = None
+
+
+def carregar_config():
+    """Lê o config.json ao lado do script/executável (dicionário vazio se não existir)"""
+    config_path = os.path.join(obter_pasta_base(), "config.json")
+    if not os.path.exists(config_path):
+        return {}
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        print(f"Configurações carregadas de {config_path}")
+        return config
+    except Exception as e:
+        print(f"Aviso: Erro ao ler config.json: {e}. Usando padrões.")
+        return {}
+
+
+def comando_restaurar(config, argv):
+    """
+    Subcomando 'restaurar': restaura uma pasta de backup ou um ponto no tempo
+    
+    Com --ate, a base incremental adequada é escolhida em backup_dir e o oplog
+    é reaplicado somente até o horário informado (--oplogLimit). Com --nsInclude,
+    só as coleções escolhidas são restauradas (--listar-colecoes mostra as do backup).
+    Com --rapida, os índices são construídos depois da carga dos dados.
+    """
+    parser = argparse.ArgumentParser(prog="backup_mongodb.py restaurar",
+                                     description="Restaura bancos de um backup")
+    parser.add_argument("pasta", nargs="?", help="Pasta do backup a restaurar")
+    parser.add_argument("--ate", metavar="DATA_HORA",
+                        help="Restauração pontual até o horário (DD-MM-YYYY HH:MM:SS)")
+    parser.add_argument("--backup-dir", default=config.get("backup_dir", "C:\\backup\\mongodb"),
+                        help="Diretório onde procurar a base para a restauração pontual")
+    parser.add_argument("--origem", "--source", dest="origem", metavar="NOME",
+                        help="Origem do backup de vários servidores (usa backup_dir/<origem>)")
+    parser.add_argument("--uri", default=config.get("restore_uri", "mongodb://localhost:27017/"),
+                        help="URI do MongoDB de destino")
+    parser.add_argument("--drop", action="store_true",
+                        help="Substitui os bancos existentes (mongorestore --drop)")
+    parser.add_argument("-j", "--paralelismo", type=int,
+                        default=config.get("restore_paralelismo", RESTORE_PARALELISMO_PADRAO),
+                        help="Quantidade de mongorestore simultâneos")
+    parser.add_argument("--motor", choices=MOTORES, default=config.get("motor", MOTOR_PADRAO),
+                        help="mongorestore ou nativo (insert_many pelo pymongo, formato pasta)")
+    parser.add_argument("--sem-verificacao", dest="verificar", action="store_false",
+                        default=config.get("verificar_antes_restaurar", True),
+                        help="Não confere os checksums do backup antes de restaurar")
+    parser.add_argument("--nsInclude", "--colecao", dest="colecoes", action="append", metavar="BANCO.COLECAO",
+                        help="Restaura só as coleções do padrão (aceita *; pode repetir)")
+    parser.add_argument("--rapida", "--fast", dest="rapida", action="store_true",
+                        default=config.get("restauracao_rapida", False),
+                        help="Carrega sem índices (w:1, sem journal) e constrói os índices no fim, em paralelo")
+    parser.add_argument("--listar-colecoes", action="store_true",
+                        help="Lista as coleções de cada banco do backup e sai")
+    args = parser.parse_args(argv)
+    if args.origem:
+        args.backup_dir = pasta_origem(args.backup_dir, args.origem)
+    
+    if args.listar_colecoes:
+        if not args.pasta or not os.path.isdir(args.pasta):
+            parser.error("informe a pasta do backup para listar as coleções")
+        for banco in sorted(listar_bancos_backup(args.pasta)):
+            colecoes = colecoes_do_backup(args.pasta, banco)
+            if colecoes is None:
+                print(f"{banco}: (sem índice de coleções)")
+                continue
+            print(f"{banco}: {len(colecoes)} coleção(ões)")
+            for colecao in colecoes:
+                print(f"  {banco}.{colecao}")
+        return True
+    
+    alvo_ts = None
+    pasta = args.pasta
+    if args.ate:
+        try:
+            alvo = interpretar_data_hora(args.ate)
+        except ValueError as e:
+            print(f"✗ {e}")
+            return False
+        alvo_ts = datetime_para_ts(alvo)
+        
+        if not pasta:
+            base = escolher_base_para_alvo(args.backup_dir, alvo)
+            if not base:
+                print(f"✗ Nenhuma base incremental concluída até {alvo} em {args.backup_dir}")
+                return False
+            pasta = base[0]
+        
+        estado = ler_estado(pasta)
+        if not estado:
+            print(f"✗ {pasta} não é uma base incremental (sem oplog para reaplicar)")
+            return False
+        # Um incremento vazio confirma que nada mudou depois do último oplog capturado
+        sem_alteracoes = estado.get("sem_alteracoes_ate")
+        conferido = sem_alteracoes is not None and alvo <= datetime.fromisoformat(sem_alteracoes)
+        if alvo_ts > dict_para_ts(estado["ultimo_ts"]) and not conferido:
+            ultimo = datetime.fromtimestamp(estado["ultimo_ts"]["t"])
+            print(f"⚠ O último oplog capturado é de {ultimo}; a restauração irá até esse ponto.")
+        print(f"Restauração pontual até {alvo} usando a base {pasta}")
+    elif not pasta:
+        parser.error("informe a pasta do backup ou --ate")
+    
+    try:
+        restore = MongoDBRestore(
+            restore_uri=args.uri,
+            preservar_dados=not args.drop,
+            paralelismo=args.paralelismo,
+            colecoes_paralelas=config.get("restore_colecoes_paralelas", RESTORE_COLECOES_PARALELAS_PADRAO),
+            workers_insercao=config.get("restore_workers_insercao", RESTORE_WORKERS_INSERCAO_PADRAO),
+            limite_total=config.get("restore_limite_total", RESTORE_LIMITE_TOTAL_PADRAO),
+            verificar=args.verificar,
+            motor=args.motor,
+            processos_verificacao=config.get("verificacao_processos", PROCESSOS_VERIFICACAO_PADRAO),
+            colecoes=args.colecoes,
+            rapida=args.rapida,
+            indices_paralelos=config.get("restore_indices_paralelos", INDICES_PARALELOS_PADRAO),
+            banco_diario=config.get("restore_banco_diario", BANCO_JORNAIS_RESTAURACAO)
+        )
+    except ValueError as e:
+        print(f"✗ {e}")
+        return False
+    return restore.executar_restore(pasta, alvo_ts)
+
+
+def comando_verificar(config, argv):
+    """
+    Subcomando 'verificar' (ou 'verify'): confere os checksums de uma pasta de backup
+    
+    Os hashes são recalculados em vários processos (um disco lento não segura os demais).
+    """
+    parser = argparse.ArgumentParser(prog="backup_mongodb.py verificar",
+                                     description="Confere a integridade de um backup")
+    parser.add_argument("pasta", help="Pasta do backup a verificar")
+    parser.add_argument("-j", "--processos", type=int,
+                        default=config.get("verificacao_processos", PROCESSOS_VERIFICACAO_PADRAO),
+                        help="Quantidade de processos que calculam os hashes")
+    args = parser.parse_args(argv)
+    
+    if not os.path.isdir(args.pasta):
+        print(f"✗ Pasta não encontrada: {args.pasta}")
+        return False
+    
+    problemas = verificar_backup(args.pasta, processos=max(1, args.processos))
+    if problemas is None:
+        print(f"✗ {args.pasta} não tem manifesto de checksums ({ARQUIVO_MANIFESTO})")
+        return False
+    return not problemas
+
+
+def comando_reter(config, argv):
+    """
+    Subcomando 'reter' (ou 'prune'): aplica a política de retenção em backup_dir
+    
+    A política vem de "retencao" no config.json; as opções da linha de comando
+    substituem cada nível. Com --simular apenas exibe o que seria apagado.
+    """
+    politica = normalizar_politica(config.get("retencao"))
+    parser = argparse.ArgumentParser(prog="backup_mongodb.py reter",
+                                     description="Apaga os backups fora da política de retenção")
+    parser.add_argument("--backup-dir", default=config.get("backup_dir", "C:\\backup\\mongodb"),
+                        help="Diretório de backup")
+    parser.add_argument("--origem", "--source", dest="origem", metavar="NOME",
+                        help="Origem do backup de vários servidores (usa backup_dir/<origem>)")
+    for nivel, rotulo, _ in NIVEIS:
+        parser.add_argument(f"--{nivel}", type=int, default=politica[nivel],
+                            help=f"Quantidade de backups de nível {rotulo} mantidos")
+    parser.add_argument("--simular", "--dry-run", dest="simular", action="store_true",
+                        help="Apenas exibe o relatório, sem apagar nada")
+    args = parser.parse_args(argv)
+    if args.origem:
+        args.backup_dir = pasta_origem(args.backup_dir, args.origem)
+    
+    politica = {nivel: getattr(args, nivel) for nivel, _, _ in NIVEIS}
+    if not politica_ativa(politica):
+        print("✗ Nenhuma política de retenção: configure 'retencao' no config.json "
+              "ou informe --horarios, --diarios, --semanais ou --mensais")
+        return False
+    if not os.path.isdir(args.backup_dir):
+        print(f"✗ Pasta não encontrada: {args.backup_dir}")
+        return False
+    
+    aplicar_retencao(args.backup_dir, politica, simular=args.simular)
+    return True
+
+
+def comando_listar(config, argv):
+    """
+    Subcomando 'listar' (ou 'list'): consulta o catálogo de backups
+    
+    Sem argumentos mostra as execuções mais recentes; com o nome de uma pasta de
+    backup mostra seus bancos e coleções; com --por-banco, os bancos mais lentos.
+    """
+    parser = argparse.ArgumentParser(prog="backup_mongodb.py listar",
+                                     description="Lista os backups registrados no catálogo")
+    parser.add_argument("pasta", nargs="?",
+                        help="Pasta de backup (nome relativo ao backup_dir) para ver bancos e coleções")
+    parser.add_argument("--backup-dir", default=config.get("backup_dir", "C:\\backup\\mongodb"),
+                        help="Diretório de backup (onde fica o catálogo)")
+    parser.add_argument("--origem", "--source", dest="origem", metavar="NOME",
+                        help="Origem do backup de vários servidores (usa backup_dir/<origem>)")
+    parser.add_argument("-n", "--limite", type=int, default=30,
+                        help="Quantidade de execuções exibidas")
+    parser.add_argument("--por-banco", "--by-database", action="store_true",
+                        help="Tempo de cada banco nas últimas -n execuções completas (mais lentos primeiro)")
+    args = parser.parse_args(argv)
+    if args.origem:
+        args.backup_dir = pasta_origem(args.backup_dir, args.origem)
+    
+    if args.por_banco:
+        bancos = bancos_mais_lentos(args.backup_dir, args.limite)
+        if not bancos:
+            print(f"Nenhum backup completo registrado no catálogo de {args.backup_dir}")
+            return True
+        print(f"{'Banco':<30} {'Execuções':>9} {'Média':>9} {'Máxima':>9} {'Tamanho':>10} "
+              f"{'Docs/s':>10} {'Parcela':>8} {'Tentativas':>10}")
+        for banco in bancos:
+            parcela = f"{banco['parcela'] * 100:.0f}%" if banco["parcela"] is not None else "-"
+            print(f"{banco['nome']:<30} {banco['execucoes']:>9} {banco['duracao_media']:>8.1f}s "
+                  f"{banco['duracao_maxima']:>8.1f}s {formatar_bytes(banco['bytes_medio']):>10} "
+                  f"{banco['documentos_s'] or 0:>10.0f} {parcela:>8} {banco['tentativas_maximas'] or 1:>10}")
+        return True
+    
+    if args.pasta:
+        nome = os.path.relpath(args.pasta, args.backup_dir) if os.path.isabs(args.pasta) else args.pasta
+        bancos = bancos_da_execucao(args.backup_dir, nome)
+        if bancos is None:
+            print(f"✗ '{nome}' não está registrado no catálogo de {args.backup_dir}")
+            return False
+        for banco in bancos:
+            marca = "✓" if banco["status"] == "ok" else "✗"
+            print(f"{marca} {banco['nome']:<30} {formatar_bytes(banco['bytes']):>10}  "
+                  f"{banco['documentos'] or 0:>12} docs  {banco['duracao'] or 0:>8.1f}s  {banco['checksum'] or ''}")
+            if banco["fases"]:
+                print("      Fases: " + ", ".join(f"{fase} {segundos:.1f}s" for fase, segundos in banco["fases"].items())
+                      + (f"  (tentativas: {banco['tentativas']})" if (banco["tentativas"] or 1) > 1 else ""))
+            for colecao in banco["colecoes"]:
+                if colecao["filtro"]:
+                    print(f"      {colecao['nome']:<34} {formatar_bytes(colecao['bytes']):>10}  "
+                          f"parcial: {colecao['filtro']}")
+                    continue
+                print(f"      {colecao['nome']:<34} {formatar_bytes(colecao['bytes']):>10}  "
+                      f"{colecao['documentos'] or 0:>12} docs")
+            if banco["erro"]:
+                print(f"      Erro: {banco['erro'].strip()}")
+        return True
+    
+    execucoes = listar_execucoes(args.backup_dir, args.limite)
+    if not execucoes:
+        print(f"Nenhum backup registrado no catálogo de {args.backup_dir}")
+        return True
+    
+    print(f"{'Início':<20} {'Tipo':<12} {'Status':<7} {'Bancos':>9} {'Tamanho':>10} {'Duração':>9}  Pasta")
+    for execucao in execucoes:
+        bancos = f"{execucao['bancos_ok']}/{execucao['bancos_ok'] + execucao['bancos_falha']}"
+        print(f"{execucao['inicio'].replace('T', ' '):<20} {execucao['tipo']:<12} {execucao['status']:<7} "
+              f"{bancos:>9} {formatar_bytes(execucao['bytes']):>10} {execucao['duracao'] or 0:>8.1f}s  "
+              f"{execucao['nome']}")
+    return True
+
+
+# Subcomandos aceitos como primeiro argumento (o padrão é executar o backup)
+COMANDOS = {
+    "restaurar": comando_restaurar,
+    "listar": comando_listar,
+    "list": comando_listar,
+    "verificar": comando_verificar,
+    "verify": comando_verificar,
+    "reter": comando_reter,
+    "prune": comando_reter,
+}
+
+
+def main():
+    """Função principal"""
+    config = carregar_config()
+    
+    if len(sys.argv) > 1 and sys.argv[1] in COMANDOS:
+        try:
+            sucesso = COMANDOS[sys.argv[1]](config, sys.argv[2:])
+            sys.exit(0 if sucesso else 1)
+        except KeyboardInterrupt:
+            print("\n\nOperação cancelada pelo usuário.")
+            sys.exit(1)
     
-    # Verifica argumentos da linha de comando (sobrescrevem o config.json se fornecidos)
-    if len(sys.argv) > 1:
-        BACKUP_DIR = sys.argv[1]
-    if len(sys.argv) > 2:
-        MONGO_URI = sys.argv[2]
+    # Valores padrão (o config.json tem precedência)
+    BACKUP_DIR = config.get("backup_dir", "C:\\backup\\mongodb")
+    MONGO_URI = config.get("mongo_uri", "mongodb://localhost:27017/")
+    PARALELISMO = config.get("paralelismo", PARALELISMO_PADRAO)
+    FORMATO = config.get("formato_backup", FORMATO_PADRAO)
+    COMPRESSAO = config.get("compressao", COMPRESSAO_PADRAO)
+    INCREMENTAL = config.get("backup_incremental", False)
+    INTERVALO_BASE_HORAS = config.get("incremental_intervalo_base_horas", INTERVALO_BASE_HORAS_PADRAO)
+    PROCESSOS_VERIFICACAO = config.get("verificacao_processos", PROCESSOS_VERIFICACAO_PADRAO)
+    COLECOES_PARALELAS = config.get("colecoes_paralelas", COLECOES_PARALELAS_PADRAO)
+    MOTOR = config.get("motor", MOTOR_PADRAO)
+    ESPACO_INSUFICIENTE = config.get("espaco_insuficiente", MODO_ESPACO_PADRAO)
+    PREFERENCIA_LEITURA = config.get("preferencia_leitura")
+    SNAPSHOT_CONSISTENTE = config.get("snapshot_consistente", False)
     
-    backup = MongoDBBackup(backup_dir=BACKUP_DIR, mongo_uri=MONGO_URI)
+    # Argumentos da linha de comando (sobrescrevem o config.json se fornecidos)
+    parser = argparse.ArgumentParser(description="Sistema de Backup MongoDB",
+                                     epilog="Subcomandos: " + ", ".join(COMANDOS))
+    parser.add_argument("backup_dir", nargs="?", default=BACKUP_DIR,
+                        help="Diretório de backup")
+    parser.add_argument("mongo_uri", nargs="?", default=MONGO_URI,
+                        help="URI de conexão do MongoDB")
+    parser.add_argument("-j", "--paralelismo", type=int, default=PARALELISMO,
+                        help="Quantidade de processos mongodump simultâneos")
+    parser.add_argument("--formato", choices=FORMATOS_BACKUP, default=FORMATO,
+                        help="Formato de saída: pasta (.bson) ou archive (arquivo comprimido)")
+    parser.add_argument("--compressao", choices=list(EXTENSOES), default=COMPRESSAO,
+                        help="Codec usado no formato archive")
+    parser.add_argument("--motor", choices=MOTORES, default=MOTOR,
+                        help="mongodump (ferramenta externa) ou nativo (pymongo, sem mongodump)")
+    parser.add_argument("--colecoes-paralelas", type=int, default=COLECOES_PARALELAS,
+                        help="Coleções exportadas em paralelo por mongodump no formato archive")
+    parser.add_argument("--incremental", dest="incremental", action="store_true", default=INCREMENTAL,
+                        help="Captura apenas o oplog novo quando já existe uma base completa")
+    parser.add_argument("--completo", dest="incremental", action="store_false",
+                        help="Força um backup completo (ignora o modo incremental do config.json)")
+    parser.add_argument("--retomar", "--resume", dest="retomar", action="store_true",
+                        help="Continua o backup interrompido mais recente, exportando só o que faltava")
+    parser.add_argument("--espaco-insuficiente", choices=MODOS_ESPACO, default=ESPACO_INSUFICIENTE,
+                        help="Sem espaço para a saída estimada: recusar o backup ou exportar só o que cabe")
+    parser.add_argument("--planejar", "--plan", dest="planejar", action="store_true",
+                        help="Apenas estima o tamanho e a duração e confere o espaço livre, sem exportar")
+    parser.add_argument("--preferencia-leitura", "--read-preference", dest="preferencia_leitura",
+                        choices=PREFERENCIAS_LEITURA, default=PREFERENCIA_LEITURA,
+                        help="Membro do replica set usado na leitura (ex: secondaryPreferred)")
+    parser.add_argument("--oplog", "--snapshot-consistente", dest="snapshot_consistente", action="store_true",
+                        default=SNAPSHOT_CONSISTENTE,
+                        help="Captura o oplog do período da exportação para restaurar todos os bancos no mesmo instante")
+    parser.add_argument("--limite-leitura", type=float, metavar="MB_S",
+                        help="Limite de leitura do MongoDB em MB/s (sobrescreve limitacao.leitura_mb_s)")
+    parser.add_argument("--limite-escrita", type=float, metavar="MB_S",
+                        help="Limite de escrita no disco em MB/s (sobrescreve limitacao.escrita_mb_s)")
+    parser.add_argument("--origem", "--source", dest="origem", action="append", metavar="NOME",
+                        help="Com \"origens\" no config.json, faz o backup apenas desta origem (repetível)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Fica em execução e faz os backups nos horários de agendamento do config.json")
+    args = parser.parse_args()
+    
+    agenda = None
+    limitacao = config.get("limitacao")
+    if args.daemon:
+        try:
+            agenda = carregar_agenda(config)
+        except ValueError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        # Limites próprios do modo de agendamento (ex: mais restritos no "intervalo", em horário comercial)
+        limitacao = mesclar_limitacao(limitacao, config.get("limitacao_agendamento", {}).get(agenda["modo"]))
+    if args.limite_leitura is not None:
+        limitacao = mesclar_limitacao(limitacao, {"leitura_mb_s": args.limite_leitura})
+    if args.limite_escrita is not None:
+        limitacao = mesclar_limitacao(limitacao, {"escrita_mb_s": args.limite_escrita})
+    
+    opcoes = dict(paralelismo=args.paralelismo, formato=args.formato,
+                  compressao=args.compressao, incremental=args.incremental,
+                  intervalo_base_horas=INTERVALO_BASE_HORAS,
+                  processos_verificacao=PROCESSOS_VERIFICACAO,
+                  colecoes_paralelas=args.colecoes_paralelas, motor=args.motor,
+                  retencao=config.get("retencao"),
+                  espaco_insuficiente=args.espaco_insuficiente,
+                  metricas_prometheus=config.get("metricas_prometheus"),
+                  limitacao=limitacao, preferencia_leitura=args.preferencia_leitura,
+                  tags_leitura=config.get("tags_leitura"),
+                  snapshot_consistente=args.snapshot_consistente,
+                  filtros=config.get("filtros_exportacao"))
+    try:
+        origens = carregar_origens(config)
+        if args.origem:
+            desconhecidas = set(args.origem) - {origem["nome"] for origem in origens}
+            if desconhecidas:
+                raise ValueError(f"Origem(ns) não configurada(s): {', '.join(sorted(desconhecidas))}")
+            origens = [origem for origem in origens if origem["nome"] in args.origem]
+        
+        if origens:
+            # Várias origens: cada uma em backup_dir/<origem>, com as chaves que ela sobrescreve
+            backups = {}
+            for origem in origens:
+                opcoes_origem = dict(opcoes, **origem["opcoes"])
+                if "limitacao" in origem["opcoes"]:
+                    opcoes_origem["limitacao"] = mesclar_limitacao(limitacao, origem["opcoes"]["limitacao"])
+                backups[origem["nome"]] = MongoDBBackup(
+                    backup_dir=pasta_origem(args.backup_dir, origem["nome"]), mongo_uri=origem["mongo_uri"],
+                    incluir_bancos=origem["incluir"], excluir_bancos=origem["excluir"], origem=origem["nome"],
+                    log=log_da_origem(origem["nome"]), **opcoes_origem)
+            orquestrador = OrquestradorOrigens(backups,
+                                               config.get("concorrencia_origens", CONCORRENCIA_ORIGENS_PADRAO),
+                                               config.get("concorrencia_por_host", CONCORRENCIA_HOST_PADRAO))
+            executar = partial(orquestrador.executar, retomar=args.retomar)
+        else:
+            backups = {None: MongoDBBackup(backup_dir=args.backup_dir, mongo_uri=args.mongo_uri,
+                                           incluir_bancos=config.get("incluir_bancos"),
+                                           excluir_bancos=config.get("excluir_bancos"), **opcoes)}
+            executar = partial(backups[None].executar_backup, retomar=args.retomar)
+    except ValueError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
     
     try:
-        sucesso = backup.executar_backup()
+        if args.planejar:
+            sucesso = all(backup.conectar_mongodb() and backup.planejar(backup.listar_bancos_dados()) is not None
+                          for backup in backups.values())
+        elif args.daemon:
+            agendador = Agendador(args.backup_dir, agenda, executar)
+            # SIGTERM (systemd, docker stop) encerra o agendador depois do backup em andamento
+            signal.signal(signal.SIGTERM, lambda *_: agendador.parar.set())
+            agendador.rodar()
+            sucesso = True
+        else:
+            sucesso = executar()
         sys.exit(0 if sucesso else 1)
     except KeyboardInterrupt:
         print("\n\nBackup cancelado pelo usuário.")
+        for backup in backups.values():
+            if backup.jornal is not None:
+                print(f"O progresso foi salvo em {backup.jornal.pasta}. Execute com --retomar para continuar.")
         sys.exit(1)
     except Exception as e:
         print(f"\n✗ Erro fatal: {e}")
         sys.exit(1)
     finally:
-        backup.fechar_conexao()
+        for backup in backups.values():
+            backup.fechar_conexao()
 
 
 if __name__ == "__main__":
+    # Necessário para o pool de processos da verificação no executável (PyInstaller)
+    multiprocessing.freeze_support()
     main()
 
@@ -9,13 +9,38 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
 import threading
 import subprocess
+import queue
 import os
 from datetime import datetime
 import json
 import sys
+import multiprocessing
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 
+from backup_mongodb import (
+    MongoDBBackup, MongoDBRestore, PARALELISMO_PADRAO, COLECOES_PARALELAS_PADRAO, RESTORE_PARALELISMO_PADRAO,
+    RESTORE_COLECOES_PARALELAS_PADRAO, RESTORE_WORKERS_INSERCAO_PADRAO, RESTORE_LIMITE_TOTAL_PADRAO,
+    FORMATOS_BACKUP, FORMATO_PADRAO, listar_bancos_backup, colecoes_do_backup
+)
+from construcao_indices import INDICES_PARALELOS_PADRAO
+from catalogo import listar_execucoes, formatar_bytes
+from log_interface import FilaLog, criar_logger_arquivo
+from compressao import COMPRESSAO_PADRAO, codecs_disponiveis
+from motor_nativo import MOTORES, MOTOR_PADRAO
+from planejamento import MODO_ESPACO_PADRAO
+from progresso import formatar_duracao
+from retomada import BANCO_JORNAIS_RESTAURACAO, localizar_backup_interrompido
+from indice import bancos_selecionados
+from verificacao import PROCESSOS_VERIFICACAO_PADRAO, verificar_backup
+from incremental import (
+    listar_incrementos, incrementos_ate, escolher_base_para_alvo, interpretar_data_hora, datetime_para_ts
+)
+
+
+# Intervalo (ms) em que a thread principal aplica os logs e o progresso enfileirados
+INTERVALO_INTERFACE_MS = 100
+
 
 class MongoDBBackupGUI:
     def __init__(self, root):
@@ -36,6 +61,19 @@ class MongoDBBackupGUI:
         self.bancos_lista = []
         self.client = None
         self.backup_em_andamento = False
+        self.paralelismo = tk.IntVar(value=PARALELISMO_PADRAO)
+        self.formato_backup = tk.StringVar(value=FORMATO_PADRAO)
+        self.compressao = tk.StringVar(value=COMPRESSAO_PADRAO)
+        self.colecoes_paralelas = COLECOES_PARALELAS_PADRAO
+        self.politica_retencao = None
+        self.espaco_insuficiente = MODO_ESPACO_PADRAO
+        self.metricas_prometheus = None
+        self.limitacao = None
+        self.preferencia_leitura = None
+        self.tags_leitura = None
+        self.filtros_exportacao = None
+        self.snapshot_consistente = False
+        self.motor = tk.StringVar(value=MOTOR_PADRAO)
         
         # Variáveis Restauração
         self.restore_uri = tk.StringVar(value="mongodb://localhost:27017/")
@@ -43,12 +81,26 @@ class MongoDBBackupGUI:
         self.bancos_backup_lista = []
         self.restore_em_andamento = False
         self.preservar_dados = tk.BooleanVar(value=True)
+        self.restore_paralelismo = tk.IntVar(value=RESTORE_PARALELISMO_PADRAO)
+        self.restore_colecoes_paralelas = tk.IntVar(value=RESTORE_COLECOES_PARALELAS_PADRAO)
+        self.restore_workers_insercao = tk.IntVar(value=RESTORE_WORKERS_INSERCAO_PADRAO)
+        self.restore_limite_total = tk.IntVar(value=RESTORE_LIMITE_TOTAL_PADRAO)
+        self.restore_alvo = tk.StringVar()
+        self.restore_alvo_ts = None
+        self.restore_colecoes = tk.StringVar()
+        self.restore_padroes = []
+        self.verificar_restore = tk.BooleanVar(value=True)
+        self.restauracao_rapida = tk.BooleanVar(value=False)
+        self.indices_paralelos = INDICES_PARALELOS_PADRAO
+        self.banco_diario = BANCO_JORNAIS_RESTAURACAO
+        self.processos_verificacao = PROCESSOS_VERIFICACAO_PADRAO
         
         # Variáveis Agendamento
         self.config_path = os.path.join(self.base_dir, "config.json")
         self.agendamento_ativo = tk.BooleanVar(value=False)
         self.modo_agendamento = tk.StringVar(value="semanal") # 'semanal' ou 'intervalo'
         self.intervalo_minutos = tk.IntVar(value=30)
+        self.backup_incremental = tk.BooleanVar(value=False)
         self.hora_backup = tk.StringVar(value="00:00")
         self.dias_semana = {
             "Segunda": tk.BooleanVar(value=False),
@@ -60,8 +112,13 @@ class MongoDBBackupGUI:
             "Domingo": tk.BooleanVar(value=False)
         }
         
+        # Log: as threads de trabalho enfileiram, a thread principal do Tk exibe
+        self.logger_arquivo = criar_logger_arquivo(self.base_dir)
+        self.fila_interface = queue.Queue()
+        
         self.carregar_configuracoes()
         self.criar_interface()
+        self.root.after(INTERVALO_INTERFACE_MS, self.bombear_interface)
         
     def criar_interface(self):
         """Cria a interface gráfica"""
@@ -121,6 +178,27 @@ class MongoDBBackupGUI:
         uri_entry.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(0, 5), pady=5)
         ttk.Button(config_frame, text="Testar Conexão", command=self.testar_conexao).grid(row=1, column=2, pady=5)
         
+        # Processos mongodump simultâneos
+        ttk.Label(config_frame, text="Processos Simultâneos:").grid(row=2, column=0, sticky=tk.W, padx=(0, 10), pady=5)
+        processos_frame = ttk.Frame(config_frame)
+        processos_frame.grid(row=2, column=1, sticky=tk.W, pady=5)
+        tk.Spinbox(processos_frame, from_=1, to=32, textvariable=self.paralelismo, width=10).pack(side=tk.LEFT)
+        ttk.Label(processos_frame, text="Motor:").pack(side=tk.LEFT, padx=(10, 5))
+        ttk.Combobox(processos_frame, textvariable=self.motor, values=MOTORES,
+                     state="readonly", width=10).pack(side=tk.LEFT)
+        ttk.Label(processos_frame, text="nativo = pymongo, sem mongodump (formato pasta)",
+                  font=("Arial", 8, "italic")).pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Formato de saída e compressão
+        ttk.Label(config_frame, text="Formato do Backup:").grid(row=3, column=0, sticky=tk.W, padx=(0, 10), pady=5)
+        formato_frame = ttk.Frame(config_frame)
+        formato_frame.grid(row=3, column=1, sticky=tk.W, pady=5)
+        ttk.Combobox(formato_frame, textvariable=self.formato_backup, values=FORMATOS_BACKUP,
+                     state="readonly", width=10).pack(side=tk.LEFT)
+        ttk.Label(formato_frame, text="Compressão (archive):").pack(side=tk.LEFT, padx=(10, 5))
+        ttk.Combobox(formato_frame, textvariable=self.compressao, values=codecs_disponiveis(),
+                     state="readonly", width=10).pack(side=tk.LEFT)
+        
         # Seção de Bancos de Dados
         bancos_frame = ttk.LabelFrame(parent, text="Bancos de Dados", padding="10")
         bancos_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
@@ -154,10 +232,16 @@ class MongoDBBackupGUI:
         
         self.log_text = scrolledtext.ScrolledText(log_frame, height=8, width=80, wrap=tk.WORD)
         self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.saida_log = FilaLog(self.log_text, "backup", self.logger_arquivo)
         
-        # Barra de progresso
-        self.progress = ttk.Progressbar(parent, mode='indeterminate')
-        self.progress.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+        # Barra de progresso (volume exportado) e tempo restante por coleção
+        progresso_frame = ttk.Frame(parent)
+        progresso_frame.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+        progresso_frame.columnconfigure(0, weight=1)
+        self.progress = ttk.Progressbar(progresso_frame, mode='determinate', maximum=100)
+        self.progress.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        self.lbl_progresso = ttk.Label(progresso_frame, text="", font=("Arial", 8))
+        self.lbl_progresso.grid(row=1, column=0, sticky=tk.W)
         
         # Botões de ação
         btn_action_frame = ttk.Frame(parent)
@@ -167,6 +251,10 @@ class MongoDBBackupGUI:
                                      command=self.executar_backup_thread, state=tk.DISABLED)
         self.btn_backup.pack(side=tk.LEFT, padx=5)
         
+        self.btn_retomar = ttk.Button(btn_action_frame, text="Retomar Backup Interrompido", 
+                                      command=self.retomar_backup_thread)
+        self.btn_retomar.pack(side=tk.LEFT, padx=5)
+        
         ttk.Button(btn_action_frame, text="Limpar Log", command=self.limpar_log).pack(side=tk.LEFT, padx=5)
         
         # Mensagem inicial
@@ -200,6 +288,47 @@ class MongoDBBackupGUI:
         ttk.Checkbutton(config_frame, text="Preservar dados existentes (Não sobrescrever)", 
                         variable=self.preservar_dados).grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=5)
         
+        # Paralelismo da restauração
+        paralelo_frame = ttk.Frame(config_frame)
+        paralelo_frame.grid(row=3, column=0, columnspan=3, sticky=tk.W, pady=5)
+        ttk.Label(paralelo_frame, text="Restaurações Simultâneas:").pack(side=tk.LEFT, padx=(0, 5))
+        tk.Spinbox(paralelo_frame, from_=1, to=32, textvariable=self.restore_paralelismo, width=5).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(paralelo_frame, text="Coleções Paralelas:").pack(side=tk.LEFT, padx=(0, 5))
+        tk.Spinbox(paralelo_frame, from_=1, to=64, textvariable=self.restore_colecoes_paralelas, width=5).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(paralelo_frame, text="Workers de Inserção:").pack(side=tk.LEFT, padx=(0, 5))
+        tk.Spinbox(paralelo_frame, from_=1, to=64, textvariable=self.restore_workers_insercao, width=5).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(paralelo_frame, text="Limite Total:").pack(side=tk.LEFT, padx=(0, 5))
+        tk.Spinbox(paralelo_frame, from_=1, to=512, textvariable=self.restore_limite_total, width=5).pack(side=tk.LEFT)
+        ttk.Label(paralelo_frame, text="Motor:").pack(side=tk.LEFT, padx=(10, 5))
+        ttk.Combobox(paralelo_frame, textvariable=self.motor, values=MOTORES,
+                     state="readonly", width=10).pack(side=tk.LEFT)
+        
+        # Restauração pontual (backup incremental)
+        ttk.Label(config_frame, text="Restaurar até (opcional):").grid(row=4, column=0, sticky=tk.W, padx=(0, 10), pady=5)
+        alvo_frame = ttk.Frame(config_frame)
+        alvo_frame.grid(row=4, column=1, columnspan=2, sticky=tk.W, pady=5)
+        ttk.Entry(alvo_frame, textvariable=self.restore_alvo, width=22).pack(side=tk.LEFT)
+        ttk.Label(alvo_frame, text="DD-MM-YYYY HH:MM:SS — escolhe a base no Diretório de Backup e reaplica o oplog até o horário",
+                  font=("Arial", 8, "italic")).pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Verificação de integridade
+        ttk.Checkbutton(config_frame, text="Verificar integridade (checksums) antes de restaurar", 
+                        variable=self.verificar_restore).grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        # Restauração rápida: índices construídos depois da carga
+        ttk.Checkbutton(config_frame, text="Restauração rápida (índices construídos no final; carga com w:1, sem journal)",
+                        variable=self.restauracao_rapida).grid(row=7, column=0, columnspan=3, sticky=tk.W, pady=5)
+        
+        # Restauração seletiva (padrões do --nsInclude)
+        ttk.Label(config_frame, text="Coleções (opcional):").grid(row=6, column=0, sticky=tk.W, padx=(0, 10), pady=5)
+        colecoes_frame = ttk.Frame(config_frame)
+        colecoes_frame.grid(row=6, column=1, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        ttk.Entry(colecoes_frame, textvariable=self.restore_colecoes, width=40).pack(side=tk.LEFT)
+        ttk.Button(colecoes_frame, text="Escolher Coleções",
+                   command=self.escolher_colecoes).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Label(colecoes_frame, text="banco.colecao separados por vírgula (aceita *); vazio restaura tudo",
+                  font=("Arial", 8, "italic")).pack(side=tk.LEFT, padx=(10, 0))
+        
         # Seção de Bancos de Backup
         bancos_frame = ttk.LabelFrame(parent, text="Bancos de Dados no Backup", padding="10")
         bancos_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
@@ -211,6 +340,10 @@ class MongoDBBackupGUI:
         btn_frame.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
         ttk.Button(btn_frame, text="Listar Bancos no Backup", 
                   command=self.listar_bancos_backup_thread).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(btn_frame, text="Backups Recentes (Catálogo)", 
+                  command=self.abrir_catalogo).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(btn_frame, text="Verificar Backup", 
+                  command=self.verificar_backup_thread).pack(side=tk.LEFT, padx=(0, 10))
         
         # Lista de bancos com scrollbar
         list_frame = ttk.Frame(bancos_frame)
@@ -233,10 +366,16 @@ class MongoDBBackupGUI:
         
         self.log_text_restore = scrolledtext.ScrolledText(log_frame, height=8, width=80, wrap=tk.WORD)
         self.log_text_restore.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.saida_log_restore = FilaLog(self.log_text_restore, "restauracao", self.logger_arquivo)
         
-        # Barra de progresso
-        self.progress_restore = ttk.Progressbar(parent, mode='indeterminate')
-        self.progress_restore.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+        # Barra de progresso (volume restaurado, pelo progresso do mongorestore) e tempo restante
+        progresso_frame = ttk.Frame(parent)
+        progresso_frame.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+        progresso_frame.columnconfigure(0, weight=1)
+        self.progress_restore = ttk.Progressbar(progresso_frame, mode='determinate', maximum=100)
+        self.progress_restore.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        self.lbl_progresso_restore = ttk.Label(progresso_frame, text="", font=("Arial", 8))
+        self.lbl_progresso_restore.grid(row=1, column=0, sticky=tk.W)
         
         # Botões de ação
         btn_action_frame = ttk.Frame(parent)
@@ -301,9 +440,16 @@ class MongoDBBackupGUI:
         tk.Spinbox(self.intervalo_frame, from_=1, to=1440, textvariable=self.intervalo_minutos, width=10).pack(side=tk.LEFT)
         ttk.Label(self.intervalo_frame, text="Ex: 30, 60, 120").pack(side=tk.LEFT, padx=(10, 0))
         
+        # Frame de Backup Incremental
+        incremental_frame = ttk.LabelFrame(parent, text="Tipo de Backup", padding="10")
+        incremental_frame.grid(row=5, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+        ttk.Checkbutton(incremental_frame, 
+                        text="Backup incremental (base completa + apenas o oplog novo; requer replica set)",
+                        variable=self.backup_incremental).pack(side=tk.LEFT)
+        
         # Frame de Botões
         acoes_frame = ttk.Frame(parent, padding="10")
-        acoes_frame.grid(row=5, column=0, sticky=(tk.W, tk.E))
+        acoes_frame.grid(row=6, column=0, sticky=(tk.W, tk.E))
         
         ttk.Button(acoes_frame, text="Salvar e Ativar Agendamento", 
                   command=self.ativar_agendamento).pack(side=tk.LEFT, padx=5)
@@ -312,8 +458,12 @@ class MongoDBBackupGUI:
         
         # Informações sobre o agendador
         info_frame = ttk.Frame(parent, padding="10")
-        info_frame.grid(row=6, column=0, sticky=(tk.W, tk.E))
-        ttk.Label(info_frame, text="O agendamento utiliza o 'Agendador de Tarefas' do Windows.", 
+        info_frame.grid(row=7, column=0, sticky=(tk.W, tk.E))
+        if sys.platform == "win32":
+            texto_info = "O agendamento utiliza o 'Agendador de Tarefas' do Windows."
+        else:
+            texto_info = "O agendamento é executado por 'backup_mongodb.py --daemon' (ex: serviço do systemd)."
+        ttk.Label(info_frame, text=texto_info, 
                  font=("Arial", 9, "italic")).pack(side=tk.LEFT)
         
         # Inicializar status e visibilidade
@@ -394,6 +544,16 @@ class MongoDBBackupGUI:
             ]
             msg_sucesso = f"Agendamento por Intervalo configurado com sucesso!\nExecutar a cada: {minutos} minutos."
         
+        if sys.platform != "win32":
+            # Sem o Agendador de Tarefas: os horários ficam no config.json, lidos pelo modo daemon
+            self.agendamento_ativo.set(True)
+            self.salvar_configuracoes()
+            self.atualizar_visual_agendamento()
+            messagebox.showinfo("Sucesso", f"{msg_sucesso}\n\nMantenha em execução (ex: serviço do systemd):\n"
+                                           f"{comando_tr} --daemon")
+            self.log(f"Agendamento salvo para o modo daemon: {msg_sucesso}")
+            return
+        
         try:
             resultado = subprocess.run(cmd, capture_output=True, text=True, check=True)
             self.agendamento_ativo.set(True)
@@ -410,6 +570,13 @@ class MongoDBBackupGUI:
         nome_tarefa = "MongoDB_Backup_Automatico"
         cmd = ["schtasks", "/delete", "/tn", nome_tarefa, "/f"]
         
+        if sys.platform != "win32":
+            self.agendamento_ativo.set(False)
+            self.salvar_configuracoes()
+            self.atualizar_visual_agendamento()
+            messagebox.showinfo("Info", "Agendamento desativado. Encerre o processo 'backup_mongodb.py --daemon'.")
+            return
+        
         try:
             subprocess.run(cmd, capture_output=True, text=True, check=True)
             self.agendamento_ativo.set(False)
@@ -436,26 +603,36 @@ class MongoDBBackupGUI:
             self.lbl_status_agendamento.config(text="AGENDAMENTO DESATIVADO", foreground="red")
         
     def log(self, mensagem):
-        """Adiciona mensagem ao log"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {mensagem}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        """Adiciona mensagem ao log (pode ser chamada de qualquer thread)"""
+        self.saida_log.escrever(mensagem)
         
     def limpar_log(self):
         """Limpa o log"""
-        self.log_text.delete(1.0, tk.END)
+        self.saida_log.limpar()
         
     def log_restore(self, mensagem):
-        """Adiciona mensagem ao log de restauração"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text_restore.insert(tk.END, f"[{timestamp}] {mensagem}\n")
-        self.log_text_restore.see(tk.END)
-        self.root.update_idletasks()
+        """Adiciona mensagem ao log de restauração (pode ser chamada de qualquer thread)"""
+        self.saida_log_restore.escrever(mensagem)
         
     def limpar_log_restore(self):
         """Limpa o log de restauração"""
-        self.log_text_restore.delete(1.0, tk.END)
+        self.saida_log_restore.limpar()
+        
+    def na_interface(self, funcao, *args):
+        """Agenda uma alteração de widget ou um diálogo para a thread principal (chamada pelas threads de trabalho)"""
+        self.fila_interface.put((funcao, args))
+        
+    def bombear_interface(self):
+        """Aplica, na thread principal, os logs e as alterações de widgets enfileirados"""
+        try:
+            while True:
+                funcao, args = self.fila_interface.get_nowait()
+                funcao(*args)
+        except queue.Empty:
+            pass
+        self.saida_log.drenar()
+        self.saida_log_restore.drenar()
+        self.root.after(INTERVALO_INTERFACE_MS, self.bombear_interface)
         
     def selecionar_pasta_backup(self):
         """Abre diálogo para selecionar pasta de backup"""
@@ -474,9 +651,32 @@ class MongoDBBackupGUI:
                     self.backup_dir.set(config.get("backup_dir", "C:\\backup\\mongodb"))
                     self.mongo_uri.set(config.get("mongo_uri", "mongodb://localhost:27017/"))
                     self.restore_uri.set(config.get("restore_uri", "mongodb://localhost:27017/"))
+                    self.paralelismo.set(config.get("paralelismo", PARALELISMO_PADRAO))
+                    self.formato_backup.set(config.get("formato_backup", FORMATO_PADRAO))
+                    self.compressao.set(config.get("compressao", COMPRESSAO_PADRAO))
+                    self.colecoes_paralelas = max(1, config.get("colecoes_paralelas", COLECOES_PARALELAS_PADRAO))
+                    self.politica_retencao = config.get("retencao")
+                    self.espaco_insuficiente = config.get("espaco_insuficiente", MODO_ESPACO_PADRAO)
+                    self.metricas_prometheus = config.get("metricas_prometheus")
+                    self.limitacao = config.get("limitacao")
+                    self.preferencia_leitura = config.get("preferencia_leitura")
+                    self.tags_leitura = config.get("tags_leitura")
+                    self.filtros_exportacao = config.get("filtros_exportacao")
+                    self.snapshot_consistente = config.get("snapshot_consistente", False)
+                    self.motor.set(config.get("motor", MOTOR_PADRAO))
+                    self.restore_paralelismo.set(config.get("restore_paralelismo", RESTORE_PARALELISMO_PADRAO))
+                    self.restore_colecoes_paralelas.set(config.get("restore_colecoes_paralelas", RESTORE_COLECOES_PARALELAS_PADRAO))
+                    self.restore_workers_insercao.set(config.get("restore_workers_insercao", RESTORE_WORKERS_INSERCAO_PADRAO))
+                    self.restore_limite_total.set(config.get("restore_limite_total", RESTORE_LIMITE_TOTAL_PADRAO))
+                    self.verificar_restore.set(config.get("verificar_antes_restaurar", True))
+                    self.restauracao_rapida.set(config.get("restauracao_rapida", False))
+                    self.indices_paralelos = max(1, config.get("restore_indices_paralelos", INDICES_PARALELOS_PADRAO))
+                    self.banco_diario = config.get("restore_banco_diario", BANCO_JORNAIS_RESTAURACAO)
+                    self.processos_verificacao = max(1, config.get("verificacao_processos", PROCESSOS_VERIFICACAO_PADRAO))
                     self.agendamento_ativo.set(config.get("agendamento_ativo", False))
                     self.modo_agendamento.set(config.get("modo_agendamento", "semanal"))
                     self.intervalo_minutos.set(config.get("intervalo_minutos", 30))
+                    self.backup_incremental.set(config.get("backup_incremental", False))
                     self.hora_backup.set(config.get("hora_backup", "00:00"))
                     
                     dias_config = config.get("dias_semana", {})
@@ -490,16 +690,36 @@ class MongoDBBackupGUI:
 
     def salvar_configuracoes(self):
         """Salva configurações no arquivo config.json"""
-        config = {
+        # Preserva chaves que não são editadas pela interface
+        config = {}
+        if os.path.exists(self.config_path):
+            try:
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except Exception:
+                config = {}
+        
+        config.update({
             "backup_dir": self.backup_dir.get(),
             "mongo_uri": self.mongo_uri.get(),
             "restore_uri": self.restore_uri.get(),
+            "paralelismo": self.paralelismo.get(),
+            "formato_backup": self.formato_backup.get(),
+            "compressao": self.compressao.get(),
+            "motor": self.motor.get(),
+            "restore_paralelismo": self.restore_paralelismo.get(),
+            "restore_colecoes_paralelas": self.restore_colecoes_paralelas.get(),
+            "restore_workers_insercao": self.restore_workers_insercao.get(),
+            "restore_limite_total": self.restore_limite_total.get(),
+            "verificar_antes_restaurar": self.verificar_restore.get(),
+            "restauracao_rapida": self.restauracao_rapida.get(),
             "agendamento_ativo": self.agendamento_ativo.get(),
             "modo_agendamento": self.modo_agendamento.get(),
             "intervalo_minutos": self.intervalo_minutos.get(),
+            "backup_incremental": self.backup_incremental.get(),
             "hora_backup": self.hora_backup.get(),
             "dias_semana": {dia: var.get() for dia, var in self.dias_semana.items()}
-        }
+        })
         try:
             with open(self.config_path, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=4, ensure_ascii=False)
@@ -557,7 +777,7 @@ class MongoDBBackupGUI:
             return True
         except Exception as e:
             self.log(f"✗ Erro ao conectar ao MongoDB: {e}")
-            messagebox.showerror("Erro de Conexão", f"Erro ao conectar ao MongoDB:\n{str(e)}")
+            self.na_interface(messagebox.showerror, "Erro de Conexão", f"Erro ao conectar ao MongoDB:\n{str(e)}")
             return False
             
     def listar_bancos_thread(self):
@@ -571,7 +791,7 @@ class MongoDBBackupGUI:
         
     def listar_bancos(self):
         """Lista todos os bancos de dados"""
-        self.lista_bancos.delete(0, tk.END)
+        self.na_interface(self.lista_bancos.delete, 0, tk.END)
         self.bancos_lista = []
         
         if not self.conectar_mongodb():
@@ -585,19 +805,19 @@ class MongoDBBackupGUI:
             self.log(f"Bancos de dados encontrados: {len(self.bancos_lista)}")
             
             for banco in self.bancos_lista:
-                self.lista_bancos.insert(tk.END, banco)
+                self.na_interface(self.lista_bancos.insert, tk.END, banco)
                 self.log(f"  - {banco}")
                 
             if self.bancos_lista:
-                self.btn_backup.config(state=tk.NORMAL)
+                self.na_interface(self.btn_backup.config, {"state": tk.NORMAL})
                 self.log(f"\n✓ {len(self.bancos_lista)} banco(s) pronto(s) para backup.")
             else:
-                self.btn_backup.config(state=tk.DISABLED)
+                self.na_interface(self.btn_backup.config, {"state": tk.DISABLED})
                 self.log("Nenhum banco de dados encontrado para backup.")
                 
         except Exception as e:
             self.log(f"✗ Erro ao listar bancos de dados: {e}")
-            messagebox.showerror("Erro", f"Erro ao listar bancos:\n{str(e)}")
+            self.na_interface(messagebox.showerror, "Erro", f"Erro ao listar bancos:\n{str(e)}")
         finally:
             if self.client:
                 self.client.close()
@@ -615,126 +835,210 @@ class MongoDBBackupGUI:
         thread = threading.Thread(target=self.executar_backup, daemon=True)
         thread.start()
         
-    def executar_backup(self):
-        """Executa o processo completo de backup"""
+    def retomar_backup_thread(self):
+        """Continua o backup interrompido mais recente do diretório de backup em thread separada"""
+        if self.backup_em_andamento:
+            return
+        
+        jornal = localizar_backup_interrompido(self.backup_dir.get())
+        if jornal is None:
+            messagebox.showinfo("Retomar Backup", "Nenhum backup interrompido encontrado no diretório de backup.")
+            return
+        
+        resposta = messagebox.askyesno("Retomar Backup",
+            f"Continuar o backup interrompido?\n\n"
+            f"Pasta: {jornal.pasta}\n"
+            f"Bancos concluídos: {len(jornal.dados['concluidos'])}/{len(jornal.dados['bancos'])}\n\n"
+            "Apenas os bancos e coleções que faltavam serão exportados.")
+        if not resposta:
+            return
+        
+        thread = threading.Thread(target=self.executar_backup, args=(True,), daemon=True)
+        thread.start()
+        
+    def executar_backup(self, retomar=False):
+        """Executa o processo completo de backup (ou continua o último interrompido)"""
         self.backup_em_andamento = True
-        self.btn_backup.config(state=tk.DISABLED)
-        self.progress.start(10)
+        self.na_interface(self.btn_backup.config, {"state": tk.DISABLED})
+        self.na_interface(self.btn_retomar.config, {"state": tk.DISABLED})
+        self.na_interface(self.definir_progresso, 0, "Preparando...")
         
+        backup = None
         try:
-            self.log("\n" + "="*60)
-            self.log("INICIANDO PROCESSO DE BACKUP")
-            self.log("="*60)
-            
-            # Conecta ao MongoDB
-            if not self.conectar_mongodb():
-                return
-                
-            # Cria pasta de backup
-            data_hora = datetime.now().strftime("%d-%m-%Y - %H-%M-%S")
-            pasta_backup = os.path.join(self.backup_dir.get(), data_hora)
-            
-            try:
-                os.makedirs(pasta_backup, exist_ok=True)
-                self.log(f"\nPasta de backup criada: {pasta_backup}")
-            except Exception as e:
-                self.log(f"✗ Erro ao criar pasta de backup: {e}")
-                messagebox.showerror("Erro", f"Erro ao criar pasta de backup:\n{str(e)}")
-                return
-                
-            # Exporta cada banco
-            self.log("\n" + "="*60)
-            self.log("EXPORTANDO BANCOS DE DADOS...")
-            self.log("="*60 + "\n")
-            
-            sucessos = 0
-            falhas = 0
+            self.salvar_configuracoes()
             
-            for i, banco in enumerate(self.bancos_lista, 1):
-                self.log(f"[{i}/{len(self.bancos_lista)}] Exportando banco '{banco}'...")
-                
-                if self.exportar_banco(banco, pasta_backup):
-                    sucessos += 1
-                    self.log(f"✓ Banco '{banco}' exportado com sucesso!\n")
-                else:
-                    falhas += 1
-                    self.log(f"✗ Falha ao exportar banco '{banco}'\n")
-                    
-            # Resumo final
-            self.log("\n" + "="*60)
-            self.log("RESUMO DO BACKUP")
-            self.log("="*60)
-            self.log(f"Bancos exportados com sucesso: {sucessos}")
-            self.log(f"Bancos com falha: {falhas}")
-            self.log(f"Pasta de backup: {pasta_backup}")
-            self.log("="*60)
+            # O motor de backup é o mesmo da linha de comando; as mensagens vão para o log
+            backup = MongoDBBackup(
+                backup_dir=self.backup_dir.get(),
+                mongo_uri=self.mongo_uri.get(),
+                paralelismo=self.paralelismo.get(),
+                formato=self.formato_backup.get(),
+                compressao=self.compressao.get(),
+                processos_verificacao=self.processos_verificacao,
+                colecoes_paralelas=self.colecoes_paralelas,
+                motor=self.motor.get(),
+                retencao=self.politica_retencao,
+                espaco_insuficiente=self.espaco_insuficiente,
+                metricas_prometheus=self.metricas_prometheus,
+                limitacao=self.limitacao,
+                preferencia_leitura=self.preferencia_leitura,
+                tags_leitura=self.tags_leitura,
+                snapshot_consistente=self.snapshot_consistente,
+                filtros=self.filtros_exportacao,
+                log=self.log,
+                ao_progresso=self.atualizar_progresso
+            )
+            backup.executar_backup(bancos=None if retomar else list(self.bancos_lista), retomar=retomar)
+            resumo = backup.resumo
             
             # Mensagem final
-            if falhas == 0:
-                messagebox.showinfo("Sucesso", 
+            if resumo is None:
+                self.na_interface(messagebox.showerror, "Erro", "O backup não foi executado. Verifique o log para mais detalhes.")
+            elif resumo["falhas"] == 0:
+                self.na_interface(messagebox.showinfo, "Sucesso", 
                     f"Backup concluído com sucesso!\n\n"
-                    f"Bancos exportados: {sucessos}\n"
-                    f"Pasta: {pasta_backup}")
+                    f"Bancos exportados: {resumo['sucessos']}\n"
+                    f"Pasta: {resumo['pasta']}")
             else:
-                messagebox.showwarning("Concluído com Avisos",
+                self.na_interface(messagebox.showwarning, "Concluído com Avisos",
                     f"Backup concluído com algumas falhas.\n\n"
-                    f"Sucessos: {sucessos}\n"
-                    f"Falhas: {falhas}\n"
-                    f"Pasta: {pasta_backup}")
+                    f"Sucessos: {resumo['sucessos']}\n"
+                    f"Falhas: {resumo['falhas']}\n"
+                    f"Pasta: {resumo['pasta']}")
                     
         except Exception as e:
             self.log(f"\n✗ Erro fatal: {e}")
-            messagebox.showerror("Erro Fatal", f"Erro durante o backup:\n{str(e)}")
+            self.na_interface(messagebox.showerror, "Erro Fatal", f"Erro durante o backup:\n{str(e)}")
         finally:
-            self.progress.stop()
+            if backup and backup.resumo:
+                self.na_interface(self.definir_progresso, 100,
+                                  f"Concluído em {formatar_duracao(backup.progresso.resumo()['decorrido'])}")
+            else:
+                self.na_interface(self.definir_progresso, 0, "")
             self.backup_em_andamento = False
-            self.btn_backup.config(state=tk.NORMAL)
-            if self.client:
-                self.client.close()
-                self.client = None
+            if self.bancos_lista:
+                self.na_interface(self.btn_backup.config, {"state": tk.NORMAL})
+            self.na_interface(self.btn_retomar.config, {"state": tk.NORMAL})
+            if backup:
+                backup.fechar_conexao()
                 
-    def exportar_banco(self, nome_banco, pasta_destino):
-        """Exporta um banco de dados usando mongodump"""
+    @staticmethod
+    def texto_progresso(resumo):
+        """Texto exibido abaixo das barras de progresso (geral e itens em andamento)"""
+        partes = [f"{resumo['fracao'] * 100:.1f}% — {resumo['concluidos']}/{resumo['total']} — "
+                  f"restante: {formatar_duracao(resumo['eta'])}"]
+        for item in resumo["em_andamento"][:3]:
+            partes.append(f"{item['chave']}: {item['fracao'] * 100:.0f}% ({formatar_duracao(item['eta'])})")
+        return "  |  ".join(partes)
+        
+    def atualizar_progresso(self, resumo):
+        """Recebe o progresso do backup (thread de trabalho) e o exibe pela thread principal"""
+        self.na_interface(self.definir_progresso, resumo["fracao"] * 100, self.texto_progresso(resumo))
+        
+    def definir_progresso(self, valor, texto):
+        """Atualiza a barra de progresso do backup e o texto abaixo dela (thread principal)"""
+        self.progress["value"] = valor
+        self.lbl_progresso.config(text=texto)
+        
+    def atualizar_progresso_restore(self, resumo):
+        """Recebe o progresso da restauração (thread de trabalho) e o exibe pela thread principal"""
+        self.na_interface(self.definir_progresso_restore, resumo["fracao"] * 100, self.texto_progresso(resumo))
+        
+    def definir_progresso_restore(self, valor, texto):
+        """Atualiza a barra de progresso da restauração e o texto abaixo dela (thread principal)"""
+        # O primeiro progresso mensurável encerra a espera (conexão e verificação)
+        if str(self.progress_restore["mode"]) == "indeterminate":
+            self.indicar_espera_restore(False)
+        self.progress_restore["value"] = valor
+        self.lbl_progresso_restore.config(text=texto)
+        
+    def indicar_espera_restore(self, ativo):
+        """Barra da restauração em modo indeterminado enquanto não há progresso mensurável (thread principal)"""
+        if ativo:
+            self.progress_restore.config(mode='indeterminate')
+            self.progress_restore.start(10)
+        else:
+            self.progress_restore.stop()
+            self.progress_restore.config(mode='determinate')
+        
+    def abrir_catalogo(self):
+        """Mostra os backups registrados no catálogo do Diretório de Backup para seleção"""
+        backup_dir = self.backup_dir.get()
         try:
-            # Modificacao: Exportar diretamente para a pasta destino
-            # O mongodump ja cria uma subpasta com o nome do banco
-            
-            comando = [
-                "mongodump",
-                "--db", nome_banco,
-                "--out", pasta_destino
-            ]
-            
-            resultado = subprocess.run(
-                comando,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-
-            # Log output to help debugging
-            if resultado.stderr:
-                self.log(f"  [Mongo Log]: {resultado.stderr}")
-            if resultado.stdout:
-                self.log(f"  [Output]: {resultado.stdout}")
-            
-            return True
-            
-        except subprocess.CalledProcessError as e:
-            self.log(f"  Erro: {e.stderr}")
-            return False
-        except FileNotFoundError:
-            self.log("  Erro: 'mongodump' não encontrado!")
-            self.log("  Certifique-se de que o MongoDB está instalado e mongodump está no PATH.")
-            messagebox.showerror("Erro", 
-                "mongodump não encontrado!\n\n"
-                "Certifique-se de que o MongoDB está instalado\n"
-                "e mongodump está no PATH do sistema.")
-            return False
+            execucoes = listar_execucoes(backup_dir, limite=200)
         except Exception as e:
-            self.log(f"  Erro inesperado: {e}")
-            return False
+            messagebox.showerror("Erro", f"Erro ao ler o catálogo:\n{str(e)}")
+            return
+        if not execucoes:
+            messagebox.showinfo("Info", f"Nenhum backup registrado no catálogo de:\n{backup_dir}")
+            return
             
+        janela = tk.Toplevel(self.root)
+        janela.title("Backups Recentes")
+        janela.geometry("700x400")
+        
+        lista = tk.Listbox(janela, font=("Courier New", 9))
+        lista.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        for execucao in execucoes:
+            marca = "✓" if execucao["status"] == "ok" else "✗"
+            lista.insert(tk.END, f"{marca} {execucao['nome']:<45} {execucao['tipo']:<12} "
+                                 f"{execucao['bancos_ok']:>3} banco(s) {formatar_bytes(execucao['bytes']):>10}")
+        
+        def selecionar(event=None):
+            selecao = lista.curselection()
+            if not selecao:
+                return
+            pasta = os.path.join(backup_dir, execucoes[selecao[0]]["nome"])
+            self.pasta_backup_selecionada.set(pasta)
+            self.log_restore(f"Pasta de backup selecionada (catálogo): {pasta}")
+            janela.destroy()
+            self.listar_bancos_backup_thread()
+        
+        lista.bind("<Double-Button-1>", selecionar)
+        ttk.Button(janela, text="Selecionar", command=selecionar).pack(pady=(0, 10))
+        
+    def padroes_restore(self):
+        """Padrões do campo Coleções (vazio = restauração completa)"""
+        return [padrao.strip() for padrao in self.restore_colecoes.get().split(",") if padrao.strip()]
+        
+    def escolher_colecoes(self):
+        """Mostra as coleções de cada banco da pasta de backup para seleção"""
+        pasta = self.pasta_backup_selecionada.get()
+        if not pasta or not os.path.isdir(pasta):
+            messagebox.showwarning("Aviso", "Selecione uma pasta de backup existente primeiro.")
+            return
+        
+        # Bancos sem índice (archives anteriores a ele) só podem ser escolhidos inteiros
+        itens = []
+        for banco in sorted(listar_bancos_backup(pasta)):
+            colecoes = colecoes_do_backup(pasta, banco)
+            itens.append(f"{banco}.*")
+            itens.extend(f"{banco}.{colecao}" for colecao in colecoes or [])
+        if not itens:
+            messagebox.showinfo("Info", "Nenhum banco de dados encontrado na pasta selecionada.")
+            return
+        
+        janela = tk.Toplevel(self.root)
+        janela.title("Coleções do Backup")
+        janela.geometry("500x400")
+        
+        lista = tk.Listbox(janela, font=("Courier New", 9), selectmode=tk.EXTENDED)
+        lista.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        atuais = set(self.padroes_restore())
+        for i, item in enumerate(itens):
+            lista.insert(tk.END, item)
+            if item in atuais:
+                lista.selection_set(i)
+        
+        def selecionar():
+            escolhidos = [itens[i] for i in lista.curselection()]
+            self.restore_colecoes.set(", ".join(escolhidos))
+            if escolhidos:
+                self.log_restore(f"Coleções selecionadas: {', '.join(escolhidos)}")
+            janela.destroy()
+        
+        ttk.Button(janela, text="Selecionar", command=selecionar).pack(pady=(0, 10))
+        
     def listar_bancos_backup_thread(self):
         """Executa listagem de bancos no backup em thread separada"""
         if self.restore_em_andamento:
@@ -746,43 +1050,97 @@ class MongoDBBackupGUI:
         
     def listar_bancos_backup(self):
         """Lista os bancos de dados disponíveis na pasta de backup"""
-        self.lista_bancos_backup.delete(0, tk.END)
+        self.na_interface(self.lista_bancos_backup.delete, 0, tk.END)
         self.bancos_backup_lista = []
+        self.restore_alvo_ts = None
+        
+        # Restauração pontual: a base é escolhida automaticamente pelo horário alvo
+        if self.restore_alvo.get().strip():
+            try:
+                alvo = interpretar_data_hora(self.restore_alvo.get())
+            except ValueError as e:
+                self.na_interface(messagebox.showerror, "Erro", str(e))
+                return
+            base = escolher_base_para_alvo(self.backup_dir.get(), alvo)
+            if not base:
+                self.log_restore(f"✗ Nenhuma base incremental concluída até {alvo} em {self.backup_dir.get()}")
+                self.na_interface(messagebox.showerror, "Erro", "Nenhuma base incremental encontrada para o horário informado.")
+                return
+            pasta = base[0]
+            self.na_interface(self.pasta_backup_selecionada.set, pasta)
+            self.restore_alvo_ts = datetime_para_ts(alvo)
+            self.log_restore(f"Restauração pontual até {alvo}: base {pasta}")
+        else:
+            pasta = self.pasta_backup_selecionada.get()
         
-        pasta = self.pasta_backup_selecionada.get()
         if not pasta:
-            messagebox.showwarning("Aviso", "Selecione uma pasta de backup primeiro.")
+            self.na_interface(messagebox.showwarning, "Aviso", "Selecione uma pasta de backup primeiro.")
             return
             
         if not os.path.exists(pasta):
-            messagebox.showerror("Erro", "A pasta selecionada não existe!")
+            self.na_interface(messagebox.showerror, "Erro", "A pasta selecionada não existe!")
             self.log_restore(f"✗ Pasta não encontrada: {pasta}")
             return
             
         try:
-            # Lista os diretórios na pasta de backup (cada diretório é um banco)
-            itens = os.listdir(pasta)
-            self.bancos_backup_lista = [item for item in itens 
-                                       if os.path.isdir(os.path.join(pasta, item)) 
-                                       and not item.startswith('.')]
+            # Cada subpasta ou archive (banco.archive[.gz|.zst|.lz4]) é um banco
+            self.bancos_backup_lista = listar_bancos_backup(pasta)
             
             if not self.bancos_backup_lista:
                 self.log_restore("Nenhum banco de dados encontrado na pasta de backup.")
-                messagebox.showinfo("Info", "Nenhum banco de dados encontrado na pasta selecionada.")
+                self.na_interface(messagebox.showinfo, "Info", "Nenhum banco de dados encontrado na pasta selecionada.")
                 return
                 
             self.log_restore(f"Bancos de dados encontrados no backup: {len(self.bancos_backup_lista)}")
             
             for banco in self.bancos_backup_lista:
-                self.lista_bancos_backup.insert(tk.END, banco)
+                self.na_interface(self.lista_bancos_backup.insert, tk.END, banco)
                 self.log_restore(f"  - {banco}")
                 
-            self.btn_restore.config(state=tk.NORMAL)
+            incrementos = self.incrementos_restore(pasta)
+            if incrementos:
+                self.log_restore(f"Backup incremental: {len(incrementos)} incremento(s) de oplog serão reaplicados.")
+                
+            self.na_interface(self.btn_restore.config, {"state": tk.NORMAL})
             self.log_restore(f"\n✓ {len(self.bancos_backup_lista)} banco(s) pronto(s) para restauração.")
             
         except Exception as e:
             self.log_restore(f"✗ Erro ao listar bancos no backup: {e}")
-            messagebox.showerror("Erro", f"Erro ao listar bancos:\n{str(e)}")
+            self.na_interface(messagebox.showerror, "Erro", f"Erro ao listar bancos:\n{str(e)}")
+            
+    def verificar_backup_thread(self):
+        """Confere os checksums da pasta de backup selecionada em thread separada"""
+        if self.restore_em_andamento:
+            messagebox.showwarning("Aviso", "Restauração em andamento. Aguarde a conclusão.")
+            return
+        
+        pasta = self.pasta_backup_selecionada.get()
+        if not pasta or not os.path.isdir(pasta):
+            messagebox.showwarning("Aviso", "Selecione uma pasta de backup existente primeiro.")
+            return
+            
+        thread = threading.Thread(target=self.verificar_backup, args=(pasta,), daemon=True)
+        thread.start()
+        
+    def verificar_backup(self, pasta):
+        """Verifica a integridade de uma pasta de backup e mostra o resultado"""
+        self.na_interface(self.indicar_espera_restore, True)
+        try:
+            self.log_restore(f"\nVerificando integridade de {pasta}...")
+            problemas = verificar_backup(pasta, processos=self.processos_verificacao, log=self.log_restore)
+            if problemas is None:
+                self.log_restore("⚠ Backup sem manifesto de checksums (anterior à verificação).")
+                self.na_interface(messagebox.showwarning, "Aviso", "Este backup não tem manifesto de checksums.")
+            elif problemas:
+                self.na_interface(messagebox.showerror, "Backup Corrompido",
+                    f"A verificação encontrou {len(problemas)} problema(s).\nVeja o log para os detalhes.")
+            else:
+                self.na_interface(messagebox.showinfo, "Sucesso", "Backup íntegro: todos os checksums conferem.")
+        except Exception as e:
+            self.log_restore(f"✗ Erro ao verificar o backup: {e}")
+            self.na_interface(messagebox.showerror, "Erro", f"Erro ao verificar o backup:\n{str(e)}")
+        finally:
+            self.na_interface(self.indicar_espera_restore, False)
             
     def executar_restore_thread(self):
         """Executa restauração em thread separada"""
@@ -792,14 +1150,27 @@ class MongoDBBackupGUI:
         if not self.bancos_backup_lista:
             messagebox.showwarning("Aviso", "Nenhum banco de dados listado. Liste os bancos primeiro.")
             return
+        
+        # Restauração seletiva: só os bancos alcançados pelos padrões
+        padroes = self.padroes_restore()
+        try:
+            bancos = bancos_selecionados(self.bancos_backup_lista, padroes) if padroes else self.bancos_backup_lista
+        except ValueError as e:
+            messagebox.showerror("Erro", str(e))
+            return
+        if not bancos:
+            messagebox.showwarning("Aviso", "Nenhum banco do backup corresponde às coleções informadas.")
+            return
+        self.restore_padroes = padroes
+        selecao = f"\nColeções: {', '.join(padroes)}\n" if padroes else ""
             
         # Confirmação
         if self.preservar_dados.get():
-            msg = (f"Deseja importar {len(self.bancos_backup_lista)} banco(s) de dados?\n\n"
+            msg = (f"Deseja importar {len(bancos)} banco(s) de dados?\n{selecao}\n"
                    "Os dados existentes no seu banco local SERÃO PRESERVADOS. "
                    "Apenas novas informações serão adicionadas.")
         else:
-            msg = (f"Deseja restaurar {len(self.bancos_backup_lista)} banco(s) de dados?\n\n"
+            msg = (f"Deseja restaurar {len(bancos)} banco(s) de dados?\n{selecao}\n"
                    "ATENÇÃO: Isso irá SOBRESCREVER os bancos existentes no MongoDB de destino!")
             
         resposta = messagebox.askyesno("Confirmar Restauração", msg)
@@ -813,134 +1184,66 @@ class MongoDBBackupGUI:
     def executar_restore(self):
         """Executa o processo completo de restauração"""
         self.restore_em_andamento = True
-        self.btn_restore.config(state=tk.DISABLED)
-        self.progress_restore.start(10)
+        self.na_interface(self.btn_restore.config, {"state": tk.DISABLED})
+        self.na_interface(self.definir_progresso_restore, 0, "")
+        self.na_interface(self.indicar_espera_restore, True)
+        restore = None
         
         try:
-            self.log_restore("\n" + "="*60)
-            self.log_restore("INICIANDO PROCESSO DE RESTAURAÇÃO")
-            self.log_restore("="*60)
-            
-            pasta_backup = self.pasta_backup_selecionada.get()
-            
-            # Testa conexão
-            try:
-                self.log_restore("Testando conexão com MongoDB...")
-                client = MongoClient(self.restore_uri.get(), serverSelectionTimeoutMS=5000)
-                client.server_info()
-                client.close()
-                self.log_restore("✓ Conexão estabelecida com sucesso!")
-            except Exception as e:
-                self.log_restore(f"✗ Erro ao conectar ao MongoDB: {e}")
-                messagebox.showerror("Erro", f"Erro ao conectar ao MongoDB:\n{str(e)}")
-                return
-                
-            # Restaura cada banco
-            self.log_restore("\n" + "="*60)
-            self.log_restore("RESTAURANDO BANCOS DE DADOS...")
-            self.log_restore("="*60 + "\n")
-            
-            sucessos = 0
-            falhas = 0
+            self.salvar_configuracoes()
             
-            for i, banco in enumerate(self.bancos_backup_lista, 1):
-                self.log_restore(f"[{i}/{len(self.bancos_backup_lista)}] Restaurando banco '{banco}'...")
-                
-                if self.restaurar_banco(banco, pasta_backup):
-                    sucessos += 1
-                    self.log_restore(f"✓ Banco '{banco}' restaurado com sucesso!\n")
-                else:
-                    falhas += 1
-                    self.log_restore(f"✗ Falha ao restaurar banco '{banco}'\n")
-                    
-            # Resumo final
-            self.log_restore("\n" + "="*60)
-            self.log_restore("RESUMO DA RESTAURAÇÃO")
-            self.log_restore("="*60)
-            self.log_restore(f"Bancos restaurados com sucesso: {sucessos}")
-            self.log_restore(f"Bancos com falha: {falhas}")
-            self.log_restore("="*60)
+            # O motor de restauração é o mesmo da linha de comando; as mensagens vão para o log
+            restore = MongoDBRestore(
+                restore_uri=self.restore_uri.get(),
+                preservar_dados=self.preservar_dados.get(),
+                paralelismo=self.restore_paralelismo.get(),
+                colecoes_paralelas=self.restore_colecoes_paralelas.get(),
+                workers_insercao=self.restore_workers_insercao.get(),
+                limite_total=self.restore_limite_total.get(),
+                verificar=self.verificar_restore.get(),
+                processos_verificacao=self.processos_verificacao,
+                motor=self.motor.get(),
+                colecoes=self.restore_padroes,
+                rapida=self.restauracao_rapida.get(),
+                indices_paralelos=self.indices_paralelos,
+                banco_diario=self.banco_diario,
+                log=self.log_restore,
+                ao_progresso=self.atualizar_progresso_restore
+            )
+            restore.executar_restore(self.pasta_backup_selecionada.get(), self.restore_alvo_ts)
+            resumo = restore.resumo
             
             # Mensagem final
-            if falhas == 0:
-                messagebox.showinfo("Sucesso", 
+            if resumo is None:
+                self.na_interface(messagebox.showerror, "Erro",
+                    "A restauração não foi executada. Verifique o log para mais detalhes.")
+            elif resumo["falhas"] == 0 and resumo["oplog"]:
+                self.na_interface(messagebox.showinfo, "Sucesso",
                     f"Restauração concluída com sucesso!\n\n"
-                    f"Bancos restaurados: {sucessos}")
+                    f"Bancos restaurados: {resumo['sucessos']}")
             else:
-                messagebox.showwarning("Concluído com Avisos",
+                self.na_interface(messagebox.showwarning, "Concluído com Avisos",
                     f"Restauração concluída com algumas falhas.\n\n"
-                    f"Sucessos: {sucessos}\n"
-                    f"Falhas: {falhas}")
-                    
+                    f"Sucessos: {resumo['sucessos']}\n"
+                    f"Falhas: {resumo['falhas']}\n\n"
+                    "Restaure novamente para continuar de onde parou.")
+        
         except Exception as e:
             self.log_restore(f"\n✗ Erro fatal: {e}")
-            messagebox.showerror("Erro Fatal", f"Erro durante a restauração:\n{str(e)}")
+            self.na_interface(messagebox.showerror, "Erro Fatal", f"Erro durante a restauração:\n{str(e)}")
         finally:
-            self.progress_restore.stop()
+            self.na_interface(self.indicar_espera_restore, False)
+            if restore and restore.resumo:
+                self.na_interface(self.definir_progresso_restore, 100,
+                                  f"Concluído em {formatar_duracao(restore.progresso.resumo()['decorrido'])}")
             self.restore_em_andamento = False
-            self.btn_restore.config(state=tk.NORMAL)
-            
-    def restaurar_banco(self, nome_banco, pasta_backup):
-        """Restaura um banco de dados usando mongorestore"""
-        try:
-            pasta_banco = os.path.join(pasta_backup, nome_banco)
-            
-            # Verificacao de aninhamento duplo (correção para backups antigos)
-            # Estrutura antiga: backup/dbName/dbName/arquivo.bson
-            # Estrutura nova/correta: backup/dbName/arquivo.bson
-            pasta_aninhada = os.path.join(pasta_banco, nome_banco)
-            
-            if os.path.exists(pasta_aninhada):
-                self.log_restore(f"  [Info] Detectada estrutura aninhada para '{nome_banco}'")
-                path_to_restore = pasta_aninhada
-            else:
-                path_to_restore = pasta_banco
-            
-            if not os.path.exists(path_to_restore):
-                self.log_restore(f"  Erro: Pasta do banco não encontrada: {path_to_restore}")
-                return False
-                
-            comando = [
-                "mongorestore",
-                "--uri", self.restore_uri.get(),
-                "--db", nome_banco
-            ]
-            
-            # Se NÃO for para preservar, adicionamos o --drop para limpar antes
-            if not self.preservar_dados.get():
-                comando.append("--drop")
-                
-            comando.append(path_to_restore)
-            
-            resultado = subprocess.run(
-                comando,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            # Log output to help debugging
-            if resultado.stderr:
-                self.log_restore(f"  [Mongo Log]: {resultado.stderr}")
-            if resultado.stdout:
-                self.log_restore(f"  [Output]: {resultado.stdout}")
-            
-            return True
-            
-        except subprocess.CalledProcessError as e:
-            self.log_restore(f"  Erro: {e.stderr}")
-            return False
-        except FileNotFoundError:
-            self.log_restore("  Erro: 'mongorestore' não encontrado!")
-            self.log_restore("  Certifique-se de que o MongoDB está instalado e mongorestore está no PATH.")
-            messagebox.showerror("Erro", 
-                "mongorestore não encontrado!\n\n"
-                "Certifique-se de que o MongoDB está instalado\n"
-                "e mongorestore está no PATH do sistema.")
-            return False
-        except Exception as e:
-            self.log_restore(f"  Erro inesperado: {e}")
-            return False
+            self.na_interface(self.btn_restore.config, {"state": tk.NORMAL})
+
+    def incrementos_restore(self, pasta_backup):
+        """Incrementos de oplog a reaplicar (até o horário alvo, na restauração pontual)"""
+        if self.restore_alvo_ts:
+            return incrementos_ate(pasta_backup, self.restore_alvo_ts)
+        return listar_incrementos(pasta_backup)
 
 
 def main():
@@ -951,5 +1254,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # Necessário para o pool de processos da verificação no executável (PyInstaller)
+    multiprocessing.freeze_support()
     main()
 
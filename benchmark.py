@@ -0,0 +1,454 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark do backup e da restauração
+Sobe um mongod descartável (ou usa um servidor local informado), cria bancos sintéticos
+de formatos conhecidos e mede o backup e a restauração em cada combinação de formato,
+motor e paralelismo. Os resultados (MB/s, documentos/s, tempo e pico de memória) vão
+para um arquivo JSON que pode ser comparado com o de outra execução
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient, ASCENDING
+
+from backup_mongodb import MongoDBBackup, MongoDBRestore, localizar_ferramenta, tamanho_pasta
+from catalogo import formatar_bytes
+from compressao import codecs_disponiveis
+
+# Memória medida por amostragem (processo + mongodump/mongorestore) se o psutil estiver instalado
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Todos os bancos do benchmark têm este prefixo (apagados antes e depois, inclusive com --uri)
+PREFIXO_BANCOS = "bench_"
+
+# Documentos inseridos por lote ao criar os bancos sintéticos
+LOTE_INSERCAO = 5000
+
+# Intervalo entre duas amostras de memória (segundos)
+INTERVALO_MEMORIA = 0.05
+
+# Tempo máximo para o mongod descartável aceitar conexões (segundos)
+ESPERA_MONGOD = 30
+
+# Combinações medidas: nome -> opções do MongoDBBackup (a restauração usa o mesmo motor e paralelismo)
+MODOS = {
+    "pasta-mongodump-j1": {"formato": "pasta", "motor": "mongodump", "paralelismo": 1},
+    "pasta-mongodump-j4": {"formato": "pasta", "motor": "mongodump", "paralelismo": 4},
+    "pasta-nativo-j1": {"formato": "pasta", "motor": "nativo", "paralelismo": 1},
+    "pasta-nativo-j4": {"formato": "pasta", "motor": "nativo", "paralelismo": 4},
+    "archive-gzip-j1": {"formato": "archive", "compressao": "gzip", "paralelismo": 1},
+    "archive-gzip-j4": {"formato": "archive", "compressao": "gzip", "paralelismo": 4},
+    "archive-zstd-j4": {"formato": "archive", "compressao": "zstd", "paralelismo": 4},
+    "dedup-j1": {"formato": "dedup", "paralelismo": 1},
+}
+
+
+def _texto(aleatorio, tamanho):
+    return "".join(aleatorio.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(tamanho))
+
+
+def _inserir(colecao, documentos):
+    """Insere um gerador de documentos em lotes"""
+    lote = []
+    for documento in documentos:
+        lote.append(documento)
+        if len(lote) >= LOTE_INSERCAO:
+            colecao.insert_many(lote, ordered=False)
+            lote = []
+    if lote:
+        colecao.insert_many(lote, ordered=False)
+
+
+def criar_muitos_bancos(client, escala, aleatorio):
+    """Muitos bancos pequenos: o custo fixo por banco/processo domina"""
+    bancos = []
+    for indice in range(max(1, int(100 * escala))):
+        nome = f"{PREFIXO_BANCOS}pequeno_{indice:04d}"
+        _inserir(client[nome]["itens"], ({"_id": numero, "valor": aleatorio.random(), "nome": _texto(aleatorio, 16)}
+                                         for numero in range(200)))
+        bancos.append(nome)
+    return bancos
+
+
+def criar_colecao_grande(client, escala, aleatorio):
+    """Uma coleção grande (~250 bytes por documento): vazão de um único fluxo"""
+    nome = f"{PREFIXO_BANCOS}grande"
+    inicio = datetime(2024, 1, 1)
+    _inserir(client[nome]["pedidos"], ({
+        "_id": numero,
+        "cliente": aleatorio.randrange(100000),
+        "valor": round(aleatorio.random() * 1000, 2),
+        "data": inicio + timedelta(seconds=numero),
+        "status": aleatorio.choice(("novo", "pago", "enviado", "entregue")),
+        "observacao": _texto(aleatorio, 120),
+        "itens": [aleatorio.randrange(5000) for _ in range(5)]
+    } for numero in range(max(1, int(1000000 * escala)))))
+    return [nome]
+
+
+def criar_documentos_largos(client, escala, aleatorio):
+    """Documentos com 200 campos (~6 KB): custo de codificação por documento"""
+    nome = f"{PREFIXO_BANCOS}largos"
+    _inserir(client[nome]["cadastros"], (
+        dict({"_id": numero}, **{f"campo_{campo:03d}": _texto(aleatorio, 24) for campo in range(200)})
+        for numero in range(max(1, int(20000 * escala)))))
+    return [nome]
+
+
+def criar_muitos_indices(client, escala, aleatorio):
+    """Coleção com 40 índices: peso da recriação de índices na restauração"""
+    nome = f"{PREFIXO_BANCOS}indices"
+    colecao = client[nome]["registros"]
+    _inserir(colecao, (dict({"_id": numero}, **{f"c{campo:02d}": aleatorio.randrange(1000000) for campo in range(30)})
+                       for numero in range(max(1, int(200000 * escala)))))
+    for campo in range(30):
+        colecao.create_index([(f"c{campo:02d}", ASCENDING)])
+    for campo in range(0, 20, 2):
+        colecao.create_index([(f"c{campo:02d}", ASCENDING), (f"c{campo + 1:02d}", ASCENDING)])
+    return [nome]
+
+
+# Cenários: nome -> função que cria os bancos e retorna seus nomes
+CENARIOS = {
+    "muitos_bancos": criar_muitos_bancos,
+    "colecao_grande": criar_colecao_grande,
+    "documentos_largos": criar_documentos_largos,
+    "muitos_indices": criar_muitos_indices,
+}
+
+
+def porta_livre():
+    """Porta TCP livre em 127.0.0.1"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as conexao:
+        conexao.bind(("127.0.0.1", 0))
+        return conexao.getsockname()[1]
+
+
+class MongodTemporario:
+    """mongod descartável (dados em uma pasta temporária, apagada ao final)"""
+
+    def __init__(self, executavel, pasta):
+        self.executavel = executavel
+        self.pasta = pasta
+        self.processo = None
+        self.uri = None
+
+    def __enter__(self):
+        porta = porta_livre()
+        pasta_dados = os.path.join(self.pasta, "dados")
+        os.makedirs(pasta_dados, exist_ok=True)
+        self.processo = subprocess.Popen(
+            [self.executavel, "--dbpath", pasta_dados, "--port", str(porta), "--bind_ip", "127.0.0.1",
+             "--logpath", os.path.join(self.pasta, "mongod.log")],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.uri = f"mongodb://127.0.0.1:{porta}/"
+
+        limite = time.monotonic() + ESPERA_MONGOD
+        while True:
+            if self.processo.poll() is not None:
+                raise RuntimeError(f"mongod terminou ao iniciar (veja {os.path.join(self.pasta, 'mongod.log')})")
+            try:
+                with MongoClient(self.uri, serverSelectionTimeoutMS=500) as client:
+                    client.admin.command("ping")
+                return self
+            except Exception:
+                if time.monotonic() > limite:
+                    self.__exit__()
+                    raise RuntimeError(f"mongod não respondeu em {ESPERA_MONGOD}s")
+                time.sleep(0.2)
+
+    def __exit__(self, *args):
+        if self.processo is not None and self.processo.poll() is None:
+            self.processo.terminate()
+            try:
+                self.processo.wait(timeout=ESPERA_MONGOD)
+            except subprocess.TimeoutExpired:
+                self.processo.kill()
+                self.processo.wait()
+
+
+class MedidorMemoria:
+    """
+    Pico de memória (RSS) de uma etapa
+
+    Com o psutil, soma a cada INTERVALO_MEMORIA o RSS deste processo e dos filhos
+    (mongodump/mongorestore), sem contar os processos ignorados (o mongod). Sem ele,
+    usa o ru_maxrss do getrusage, que é o maior valor desde o início do processo (não
+    por etapa). No Windows sem psutil, o pico fica desconhecido (None).
+    """
+
+    def __init__(self, ignorar=()):
+        self.ignorar = set(ignorar)
+        self.pico = 0
+        self._parar = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def origem():
+        if psutil is not None:
+            return "psutil"
+        return "getrusage" if resource is not None else None
+
+    def _amostrar(self):
+        processo = psutil.Process()
+        while not self._parar.is_set():
+            total = 0
+            try:
+                processos = [processo] + processo.children(recursive=True)
+            except psutil.Error:
+                processos = [processo]
+            for item in processos:
+                if item.pid in self.ignorar:
+                    continue
+                try:
+                    total += item.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.pico = max(self.pico, total)
+            self._parar.wait(INTERVALO_MEMORIA)
+
+    def __enter__(self):
+        if psutil is not None:
+            self._thread = threading.Thread(target=self._amostrar, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        if self._thread is not None:
+            self._parar.set()
+            self._thread.join()
+        elif resource is not None:
+            # ru_maxrss em KB no Linux e em bytes no macOS
+            unidade = 1 if sys.platform == "darwin" else 1024
+            self.pico = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * unidade
+        else:
+            self.pico = None
+
+
+def apagar_bancos(client):
+    """Apaga os bancos do benchmark (prefixo PREFIXO_BANCOS)"""
+    for nome in client.list_database_names():
+        if nome.startswith(PREFIXO_BANCOS):
+            client.drop_database(nome)
+
+
+def contar_dados(client, bancos):
+    """Documentos e bytes (dataSize) dos bancos, para as taxas e a conferência da restauração"""
+    documentos = 0
+    dados = 0
+    for banco in bancos:
+        estatisticas = client[banco].command("dbStats")
+        documentos += estatisticas.get("objects", 0)
+        dados += estatisticas.get("dataSize", 0)
+    return documentos, dados
+
+
+def medir(cenario, modo, operacao, funcao, documentos, dados, ignorar_pids):
+    """Executa uma etapa e monta o registro de resultado"""
+    inicio = time.perf_counter()
+    with MedidorMemoria(ignorar_pids) as memoria:
+        try:
+            sucesso = bool(funcao())
+            erro = None
+        except Exception as e:
+            sucesso = False
+            erro = str(e)
+    segundos = time.perf_counter() - inicio
+    return {
+        "cenario": cenario,
+        "modo": modo,
+        "operacao": operacao,
+        "sucesso": sucesso,
+        "erro": erro,
+        "segundos": round(segundos, 3),
+        "mb_s": round(dados / (1024 * 1024) / segundos, 2) if segundos else None,
+        "documentos_s": round(documentos / segundos, 1) if segundos else None,
+        "documentos": documentos,
+        "bytes_dados": dados,
+        "pico_rss": memoria.pico
+    }
+
+
+def executar_cenario(client, uri, nome, escala, modos, pasta_trabalho, log, ignorar_pids=()):
+    """Cria os bancos de um cenário e mede o backup e a restauração em cada modo"""
+    resultados = []
+    log(f"\n=== Cenário {nome} ===")
+    apagar_bancos(client)
+    bancos = CENARIOS[nome](client, escala, random.Random(42))
+    documentos, dados = contar_dados(client, bancos)
+    log(f"{len(bancos)} banco(s), {documentos} documentos, {formatar_bytes(dados)}")
+
+    for modo in modos:
+        opcoes = MODOS[modo]
+        backup_dir = os.path.join(pasta_trabalho, "backups", nome, modo)
+        backup = MongoDBBackup(backup_dir=backup_dir, mongo_uri=uri, log=log, **opcoes)
+        try:
+            resultado = medir(nome, modo, "backup", lambda: backup.executar_backup(bancos=bancos),
+                              documentos, dados, ignorar_pids)
+        finally:
+            backup.fechar_conexao()
+        pasta_backup = backup.resumo["pasta"] if backup.resumo else None
+        resultado["bytes_saida"] = tamanho_pasta(pasta_backup) if pasta_backup else None
+        resultados.append(resultado)
+        log(f"  backup      {modo:<22} {resultado['segundos']:>8.2f}s  {resultado['mb_s'] or 0:>8.1f} MB/s"
+            + ("" if resultado["sucesso"] else "  FALHA"))
+        if not resultado["sucesso"]:
+            continue
+
+        # A restauração parte de um servidor sem os bancos do cenário
+        apagar_bancos(client)
+        restore = MongoDBRestore(restore_uri=uri, preservar_dados=False, paralelismo=opcoes["paralelismo"],
+                                 motor=opcoes.get("motor", "mongodump"))
+        resultado = medir(nome, modo, "restauracao", lambda: restore.executar_restore(pasta_backup),
+                          documentos, dados, ignorar_pids)
+        restaurados, _ = contar_dados(client, bancos)
+        if restaurados != documentos:
+            resultado["sucesso"] = False
+            resultado["erro"] = f"{restaurados} de {documentos} documentos restaurados"
+        resultados.append(resultado)
+        log(f"  restauração {modo:<22} {resultado['segundos']:>8.2f}s  {resultado['mb_s'] or 0:>8.1f} MB/s"
+            + ("" if resultado["sucesso"] else f"  FALHA {resultado['erro'] or ''}"))
+        if not resultado["sucesso"]:
+            # Recria os dados para os próximos modos
+            apagar_bancos(client)
+            CENARIOS[nome](client, escala, random.Random(42))
+
+        shutil.rmtree(backup_dir, ignore_errors=True)
+    apagar_bancos(client)
+    return resultados
+
+
+def comparar(anterior, atual):
+    """Linhas com a variação de MB/s e do tempo entre dois arquivos de resultado"""
+    def chave(resultado):
+        return resultado["cenario"], resultado["modo"], resultado["operacao"]
+
+    antes = {chave(resultado): resultado for resultado in anterior["resultados"] if resultado["sucesso"]}
+    linhas = []
+    for resultado in atual["resultados"]:
+        base = antes.get(chave(resultado))
+        if not base or not resultado["sucesso"] or not base["mb_s"]:
+            continue
+        variacao = (resultado["mb_s"] - base["mb_s"]) / base["mb_s"] * 100
+        linhas.append(f"  {resultado['cenario']:<18} {resultado['modo']:<22} {resultado['operacao']:<12} "
+                      f"{base['mb_s']:>8.1f} -> {resultado['mb_s']:>8.1f} MB/s ({variacao:+.1f}%)  "
+                      f"{base['segundos']:.2f}s -> {resultado['segundos']:.2f}s")
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do backup e da restauração do MongoDB")
+    parser.add_argument("--uri", help="Usa este servidor local em vez de um mongod descartável "
+                                      f"(apenas os bancos {PREFIXO_BANCOS}* são criados e apagados)")
+    parser.add_argument("--mongod", default=localizar_ferramenta("mongod"),
+                        help="Executável do mongod descartável")
+    parser.add_argument("--cenarios", nargs="+", choices=list(CENARIOS), default=list(CENARIOS),
+                        help="Cenários medidos")
+    parser.add_argument("--modos", nargs="+", choices=list(MODOS), default=None,
+                        help="Combinações medidas (padrão: todas as disponíveis neste ambiente)")
+    parser.add_argument("--escala", type=float, default=0.1,
+                        help="Multiplicador do tamanho dos cenários (1 = ~250 MB na coleção grande)")
+    parser.add_argument("--saida", default=f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json",
+                        help="Arquivo JSON com os resultados")
+    parser.add_argument("--comparar", metavar="ANTERIOR.json",
+                        help="Compara os resultados com os de uma execução anterior")
+    args = parser.parse_args()
+
+    modos = args.modos or [modo for modo, opcoes in MODOS.items()
+                           if opcoes.get("compressao", "gzip") in codecs_disponiveis()]
+    pasta_trabalho = tempfile.mkdtemp(prefix="benchmark_mongodb_")
+    caminho_log = os.path.splitext(args.saida)[0] + ".log"
+    resultados = []
+    versao = None
+
+    with open(caminho_log, 'w', encoding='utf-8') as arquivo_log:
+        def log(mensagem):
+            arquivo_log.write(f"{mensagem}\n")
+            arquivo_log.flush()
+
+        def exibir(mensagem):
+            print(mensagem)
+            log(mensagem)
+
+        try:
+            with contextlib.ExitStack() as pilha:
+                if args.uri:
+                    uri = args.uri
+                    ignorar_pids = ()
+                else:
+                    if not shutil.which(args.mongod):
+                        print(f"✗ '{args.mongod}' não encontrado. Informe --mongod ou use --uri com um servidor local.")
+                        return False
+                    mongod = pilha.enter_context(MongodTemporario(args.mongod, pasta_trabalho))
+                    uri = mongod.uri
+                    ignorar_pids = (mongod.processo.pid,)
+                client = pilha.enter_context(MongoClient(uri, serverSelectionTimeoutMS=5000))
+                versao = client.server_info().get("version")
+                exibir(f"MongoDB {versao} em {uri} | modos: {', '.join(modos)} | escala {args.escala}")
+
+                # A saída do mongorestore (print) vai para o log, como as mensagens do backup
+                with contextlib.redirect_stdout(arquivo_log):
+                    for cenario in args.cenarios:
+                        for resultado in executar_cenario(client, uri, cenario, args.escala, modos,
+                                                          pasta_trabalho, log, ignorar_pids):
+                            resultados.append(resultado)
+                            marca = "✓" if resultado["sucesso"] else "✗"
+                            print(f"{marca} {cenario:<18} {resultado['modo']:<22} {resultado['operacao']:<12} "
+                                  f"{resultado['segundos']:>8.2f}s {resultado['mb_s'] or 0:>8.1f} MB/s "
+                                  f"{resultado['documentos_s'] or 0:>10.0f} docs/s", file=sys.__stdout__)
+        except KeyboardInterrupt:
+            print("\nBenchmark interrompido; gravando os resultados obtidos.")
+        finally:
+            shutil.rmtree(pasta_trabalho, ignore_errors=True)
+
+    dados = {
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "plataforma": platform.platform(),
+            "processadores": os.cpu_count(),
+            "python": platform.python_version(),
+            "mongodb": versao,
+            "memoria_medida_por": MedidorMemoria.origem()
+        },
+        "escala": args.escala,
+        "resultados": resultados
+    }
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, indent=4, ensure_ascii=False)
+    print(f"Resultados gravados em {args.saida} (log em {caminho_log})")
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            anterior = json.load(f)
+        print(f"\nComparação com {args.comparar}:")
+        for linha in comparar(anterior, dados) or ["  Nenhum resultado em comum."]:
+            print(linha)
+    return all(resultado["sucesso"] for resultado in resultados)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Catálogo de backups (SQLite)
+Registra o conteúdo, o tamanho, a duração e o status de cada backup em um
+arquivo catalogo.sqlite dentro de backup_dir, para consultas sem varrer pastas
+"""
+
+import os
+import json
+import sqlite3
+import threading
+
+
+ARQUIVO_CATALOGO = "catalogo.sqlite"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome TEXT NOT NULL UNIQUE,
+    tipo TEXT NOT NULL,
+    formato TEXT,
+    origem TEXT,
+    inicio TEXT NOT NULL,
+    fim TEXT,
+    duracao REAL,
+    status TEXT NOT NULL,
+    bancos_ok INTEGER DEFAULT 0,
+    bancos_falha INTEGER DEFAULT 0,
+    bytes INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS bancos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    execucao_id INTEGER NOT NULL REFERENCES execucoes(id) ON DELETE CASCADE,
+    nome TEXT NOT NULL,
+    status TEXT NOT NULL,
+    documentos INTEGER,
+    bytes INTEGER,
+    checksum TEXT,
+    duracao REAL,
+    erro TEXT,
+    UNIQUE (execucao_id, nome)
+);
+CREATE TABLE IF NOT EXISTS colecoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    banco_id INTEGER NOT NULL REFERENCES bancos(id) ON DELETE CASCADE,
+    nome TEXT NOT NULL,
+    documentos INTEGER,
+    bytes INTEGER,
+    UNIQUE (banco_id, nome)
+);
+CREATE INDEX IF NOT EXISTS idx_execucoes_inicio ON execucoes(inicio);
+"""
+
+# Colunas acrescentadas depois da primeira versão (adicionadas aos catálogos antigos ao abrir)
+COLUNAS_NOVAS = {
+    "execucoes": [("fases", "TEXT"), ("cpu", "REAL")],
+    "bancos": [("fases", "TEXT"), ("tentativas", "INTEGER")],
+    "colecoes": [("duracao", "REAL"), ("filtro", "TEXT")],
+}
+
+# Uma escrita por vez no mesmo processo (execuções paralelas compartilham o arquivo)
+_trava_escrita = threading.Lock()
+
+
+def caminho_catalogo(backup_dir):
+    """Caminho do catálogo de um diretório de backup"""
+    return os.path.join(backup_dir, ARQUIVO_CATALOGO)
+
+
+def abrir_catalogo(backup_dir):
+    """Abre (criando se necessário) o catálogo de backup_dir"""
+    os.makedirs(backup_dir, exist_ok=True)
+    conexao = sqlite3.connect(caminho_catalogo(backup_dir), timeout=30)
+    conexao.row_factory = sqlite3.Row
+    conexao.execute("PRAGMA foreign_keys = ON")
+    conexao.executescript(ESQUEMA)
+    for tabela, colunas in COLUNAS_NOVAS.items():
+        existentes = {linha["name"] for linha in conexao.execute(f"PRAGMA table_info({tabela})")}
+        for coluna, tipo in colunas:
+            if coluna not in existentes:
+                try:
+                    conexao.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+                except sqlite3.OperationalError:
+                    # Outro processo acrescentou a coluna ao mesmo tempo
+                    pass
+    return conexao
+
+
+def _json(valor):
+    return json.dumps(valor, ensure_ascii=False) if valor else None
+
+
+def ocultar_senha(uri):
+    """Remove usuário/senha de uma URI antes de gravá-la no catálogo"""
+    if "@" not in uri or "://" not in uri:
+        return uri
+    esquema, resto = uri.split("://", 1)
+    return f"{esquema}://{resto.split('@', 1)[1]}"
+
+
+def registrar_execucao(backup_dir, execucao, bancos):
+    """
+    Grava uma execução de backup e o resultado de cada banco
+
+    Args:
+        backup_dir: Diretório de backup (onde fica o catálogo)
+        execucao: Dicionário com nome (pasta relativa a backup_dir), tipo, formato,
+            origem, inicio, fim, duracao, status e, opcionalmente, fases ({fase: segundos})
+            e cpu (segundos)
+        bancos: Lista de dicionários com nome, status, documentos, bytes, checksum,
+            duracao, erro, fases, tentativas e colecoes (lista de {nome, documentos,
+            bytes, duracao, filtro})
+    """
+    with _trava_escrita:
+        conexao = abrir_catalogo(backup_dir)
+        try:
+            with conexao:
+                # Reexecuções (ex: retomada) substituem o registro anterior da mesma pasta
+                conexao.execute("DELETE FROM execucoes WHERE nome = ?", (execucao["nome"],))
+                cursor = conexao.execute(
+                    "INSERT INTO execucoes (nome, tipo, formato, origem, inicio, fim, duracao, status, "
+                    "bancos_ok, bancos_falha, bytes, fases, cpu) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (execucao["nome"], execucao["tipo"], execucao.get("formato"),
+                     ocultar_senha(execucao.get("origem", "")), execucao["inicio"], execucao.get("fim"),
+                     execucao.get("duracao"), execucao["status"],
+                     sum(1 for banco in bancos if banco["status"] == "ok"),
+                     sum(1 for banco in bancos if banco["status"] != "ok"),
+                     sum(banco.get("bytes") or 0 for banco in bancos),
+                     _json(execucao.get("fases")), execucao.get("cpu")))
+                execucao_id = cursor.lastrowid
+
+                for banco in bancos:
+                    cursor = conexao.execute(
+                        "INSERT INTO bancos (execucao_id, nome, status, documentos, bytes, checksum, duracao, erro, "
+                        "fases, tentativas) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (execucao_id, banco["nome"], banco["status"], banco.get("documentos"),
+                         banco.get("bytes"), banco.get("checksum"), banco.get("duracao"), banco.get("erro"),
+                         _json(banco.get("fases")), banco.get("tentativas")))
+                    conexao.executemany(
+                        "INSERT INTO colecoes (banco_id, nome, documentos, bytes, duracao, filtro) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [(cursor.lastrowid, colecao["nome"], colecao.get("documentos"), colecao.get("bytes"),
+                          colecao.get("duracao"), colecao.get("filtro"))
+                         for colecao in banco.get("colecoes", [])])
+            return execucao_id
+        finally:
+            conexao.close()
+
+
+def listar_execucoes(backup_dir, limite=50):
+    """Execuções registradas, da mais recente para a mais antiga (lista vazia sem catálogo)"""
+    if not os.path.isfile(caminho_catalogo(backup_dir)):
+        return []
+    conexao = abrir_catalogo(backup_dir)
+    try:
+        linhas = conexao.execute(
+            "SELECT * FROM execucoes ORDER BY inicio DESC LIMIT ?", (limite,)).fetchall()
+        return [dict(linha) for linha in linhas]
+    finally:
+        conexao.close()
+
+
+def bancos_da_execucao(backup_dir, nome_execucao, somente_ok=False):
+    """
+    Bancos registrados para uma pasta de backup
+
+    Returns:
+        Lista de dicionários (com a lista 'colecoes') ou None se a pasta não está no catálogo
+    """
+    if not os.path.isfile(caminho_catalogo(backup_dir)):
+        return None
+    conexao = abrir_catalogo(backup_dir)
+    try:
+        execucao = conexao.execute("SELECT id FROM execucoes WHERE nome = ?", (nome_execucao,)).fetchone()
+        if execucao is None:
+            return None
+        consulta = "SELECT * FROM bancos WHERE execucao_id = ?"
+        if somente_ok:
+            consulta += " AND status = 'ok'"
+        bancos = [dict(linha) for linha in conexao.execute(consulta + " ORDER BY nome", (execucao["id"],))]
+        for banco in bancos:
+            banco["fases"] = json.loads(banco["fases"]) if banco["fases"] else {}
+            banco["colecoes"] = [dict(linha) for linha in conexao.execute(
+                "SELECT nome, documentos, bytes, duracao, filtro FROM colecoes WHERE banco_id = ? ORDER BY nome",
+                (banco["id"],))]
+        return bancos
+    finally:
+        conexao.close()
+
+
+def historico_vazao(backup_dir, formato, limite=10):
+    """
+    Totais das últimas execuções completas sem falhas de um formato (para estimativas)
+
+    Returns:
+        Dicionário {origem (bytes das coleções no servidor), saida (bytes gravados),
+        duracao (segundos), execucoes} ou None sem histórico
+    """
+    if not os.path.isfile(caminho_catalogo(backup_dir)):
+        return None
+    conexao = abrir_catalogo(backup_dir)
+    try:
+        linhas = conexao.execute(
+            "SELECT e.bytes AS saida, e.duracao, "
+            "(SELECT SUM(c.bytes) FROM colecoes c JOIN bancos b ON c.banco_id = b.id "
+            " WHERE b.execucao_id = e.id) AS origem "
+            "FROM execucoes e WHERE e.tipo = 'completo' AND e.status = 'ok' AND e.formato = ? "
+            "ORDER BY e.inicio DESC LIMIT ?", (formato, limite)).fetchall()
+    finally:
+        conexao.close()
+    linhas = [linha for linha in linhas if linha["origem"] and linha["saida"] and linha["duracao"]]
+    if not linhas:
+        return None
+    return {
+        "origem": sum(linha["origem"] for linha in linhas),
+        "saida": sum(linha["saida"] for linha in linhas),
+        "duracao": sum(linha["duracao"] for linha in linhas),
+        "execucoes": len(linhas)
+    }
+
+
+def bancos_mais_lentos(backup_dir, execucoes=10):
+    """
+    Tempo de cada banco nas últimas execuções completas, do mais lento para o mais rápido
+
+    "parcela" é a fração média da duração da execução ocupada pelo banco (com backup em
+    paralelo, a soma das parcelas passa de 1).
+
+    Returns:
+        Lista de {nome, execucoes, duracao_media, duracao_maxima, bytes_medio,
+        documentos_s, parcela, tentativas_maximas}
+    """
+    if not os.path.isfile(caminho_catalogo(backup_dir)):
+        return []
+    conexao = abrir_catalogo(backup_dir)
+    try:
+        linhas = conexao.execute(
+            "SELECT b.nome, COUNT(*) AS execucoes, AVG(b.duracao) AS duracao_media, "
+            "MAX(b.duracao) AS duracao_maxima, AVG(b.bytes) AS bytes_medio, "
+            "SUM(b.documentos) / SUM(b.duracao) AS documentos_s, "
+            "AVG(b.duracao / NULLIF(e.duracao, 0)) AS parcela, MAX(b.tentativas) AS tentativas_maximas "
+            "FROM bancos b JOIN (SELECT id, duracao FROM execucoes WHERE tipo = 'completo' "
+            "ORDER BY inicio DESC LIMIT ?) e ON b.execucao_id = e.id "
+            "WHERE b.duracao IS NOT NULL GROUP BY b.nome ORDER BY duracao_media DESC", (execucoes,)).fetchall()
+        return [dict(linha) for linha in linhas]
+    finally:
+        conexao.close()
+
+
+def status_das_execucoes(backup_dir):
+    """Status ("ok" ou "falha") de cada execução registrada, por nome (vazio sem catálogo)"""
+    if not os.path.isfile(caminho_catalogo(backup_dir)):
+        return {}
+    conexao = abrir_catalogo(backup_dir)
+    try:
+        return {linha["nome"]: linha["status"] for linha in conexao.execute("SELECT nome, status FROM execucoes")}
+    finally:
+        conexao.close()
+
+
+def remover_execucao(backup_dir, nome_execucao):
+    """Remove uma execução (e seus bancos e coleções) do catálogo"""
+    if not os.path.isfile(caminho_catalogo(backup_dir)):
+        return
+    with _trava_escrita:
+        conexao = abrir_catalogo(backup_dir)
+        try:
+            with conexao:
+                conexao.execute("DELETE FROM execucoes WHERE nome = ?", (nome_execucao,))
+        finally:
+            conexao.close()
+
+
+def formatar_bytes(quantidade):
+    """Formata um tamanho em bytes para leitura (KB, MB, GB...)"""
+    quantidade = float(quantidade or 0)
+    for unidade in ("B", "KB", "MB", "GB", "TB"):
+        if quantidade < 1024 or unidade == "TB":
+            return f"{quantidade:.1f} {unidade}" if unidade != "B" else f"{int(quantidade)} B"
+        quantidade /= 1024
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compressão dos backups em modo archive
+Transmite a saída do mongodump --archive direto para um arquivo comprimido
+(e de volta para o mongorestore) sem gravar cópia intermediária sem compressão
+"""
+
+import gzip
+import io
+import os
+import shutil
+import subprocess
+import threading
+from bisect import bisect_right
+
+from deduplicacao import iterar_registros
+from ferramentas import aguardar_processo, ler_stderr
+from progresso import LeitorContador
+
+# Codecs opcionais: só ficam disponíveis se a biblioteca estiver instalada
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+# Sufixo base dos arquivos de backup em modo archive
+SUFIXO_ARCHIVE = ".archive"
+
+# Codec -> extensão adicionada após o sufixo ".archive"
+EXTENSOES = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+    "lz4": ".lz4",
+    "nenhuma": "",
+}
+
+COMPRESSAO_PADRAO = "gzip"
+
+# Tamanho dos blocos copiados entre o processo e o arquivo
+TAMANHO_BLOCO = 1024 * 1024
+
+# Nos archives indexados a compressão é reiniciada (novo quadro independente) a cada
+# TAMANHO_QUADRO bytes sem compressão: a leitura de uma coleção começa no quadro dela
+TAMANHO_QUADRO = 8 * 1024 * 1024
+
+
+def codecs_disponiveis():
+    """Lista os codecs que podem ser usados neste ambiente"""
+    codecs = ["gzip"]
+    if zstandard is not None:
+        codecs.append("zstd")
+    if lz4 is not None:
+        codecs.append("lz4")
+    codecs.append("nenhuma")
+    return codecs
+
+
+def validar_codec(codec):
+    """Garante que o codec existe e que sua biblioteca está instalada"""
+    if codec not in EXTENSOES:
+        raise ValueError(f"Compressão desconhecida: '{codec}'. Opções: {', '.join(EXTENSOES)}")
+    if codec == "zstd" and zstandard is None:
+        raise ValueError("Compressão 'zstd' requer o pacote 'zstandard' (pip install zstandard)")
+    if codec == "lz4" and lz4 is None:
+        raise ValueError("Compressão 'lz4' requer o pacote 'lz4' (pip install lz4)")
+
+
+def nome_arquivo_archive(nome_banco, codec):
+    """Retorna o nome do arquivo de archive de um banco (ex: vendas.archive.gz)"""
+    return f"{nome_banco}{SUFIXO_ARCHIVE}{EXTENSOES[codec]}"
+
+
+def identificar_archive(nome_arquivo):
+    """
+    Identifica um arquivo de archive pelo nome
+
+    Returns:
+        Tupla (nome_banco, codec) ou None se não for um archive
+    """
+    # Extensões mais longas primeiro para que ".archive" não capture ".archive.gz"
+    for codec, extensao in sorted(EXTENSOES.items(), key=lambda item: -len(item[1])):
+        sufixo = SUFIXO_ARCHIVE + extensao
+        if nome_arquivo.endswith(sufixo) and len(nome_arquivo) > len(sufixo):
+            return nome_arquivo[:-len(sufixo)], codec
+    return None
+
+
+def localizar_archive(pasta_backup, nome_banco):
+    """
+    Procura o archive de um banco dentro da pasta de backup
+
+    Returns:
+        Tupla (caminho, codec) ou None se o banco não foi salvo em modo archive
+    """
+    for codec in EXTENSOES:
+        caminho = os.path.join(pasta_backup, nome_arquivo_archive(nome_banco, codec))
+        if os.path.isfile(caminho):
+            return caminho, codec
+    return None
+
+
+def abrir_escrita(caminho, codec):
+    """
+    Abre um arquivo binário para escrita com o codec informado
+
+    'caminho' também pode ser um arquivo já aberto (ex: ArquivoMedido); nesse caso quem
+    o abriu é responsável por fechá-lo.
+    """
+    validar_codec(codec)
+    aberto = not isinstance(caminho, (str, bytes, os.PathLike))
+    if codec == "gzip":
+        return gzip.open(caminho, "wb", compresslevel=6)
+    if codec == "zstd":
+        arquivo = caminho if aberto else open(caminho, "wb")
+        return zstandard.ZstdCompressor(threads=-1).stream_writer(arquivo, closefd=not aberto)
+    if codec == "lz4":
+        return lz4.frame.open(caminho, "wb")
+    return caminho if aberto else open(caminho, "wb")
+
+
+class ArquivoMedido(io.FileIO):
+    """Arquivo de escrita sem buffer que informa ao_gravar(quantidade) a cada escrita no disco"""
+
+    def __init__(self, caminho, ao_gravar):
+        super().__init__(caminho, "wb")
+        self.ao_gravar = ao_gravar
+
+    def write(self, dados):
+        quantidade = super().write(dados)
+        if quantidade:
+            self.ao_gravar(quantidade)
+        return quantidade
+
+
+def abrir_leitura(caminho, codec):
+    """
+    Abre um arquivo binário para leitura descomprimindo com o codec informado
+
+    Lê todos os quadros do arquivo em sequência. Como em abrir_escrita, 'caminho' pode
+    ser um arquivo já aberto (a leitura começa na posição atual).
+    """
+    validar_codec(codec)
+    aberto = not isinstance(caminho, (str, bytes, os.PathLike))
+    if codec == "gzip":
+        return gzip.open(caminho, "rb")
+    if codec == "zstd":
+        arquivo = caminho if aberto else open(caminho, "rb")
+        return zstandard.ZstdDecompressor().stream_reader(arquivo, closefd=not aberto, read_across_frames=True)
+    if codec == "lz4":
+        return lz4.frame.open(caminho, "rb")
+    return caminho if aberto else open(caminho, "rb")
+
+
+class EscritorQuadros:
+    """
+    Grava o archive comprimido em quadros independentes
+
+    Um novo quadro (membro gzip, quadro zstd/lz4) começa na primeira escrita depois de
+    TAMANHO_QUADRO bytes; as escritas devem terminar em limites de registro. 'quadros'
+    guarda [posição sem compressão, posição no arquivo] do início de cada quadro. Sem
+    compressão, o arquivo é um quadro só (a posição é a mesma).
+    """
+
+    def __init__(self, arquivo, codec):
+        self.arquivo = arquivo
+        self.codec = codec
+        self.quadros = []
+        self.posicao = 0
+        self._destino = None
+
+    def write(self, dados):
+        if self._destino is None or (self.codec != "nenhuma" and self.posicao - self.quadros[-1][0] >= TAMANHO_QUADRO):
+            self.novo_quadro()
+        self._destino.write(dados)
+        self.posicao += len(dados)
+
+    def novo_quadro(self):
+        if self._destino is not None:
+            self._destino.close()
+        self.quadros.append([self.posicao, self.arquivo.tell()])
+        self._destino = abrir_escrita(self.arquivo, self.codec)
+
+    def close(self):
+        # Sem compressão o destino é o próprio arquivo, fechado por quem o abriu
+        if self._destino is not None and self._destino is not self.arquivo:
+            self._destino.close()
+        self._destino = None
+
+
+def copiar_registros(origem, escritor, indice, resumo=None, ao_ler=None):
+    """
+    Copia o archive do mongodump registro a registro, entregando cada um a indice.registrar
+
+    As escritas são agrupadas em blocos de TAMANHO_BLOCO (sempre em limites de registro).
+    """
+    pendente = bytearray()
+
+    def descarregar():
+        if resumo is not None:
+            resumo.update(pendente)
+        escritor.write(bytes(pendente))
+        pendente.clear()
+
+    for registro in iterar_registros(LeitorContador(origem, ao_ler) if ao_ler is not None else origem):
+        indice.registrar(registro)
+        pendente += registro
+        if len(pendente) >= TAMANHO_BLOCO:
+            descarregar()
+    if pendente:
+        descarregar()
+
+
+def ler_trechos(caminho, codec, quadros, trechos):
+    """
+    Gera os bytes dos trechos [início, tamanho] do archive sem compressão, em ordem
+
+    Cada leitura começa no quadro que contém o trecho (sem descomprimir o que vem
+    antes); trechos próximos reaproveitam a leitura em andamento.
+    """
+    inicios = [quadro[0] for quadro in quadros]
+    with open(caminho, "rb") as arquivo:
+        origem = None
+        posicao = None
+        try:
+            for inicio, tamanho in trechos:
+                if codec == "nenhuma":
+                    arquivo.seek(inicio)
+                    origem, posicao = arquivo, inicio
+                elif origem is None or not posicao <= inicio < posicao + TAMANHO_QUADRO:
+                    # O leitor do quadro anterior é fechado (o arquivo continua aberto)
+                    if origem is not None:
+                        origem.close()
+                    indice_quadro = max(0, bisect_right(inicios, inicio) - 1)
+                    arquivo.seek(quadros[indice_quadro][1])
+                    origem = abrir_leitura(arquivo, codec)
+                    posicao = quadros[indice_quadro][0]
+                while posicao < inicio:
+                    descartados = len(origem.read(min(TAMANHO_BLOCO, inicio - posicao)))
+                    if not descartados:
+                        raise ValueError(f"Índice inconsistente com o archive: {caminho}")
+                    posicao += descartados
+                restante = tamanho
+                while restante:
+                    dados = origem.read(min(TAMANHO_BLOCO, restante))
+                    if not dados:
+                        raise ValueError(f"Índice inconsistente com o archive: {caminho}")
+                    posicao += len(dados)
+                    restante -= len(dados)
+                    yield dados
+        finally:
+            if origem is not None and origem is not arquivo:
+                origem.close()
+
+
+def _coletar_stderr(processo, saida, ao_evento):
+    """Lê o stderr do processo em paralelo para evitar bloqueio do pipe (só o final é guardado)"""
+    saida.append(ler_stderr(processo.stderr, ao_evento))
+
+
+def despejar_saida(comando, consumir, ao_evento=None, opcoes_processo=None):
+    """
+    Executa um comando entregando o stdout (binário) para a função 'consumir'
+
+    Lança subprocess.CalledProcessError com o final do stderr se o processo terminar
+    com erro (mesmo contrato de subprocess.run(check=True)). Retorna o final do stderr.
+    As linhas de progresso do stderr são entregues a ao_evento (ver ferramentas) e
+    opcoes_processo são repassadas ao Popen.
+    """
+    processo = subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                **(opcoes_processo or {}))
+    saida_stderr = []
+    leitor = threading.Thread(target=_coletar_stderr, args=(processo, saida_stderr, ao_evento), daemon=True)
+    leitor.start()
+
+    try:
+        consumir(processo.stdout)
+    except BaseException:
+        processo.kill()
+        aguardar_processo(processo)
+        leitor.join()
+        raise
+
+    processo.stdout.close()
+    codigo = aguardar_processo(processo)
+    leitor.join()
+    stderr = "".join(saida_stderr)
+
+    if codigo != 0:
+        raise subprocess.CalledProcessError(codigo, comando, stderr=stderr)
+    return stderr
+
+
+def alimentar_entrada(comando, origem, ao_evento=None):
+    """
+    Executa um comando copiando o objeto de arquivo 'origem' para o seu stdin
+
+    Lança subprocess.CalledProcessError se o processo terminar com erro. Retorna o final
+    do stderr; as linhas de progresso são entregues a ao_evento.
+    """
+    processo = subprocess.Popen(comando, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE)
+    saida_stderr = []
+    leitor = threading.Thread(target=_coletar_stderr, args=(processo, saida_stderr, ao_evento), daemon=True)
+    leitor.start()
+
+    try:
+        shutil.copyfileobj(origem, processo.stdin, TAMANHO_BLOCO)
+        processo.stdin.close()
+    except BrokenPipeError:
+        # O processo encerrou antes de ler tudo; o código de saída indica o erro
+        pass
+    except BaseException:
+        processo.kill()
+        aguardar_processo(processo)
+        leitor.join()
+        raise
+
+    codigo = aguardar_processo(processo)
+    leitor.join()
+    stderr = "".join(saida_stderr)
+
+    if codigo != 0:
+        raise subprocess.CalledProcessError(codigo, comando, stderr=stderr)
+    return stderr
+
+
+def copiar_stream(origem, destino, resumo=None, ao_ler=None):
+    """
+    Copia origem -> destino em blocos
+
+    Atualiza o hash 'resumo' e chama ao_ler(quantidade) a cada bloco (se informados).
+    """
+    if resumo is None and ao_ler is None:
+        shutil.copyfileobj(origem, destino, TAMANHO_BLOCO)
+        return
+    for bloco in iter(lambda: origem.read(TAMANHO_BLOCO), b""):
+        if resumo is not None:
+            resumo.update(bloco)
+        destino.write(bloco)
+        if ao_ler is not None:
+            ao_ler(len(bloco))
+
+
+def despejar_para_archive(comando, caminho, codec, resumo=None, ao_ler=None, ao_evento=None,
+                          ao_gravar=None, opcoes_processo=None, indice=None):
+    """
+    Executa o comando (mongodump --archive ou --out -) e grava a saída comprimida em 'caminho'
+
+    Se 'resumo' (ex: hashlib.sha256()) for informado, ele recebe os bytes sem compressão;
+    ao_ler(quantidade) é chamada a cada bloco lido, ao_gravar(quantidade) a cada escrita
+    no disco (bytes comprimidos) e ao_evento recebe o progresso do stderr.
+    Com 'indice' (ver indice.IndiceArchive), o archive é gravado em quadros independentes
+    e o índice recebe cada registro e, no fim, os quadros.
+    Em caso de falha o arquivo parcial é removido e a exceção é propagada.
+    """
+    try:
+        with ArquivoMedido(caminho, ao_gravar) if ao_gravar is not None else open(caminho, "wb") as arquivo:
+            if indice is not None:
+                escritor = EscritorQuadros(arquivo, codec)
+                try:
+                    stderr = despejar_saida(comando, lambda saida: copiar_registros(saida, escritor, indice, resumo, ao_ler),
+                                            ao_evento, opcoes_processo)
+                finally:
+                    escritor.close()
+                indice.quadros = escritor.quadros
+                return stderr
+            with abrir_escrita(arquivo, codec) as destino:
+                return despejar_saida(comando, lambda saida: copiar_stream(saida, destino, resumo, ao_ler),
+                                      ao_evento, opcoes_processo)
+    except BaseException:
+        _remover_parcial(caminho)
+        raise
+
+
+def restaurar_de_archive(comando, caminho, codec, ao_evento=None):
+    """
+    Executa o mongorestore com --archive alimentando o stdin com o archive descomprimido
+
+    Lança subprocess.CalledProcessError se o processo terminar com erro.
+    """
+    with abrir_leitura(caminho, codec) as origem:
+        return alimentar_entrada(comando, origem, ao_evento)
+
+
+def _remover_parcial(caminho):
+    """Remove um archive incompleto"""
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
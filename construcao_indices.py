@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Construção dos índices no fim da restauração rápida
+Os dados são carregados sem índices (mongorestore --noIndexRestore ou motor nativo) e
+com write concern relaxado; depois, os índices do .metadata.json de cada coleção (ou do
+prelúdio do archive) são criados em paralelo, um createIndexes por índice, cada um com
+o seu tempo registrado
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pymongo.write_concern import WriteConcern
+
+import motor_nativo
+from progresso import formatar_duracao
+
+
+# Índices construídos ao mesmo tempo em cada banco (o servidor aceita, por padrão, 3
+# construções simultâneas: maxNumActiveUserIndexBuilds)
+INDICES_PARALELOS_PADRAO = 3
+
+# Write concern da carga na restauração rápida (mongorestore --writeConcern e motor nativo)
+WRITE_CONCERN_CARGA = "{w: 1, j: false}"
+
+
+def write_concern_carga():
+    """WriteConcern do pymongo equivalente a WRITE_CONCERN_CARGA"""
+    return WriteConcern(w=1, j=False)
+
+
+def opcoes_carga_rapida():
+    """Opções do mongorestore na carga da restauração rápida (sem índices, w:1 sem journal)"""
+    return ["--noIndexRestore", f"--writeConcern={WRITE_CONCERN_CARGA}"]
+
+
+def indices_dos_metadados(metadados, colecoes=None):
+    """
+    Índices a construir: lista de (coleção, especificação), sem _id e sem views
+
+    Args:
+        metadados: Dicionário {coleção: conteúdo do .metadata.json}
+        colecoes: Coleções consideradas (None = todas)
+    """
+    indices = []
+    for nome_colecao, dados in sorted(metadados.items()):
+        if colecoes is not None and nome_colecao not in colecoes:
+            continue
+        if nome_colecao.startswith("system.") or dados.get("type", "collection") != "collection":
+            continue
+        indices.extend((nome_colecao, indice) for indice in dados.get("indexes", []) if indice.get("name") != "_id_")
+    return indices
+
+
+def metadados_da_pasta(pasta):
+    """Conteúdo dos .metadata.json de uma pasta de banco do mongodump"""
+    return {nome: motor_nativo.ler_metadados(os.path.join(pasta, f"{nome}.metadata.json"))
+            for nome in motor_nativo.colecoes_no_backup(pasta)}
+
+
+def construir_indice(client, nome_banco, nome_colecao, indice):
+    """Cria um índice e retorna a duração em segundos"""
+    inicio = time.monotonic()
+    client[nome_banco][nome_colecao].create_indexes([motor_nativo.modelo_indice(indice)])
+    return time.monotonic() - inicio
+
+
+def construir_indices(client, nome_banco, indices, paralelos=INDICES_PARALELOS_PADRAO, log=print):
+    """
+    Constrói os índices em paralelo, registrando no log o tempo de cada um
+
+    Lança a primeira exceção ocorrida depois que todas as construções terminarem
+    (um índice único com duplicatas não interrompe os demais).
+
+    Returns:
+        Lista de (coleção, nome do índice, segundos) dos índices criados
+    """
+    if not indices:
+        return []
+    log(f"  '{nome_banco}': construindo {len(indices)} índice(s), até {paralelos} ao mesmo tempo")
+    inicio = time.monotonic()
+    tempos = []
+    erros = []
+    with ThreadPoolExecutor(max_workers=max(1, paralelos)) as executor:
+        futuros = {executor.submit(construir_indice, client, nome_banco, nome_colecao, indice): (nome_colecao, indice)
+                   for nome_colecao, indice in indices}
+        for futuro in as_completed(futuros):
+            nome_colecao, indice = futuros[futuro]
+            try:
+                segundos = futuro.result()
+                tempos.append((nome_colecao, indice["name"], segundos))
+                log(f"  ✓ Índice {nome_banco}.{nome_colecao}.{indice['name']} criado em {formatar_duracao(segundos)}")
+            except Exception as e:
+                erros.append(e)
+                log(f"  ✗ Índice {nome_banco}.{nome_colecao}.{indice['name']}: {e}")
+    if erros:
+        raise erros[0]
+    log(f"  '{nome_banco}': {len(tempos)} índice(s) em {formatar_duracao(time.monotonic() - inicio)}")
+    return tempos
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Repositório deduplicado de backups (armazenamento endereçado por conteúdo)
+O archive do mongodump é dividido em blocos definidos pelo conteúdo, cada bloco é
+gravado uma única vez (pelo hash SHA-256) e cada backup vira um manifesto pequeno
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+
+
+# Pasta do repositório de blocos, dentro de backup_dir (oculta das listagens)
+PASTA_REPOSITORIO = ".repositorio"
+
+# Sufixo do manifesto de cada banco dentro da pasta de backup
+SUFIXO_MANIFESTO = ".dedup.json"
+
+# Limites dos blocos: o corte acontece em média a cada TAMANHO_MEDIO bytes,
+# nunca antes de TAMANHO_MINIMO e sempre até TAMANHO_MAXIMO
+TAMANHO_MINIMO = 256 * 1024
+TAMANHO_MEDIO = 1024 * 1024
+TAMANHO_MAXIMO = 4 * 1024 * 1024
+
+# Nível do zlib usado para gravar cada bloco
+NIVEL_COMPRESSAO = 3
+
+# Marcador de fim de bloco do formato archive do mongodump
+TERMINADOR = b"\xff\xff\xff\xff"
+
+TAMANHO_LEITURA = 1024 * 1024
+
+
+def caminho_repositorio(backup_dir):
+    """Caminho do repositório de blocos de um diretório de backup"""
+    return os.path.join(backup_dir, PASTA_REPOSITORIO)
+
+
+def caminho_bloco(repositorio, hash_hex):
+    """Caminho de um bloco no repositório (subpastas pelos 2 primeiros caracteres do hash)"""
+    return os.path.join(repositorio, "blocos", hash_hex[:2], hash_hex)
+
+
+def nome_manifesto(nome_banco):
+    """Nome do manifesto de um banco (ex: vendas.dedup.json)"""
+    return nome_banco + SUFIXO_MANIFESTO
+
+
+def identificar_manifesto(nome_arquivo):
+    """Retorna o nome do banco se o arquivo for um manifesto, senão None"""
+    if nome_arquivo.endswith(SUFIXO_MANIFESTO) and len(nome_arquivo) > len(SUFIXO_MANIFESTO):
+        return nome_arquivo[:-len(SUFIXO_MANIFESTO)]
+    return None
+
+
+def localizar_manifesto(pasta_backup, nome_banco):
+    """Caminho do manifesto do banco na pasta de backup, ou None se não existir"""
+    caminho = os.path.join(pasta_backup, nome_manifesto(nome_banco))
+    return caminho if os.path.isfile(caminho) else None
+
+
+def ler_manifesto(caminho):
+    """Lê um manifesto de backup deduplicado"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iterar_registros(stream):
+    """
+    Percorre um archive do mongodump devolvendo seus registros como bytes
+
+    O archive é uma sequência de documentos BSON (prefixados pelo tamanho) e de
+    terminadores 0xFFFFFFFF, após 4 bytes de número mágico. Cortar apenas entre
+    registros faz os blocos coincidirem com documentos inteiros, o que mantém os
+    cortes estáveis quando documentos são inseridos ou removidos.
+    Dados que não seguem o formato são devolvidos em pedaços de TAMANHO_LEITURA.
+    """
+    buffer = bytearray()
+    inicio = True
+    fim_stream = False
+
+    while True:
+        while not fim_stream and len(buffer) < TAMANHO_LEITURA:
+            dados = stream.read(TAMANHO_LEITURA)
+            if not dados:
+                fim_stream = True
+                break
+            buffer += dados
+
+        if not buffer:
+            return
+
+        if inicio:
+            # Número mágico do archive
+            inicio = False
+            tamanho = min(4, len(buffer))
+        elif len(buffer) < 4:
+            tamanho = len(buffer)
+        elif buffer[:4] == TERMINADOR:
+            tamanho = 4
+        else:
+            tamanho = struct.unpack_from("<i", buffer)[0]
+            if tamanho < 5:
+                tamanho = min(len(buffer), TAMANHO_LEITURA)
+            elif tamanho > len(buffer):
+                if fim_stream:
+                    tamanho = len(buffer)
+                else:
+                    # Documento maior que o buffer: lê o restante antes de continuar
+                    dados = stream.read(tamanho - len(buffer))
+                    if dados:
+                        buffer += dados
+                        continue
+                    fim_stream = True
+                    tamanho = len(buffer)
+
+        registro = bytes(buffer[:tamanho])
+        del buffer[:tamanho]
+        yield registro
+
+
+def dividir_em_blocos(stream, ao_registro=None):
+    """
+    Divide o stream em blocos definidos pelo conteúdo
+
+    Após cada registro, o corte acontece com probabilidade proporcional ao tamanho
+    do registro (decidida pelo CRC32 do próprio conteúdo), respeitando os limites
+    mínimo e máximo. O mesmo conteúdo sempre gera os mesmos cortes. ao_registro
+    recebe cada registro (ex: indice.IndiceArchive.registrar).
+    """
+    partes = []
+    tamanho_atual = 0
+
+    for registro in iterar_registros(stream):
+        if ao_registro is not None:
+            ao_registro(registro)
+        partes.append(registro)
+        tamanho_atual += len(registro)
+
+        if tamanho_atual < TAMANHO_MINIMO:
+            continue
+        limiar = min(1.0, len(registro) / TAMANHO_MEDIO) * 0xFFFFFFFF
+        if tamanho_atual >= TAMANHO_MAXIMO or zlib.crc32(registro) <= limiar:
+            yield b"".join(partes)
+            partes = []
+            tamanho_atual = 0
+
+    if partes:
+        yield b"".join(partes)
+
+
+def gravar_bloco(repositorio, dados):
+    """
+    Grava um bloco no repositório se ele ainda não existir
+
+    Returns:
+        Tupla (hash_hex, bytes_gravados); bytes_gravados é 0 quando o bloco já existia
+    """
+    hash_hex = hashlib.sha256(dados).hexdigest()
+    caminho = caminho_bloco(repositorio, hash_hex)
+    if os.path.exists(caminho):
+        return hash_hex, 0
+
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    comprimido = zlib.compress(dados, NIVEL_COMPRESSAO)
+    # Nome temporário único: outro processo pode estar gravando o mesmo bloco
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(comprimido)
+    os.replace(temporario, caminho)
+    return hash_hex, len(comprimido)
+
+
+def ler_bloco(repositorio, hash_hex):
+    """Lê e descomprime um bloco, conferindo o hash"""
+    with open(caminho_bloco(repositorio, hash_hex), 'rb') as f:
+        dados = zlib.decompress(f.read())
+    if hashlib.sha256(dados).hexdigest() != hash_hex:
+        raise ValueError(f"Bloco corrompido no repositório: {hash_hex}")
+    return dados
+
+
+def armazenar_stream(stream, repositorio, caminho_manifesto, nome_banco, ao_gravar=None, ao_registro=None):
+    """
+    Armazena um stream no repositório e grava o manifesto que o reconstrói
+
+    ao_gravar(quantidade) é chamada com os bytes de cada bloco novo gravado e
+    ao_registro com cada registro do archive (ver dividir_em_blocos).
+
+    Returns:
+        Dicionário com o manifesto gravado (inclui 'bytes_novos' para estatística)
+    """
+    blocos = []
+    tamanho_total = 0
+    bytes_novos = 0
+    resumo = hashlib.sha256()
+
+    for dados in dividir_em_blocos(stream, ao_registro):
+        resumo.update(dados)
+        hash_hex, gravados = gravar_bloco(repositorio, dados)
+        blocos.append([hash_hex, len(dados)])
+        tamanho_total += len(dados)
+        bytes_novos += gravados
+        if gravados and ao_gravar is not None:
+            ao_gravar(gravados)
+
+    manifesto = {
+        "versao": 1,
+        "banco": nome_banco,
+        "repositorio": os.path.relpath(repositorio, os.path.dirname(caminho_manifesto)),
+        "tamanho": tamanho_total,
+        "bytes_novos": bytes_novos,
+        "sha256": resumo.hexdigest(),
+        "blocos": blocos
+    }
+    temporario = caminho_manifesto + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f)
+    os.replace(temporario, caminho_manifesto)
+    return manifesto
+
+
+def resolver_repositorio(caminho_manifesto, manifesto):
+    """Caminho absoluto do repositório referenciado por um manifesto"""
+    return os.path.normpath(os.path.join(os.path.dirname(caminho_manifesto), manifesto["repositorio"]))
+
+
+class LeitorManifesto:
+    """Objeto de arquivo (somente leitura) que remonta o stream de um manifesto"""
+
+    def __init__(self, caminho_manifesto):
+        self.manifesto = ler_manifesto(caminho_manifesto)
+        self.repositorio = resolver_repositorio(caminho_manifesto, self.manifesto)
+        self._blocos = iter(self.manifesto["blocos"])
+        self._atual = memoryview(b"")
+
+    def read(self, tamanho=-1):
+        if tamanho is None or tamanho < 0:
+            return b"".join(iter(lambda: self.read(TAMANHO_LEITURA), b""))
+        while not self._atual:
+            proximo = next(self._blocos, None)
+            if proximo is None:
+                return b""
+            self._atual = memoryview(ler_bloco(self.repositorio, proximo[0]))
+        dados = bytes(self._atual[:tamanho])
+        self._atual = self._atual[tamanho:]
+        return dados
+
+    def close(self):
+        self._blocos = iter(())
+        self._atual = memoryview(b"")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def blocos_referenciados(backup_dir):
+    """Conjunto dos hashes usados por todos os manifestos dentro de backup_dir"""
+    usados = set()
+    for raiz, pastas, arquivos in os.walk(backup_dir):
+        pastas[:] = [pasta for pasta in pastas if pasta != PASTA_REPOSITORIO]
+        for arquivo in arquivos:
+            if identificar_manifesto(arquivo):
+                try:
+                    manifesto = ler_manifesto(os.path.join(raiz, arquivo))
+                except (OSError, ValueError):
+                    continue
+                usados.update(bloco[0] for bloco in manifesto.get("blocos", []))
+    return usados
+
+
+def remover_blocos_orfaos(backup_dir, simular=False):
+    """
+    Remove do repositório os blocos que nenhum manifesto referencia mais
+
+    Deve ser executado depois de apagar backups antigos.
+
+    Returns:
+        Tupla (quantidade, bytes) dos blocos removidos (ou que seriam removidos)
+    """
+    pasta_blocos = os.path.join(caminho_repositorio(backup_dir), "blocos")
+    if not os.path.isdir(pasta_blocos):
+        return 0, 0
+
+    usados = blocos_referenciados(backup_dir)
+    quantidade = 0
+    liberados = 0
+    for raiz, _, arquivos in os.walk(pasta_blocos):
+        for arquivo in arquivos:
+            if arquivo in usados or arquivo.endswith(".tmp"):
+                continue
+            caminho = os.path.join(raiz, arquivo)
+            try:
+                tamanho = os.path.getsize(caminho)
+                if not simular:
+                    os.remove(caminho)
+            except OSError:
+                continue
+            quantidade += 1
+            liberados += tamanho
+    return quantidade, liberados
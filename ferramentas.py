@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Execução do mongodump/mongorestore
+Lê o stderr das ferramentas linha a linha enquanto elas rodam, converte as linhas de
+progresso em eventos e guarda só as últimas linhas restantes (memória limitada)
+"""
+
+import os
+import re
+import subprocess
+import threading
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+# Linhas do stderr guardadas para a mensagem de erro (as linhas de progresso não contam)
+MAX_LINHAS_STDERR = 200
+
+# Multiplicadores das quantidades exibidas pelo mongorestore (ex: 12.3MB)
+UNIDADES_BYTES = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+# 2024-01-15T10:00:01.123-0300  [#####...............]  vendas.pedidos  5802/10000  (58.0%)
+# 2024-01-15T10:00:01.123-0300  [#####...............]  vendas.pedidos  12.3MB/45.6MB  (27.0%)
+_LINHA_PROGRESSO = re.compile(
+    r"\[[#.]*\]\s+(?P<colecao>\S+)\s+(?P<feito>[\d.]+[KMGT]?B|\d+)/(?P<total>[\d.]+[KMGT]?B|\d+)\s+\((?P<percentual>[\d.]+)%\)")
+# done dumping vendas.pedidos (10000 documents)
+_FIM_EXPORTACAO = re.compile(r"done dumping (?P<colecao>\S+) \((?P<documentos>\d+) documents?\)")
+# finished restoring vendas.pedidos (10000 documents, 0 failures)
+_FIM_RESTAURACAO = re.compile(r"finished restoring (?P<colecao>\S+) \((?P<documentos>\d+) documents?, (?P<falhas>\d+) failures?\)")
+
+# Segundos de CPU dos processos filhos esperados por cada thread (ver aguardar_processo)
+_cpu_filhos = threading.local()
+
+
+def uri_para_ferramenta(uri):
+    """
+    URI do MongoDB aceita junto com --db pelo mongodump/mongorestore
+
+    As ferramentas recusam --db quando a URI também indica um banco; o banco da URI só
+    define onde o usuário é autenticado, então ele vira authSource (se ainda não houver).
+    """
+    partes = urlsplit(uri)
+    banco = partes.path.strip("/")
+    if not banco:
+        return uri
+    opcoes = parse_qsl(partes.query, keep_blank_values=True)
+    if not any(nome.lower() == "authsource" for nome, _ in opcoes):
+        opcoes.append(("authSource", banco))
+    return urlunsplit((partes.scheme, partes.netloc, "/", urlencode(opcoes), partes.fragment))
+
+
+def _quantidade(texto):
+    """Converte '5802' (documentos) ou '12.3MB' (bytes) em (quantidade, unidade)"""
+    if texto.isdigit():
+        return int(texto), "documentos"
+    numero = texto.rstrip("KMGTB")
+    return int(float(numero) * UNIDADES_BYTES[texto[len(numero):]]), "bytes"
+
+
+def interpretar_linha(linha):
+    """
+    Interpreta uma linha do stderr do mongodump/mongorestore
+
+    Returns:
+        Evento {colecao, feito, total, unidade ("documentos" ou "bytes"), percentual,
+        concluido} ou None se a linha não for de progresso
+    """
+    encontrado = _LINHA_PROGRESSO.search(linha)
+    if encontrado:
+        feito, unidade = _quantidade(encontrado["feito"])
+        total, _ = _quantidade(encontrado["total"])
+        return {
+            "colecao": encontrado["colecao"],
+            "feito": feito,
+            "total": total,
+            "unidade": unidade,
+            "percentual": float(encontrado["percentual"]),
+            "concluido": False
+        }
+
+    encontrado = _FIM_EXPORTACAO.search(linha) or _FIM_RESTAURACAO.search(linha)
+    if encontrado:
+        documentos = int(encontrado["documentos"])
+        return {
+            "colecao": encontrado["colecao"],
+            "feito": documentos,
+            "total": documentos,
+            "unidade": "documentos",
+            "percentual": 100.0,
+            "concluido": True
+        }
+    return None
+
+
+def ler_stderr(stderr, ao_evento=None, max_linhas=MAX_LINHAS_STDERR):
+    """
+    Consome o stderr (binário) de uma ferramenta até o fim
+
+    Cada linha de progresso vira um evento entregue a ao_evento; das demais, só as
+    últimas max_linhas são mantidas.
+
+    Returns:
+        Texto das linhas mantidas
+    """
+    linhas = deque(maxlen=max_linhas)
+    for bruta in iter(stderr.readline, b""):
+        linha = bruta.decode("utf-8", errors="replace").rstrip("\r\n")
+        evento = interpretar_linha(linha)
+        if evento is None:
+            linhas.append(linha)
+        elif ao_evento is not None:
+            ao_evento(evento)
+    return "\n".join(linhas)
+
+
+def cpu_filhos_thread():
+    """Segundos de CPU dos filhos esperados pela thread atual, ou None sem os.wait4 (Windows)"""
+    if not hasattr(os, "wait4"):
+        return None
+    return getattr(_cpu_filhos, "segundos", 0.0)
+
+
+def aguardar_processo(processo):
+    """
+    Espera o processo terminar e retorna o código de saída (como Popen.wait)
+
+    No POSIX o filho é esperado com os.wait4, que devolve o uso de CPU só dele; os segundos
+    são somados ao contador da thread que o esperou (cpu_filhos_thread). Assim os bancos em
+    paralelo e as origens simultâneas não misturam o CPU de seus mongodump. A espera segue
+    a do próprio Popen.wait: sob a trava de waitpid do Popen, com o código de saída
+    registrado por ele (_handle_exitstatus), para não disputar o filho com poll() ou wait().
+    """
+    trava = getattr(processo, "_waitpid_lock", None)
+    if not hasattr(os, "wait4") or trava is None or not hasattr(processo, "_handle_exitstatus"):
+        return processo.wait()
+    with trava:
+        if processo.returncode is None:
+            try:
+                pid, status, uso = os.wait4(processo.pid, 0)
+            except ChildProcessError:
+                pid = None
+            if pid == processo.pid:
+                processo._handle_exitstatus(status)
+                _cpu_filhos.segundos = cpu_filhos_thread() + uso.ru_utime + uso.ru_stime
+    # Já esperado (ou recolhido por outro caminho): o Popen resolve o código de saída
+    return processo.wait()
+
+
+def executar_ferramenta(comando, ao_evento=None, opcoes_processo=None):
+    """
+    Executa o mongodump/mongorestore acompanhando o progresso pelo stderr
+
+    Lança subprocess.CalledProcessError com o final do stderr se a ferramenta terminar
+    com erro (mesmo contrato de subprocess.run(check=True)). Retorna o final do stderr.
+    opcoes_processo são repassadas ao Popen (ex: creationflags da prioridade no Windows).
+    """
+    processo = subprocess.Popen(comando, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                **(opcoes_processo or {}))
+    try:
+        stderr = ler_stderr(processo.stderr, ao_evento)
+    except BaseException:
+        processo.kill()
+        aguardar_processo(processo)
+        raise
+    finally:
+        processo.stderr.close()
+
+    codigo = aguardar_processo(processo)
+    if codigo != 0:
+        raise subprocess.CalledProcessError(codigo, comando, stderr=stderr)
+    return stderr
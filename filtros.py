@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Filtros de exportação parcial
+A chave "filtros_exportacao" do config.json associa coleções (banco.colecao, com * como
+curinga) a uma consulta e/ou projeção. A coleção filtrada é exportada só com os
+documentos (e campos) pedidos: a consulta vai para o mongodump (--query) ou para o
+cursor do motor nativo, então os documentos descartados nunca são lidos nem gravados
+"""
+
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+from bson import json_util
+
+from indice import corresponde, separar_padroes
+
+
+# Chaves de cada filtro
+CHAVES_FILTRO = ("consulta", "projecao")
+
+# Data relativa ao início do backup: {"$agoraMenos": "7d"}
+OPERADOR_DATA_RELATIVA = "$agoraMenos"
+
+# Unidades aceitas em $agoraMenos -> argumento do timedelta
+UNIDADES_TEMPO = {
+    "s": "seconds",
+    "min": "minutes",
+    "h": "hours",
+    "d": "days",
+    "sem": "weeks",
+}
+
+PADRAO_DURACAO = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(s|min|h|d|sem)\s*$")
+
+
+def interpretar_duracao(texto):
+    """Duração de $agoraMenos ("30min", "12h", "7d", "2sem")"""
+    combinacao = PADRAO_DURACAO.match(str(texto))
+    if not combinacao:
+        raise ValueError(f"Duração inválida em {OPERADOR_DATA_RELATIVA}: '{texto}' "
+                         f"(use um número seguido de {', '.join(UNIDADES_TEMPO)}, ex: 7d)")
+    return timedelta(**{UNIDADES_TEMPO[combinacao.group(2)]: float(combinacao.group(1))})
+
+
+def resolver_datas(valor, agora):
+    """Substitui cada {"$agoraMenos": duração} pela data correspondente (agora - duração)"""
+    if isinstance(valor, dict):
+        if set(valor) == {OPERADOR_DATA_RELATIVA}:
+            try:
+                return agora - interpretar_duracao(valor[OPERADOR_DATA_RELATIVA])
+            except OverflowError:
+                raise ValueError(f"Duração muito longa em {OPERADOR_DATA_RELATIVA}: '{valor[OPERADOR_DATA_RELATIVA]}'")
+        return {chave: resolver_datas(item, agora) for chave, item in valor.items()}
+    if isinstance(valor, list):
+        return [resolver_datas(item, agora) for item in valor]
+    return valor
+
+
+def carregar_filtros(filtros):
+    """
+    Valida os filtros do config.json
+
+    Cada chave é um padrão banco.colecao (um nome sem ponto vale para o banco inteiro) e
+    cada valor tem "consulta" e/ou "projecao", em Extended JSON (ex: {"$date": ...}).
+
+    Returns:
+        Dicionário {padrão: {"consulta": dict ou None, "projecao": dict ou None}}
+
+    Raises:
+        ValueError: Configuração inválida
+    """
+    normalizados = {}
+    for padrao, filtro in (filtros or {}).items():
+        separar_padroes([padrao])
+        if not isinstance(filtro, dict) or not filtro:
+            raise ValueError(f"Filtro de '{padrao}' deve ter 'consulta' e/ou 'projecao'")
+        desconhecidas = set(filtro) - set(CHAVES_FILTRO)
+        if desconhecidas:
+            raise ValueError(f"Chave(s) desconhecida(s) no filtro de '{padrao}': {', '.join(sorted(desconhecidas))}. "
+                             f"Opções: {', '.join(CHAVES_FILTRO)}")
+        for chave in CHAVES_FILTRO:
+            if filtro.get(chave) is not None and not isinstance(filtro[chave], dict):
+                raise ValueError(f"'{chave}' do filtro de '{padrao}' deve ser um objeto")
+        # Extended JSON -> tipos do BSON; as datas relativas são conferidas agora e
+        # resolvidas a cada execução (resolver_filtros)
+        normalizado = {chave: json_util.loads(json.dumps(filtro[chave])) if filtro.get(chave) else None
+                       for chave in CHAVES_FILTRO}
+        resolver_datas(normalizado, datetime.now(timezone.utc))
+        normalizados[padrao] = normalizado
+    return normalizados
+
+
+def resolver_filtros(filtros, agora):
+    """Filtros com as datas relativas calculadas a partir de 'agora' (início do backup)"""
+    return {padrao: resolver_datas(filtro, agora) for padrao, filtro in filtros.items()}
+
+
+def filtro_da_colecao(filtros, nome_banco, nome_colecao):
+    """
+    Filtro que vale para a coleção, ou None (coleção exportada inteira)
+
+    O nome exato tem prioridade; depois vale o primeiro padrão que a alcança, na ordem
+    do config.json.
+    """
+    exato = filtros.get(f"{nome_banco}.{nome_colecao}")
+    if exato is not None:
+        return exato
+    for padrao, filtro in filtros.items():
+        banco, colecao = separar_padroes([padrao])[0]
+        if corresponde(nome_banco, banco) and corresponde(nome_colecao, colecao):
+            return filtro
+    return None
+
+
+def banco_filtrado(filtros, nome_banco):
+    """True se algum filtro alcança coleções do banco"""
+    return any(corresponde(nome_banco, banco) for banco, _ in separar_padroes(filtros))
+
+
+def argumentos_mongodump(filtro):
+    """Opção --query do mongodump para a consulta do filtro (Extended JSON canônico)"""
+    if not filtro or not filtro["consulta"]:
+        return []
+    return ["--query", json_util.dumps(filtro["consulta"], json_options=json_util.CANONICAL_JSON_OPTIONS)]
+
+
+def descrever_filtro(filtro):
+    """Texto curto do filtro para o log e o catálogo"""
+    partes = []
+    for chave in CHAVES_FILTRO:
+        if filtro.get(chave):
+            partes.append(f"{chave} {json_util.dumps(filtro[chave], json_options=json_util.RELAXED_JSON_OPTIONS)}")
+    return "; ".join(partes)
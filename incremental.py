@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Backup incremental baseado no oplog
+Guarda o estado da base completa e captura apenas as entradas novas do oplog
+"""
+
+import os
+import json
+from datetime import datetime
+from bson.timestamp import Timestamp
+from pymongo import ReadPreference
+
+
+# Arquivo de estado gravado na pasta da base completa
+ARQUIVO_ESTADO = "incremental.json"
+
+# Subpasta (dentro da base) onde ficam os incrementos, um por execução
+PASTA_INCREMENTOS = "incrementos"
+
+# Nome do arquivo de oplog dentro de cada incremento (esperado pelo mongorestore --oplogReplay)
+ARQUIVO_OPLOG = "oplog.bson"
+
+# Subpasta (dentro de um backup completo) com o oplog do período da exportação, que
+# leva todos os bancos ao mesmo instante na restauração (snapshot consistente)
+PASTA_OPLOG_SNAPSHOT = ".oplog"
+
+# O oplog é sempre lido do mesmo membro em que o último ts é medido (o primário, se
+# disponível), mesmo com a leitura dos dados em um secundário
+LEITURA_OPLOG = ReadPreference.PRIMARY_PREFERRED
+
+# Depois deste tempo uma nova base completa é feita
+INTERVALO_BASE_HORAS_PADRAO = 24
+
+
+def ts_para_dict(ts):
+    """Converte um Timestamp BSON para um dicionário serializável em JSON"""
+    return {"t": ts.time, "i": ts.inc}
+
+
+def dict_para_ts(valor):
+    """Converte o dicionário gravado no estado de volta para Timestamp BSON"""
+    return Timestamp(valor["t"], valor["i"])
+
+
+def datetime_para_ts(momento):
+    """Converte um horário local (datetime sem fuso) para o Timestamp BSON equivalente"""
+    return Timestamp(int(momento.timestamp()), 0)
+
+
+def formatar_oplog_limit(ts):
+    """Formata um Timestamp para a opção --oplogLimit do mongorestore (<segundos>:<ordinal>)"""
+    return f"{ts.time}:{ts.inc}"
+
+
+def interpretar_data_hora(texto):
+    """
+    Interpreta o horário alvo de uma restauração pontual
+
+    Aceita "DD-MM-YYYY HH:MM[:SS]", "DD/MM/YYYY HH:MM[:SS]", o formato das
+    pastas de backup ("DD-MM-YYYY - HH-MM-SS") e ISO 8601. Lança ValueError se inválido.
+    """
+    texto = texto.strip()
+    formatos = (
+        "%d-%m-%Y %H:%M:%S", "%d-%m-%Y %H:%M",
+        "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M",
+        "%d-%m-%Y - %H-%M-%S",
+    )
+    for formato in formatos:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(texto)
+    except ValueError:
+        raise ValueError(f"Data/hora inválida: '{texto}'. Use DD-MM-YYYY HH:MM:SS") from None
+
+
+def _ts_oplog(client, direcao):
+    """Retorna o ts da primeira (1) ou última (-1) entrada do oplog, ou None sem oplog"""
+    try:
+        oplog = client.get_database("local", read_preference=LEITURA_OPLOG)["oplog.rs"]
+        entrada = oplog.find_one({}, sort=[("$natural", direcao)], projection={"ts": 1})
+    except Exception:
+        return None
+    return entrada["ts"] if entrada else None
+
+
+def ultimo_ts_oplog(client):
+    """Timestamp da entrada mais recente do oplog (None se o servidor não é replica set)"""
+    return _ts_oplog(client, -1)
+
+
+def primeiro_ts_oplog(client):
+    """Timestamp da entrada mais antiga ainda disponível no oplog"""
+    return _ts_oplog(client, 1)
+
+
+def ts_minimo_replica(client):
+    """Menor optime entre os membros com dados do replica set (None sem replSetGetStatus)"""
+    try:
+        status = client.admin.command("replSetGetStatus")
+    except Exception:
+        return None
+    optimes = [membro["optime"]["ts"] for membro in status.get("members", [])
+               if membro.get("health") == 1 and membro.get("stateStr") in ("PRIMARY", "SECONDARY")
+               and isinstance(membro.get("optime"), dict) and "ts" in membro["optime"]]
+    return min(optimes) if optimes else None
+
+
+def consulta_intervalo_oplog(inicio, fim):
+    """
+    Monta a consulta (Extended JSON) das entradas com inicio < ts <= fim
+
+    Usada no --query do mongodump sobre local.oplog.rs.
+    """
+    return json.dumps({
+        "ts": {
+            "$gt": {"$timestamp": ts_para_dict(inicio)},
+            "$lte": {"$timestamp": ts_para_dict(fim)}
+        }
+    })
+
+
+def ler_estado(pasta_base):
+    """Lê o estado incremental de uma base (None se a pasta não é uma base incremental)"""
+    caminho = os.path.join(pasta_base, ARQUIVO_ESTADO)
+    if not os.path.isfile(caminho):
+        return None
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def salvar_estado(pasta_base, estado):
+    """Grava o estado incremental de forma atômica (arquivo temporário + rename)"""
+    caminho = os.path.join(pasta_base, ARQUIVO_ESTADO)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, indent=4, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def criar_estado(ts_base):
+    """Estado inicial de uma nova base completa"""
+    return {
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "base_ts": ts_para_dict(ts_base),
+        "ultimo_ts": ts_para_dict(ts_base),
+        "incrementos": [],
+        "intervalos": {}
+    }
+
+
+def listar_bases_incrementais(backup_dir):
+    """Lista as bases incrementais de backup_dir como (pasta, estado), da mais antiga para a mais nova"""
+    if not os.path.isdir(backup_dir):
+        return []
+
+    bases = []
+    for nome in os.listdir(backup_dir):
+        pasta = os.path.join(backup_dir, nome)
+        estado = ler_estado(pasta) if os.path.isdir(pasta) else None
+        if estado:
+            bases.append((pasta, estado))
+    return sorted(bases, key=lambda base: base[1].get("criado_em", ""))
+
+
+def localizar_base_incremental(backup_dir):
+    """
+    Procura a base incremental mais recente em backup_dir
+
+    Returns:
+        Tupla (pasta_base, estado) ou None se não houver base
+    """
+    bases = listar_bases_incrementais(backup_dir)
+    return bases[-1] if bases else None
+
+
+def escolher_base_para_alvo(backup_dir, alvo):
+    """
+    Escolhe a base para restaurar o estado do horário alvo (datetime local)
+
+    É a base mais recente concluída até o alvo: uma base concluída depois dele
+    já contém alterações posteriores ao alvo e não pode ser usada.
+
+    Returns:
+        Tupla (pasta_base, estado) ou None se nenhuma base atende
+    """
+    candidatas = []
+    for pasta, estado in listar_bases_incrementais(backup_dir):
+        try:
+            concluida_em = datetime.fromisoformat(estado["criado_em"])
+        except (KeyError, ValueError):
+            continue
+        if concluida_em <= alvo:
+            candidatas.append((pasta, estado))
+    return candidatas[-1] if candidatas else None
+
+
+def incrementos_ate(pasta_base, alvo_ts):
+    """
+    Lista os incrementos necessários para chegar ao Timestamp alvo
+
+    Incrementos que começam depois do alvo são descartados; o último incremento
+    usado é cortado no alvo pelo --oplogLimit do mongorestore.
+    """
+    estado = ler_estado(pasta_base) or {}
+    intervalos = estado.get("intervalos", {})
+    necessarios = []
+    for caminho in listar_incrementos(pasta_base):
+        intervalo = intervalos.get(os.path.basename(caminho))
+        if intervalo and dict_para_ts(intervalo["inicio"]) >= alvo_ts:
+            break
+        necessarios.append(caminho)
+    return necessarios
+
+
+def listar_incrementos(pasta_base):
+    """Lista, em ordem de captura, as pastas de incremento de uma base"""
+    estado = ler_estado(pasta_base)
+    if not estado:
+        return []
+    pasta_incrementos = os.path.join(pasta_base, PASTA_INCREMENTOS)
+    return [os.path.join(pasta_incrementos, nome) for nome in estado.get("incrementos", [])
+            if os.path.isfile(os.path.join(pasta_incrementos, nome, ARQUIVO_OPLOG))]
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Índice das coleções dos backups em stream único (archive e deduplicado)
+Registra em que trechos do archive do mongodump (sem compressão) estão os dados de
+cada coleção. A restauração de algumas coleções monta um archive só com o prelúdio e
+esses trechos, lendo apenas os quadros comprimidos ou os blocos do repositório que os
+contêm, sem descomprimir nem percorrer o restante
+"""
+
+import json
+import os
+import re
+from bisect import bisect_right
+
+import bson
+from bson import json_util
+
+from compressao import ler_trechos
+from deduplicacao import TERMINADOR, iterar_registros, ler_bloco, ler_manifesto, resolver_repositorio
+
+
+# Sufixo do índice de cada banco, ao lado do archive ou do manifesto deduplicado
+SUFIXO_INDICE = ".indice.json"
+
+
+def nome_indice(nome_banco):
+    """Nome do índice de um banco (ex: vendas.indice.json)"""
+    return nome_banco + SUFIXO_INDICE
+
+
+def identificar_indice(nome_arquivo):
+    """Retorna o nome do banco se o arquivo for um índice, senão None"""
+    if nome_arquivo.endswith(SUFIXO_INDICE) and len(nome_arquivo) > len(SUFIXO_INDICE):
+        return nome_arquivo[:-len(SUFIXO_INDICE)]
+    return None
+
+
+def localizar_indice(pasta_backup, nome_banco):
+    """Índice do banco na pasta de backup, ou None (backups sem índice ou índice ilegível)"""
+    caminho = os.path.join(pasta_backup, nome_indice(nome_banco))
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class IndiceArchive:
+    """
+    Acompanha os registros de um archive do mongodump (ver deduplicacao.iterar_registros)
+
+    O archive tem o número mágico, o prelúdio (cabeçalho e metadados das coleções) até
+    o primeiro terminador e depois blocos de uma coleção cada: um cabeçalho
+    {db, collection, EOF, CRC}, os documentos e um terminador. Com várias coleções em
+    paralelo os blocos se intercalam, por isso cada coleção tem uma lista de trechos.
+    """
+
+    def __init__(self):
+        self.posicao = 0
+        self.cabecalho = None
+        self.colecoes = {}
+        self.quadros = None
+        self.valido = True
+        self._estado = "magico"
+        self._bloco = None
+
+    def registrar(self, registro):
+        inicio = self.posicao
+        self.posicao += len(registro)
+        if self._estado == "magico":
+            self._estado = "preludio"
+        elif self._estado == "preludio":
+            if registro == TERMINADOR:
+                self.cabecalho = self.posicao
+                self._estado = "cabecalho"
+        elif self._estado == "cabecalho":
+            try:
+                colecao = bson.decode(registro)["collection"]
+            except Exception:
+                # Formato inesperado: o backup fica sem índice (restauração completa)
+                self.valido = False
+                self._estado = "invalido"
+                return
+            self._bloco = (colecao, inicio)
+            self._estado = "dados"
+        elif self._estado == "dados" and registro == TERMINADOR:
+            colecao, inicio_bloco = self._bloco
+            self.colecoes.setdefault(colecao, []).append([inicio_bloco, self.posicao - inicio_bloco])
+            self._estado = "cabecalho"
+
+    def gravar(self, pasta_backup, nome_banco):
+        """
+        Grava pasta_backup/<banco>.indice.json de forma atômica
+
+        Returns:
+            True se o índice foi gravado (archive completo e no formato esperado)
+        """
+        if not self.valido or self.cabecalho is None or self._estado != "cabecalho":
+            return False
+        indice = {
+            "versao": 1,
+            "banco": nome_banco,
+            "tamanho": self.posicao,
+            "cabecalho": self.cabecalho,
+            "quadros": self.quadros,
+            "colecoes": self.colecoes
+        }
+        caminho = os.path.join(pasta_backup, nome_indice(nome_banco))
+        temporario = caminho + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(indice, f)
+        os.replace(temporario, caminho)
+        return True
+
+
+def metadados_do_preludio(origem):
+    """
+    Metadados de cada coleção ({options, indexes, type...}, como no .metadata.json) de um archive
+
+    Lê só o prelúdio (até o primeiro terminador), sem percorrer os dados.
+    """
+    metadados = {}
+    registros = iterar_registros(origem)
+    # Número mágico e cabeçalho do archive
+    next(registros, None)
+    next(registros, None)
+    for registro in registros:
+        if registro == TERMINADOR:
+            break
+        documento = bson.decode(registro)
+        if documento.get("metadata"):
+            metadados[documento["collection"]] = json_util.loads(documento["metadata"])
+    return metadados
+
+
+def corresponde(nome, padrao):
+    """Nome atende ao padrão (como no --nsInclude do mongorestore, só * é curinga)"""
+    return re.fullmatch(".*".join(re.escape(parte) for parte in padrao.split("*")), nome, re.DOTALL) is not None
+
+
+def separar_padroes(padroes):
+    """
+    Padrões do --nsInclude ("banco.colecao", "banco.*", "vendas_*.log_*") por banco
+
+    Um padrão sem ponto vale para o banco inteiro ("vendas" = "vendas.*").
+
+    Returns:
+        Lista de (padrão do banco, padrão da coleção); o nome do banco não tem ponto
+    """
+    separados = []
+    for padrao in padroes:
+        banco, ponto, colecao = padrao.partition(".")
+        if not banco or (ponto and not colecao):
+            raise ValueError(f"Padrão inválido: '{padrao}' (use banco.colecao, com * para vários)")
+        separados.append((banco, colecao if ponto else "*"))
+    return separados
+
+
+def bancos_selecionados(bancos, padroes):
+    """Bancos do backup alcançados por algum padrão"""
+    separados = separar_padroes(padroes)
+    return [banco for banco in bancos if any(corresponde(banco, padrao) for padrao, _ in separados)]
+
+
+def colecoes_selecionadas(nome_banco, colecoes, padroes):
+    """Coleções do banco alcançadas por algum padrão"""
+    separados = [colecao for banco, colecao in separar_padroes(padroes) if corresponde(nome_banco, banco)]
+    return [colecao for colecao in colecoes if any(corresponde(colecao, padrao) for padrao in separados)]
+
+
+def trechos_das_colecoes(indice, colecoes):
+    """
+    Trechos do archive que restauram as coleções: o prelúdio e os blocos delas, em ordem
+
+    Blocos sem nome de coleção (do banco como um todo) são sempre incluídos.
+    """
+    trechos = [[0, indice["cabecalho"]]]
+    for colecao, blocos in indice["colecoes"].items():
+        if colecao in colecoes or not colecao:
+            trechos.extend(blocos)
+    return sorted(trechos)
+
+
+def _inicios_dos_blocos(manifesto):
+    """Posição de cada bloco do manifesto no stream reconstruído"""
+    inicios = []
+    posicao = 0
+    for _, tamanho in manifesto["blocos"]:
+        inicios.append(posicao)
+        posicao += tamanho
+    return inicios
+
+
+def blocos_das_colecoes(indice, colecoes, caminho_manifesto):
+    """Hashes dos blocos do repositório que ler_trechos_dedup lê para restaurar as coleções"""
+    manifesto = ler_manifesto(caminho_manifesto)
+    inicios = _inicios_dos_blocos(manifesto)
+    blocos = set()
+    for inicio, tamanho in trechos_das_colecoes(indice, set(colecoes)):
+        primeiro = max(0, bisect_right(inicios, inicio) - 1)
+        ultimo = bisect_right(inicios, inicio + tamanho - 1)
+        blocos.update(hash_hex for hash_hex, _ in manifesto["blocos"][primeiro:ultimo])
+    return blocos
+
+
+def ler_trechos_dedup(caminho_manifesto, trechos):
+    """Gera os bytes dos trechos do stream de um manifesto, lendo só os blocos que os contêm"""
+    manifesto = ler_manifesto(caminho_manifesto)
+    repositorio = resolver_repositorio(caminho_manifesto, manifesto)
+    inicios = _inicios_dos_blocos(manifesto)
+
+    atual = (None, None)
+    for inicio, tamanho in trechos:
+        posicao = inicio
+        while posicao < inicio + tamanho:
+            i = bisect_right(inicios, posicao) - 1
+            if i < 0 or i >= len(inicios):
+                raise ValueError(f"Índice inconsistente com o manifesto: {caminho_manifesto}")
+            if atual[0] != i:
+                atual = (i, ler_bloco(repositorio, manifesto["blocos"][i][0]))
+            dados = atual[1][posicao - inicios[i]:inicio + tamanho - inicios[i]]
+            if not dados:
+                raise ValueError(f"Índice inconsistente com o manifesto: {caminho_manifesto}")
+            posicao += len(dados)
+            yield dados
+
+
+class LeitorTrechos:
+    """Objeto de arquivo (somente leitura) sobre um gerador de bytes (ex: ler_trechos)"""
+
+    def __init__(self, partes):
+        self._partes = iter(partes)
+        self._atual = memoryview(b"")
+
+    def read(self, tamanho=-1):
+        if tamanho is None or tamanho < 0:
+            return bytes(self._atual) + b"".join(self._partes)
+        while not self._atual:
+            proxima = next(self._partes, None)
+            if proxima is None:
+                return b""
+            self._atual = memoryview(proxima)
+        dados = bytes(self._atual[:tamanho])
+        self._atual = self._atual[tamanho:]
+        return dados
+
+
+def abrir_colecoes(indice, colecoes, archive=None, manifesto=None):
+    """
+    Archive só com as coleções informadas, para o stdin do mongorestore
+
+    Args:
+        indice: Índice do banco (localizar_indice)
+        archive: Tupla (caminho, codec) de compressao.localizar_archive
+        manifesto: Caminho do manifesto deduplicado
+
+    Returns:
+        Tupla (LeitorTrechos, bytes do archive sem compressão que serão lidos) ou None
+        se o índice não serve para o arquivo
+    """
+    trechos = trechos_das_colecoes(indice, set(colecoes))
+    if archive is not None:
+        if not indice.get("quadros"):
+            return None
+        partes = ler_trechos(archive[0], archive[1], indice["quadros"], trechos)
+    else:
+        partes = ler_trechos_dedup(manifesto, trechos)
+    return LeitorTrechos(partes), sum(tamanho for _, tamanho in trechos)
+
+
+def filtros_namespace(nome_banco, padroes=None):
+    """Opções --nsInclude do mongorestore para o banco (todas as coleções sem padrões)"""
+    if not padroes:
+        return [f"--nsInclude={nome_banco}.*"]
+    return [f"--nsInclude={nome_banco}.{colecao}"
+            for banco, colecao in separar_padroes(padroes) if corresponde(nome_banco, banco)]
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Limitação de carga do backup
+Limita a vazão de leitura (dados vindos do MongoDB) e de escrita (bytes gravados no
+disco), reduz a prioridade de CPU e de I/O dos processos mongodump e diminui a vazão
+de leitura enquanto o servidor mostra sinais de sobrecarga (latência das leituras e
+fila de operações do serverStatus)
+"""
+
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+from pymongo.errors import PyMongoError
+
+
+# Chaves de "limitacao" no config.json (None = sem limite)
+CHAVES_LIMITACAO = ("leitura_mb_s", "escrita_mb_s", "prioridade_cpu", "prioridade_io",
+                    "latencia_alvo_ms", "fila_alvo")
+
+# prioridade_io -> argumentos do ionice (Linux). No Windows a prioridade de I/O acompanha
+# a classe de prioridade do processo
+CLASSES_IO = {
+    "baixa": ["-c", "2", "-n", "7"],
+    "ocioso": ["-c", "3"],
+}
+
+# Segundos entre as leituras do serverStatus
+INTERVALO_MONITOR = 5
+
+# A redução adaptativa divide a vazão por 2 a cada leitura com sobrecarga, até este
+# fator, e devolve PASSO_RECUPERACAO a cada leitura normal
+FATOR_MINIMO = 0.1
+PASSO_RECUPERACAO = 0.1
+
+# Volume (em segundos de vazão) que pode passar de uma vez depois de uma pausa
+RAJADA_SEGUNDOS = 1.0
+
+# Janela usada para medir a vazão atual (referência da redução sem limite fixo)
+JANELA_VAZAO = 5.0
+
+
+def normalizar_limitacao(limitacao):
+    """
+    Limitação com todas as chaves (ausentes = None)
+
+    Raises:
+        ValueError: Valor inválido
+    """
+    limitacao = dict(limitacao or {})
+    desconhecidas = set(limitacao) - set(CHAVES_LIMITACAO)
+    if desconhecidas:
+        raise ValueError(f"Chave(s) de limitação desconhecida(s): {', '.join(sorted(desconhecidas))}. "
+                         f"Opções: {', '.join(CHAVES_LIMITACAO)}")
+    normalizada = {chave: limitacao.get(chave) or None for chave in CHAVES_LIMITACAO}
+    for chave in ("leitura_mb_s", "escrita_mb_s", "latencia_alvo_ms", "fila_alvo"):
+        if normalizada[chave] is not None and not float(normalizada[chave]) > 0:
+            raise ValueError(f"'{chave}' deve ser maior que zero")
+    if normalizada["prioridade_cpu"] is not None and not 1 <= int(normalizada["prioridade_cpu"]) <= 19:
+        raise ValueError("'prioridade_cpu' deve estar entre 1 e 19 (valor do nice)")
+    if normalizada["prioridade_io"] is not None and normalizada["prioridade_io"] not in CLASSES_IO:
+        raise ValueError(f"'prioridade_io' inválida: '{normalizada['prioridade_io']}'. "
+                         f"Opções: {', '.join(CLASSES_IO)}")
+    return normalizada
+
+
+def mesclar_limitacao(base, especifica):
+    """Limitação geral com as chaves de um agendamento sobrepostas (ex: "intervalo")"""
+    mesclada = dict(base or {})
+    mesclada.update(especifica or {})
+    return mesclada
+
+
+class LimitadorVazao:
+    """
+    Limite de bytes por segundo compartilhado por todas as threads (thread-safe)
+
+    Cada consumo reserva sua vez em uma linha do tempo virtual e espera até ela; sem
+    limite, apenas mede a vazão. O fator (1.0 = sem redução) é ajustado pelo monitor
+    do servidor; sem limite fixo, a redução parte da vazão medida quando ela começou.
+    """
+
+    def __init__(self, bytes_por_segundo=None):
+        self.taxa = bytes_por_segundo
+        self.fator = 1.0
+        self._referencia = None
+        self._liberado_em = time.monotonic()
+        self._janela = deque()
+        self._trava = threading.Lock()
+
+    def vazao_recente(self):
+        """Bytes por segundo nos últimos JANELA_VAZAO segundos"""
+        with self._trava:
+            return sum(quantidade for _, quantidade in self._janela) / JANELA_VAZAO
+
+    def taxa_efetiva(self):
+        base = self.taxa or self._referencia
+        return base * self.fator if base else None
+
+    def ajustar(self, fator):
+        """Define o fator de redução (1.0 = vazão configurada)"""
+        referencia = self.vazao_recente() if self.taxa is None and fator < 1 and self._referencia is None else None
+        with self._trava:
+            self.fator = fator
+            if fator >= 1:
+                self._referencia = None
+            elif referencia:
+                self._referencia = referencia
+
+    def consumir(self, quantidade):
+        """Registra quantidade bytes transferidos, esperando o necessário para respeitar a taxa"""
+        with self._trava:
+            agora = time.monotonic()
+            self._janela.append((agora, quantidade))
+            while self._janela and self._janela[0][0] < agora - JANELA_VAZAO:
+                self._janela.popleft()
+            taxa = self.taxa_efetiva()
+            if taxa is None:
+                return
+            self._liberado_em = max(self._liberado_em, agora - RAJADA_SEGUNDOS) + quantidade / taxa
+            espera = self._liberado_em - agora
+        if espera > 0:
+            time.sleep(espera)
+
+
+class MonitorServidor:
+    """
+    Lê o serverStatus periodicamente e ajusta o fator do limitador de leitura
+
+    Sobrecarga: latência média das leituras no intervalo acima de latencia_alvo_ms ou
+    fila de operações (globalLock.currentQueue) acima de fila_alvo. A redução é
+    multiplicativa e a recuperação, gradual.
+    """
+
+    def __init__(self, client, limitador, latencia_alvo_ms=None, fila_alvo=None, log=print):
+        self.client = client
+        self.limitador = limitador
+        self.latencia_alvo_ms = latencia_alvo_ms
+        self.fila_alvo = fila_alvo
+        self.log = log
+        self._parar = threading.Event()
+        self._thread = None
+        self._anterior = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.executar, name="monitor-servidor", daemon=True)
+        self._thread.start()
+
+    def encerrar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.limitador.ajustar(1.0)
+
+    def medir(self):
+        """Tupla (latência média das leituras no intervalo em ms ou None, fila de operações)"""
+        status = self.client.admin.command("serverStatus")
+        leituras = status.get("opLatencies", {}).get("reads", {})
+        atual = (leituras.get("latency", 0), leituras.get("ops", 0))
+        latencia = None
+        if self._anterior is not None and atual[1] > self._anterior[1]:
+            # latency é cumulativa, em microssegundos
+            latencia = (atual[0] - self._anterior[0]) / (atual[1] - self._anterior[1]) / 1000
+        self._anterior = atual
+        return latencia, status.get("globalLock", {}).get("currentQueue", {}).get("total", 0)
+
+    def executar(self):
+        while not self._parar.wait(INTERVALO_MONITOR):
+            try:
+                latencia, fila = self.medir()
+            except PyMongoError as e:
+                self.log(f"⚠ serverStatus indisponível ({e}); redução adaptativa desativada.")
+                self.limitador.ajustar(1.0)
+                return
+            sobrecarga = ((self.latencia_alvo_ms and latencia is not None and latencia > self.latencia_alvo_ms)
+                          or (self.fila_alvo and fila > self.fila_alvo))
+            fator = self.limitador.fator
+            if sobrecarga:
+                novo = max(FATOR_MINIMO, fator / 2)
+                if novo < fator:
+                    medida = f"{latencia:.1f} ms" if latencia is not None else "-"
+                    self.log(f"⚠ Servidor sobrecarregado (latência de leitura {medida}, fila {fila}): "
+                             f"vazão de leitura reduzida para {novo:.0%}")
+            else:
+                novo = min(1.0, fator + PASSO_RECUPERACAO)
+                if novo >= 1 > fator:
+                    self.log("✓ Carga do servidor normalizada: vazão de leitura restabelecida")
+            self.limitador.ajustar(novo)
+
+
+class LimitacaoBackup:
+    """Limites de uma execução: vazão de leitura/escrita, prioridade dos processos e monitor"""
+
+    def __init__(self, limitacao=None, log=print):
+        self.config = normalizar_limitacao(limitacao)
+        self.log = log
+        mb = 1024 * 1024
+        self.leitura = LimitadorVazao(self.config["leitura_mb_s"] and float(self.config["leitura_mb_s"]) * mb)
+        self.escrita = LimitadorVazao(self.config["escrita_mb_s"] and float(self.config["escrita_mb_s"]) * mb)
+        self.monitor = None
+
+    @property
+    def adaptativa(self):
+        return bool(self.config["latencia_alvo_ms"] or self.config["fila_alvo"])
+
+    @property
+    def limita_vazao(self):
+        """True se há limite de MB/s ou redução adaptativa"""
+        return bool(self.config["leitura_mb_s"] or self.config["escrita_mb_s"] or self.adaptativa)
+
+    def descrever(self):
+        partes = []
+        if self.config["leitura_mb_s"]:
+            partes.append(f"leitura {self.config['leitura_mb_s']} MB/s")
+        if self.config["escrita_mb_s"]:
+            partes.append(f"escrita {self.config['escrita_mb_s']} MB/s")
+        if self.config["prioridade_cpu"]:
+            partes.append(f"nice {self.config['prioridade_cpu']}")
+        if self.config["prioridade_io"]:
+            partes.append(f"I/O {self.config['prioridade_io']}")
+        if self.config["latencia_alvo_ms"]:
+            partes.append(f"latência alvo {self.config['latencia_alvo_ms']} ms")
+        if self.config["fila_alvo"]:
+            partes.append(f"fila alvo {self.config['fila_alvo']}")
+        return ", ".join(partes)
+
+    def iniciar(self, client):
+        """Inicia o monitor do servidor (se houver alvo de latência ou fila)"""
+        if self.adaptativa and self.monitor is None:
+            self.monitor = MonitorServidor(client, self.leitura, self.config["latencia_alvo_ms"],
+                                           self.config["fila_alvo"], self.log)
+            self.monitor.iniciar()
+
+    def encerrar(self):
+        if self.monitor is not None:
+            self.monitor.encerrar()
+            self.monitor = None
+
+    def preparar_comando(self, comando):
+        """
+        Comando e opções do Popen com a prioridade configurada
+
+        No Linux/macOS o comando é prefixado com nice e ionice (se instalado); no
+        Windows a classe de prioridade vai em creationflags (a prioridade de I/O do
+        Windows acompanha a classe "ociosa").
+
+        Returns:
+            Tupla (comando, opções do Popen)
+        """
+        prioridade_cpu = self.config["prioridade_cpu"]
+        prioridade_io = self.config["prioridade_io"]
+        if sys.platform == "win32":
+            if prioridade_io == "ocioso" or (prioridade_cpu and int(prioridade_cpu) >= 15):
+                return comando, {"creationflags": subprocess.IDLE_PRIORITY_CLASS}
+            if prioridade_cpu or prioridade_io:
+                return comando, {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+            return comando, {}
+
+        prefixo = []
+        if prioridade_io and shutil.which("ionice"):
+            prefixo += ["ionice"] + CLASSES_IO[prioridade_io]
+        if prioridade_cpu:
+            prefixo += ["nice", "-n", str(int(prioridade_cpu))]
+        return prefixo + list(comando), {}
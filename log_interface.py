@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Log da interface gráfica
+As threads de trabalho apenas enfileiram as mensagens; a thread principal do Tk as
+insere no widget em lotes. O widget guarda só as últimas linhas e o log completo
+vai para um arquivo com rotação
+"""
+
+import logging
+import os
+import queue
+import tkinter as tk
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+
+# Linhas mantidas no widget (as mais antigas são descartadas)
+MAX_LINHAS_WIDGET = 5000
+
+# Linhas de uma única mensagem exibidas no widget (ex: stderr longo do mongodump)
+MAX_LINHAS_MENSAGEM = 20
+
+# Linhas inseridas no widget por ciclo da thread principal
+LOTE_LINHAS = 500
+
+# Arquivo de log completo: pasta, tamanho máximo e quantidade de arquivos antigos mantidos
+PASTA_LOGS = "logs"
+ARQUIVO_LOG = "backup_gui.log"
+TAMANHO_MAXIMO_LOG = 5 * 1024 * 1024
+ARQUIVOS_LOG_ANTIGOS = 5
+
+
+def criar_logger_arquivo(base_dir):
+    """Logger que grava o log completo da interface em base_dir/logs, com rotação"""
+    logger = logging.getLogger("backup_mongodb_gui")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        try:
+            pasta = os.path.join(base_dir, PASTA_LOGS)
+            os.makedirs(pasta, exist_ok=True)
+            handler = RotatingFileHandler(os.path.join(pasta, ARQUIVO_LOG), maxBytes=TAMANHO_MAXIMO_LOG,
+                                          backupCount=ARQUIVOS_LOG_ANTIGOS, encoding="utf-8")
+        except OSError:
+            # Sem permissão de escrita: o log continua apenas na interface
+            handler = logging.NullHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+class FilaLog:
+    """
+    Saída de log de um ScrolledText, segura para chamadas de qualquer thread
+
+    escrever() pode ser chamada de qualquer thread; drenar() e limpar() só da
+    thread principal do Tk (drenar é chamada periodicamente por root.after).
+    """
+
+    def __init__(self, widget, canal, logger=None, max_linhas=MAX_LINHAS_WIDGET):
+        self.widget = widget
+        self.canal = canal
+        self.logger = logger
+        self.max_linhas = max_linhas
+        self.fila = queue.Queue()
+        self.linhas_widget = 0
+
+    def escrever(self, mensagem):
+        """Enfileira uma mensagem (qualquer thread) e a grava no arquivo de log"""
+        mensagem = str(mensagem)
+        if self.logger is not None:
+            self.logger.info(f"[{self.canal}] {mensagem}")
+
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        linhas = f"[{timestamp}] {mensagem}".split("\n")
+        if len(linhas) > MAX_LINHAS_MENSAGEM:
+            omitidas = len(linhas) - MAX_LINHAS_MENSAGEM
+            linhas = linhas[:MAX_LINHAS_MENSAGEM] + [f"    ... ({omitidas} linha(s) omitida(s), veja o arquivo de log)"]
+        self.fila.put(linhas)
+
+    def drenar(self):
+        """Insere no widget as mensagens enfileiradas (thread principal)"""
+        linhas = []
+        try:
+            while len(linhas) < LOTE_LINHAS:
+                linhas.extend(self.fila.get_nowait())
+        except queue.Empty:
+            pass
+        if not linhas:
+            return
+
+        self.widget.insert(tk.END, "\n".join(linhas) + "\n")
+        self.linhas_widget += len(linhas)
+        excesso = self.linhas_widget - self.max_linhas
+        if excesso > 0:
+            self.widget.delete("1.0", f"{excesso + 1}.0")
+            self.linhas_widget -= excesso
+        self.widget.see(tk.END)
+
+    def limpar(self):
+        """Limpa o widget (thread principal)"""
+        self.widget.delete(1.0, tk.END)
+        self.linhas_widget = 0
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Métricas das execuções de backup
+Tempo de cada fase (conexão, listagem, exportação, fsync...), bytes, documentos/s, tempo
+de CPU (das threads do backup e dos mongodump) e tentativas, por execução, banco e
+coleção. São gravadas como linhas JSON em
+backup_dir/metricas.jsonl e, se configurado, no formato textfile do Prometheus (lido pelo
+coletor textfile do node_exporter)
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from ferramentas import cpu_filhos_thread
+
+
+# Linhas JSON acumuladas em backup_dir (uma por execução, banco e coleção)
+ARQUIVO_METRICAS = "metricas.jsonl"
+
+# Prefixo das métricas do Prometheus; o arquivo é <pasta>/mongodb_backup_[<origem>_]<tipo>.prom
+PREFIXO_PROMETHEUS = "mongodb_backup"
+
+
+def _taxa(quantidade, segundos):
+    return round(quantidade / segundos, 1) if quantidade and segundos else None
+
+
+class MetricasExecucao:
+    """
+    Coleta das métricas de uma execução (thread-safe)
+
+    fase() mede as fases da execução; medir_banco() e medir_colecao() as de cada banco
+    e coleção. Nos formatos de stream único, o tempo de cada coleção vem dos eventos do
+    stderr do mongodump (do primeiro evento até "done dumping").
+
+    O CPU é medido por thread dentro desses blocos: o da própria thread (time.thread_time)
+    e o dos mongodump que ela esperou (ferramentas.aguardar_processo). Os tempos do processo
+    inteiro (os.times) misturariam as origens simultâneas e os bancos em paralelo.
+    """
+
+    def __init__(self, tipo):
+        self.tipo = tipo
+        self.inicio = datetime.now()
+        self.fases = {}
+        self.bancos = {}
+        self.colecoes = {}
+        self.eventos = {}
+        self.cpu = {"backup": 0.0, "ferramentas": 0.0 if cpu_filhos_thread() is not None else None}
+        self.cpu_bancos = {}
+        self._relogio = time.perf_counter()
+        self._thread = threading.local()
+        self._trava = threading.Lock()
+
+    @contextmanager
+    def _medir_cpu(self, nome_banco=None):
+        """
+        Soma o CPU da thread no bloco à execução (e ao banco)
+
+        Cada thread guarda a pilha dos blocos abertos: a execução só recebe o CPU do bloco
+        mais externo, e o banco o do mais externo daquele banco. Assim um banco medido
+        dentro de uma fase (ex: finalizar_banco_colecoes) recebe o seu CPU, e nada é
+        somado duas vezes.
+        """
+        pilha = getattr(self._thread, "pilha", None)
+        if pilha is None:
+            pilha = self._thread.pilha = []
+        conta_execucao = not pilha
+        conta_banco = nome_banco is not None and nome_banco not in pilha
+        pilha.append(nome_banco)
+        backup = time.thread_time()
+        ferramentas = cpu_filhos_thread()
+        try:
+            yield
+        finally:
+            pilha.pop()
+            gasto = {"backup": time.thread_time() - backup}
+            if ferramentas is not None:
+                gasto["ferramentas"] = cpu_filhos_thread() - ferramentas
+            with self._trava:
+                for nome, segundos in gasto.items():
+                    if conta_execucao:
+                        self.cpu[nome] += segundos
+                    if conta_banco:
+                        cpu_banco = self.cpu_bancos.setdefault(nome_banco, {})
+                        cpu_banco[nome] = cpu_banco.get(nome, 0.0) + segundos
+
+    @contextmanager
+    def fase(self, nome):
+        """Soma a duração do bloco à fase da execução"""
+        inicio = time.perf_counter()
+        try:
+            with self._medir_cpu():
+                yield
+        finally:
+            with self._trava:
+                self.fases[nome] = self.fases.get(nome, 0.0) + time.perf_counter() - inicio
+
+    @contextmanager
+    def medir_banco(self, nome_banco, fase):
+        """Soma a duração do bloco à fase do banco (exportacao, checksum, fsync...)"""
+        inicio = time.perf_counter()
+        try:
+            with self._medir_cpu(nome_banco):
+                yield
+        finally:
+            with self._trava:
+                fases = self.bancos.setdefault(nome_banco, {})
+                fases[fase] = fases.get(fase, 0.0) + time.perf_counter() - inicio
+
+    @contextmanager
+    def medir_colecao(self, nome_banco, nome_colecao):
+        """Mede a exportação de uma coleção (formato "pasta"); o CPU é somado ao do banco"""
+        inicio = time.perf_counter()
+        try:
+            with self._medir_cpu(nome_banco):
+                yield
+        finally:
+            with self._trava:
+                self.colecoes[(nome_banco, nome_colecao)] = time.perf_counter() - inicio
+
+    def registrar_evento(self, evento):
+        """Evento do stderr do mongodump (ver ferramentas.interpretar_linha)"""
+        if "." not in evento["colecao"]:
+            return
+        chave = tuple(evento["colecao"].split(".", 1))
+        agora = time.perf_counter()
+        with self._trava:
+            inicio, _ = self.eventos.get(chave, (agora, None))
+            self.eventos[chave] = (inicio, agora if evento["concluido"] else None)
+
+    def duracao_colecao(self, nome_banco, nome_colecao):
+        """Duração medida da coleção (direta ou pelos eventos), ou None"""
+        with self._trava:
+            chave = (nome_banco, nome_colecao)
+            if chave in self.colecoes:
+                return self.colecoes[chave]
+            inicio, fim = self.eventos.get(chave, (None, None))
+            return fim - inicio if fim is not None else None
+
+    def fases_banco(self, nome_banco):
+        with self._trava:
+            return {fase: round(segundos, 3) for fase, segundos in self.bancos.get(nome_banco, {}).items()}
+
+    def tempo_cpu(self, nome_banco=None):
+        """
+        Segundos de CPU (backup, ferramentas) da execução ou do banco
+
+        backup é o das threads da execução; ferramentas, o dos mongodump que elas
+        esperaram (None no Windows, sem os.wait4).
+        """
+        with self._trava:
+            cpu = dict(self.cpu if nome_banco is None else self.cpu_bancos.get(nome_banco, {}))
+        return tuple(round(cpu[nome], 3) if cpu.get(nome) is not None else None
+                     for nome in ("backup", "ferramentas"))
+
+    def registros(self, nome_execucao, sucesso, bancos):
+        """
+        Linhas da execução, dos bancos e das coleções
+
+        Args:
+            nome_execucao: Pasta da execução relativa a backup_dir
+            sucesso: Resultado da execução
+            bancos: Registros de MongoDBBackup.resultados (com as coleções)
+        """
+        segundos = time.perf_counter() - self._relogio
+        cpu_backup, cpu_ferramentas = self.tempo_cpu()
+        momento = self.inicio.isoformat(timespec="seconds")
+        documentos = sum(banco.get("documentos") or 0 for banco in bancos)
+        linhas = [{
+            "registro": "execucao",
+            "execucao": nome_execucao,
+            "tipo": self.tipo,
+            "inicio": momento,
+            "status": "ok" if sucesso else "falha",
+            "segundos": round(segundos, 3),
+            "fases": {fase: round(valor, 3) for fase, valor in self.fases.items()},
+            "cpu_backup": cpu_backup,
+            "cpu_ferramentas": cpu_ferramentas,
+            "bytes": sum(banco.get("bytes") or 0 for banco in bancos),
+            "documentos": documentos,
+            "documentos_s": _taxa(documentos, segundos),
+            "bancos_ok": sum(1 for banco in bancos if banco["status"] == "ok"),
+            "bancos_falha": sum(1 for banco in bancos if banco["status"] != "ok")
+        }]
+        for banco in bancos:
+            duracao = banco.get("duracao")
+            cpu_backup, cpu_ferramentas = self.tempo_cpu(banco["nome"])
+            linhas.append({
+                "registro": "banco",
+                "execucao": nome_execucao,
+                "inicio": momento,
+                "banco": banco["nome"],
+                "status": banco["status"],
+                "segundos": round(duracao, 3) if duracao is not None else None,
+                "fases": banco.get("fases") or self.fases_banco(banco["nome"]),
+                "bytes": banco.get("bytes"),
+                "documentos": banco.get("documentos"),
+                "documentos_s": _taxa(banco.get("documentos"), duracao),
+                "cpu_backup": cpu_backup,
+                "cpu_ferramentas": cpu_ferramentas,
+                "tentativas": banco.get("tentativas", 1)
+            })
+            for colecao in banco.get("colecoes", []):
+                duracao = colecao.get("duracao")
+                linhas.append({
+                    "registro": "colecao",
+                    "execucao": nome_execucao,
+                    "inicio": momento,
+                    "banco": banco["nome"],
+                    "colecao": colecao["nome"],
+                    "segundos": round(duracao, 3) if duracao is not None else None,
+                    "bytes_origem": colecao.get("bytes"),
+                    "documentos": colecao.get("documentos"),
+                    "documentos_s": _taxa(colecao.get("documentos"), duracao)
+                })
+        return linhas
+
+
+def gravar_jsonl(backup_dir, linhas):
+    """Acrescenta as linhas a backup_dir/metricas.jsonl"""
+    with open(os.path.join(backup_dir, ARQUIVO_METRICAS), 'a', encoding='utf-8') as f:
+        for linha in linhas:
+            f.write(json.dumps(linha, ensure_ascii=False) + "\n")
+
+
+def _rotulos(**rotulos):
+    texto = ",".join('{}="{}"'.format(nome, str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                     for nome, valor in rotulos.items())
+    return "{" + texto + "}"
+
+
+def texto_prometheus(linhas, origem=None):
+    """Métricas no formato de exposição do Prometheus (textfile do node_exporter)"""
+    execucao = linhas[0]
+    comuns = {"tipo": execucao["tipo"]}
+    if origem:
+        comuns["origem"] = origem
+    series = {}
+
+    def serie(nome, ajuda, valor, **rotulos):
+        if valor is None:
+            return
+        series.setdefault(nome, (ajuda, []))[1].append(f"{PREFIXO_PROMETHEUS}_{nome}{_rotulos(**comuns, **rotulos)} {valor}")
+
+    serie("inicio_timestamp_segundos", "Início da última execução (epoch)",
+          datetime.fromisoformat(execucao["inicio"]).timestamp())
+    serie("sucesso", "1 se a última execução terminou sem falhas", 1 if execucao["status"] == "ok" else 0)
+    serie("duracao_segundos", "Duração da última execução", execucao["segundos"])
+    serie("bytes", "Bytes gravados na última execução", execucao["bytes"])
+    serie("documentos", "Documentos exportados na última execução", execucao["documentos"])
+    serie("cpu_segundos", "Tempo de CPU da última execução (threads do backup e mongodump)",
+          execucao["cpu_backup"], processo="backup")
+    serie("cpu_segundos", "Tempo de CPU da última execução (threads do backup e mongodump)",
+          execucao["cpu_ferramentas"], processo="ferramentas")
+    for fase, segundos in execucao["fases"].items():
+        serie("fase_segundos", "Duração de cada fase da última execução", segundos, fase=fase)
+
+    for linha in linhas[1:]:
+        if linha["registro"] == "banco":
+            serie("banco_sucesso", "1 se o banco foi exportado", 1 if linha["status"] == "ok" else 0, banco=linha["banco"])
+            serie("banco_duracao_segundos", "Duração da exportação do banco", linha["segundos"], banco=linha["banco"])
+            serie("banco_bytes", "Bytes gravados do banco", linha["bytes"], banco=linha["banco"])
+            serie("banco_documentos", "Documentos do banco", linha["documentos"], banco=linha["banco"])
+            serie("banco_cpu_segundos", "Tempo de CPU do banco (threads do backup e mongodump)",
+                  linha["cpu_backup"], banco=linha["banco"], processo="backup")
+            serie("banco_cpu_segundos", "Tempo de CPU do banco (threads do backup e mongodump)",
+                  linha["cpu_ferramentas"], banco=linha["banco"], processo="ferramentas")
+            serie("banco_tentativas", "Execuções que tentaram exportar o banco (retomadas)",
+                  linha["tentativas"], banco=linha["banco"])
+            for fase, segundos in linha["fases"].items():
+                serie("banco_fase_segundos", "Duração de cada fase do banco", segundos, banco=linha["banco"], fase=fase)
+        elif linha["registro"] == "colecao":
+            serie("colecao_duracao_segundos", "Duração da exportação da coleção", linha["segundos"],
+                  banco=linha["banco"], colecao=linha["colecao"])
+
+    texto = []
+    for nome, (ajuda, valores) in series.items():
+        texto.append(f"# HELP {PREFIXO_PROMETHEUS}_{nome} {ajuda}")
+        texto.append(f"# TYPE {PREFIXO_PROMETHEUS}_{nome} gauge")
+        texto.extend(valores)
+    return "\n".join(texto) + "\n"
+
+
+def gravar_prometheus(pasta, linhas, origem=None):
+    """
+    Grava pasta/mongodb_backup_[<origem>_]<tipo>.prom de forma atômica
+
+    O node_exporter pode ler o arquivo a qualquer momento, então ele é escrito em um
+    temporário e renomeado. Cada tipo (completo, incremental) e cada origem (backup de
+    vários servidores, com o rótulo "origem") tem seu arquivo.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    prefixo = f"{PREFIXO_PROMETHEUS}_{origem}" if origem else PREFIXO_PROMETHEUS
+    caminho = os.path.join(pasta, f"{prefixo}_{linhas[0]['tipo']}.prom")
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(texto_prometheus(linhas, origem))
+    os.replace(temporario, caminho)
+    return caminho
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Motor nativo de backup e restauração (pymongo, sem mongodump/mongorestore)
+Grava cada coleção em arquivos .bson + .metadata.json compatíveis com o mongodump,
+copiando o BSON cru dos lotes do cursor, sem decodificar os documentos
+"""
+
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from bson import json_util
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError
+
+
+# Motores disponíveis: ferramentas externas do MongoDB ou pymongo no próprio processo
+MOTORES = ("mongodump", "nativo")
+MOTOR_PADRAO = "mongodump"
+
+# Documentos por lote do cursor na exportação
+TAMANHO_LOTE_CURSOR = 5000
+
+# Limites de cada insert_many na restauração (documentos e bytes)
+LOTE_INSERCAO_DOCUMENTOS = 1000
+LOTE_INSERCAO_BYTES = 16 * 1024 * 1024
+
+# Buffer do arquivo .bson em gravação
+TAMANHO_BUFFER = 1024 * 1024
+
+# Erro de chave duplicada: ignorado ao preservar dados (mesmo comportamento do mongorestore)
+CODIGO_CHAVE_DUPLICADA = 11000
+
+OPCOES_RAW = CodecOptions(document_class=RawBSONDocument)
+
+
+def caminho_bson(pasta_banco, nome_banco, nome_colecao):
+    """Caminho do .bson de uma coleção na estrutura do mongodump (pasta_banco/banco/colecao.bson)"""
+    return os.path.join(pasta_banco, nome_banco, f"{nome_colecao}.bson")
+
+
+def gravar_metadados(db, nome_colecao, caminho):
+    """
+    Grava o .metadata.json da coleção (opções, índices e tipo) no formato do mongodump
+
+    Returns:
+        Tipo da coleção ("collection" ou "view")
+    """
+    info = next(db.list_collections(filter={"name": nome_colecao}), None) or {}
+    tipo = info.get("type", "collection")
+    metadados = {
+        "options": info.get("options", {}),
+        "indexes": list(db[nome_colecao].list_indexes()) if tipo == "collection" else [],
+        "collectionName": nome_colecao,
+        "type": tipo
+    }
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write(json_util.dumps(metadados, json_options=json_util.CANONICAL_JSON_OPTIONS))
+    return tipo
+
+
+def exportar_consulta(colecao, caminho, filtro=None, ao_gravar=None, tamanho_lote=TAMANHO_LOTE_CURSOR,
+                      projecao=None):
+    """
+    Grava os documentos de uma consulta em um arquivo .bson
+
+    Cada lote do cursor chega como BSON cru (find_raw_batches) e é escrito direto
+    no arquivo, sem decodificar nem recodificar os documentos. O filtro e a projeção
+    são aplicados pelo servidor.
+
+    Returns:
+        Bytes gravados
+    """
+    total = 0
+    temporario = caminho + ".tmp"
+    try:
+        with open(temporario, 'wb', buffering=TAMANHO_BUFFER) as f:
+            for lote in colecao.find_raw_batches(filtro or {}, projecao, batch_size=tamanho_lote):
+                f.write(lote)
+                total += len(lote)
+                if ao_gravar is not None:
+                    ao_gravar(len(lote))
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+    return total
+
+
+def exportar_colecao(client, nome_banco, nome_colecao, pasta_banco, ao_gravar=None,
+                     tamanho_lote=TAMANHO_LOTE_CURSOR, filtro=None, projecao=None):
+    """
+    Exporta uma coleção para pasta_banco/banco/colecao.bson (+ .metadata.json)
+
+    Views geram apenas o .metadata.json, como no mongodump. Com filtro e/ou projeção
+    (exportação parcial), só os documentos e campos pedidos são lidos.
+
+    Returns:
+        Bytes gravados no .bson
+    """
+    db = client[nome_banco]
+    pasta = os.path.join(pasta_banco, nome_banco)
+    os.makedirs(pasta, exist_ok=True)
+
+    tipo = gravar_metadados(db, nome_colecao, os.path.join(pasta, f"{nome_colecao}.metadata.json"))
+    if tipo != "collection":
+        return 0
+    return exportar_consulta(db[nome_colecao], caminho_bson(pasta_banco, nome_banco, nome_colecao),
+                             filtro=filtro, ao_gravar=ao_gravar, tamanho_lote=tamanho_lote, projecao=projecao)
+
+
+def iterar_documentos(caminho):
+    """Lê um arquivo .bson (documentos concatenados) devolvendo o BSON cru de cada documento"""
+    with open(caminho, 'rb', buffering=TAMANHO_BUFFER) as f:
+        while True:
+            prefixo = f.read(4)
+            if not prefixo:
+                return
+            if len(prefixo) < 4:
+                raise ValueError(f"Arquivo BSON truncado: {caminho}")
+            tamanho = struct.unpack("<i", prefixo)[0]
+            corpo = f.read(tamanho - 4)
+            if len(corpo) < tamanho - 4:
+                raise ValueError(f"Arquivo BSON truncado: {caminho}")
+            yield prefixo + corpo
+
+
+def iterar_lotes(caminho, max_documentos=LOTE_INSERCAO_DOCUMENTOS, max_bytes=LOTE_INSERCAO_BYTES):
+    """Agrupa os documentos de um .bson em lotes de RawBSONDocument para o insert_many"""
+    lote = []
+    tamanho = 0
+    for dados in iterar_documentos(caminho):
+        lote.append(RawBSONDocument(dados))
+        tamanho += len(dados)
+        if len(lote) >= max_documentos or tamanho >= max_bytes:
+            yield lote
+            lote = []
+            tamanho = 0
+    if lote:
+        yield lote
+
+
+def inserir_lote(colecao, lote):
+    """
+    insert_many(ordered=False) de um lote; chaves duplicadas são ignoradas
+
+    Returns:
+        Quantidade de documentos inseridos
+    """
+    try:
+        return len(colecao.insert_many(lote, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        outros = [erro for erro in e.details.get("writeErrors", []) if erro.get("code") != CODIGO_CHAVE_DUPLICADA]
+        if outros or e.details.get("writeConcernErrors"):
+            raise
+        return e.details.get("nInserted", 0)
+
+
+def ler_metadados(caminho):
+    """Lê um .metadata.json do mongodump (dicionário vazio se não existir)"""
+    if not os.path.isfile(caminho):
+        return {}
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json_util.loads(f.read())
+
+
+def modelo_indice(indice):
+    """IndexModel de um índice do .metadata.json"""
+    opcoes = {chave: valor for chave, valor in indice.items() if chave not in ("key", "v", "ns")}
+    return IndexModel(list(indice["key"].items()), **opcoes)
+
+
+def criar_indices(colecao, indices):
+    """Recria os índices do .metadata.json (exceto _id, que já existe)"""
+    modelos = [modelo_indice(indice) for indice in indices if indice.get("name") != "_id_"]
+    if modelos:
+        colecao.create_indexes(modelos)
+    return len(modelos)
+
+
+def restaurar_colecao(client, nome_banco, nome_colecao, pasta, drop=False,
+                      workers_insercao=1, ao_inserir=None, indices=True, write_concern=None):
+    """
+    Restaura uma coleção a partir de colecao.bson / colecao.metadata.json
+
+    Os documentos são enviados em lotes de insert_many(ordered=False); com
+    workers_insercao > 1 vários lotes são inseridos ao mesmo tempo. Os índices são
+    criados depois dos dados (indices=False deixa-os para construcao_indices).
+    write_concern (ex: WriteConcern(w=1, j=False)) vale para as inserções.
+    ao_inserir(documentos, bytes) é chamada a cada lote enviado.
+
+    Returns:
+        Quantidade de documentos inseridos
+    """
+    db = client[nome_banco]
+    metadados = ler_metadados(os.path.join(pasta, f"{nome_colecao}.metadata.json"))
+    opcoes = dict(metadados.get("options", {}))
+
+    if drop:
+        db.drop_collection(nome_colecao)
+    if metadados.get("type") == "view":
+        if nome_colecao not in db.list_collection_names(filter={"name": nome_colecao}):
+            db.command({"create": nome_colecao, **opcoes})
+        return 0
+    if opcoes and nome_colecao not in db.list_collection_names(filter={"name": nome_colecao}):
+        # Coleções com opções (capped, validator, collation...) precisam ser criadas antes
+        db.command({"create": nome_colecao, **opcoes})
+
+    colecao = db.get_collection(nome_colecao, codec_options=OPCOES_RAW, write_concern=write_concern)
+    caminho = os.path.join(pasta, f"{nome_colecao}.bson")
+    inseridos = 0
+    if os.path.isfile(caminho):
+        if workers_insercao <= 1:
+            for lote in iterar_lotes(caminho):
+                inseridos += inserir_lote(colecao, lote)
+                if ao_inserir is not None:
+                    ao_inserir(len(lote), _tamanho_lote(lote))
+        else:
+            inseridos = _inserir_em_paralelo(colecao, caminho, workers_insercao, ao_inserir)
+
+    if indices:
+        criar_indices(db[nome_colecao], metadados.get("indexes", []))
+    return inseridos
+
+
+def _tamanho_lote(lote):
+    return sum(len(documento.raw) for documento in lote)
+
+
+def _inserir_em_paralelo(colecao, caminho, workers, ao_inserir):
+    """Insere os lotes do arquivo com vários workers, limitando os lotes em memória"""
+    inseridos = 0
+    vagas = threading.BoundedSemaphore(workers * 2)
+
+    def inserir(lote):
+        try:
+            return inserir_lote(colecao, lote), len(lote), _tamanho_lote(lote)
+        finally:
+            vagas.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futuros = []
+        for lote in iterar_lotes(caminho):
+            vagas.acquire()
+            futuros.append(executor.submit(inserir, lote))
+        for futuro in as_completed(futuros):
+            quantidade, enviados, tamanho = futuro.result()
+            inseridos += quantidade
+            if ao_inserir is not None:
+                ao_inserir(enviados, tamanho)
+    return inseridos
+
+
+def colecoes_no_backup(pasta):
+    """Coleções de uma pasta de banco do mongodump (pelos .bson e .metadata.json)"""
+    nomes = set()
+    for arquivo in os.listdir(pasta):
+        if arquivo.endswith(".metadata.json"):
+            nomes.add(arquivo[:-len(".metadata.json")])
+        elif arquivo.endswith(".bson"):
+            nomes.add(arquivo[:-len(".bson")])
+    return sorted(nomes, key=lambda nome: -_tamanho(os.path.join(pasta, f"{nome}.bson")))
+
+
+def _tamanho(caminho):
+    try:
+        return os.path.getsize(caminho)
+    except OSError:
+        return 0
+
+
+def restaurar_banco(client, nome_banco, pasta, drop=False, colecoes_paralelas=1, workers_insercao=1, log=print,
+                    ignorar=(), ao_concluir=None, indices=True, write_concern=None, ao_inserir=None):
+    """
+    Restaura todas as coleções de uma pasta de banco gerada pelo mongodump (ou pelo motor nativo)
+
+    Coleções em 'ignorar' (já restauradas) são puladas; ao_concluir(nome_colecao) é chamada
+    quando uma coleção termina (dados e, com indices=True, índices) e ao_inserir(documentos,
+    bytes) a cada lote enviado, de qualquer coleção (pode vir de várias threads). Lança a primeira
+    exceção ocorrida depois que todas as coleções terminarem.
+
+    Returns:
+        Quantidade total de documentos inseridos
+    """
+    colecoes = [nome for nome in colecoes_no_backup(pasta) if not nome.startswith("system.") and nome not in ignorar]
+    total = 0
+    erros = []
+    with ThreadPoolExecutor(max_workers=max(1, colecoes_paralelas)) as executor:
+        futuros = {executor.submit(restaurar_colecao, client, nome_banco, nome, pasta, drop, workers_insercao,
+                                   ao_inserir=ao_inserir, indices=indices, write_concern=write_concern): nome
+                   for nome in colecoes}
+        for futuro in as_completed(futuros):
+            try:
+                inseridos = futuro.result()
+                total += inseridos
+                log(f"  {nome_banco}.{futuros[futuro]}: {inseridos} documento(s)")
+                if ao_concluir is not None:
+                    ao_concluir(futuros[futuro])
+            except Exception as e:
+                erros.append(e)
+                log(f"  ✗ {nome_banco}.{futuros[futuro]}: {e}")
+    if erros:
+        raise erros[0]
+    return total
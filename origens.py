@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Backup de várias origens (servidores MongoDB)
+Cada origem da chave "origens" do config.json tem sua URI, seus filtros de bancos e
+sua pasta (backup_dir/<origem>/<data-hora>). As origens são exportadas ao mesmo tempo,
+respeitando um limite global de backups simultâneos e um limite por host (várias
+instâncias na mesma máquina disputam o mesmo disco e CPU)
+"""
+
+import os
+import re
+import threading
+from fnmatch import fnmatchcase
+from urllib.parse import urlsplit
+
+
+# Backups de origens diferentes executados ao mesmo tempo (concorrencia_origens)
+CONCORRENCIA_ORIGENS_PADRAO = 4
+
+# Backups simultâneos de origens no mesmo host (concorrencia_por_host)
+CONCORRENCIA_HOST_PADRAO = 1
+
+# Chaves do config.json que uma origem pode sobrescrever -> parâmetro do MongoDBBackup
+CHAVES_ORIGEM = {
+    "formato_backup": "formato",
+    "compressao": "compressao",
+    "motor": "motor",
+    "paralelismo": "paralelismo",
+    "colecoes_paralelas": "colecoes_paralelas",
+    "backup_incremental": "incremental",
+    "preferencia_leitura": "preferencia_leitura",
+    "tags_leitura": "tags_leitura",
+    "snapshot_consistente": "snapshot_consistente",
+    "limitacao": "limitacao",
+    "retencao": "retencao",
+    "filtros_exportacao": "filtros",
+}
+
+# O nome da origem vira o nome da pasta
+PADRAO_NOME_ORIGEM = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$")
+
+
+def carregar_origens(config):
+    """
+    Origens a partir da chave "origens" do config.json
+
+    Returns:
+        Lista de {"nome", "mongo_uri", "incluir", "excluir", "opcoes"} (vazia sem a chave),
+        onde "opcoes" são os parâmetros do MongoDBBackup sobrescritos pela origem
+
+    Raises:
+        ValueError: Configuração inválida
+    """
+    origens = []
+    nomes = set()
+    for origem in config.get("origens") or []:
+        nome = origem.get("nome")
+        if not nome or not PADRAO_NOME_ORIGEM.match(nome):
+            raise ValueError(f"Nome de origem inválido: '{nome}' (use letras, números, '-', '_' e '.')")
+        if nome in nomes:
+            raise ValueError(f"Origem repetida: '{nome}'")
+        if not origem.get("mongo_uri"):
+            raise ValueError(f"A origem '{nome}' não tem mongo_uri")
+        desconhecidas = set(origem) - {"nome", "mongo_uri", "incluir", "excluir"} - set(CHAVES_ORIGEM)
+        if desconhecidas:
+            raise ValueError(f"Chave(s) desconhecida(s) na origem '{nome}': {', '.join(sorted(desconhecidas))}")
+        nomes.add(nome)
+        origens.append({
+            "nome": nome,
+            "mongo_uri": origem["mongo_uri"],
+            "incluir": list(origem.get("incluir") or []),
+            "excluir": list(origem.get("excluir") or []),
+            "opcoes": {parametro: origem[chave] for chave, parametro in CHAVES_ORIGEM.items() if chave in origem}
+        })
+    return origens
+
+
+def pasta_origem(backup_dir, nome):
+    """Diretório de backup da origem (backup_dir/<origem>)"""
+    return os.path.join(backup_dir, nome)
+
+
+def filtrar_bancos(bancos, incluir=None, excluir=None):
+    """
+    Bancos que atendem aos filtros (padrões do fnmatch, ex: "vendas_*")
+
+    Sem "incluir", todos os bancos entram; "excluir" vale depois de "incluir".
+    """
+    return [banco for banco in bancos
+            if (not incluir or any(fnmatchcase(banco, padrao) for padrao in incluir))
+            and not any(fnmatchcase(banco, padrao) for padrao in excluir or [])]
+
+
+def hosts_da_uri(uri):
+    """
+    Hosts (sem a porta) de uma URI do MongoDB
+
+    Em um replica set a URI lista vários membros: todos contam, já que o membro lido
+    depende da preferência de leitura. Em mongodb+srv, conta o nome do registro SRV.
+    """
+    hosts = urlsplit(uri).netloc.rpartition("@")[2]
+    resultado = set()
+    for host in hosts.split(","):
+        if host.startswith("["):
+            host = host[1:].partition("]")[0]
+        else:
+            host = host.rpartition(":")[0] if ":" in host else host
+        if host:
+            resultado.add(host.lower())
+    return resultado
+
+
+def log_da_origem(nome, log=print):
+    """Função de log que prefixa as mensagens com o nome da origem (as origens rodam juntas)"""
+    def registrar(mensagem):
+        mensagem = str(mensagem)
+        quebras = len(mensagem) - len(mensagem.lstrip("\n"))
+        log("\n" * quebras + f"[{nome}] " + mensagem[quebras:])
+    return registrar
+
+
+class OrquestradorOrigens:
+    """
+    Executa o backup de todas as origens, em paralelo
+
+    Uma origem só começa quando há vaga no limite global e em todos os seus hosts; a
+    próxima da lista que puder começar passa na frente das que esperam por um host
+    ocupado. Cada origem tem seu MongoDBBackup (sua conexão, diário, trava e catálogo
+    em backup_dir/<origem>).
+    """
+
+    def __init__(self, backups, concorrencia_total=CONCORRENCIA_ORIGENS_PADRAO,
+                 concorrencia_host=CONCORRENCIA_HOST_PADRAO, log=print):
+        """
+        Args:
+            backups: Dicionário {nome da origem: MongoDBBackup}, na ordem de prioridade
+            concorrencia_total: Backups de origens executados ao mesmo tempo
+            concorrencia_host: Backups simultâneos de origens que compartilham um host
+        """
+        if int(concorrencia_total) < 1 or int(concorrencia_host) < 1:
+            raise ValueError("concorrencia_origens e concorrencia_por_host devem ser maiores que zero")
+        self.backups = backups
+        self.concorrencia_total = int(concorrencia_total)
+        self.concorrencia_host = int(concorrencia_host)
+        self.log = log
+        self.hosts = {nome: hosts_da_uri(backup.mongo_uri) for nome, backup in backups.items()}
+        self._condicao = threading.Condition()
+        self._em_execucao = set()
+        self._ocupacao = {}
+        self.resultados = {}
+
+    def pode_iniciar(self, nome):
+        return (len(self._em_execucao) < self.concorrencia_total
+                and all(self._ocupacao.get(host, 0) < self.concorrencia_host for host in self.hosts[nome]))
+
+    def executar_origem(self, nome, retomar):
+        try:
+            sucesso = self.backups[nome].executar_backup(retomar=retomar)
+        except Exception as e:
+            self.log(f"✗ Erro no backup da origem '{nome}': {e}")
+            sucesso = False
+        with self._condicao:
+            self.resultados[nome] = sucesso
+            self._em_execucao.discard(nome)
+            for host in self.hosts[nome]:
+                self._ocupacao[host] -= 1
+            self._condicao.notify_all()
+
+    def executar(self, retomar=False):
+        """
+        Executa o backup de todas as origens e retorna True se todas foram bem-sucedidas
+        """
+        self.resultados = {}
+        pendentes = list(self.backups)
+        threads = []
+        self.log(f"Backup de {len(pendentes)} origem(ns): até {self.concorrencia_total} ao mesmo tempo, "
+                 f"{self.concorrencia_host} por host.")
+        with self._condicao:
+            while pendentes:
+                proxima = next((nome for nome in pendentes if self.pode_iniciar(nome)), None)
+                if proxima is None:
+                    self._condicao.wait()
+                    continue
+                pendentes.remove(proxima)
+                self._em_execucao.add(proxima)
+                for host in self.hosts[proxima]:
+                    self._ocupacao[host] = self._ocupacao.get(host, 0) + 1
+                self.log(f"Iniciando o backup da origem '{proxima}'.")
+                thread = threading.Thread(target=self.executar_origem, args=(proxima, retomar),
+                                          name=f"origem-{proxima}")
+                threads.append(thread)
+                thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.log("\n" + "=" * 60)
+        self.log("RESUMO DAS ORIGENS")
+        self.log("=" * 60)
+        for nome in self.backups:
+            marca = "✓" if self.resultados.get(nome) else "✗"
+            self.log(f"{marca} {nome}")
+        return all(self.resultados.get(nome) for nome in self.backups)
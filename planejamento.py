@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Planejamento do backup
+Antes do primeiro mongodump, estima o tamanho da saída (estatísticas do servidor e
+compressão) e a duração (vazão dos backups anteriores no catálogo), e confere se o
+espaço livre do volume de backup_dir é suficiente
+"""
+
+import os
+import shutil
+
+from catalogo import historico_vazao, formatar_bytes
+from progresso import formatar_duracao
+
+
+# Folga exigida além da estimativa (dados inseridos durante o backup, metadados, índices)
+MARGEM_ESPACO = 0.10
+
+# Tamanho da saída em relação aos dados (dataSize) quando não há histórico no catálogo.
+# O formato "pasta" grava o BSON sem compressão; o "dedup" comprime os blocos com zlib
+# e, no primeiro backup, grava todos eles (nos seguintes, só os blocos novos)
+TAXAS_COMPRESSAO_PADRAO = {"nenhuma": 1.0, "gzip": 0.35, "zstd": 0.30, "lz4": 0.50}
+TAXA_DEDUP_PADRAO = 0.35
+
+# O que fazer quando a estimativa não cabe: não exportar nada ou exportar só os bancos
+# que cabem (os demais ficam pendentes no diário de retomada)
+MODOS_ESPACO = ("recusar", "parcial")
+MODO_ESPACO_PADRAO = "recusar"
+
+
+def estatisticas_colecoes(client, nome_banco):
+    """
+    Documentos, bytes (dataSize) e armazenamento (storageSize) de cada coleção do banco
+
+    Usa o estágio $collStats; se não for permitido, registra apenas a contagem estimada.
+    Erros ao listar o banco são propagados.
+    """
+    colecoes = []
+    db = client[nome_banco]
+    for nome in sorted(db.list_collection_names()):
+        if nome.startswith("system."):
+            continue
+        try:
+            stats = next(db[nome].aggregate([{"$collStats": {"storageStats": {}}}]))["storageStats"]
+            colecoes.append({"nome": nome, "documentos": stats.get("count"), "bytes": stats.get("size"),
+                             "armazenamento": stats.get("storageSize")})
+        except Exception:
+            colecoes.append({"nome": nome, "documentos": db[nome].estimated_document_count(), "bytes": None,
+                             "armazenamento": None})
+    return colecoes
+
+
+def tamanhos_em_disco(client):
+    """sizeOnDisk de cada banco (listDatabases); vazio se o comando não for permitido"""
+    try:
+        return {info["name"]: info.get("sizeOnDisk", 0) for info in client.list_databases()}
+    except Exception:
+        return {}
+
+
+def espaco_livre(caminho):
+    """Bytes livres no volume de caminho (a pasta ainda pode não existir)"""
+    caminho = os.path.abspath(caminho)
+    while not os.path.exists(caminho) and os.path.dirname(caminho) != caminho:
+        caminho = os.path.dirname(caminho)
+    return shutil.disk_usage(caminho).free
+
+
+def taxa_saida(backup_dir, formato, compressao):
+    """
+    Tamanho da saída em relação ao dataSize das coleções e vazão (bytes de dados por segundo)
+
+    A taxa vem das últimas execuções do mesmo formato no catálogo (exceto no "dedup",
+    em que o catálogo guarda o tamanho lógico); sem histórico, usa os padrões. Sem
+    histórico a vazão é None.
+
+    Returns:
+        Tupla (taxa, origem da taxa, vazão)
+    """
+    if formato == "dedup":
+        taxa, origem = TAXA_DEDUP_PADRAO, "padrão"
+    elif formato == "archive":
+        taxa, origem = TAXAS_COMPRESSAO_PADRAO.get(compressao, 1.0), "padrão"
+    else:
+        taxa, origem = 1.0, "padrão"
+
+    try:
+        historico = historico_vazao(backup_dir, formato)
+    except Exception:
+        historico = None
+    if not historico:
+        return taxa, origem, None
+    if formato != "dedup":
+        taxa = historico["saida"] / historico["origem"]
+        origem = f"últimos {historico['execucoes']} backup(s)"
+    return taxa, origem, historico["origem"] / historico["duracao"]
+
+
+def planejar_backup(bancos, estatisticas, tamanhos, backup_dir, formato, compressao, concluidas=None):
+    """
+    Estima a saída e a duração do backup e compara com o espaço livre
+
+    Args:
+        bancos: Bancos a exportar
+        estatisticas: {banco: coleções de estatisticas_colecoes}
+        tamanhos: {banco: sizeOnDisk}, usado quando o dataSize é desconhecido
+        concluidas: {banco: coleções já exportadas} (retomada), fora da estimativa
+
+    Returns:
+        Dicionário com bancos (lista de {nome, dados, estimativa}, do maior para o menor),
+        estimativa, necessario (com a margem), livre (None se desconhecido), taxa,
+        origem_taxa, duracao (None sem histórico) e cabe
+    """
+    concluidas = concluidas or {}
+    taxa, origem_taxa, vazao = taxa_saida(backup_dir, formato, compressao)
+
+    itens = []
+    for banco in bancos:
+        colecoes = [colecao for colecao in estatisticas.get(banco, [])
+                    if colecao["nome"] not in concluidas.get(banco, ())]
+        if any(colecao["bytes"] is None for colecao in colecoes) or not estatisticas.get(banco):
+            # Sem dataSize (sem permissão para $collStats): o tamanho em disco é o limite conhecido
+            dados = tamanhos.get(banco, 0)
+        else:
+            dados = sum(colecao["bytes"] for colecao in colecoes)
+        itens.append({"nome": banco, "dados": dados, "estimativa": int(dados * taxa)})
+    itens.sort(key=lambda item: item["estimativa"], reverse=True)
+
+    estimativa = sum(item["estimativa"] for item in itens)
+    necessario = int(estimativa * (1 + MARGEM_ESPACO))
+    try:
+        livre = espaco_livre(backup_dir)
+    except OSError:
+        livre = None
+    dados = sum(item["dados"] for item in itens)
+    return {
+        "bancos": itens,
+        "estimativa": estimativa,
+        "necessario": necessario,
+        "livre": livre,
+        "taxa": taxa,
+        "origem_taxa": origem_taxa,
+        "duracao": dados / vazao if vazao else None,
+        "cabe": livre is None or necessario <= livre
+    }
+
+
+def bancos_que_cabem(plano):
+    """
+    Bancos que cabem no espaço livre, dos menores para os maiores (o máximo de bancos)
+
+    Returns:
+        Tupla (bancos a exportar, bancos adiados), ambas do maior para o menor
+    """
+    if plano["livre"] is None:
+        return [item["nome"] for item in plano["bancos"]], []
+    cabem = set()
+    acumulado = 0
+    for item in sorted(plano["bancos"], key=lambda item: item["estimativa"]):
+        if (acumulado + item["estimativa"]) * (1 + MARGEM_ESPACO) > plano["livre"]:
+            break
+        acumulado += item["estimativa"]
+        cabem.add(item["nome"])
+    exportar = [item["nome"] for item in plano["bancos"] if item["nome"] in cabem]
+    adiados = [item["nome"] for item in plano["bancos"] if item["nome"] not in cabem]
+    return exportar, adiados
+
+
+def formatar_plano(plano):
+    """Relatório do planejamento (um banco por linha e os totais)"""
+    linhas = [f"  {item['nome']:<30} dados: {formatar_bytes(item['dados']):>10}  "
+              f"saída estimada: {formatar_bytes(item['estimativa']):>10}" for item in plano["bancos"]]
+    linhas.append(f"Saída estimada: {formatar_bytes(plano['estimativa'])} "
+                  f"(taxa {plano['taxa']:.2f}, {plano['origem_taxa']}); "
+                  f"necessário com margem: {formatar_bytes(plano['necessario'])}")
+    livre = formatar_bytes(plano["livre"]) if plano["livre"] is not None else "desconhecido"
+    linhas.append(f"Espaço livre: {livre}; duração estimada: {formatar_duracao(plano['duracao'])}")
+    return "\n".join(linhas)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Progresso do backup e da restauração
+Acompanha documentos e bytes exportados por coleção (ou por banco, nos formatos
+de stream único) contra as estimativas do servidor e calcula o tempo restante.
+Recebe também os eventos lidos do stderr do mongodump/mongorestore (ver ferramentas)
+"""
+
+import threading
+import time
+
+
+# Intervalo mínimo entre duas notificações de progresso (segundos)
+INTERVALO_NOTIFICACAO = 0.5
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+FALHA = "falha"
+
+
+def formatar_duracao(segundos):
+    """Formata segundos como 1h02m, 3m10s ou 42s"""
+    if segundos is None:
+        return "--"
+    segundos = int(segundos)
+    if segundos >= 3600:
+        return f"{segundos // 3600}h{(segundos % 3600) // 60:02d}m"
+    if segundos >= 60:
+        return f"{segundos // 60}m{segundos % 60:02d}s"
+    return f"{segundos}s"
+
+
+def formatar_resumo(resumo):
+    """Linha de log com o percentual, os itens concluídos, os documentos e o tempo restante"""
+    return (f"  [{resumo['fracao'] * 100:5.1f}%] {resumo['concluidos']}/{resumo['total']} concluído(s), "
+            f"~{resumo['documentos']}/{resumo['documentos_total']} documentos, "
+            f"restante estimado: {formatar_duracao(resumo['eta'])}")
+
+
+class ProgressoBackup:
+    """
+    Progresso de um backup ou restauração (thread-safe)
+
+    Cada item (ex: "vendas.pedidos", ou "vendas" nos formatos de stream único) tem
+    documentos e bytes estimados. Durante a exportação informa-se os bytes já gravados
+    ou os eventos de progresso das ferramentas (documentos/bytes por coleção); quando
+    há eventos, a fração concluída vem deles, senão dos bytes gravados.
+    A função ao_atualizar recebe o resumo (ver resumo()) no máximo a cada
+    INTERVALO_NOTIFICACAO segundos, e sempre quando um item termina.
+    """
+
+    def __init__(self, ao_atualizar=None):
+        self.ao_atualizar = ao_atualizar
+        self.itens = {}
+        self.inicio = time.monotonic()
+        self._trava = threading.Lock()
+        self._ultima_notificacao = 0.0
+
+    def registrar(self, chave, documentos, bytes_total):
+        """Registra um item a exportar com as estimativas do servidor (None se desconhecidas)"""
+        with self._trava:
+            self.itens[chave] = {
+                "chave": chave,
+                "documentos_total": documentos or 0,
+                "bytes_total": bytes_total or 0,
+                "bytes": 0,
+                "parciais": {},
+                "estado": PENDENTE,
+                "inicio": None,
+                "fim": None
+            }
+
+    def iniciar(self, chave):
+        """Marca o início da exportação de um item"""
+        with self._trava:
+            item = self.itens[chave]
+            item["estado"] = EXECUTANDO
+            item["inicio"] = time.monotonic()
+        self.notificar()
+
+    def atualizar_bytes(self, chave, quantidade):
+        """Informa o total de bytes já exportados de um item"""
+        with self._trava:
+            self.itens[chave]["bytes"] = quantidade
+        self.notificar()
+
+    def somar_bytes(self, chave, quantidade):
+        """Soma bytes exportados a um item (usado por quem lê o stream do mongodump)"""
+        with self._trava:
+            self.itens[chave]["bytes"] += quantidade
+        self.notificar()
+
+    def registrar_evento(self, chave, evento):
+        """
+        Registra um evento de progresso do mongodump/mongorestore (ver ferramentas.interpretar_linha)
+
+        O item guarda só o último evento de cada coleção. Eventos de conclusão em outra
+        unidade (ex: "finished restoring" depois do progresso em bytes) apenas completam a coleção.
+        """
+        with self._trava:
+            parciais = self.itens[chave]["parciais"]
+            atual = parciais.get(evento["colecao"])
+            if atual is not None and atual["unidade"] != evento["unidade"]:
+                if evento["concluido"]:
+                    atual["feito"] = atual["total"]
+            else:
+                parciais[evento["colecao"]] = {
+                    "feito": evento["feito"],
+                    "total": max(evento["total"], evento["feito"]),
+                    "unidade": evento["unidade"]
+                }
+        self.notificar()
+
+    def concluir(self, chave, sucesso=True):
+        """Marca o fim de um item"""
+        with self._trava:
+            item = self.itens[chave]
+            item["estado"] = CONCLUIDO if sucesso else FALHA
+            item["fim"] = time.monotonic()
+        self.notificar(forcar=True)
+
+    def executando(self):
+        """Chaves dos itens em exportação"""
+        with self._trava:
+            return [chave for chave, item in self.itens.items() if item["estado"] == EXECUTANDO]
+
+    @staticmethod
+    def _fracao(item):
+        """Fração concluída de um item (0 a 1)"""
+        if item["estado"] in (CONCLUIDO, FALHA):
+            return 1.0
+        if item["estado"] == PENDENTE:
+            return 0.0
+        if item["parciais"]:
+            return ProgressoBackup._fracao_parciais(item)
+        if not item["bytes_total"]:
+            return 0.0
+        # O tamanho exportado pode passar da estimativa (dados inseridos durante o backup)
+        return min(0.99, item["bytes"] / item["bytes_total"])
+
+    @staticmethod
+    def _fracao_parciais(item):
+        """
+        Fração de um item pelos eventos das ferramentas
+
+        Coleções que ainda não apareceram no stderr entram pela estimativa do item
+        (documentos ou bytes, conforme a unidade dos eventos).
+        """
+        parciais = list(item["parciais"].values())
+        unidade = parciais[0]["unidade"]
+        feito = sum(parcial["feito"] for parcial in parciais if parcial["unidade"] == unidade)
+        total = sum(parcial["total"] for parcial in parciais if parcial["unidade"] == unidade)
+        estimativa = item["documentos_total"] if unidade == "documentos" else item["bytes_total"]
+        total = max(total, estimativa, 1)
+        return min(0.99, feito / total)
+
+    def resumo(self):
+        """
+        Situação atual do backup
+
+        Returns:
+            Dicionário com fracao (0 a 1), documentos/documentos_total, bytes/bytes_total,
+            concluidos/total, decorrido, eta (segundos ou None) e 'em_andamento'
+            (itens em exportação, com chave, fracao e eta)
+        """
+        agora = time.monotonic()
+        with self._trava:
+            itens = [dict(item, parciais={colecao: dict(parcial) for colecao, parcial in item["parciais"].items()})
+                     for item in self.itens.values()]
+
+        # Itens sem tamanho estimado contam como 1 byte para não sumirem da fração total
+        peso_total = sum(max(item["bytes_total"], 1) for item in itens) or 1
+        fracao = sum(self._fracao(item) * max(item["bytes_total"], 1) for item in itens) / peso_total
+        documentos = sum(int(self._fracao(item) * item["documentos_total"]) for item in itens)
+
+        decorrido = agora - self.inicio
+        eta = decorrido * (1 - fracao) / fracao if fracao > 0 else None
+
+        em_andamento = []
+        for item in itens:
+            if item["estado"] != EXECUTANDO:
+                continue
+            fracao_item = self._fracao(item)
+            eta_item = None
+            if fracao_item > 0:
+                decorrido_item = agora - item["inicio"]
+                eta_item = decorrido_item * (1 - fracao_item) / fracao_item
+            em_andamento.append({"chave": item["chave"], "fracao": fracao_item, "eta": eta_item})
+
+        return {
+            "fracao": fracao,
+            "documentos": documentos,
+            "documentos_total": sum(item["documentos_total"] for item in itens),
+            "bytes": int(sum(self._fracao(item) * item["bytes_total"] for item in itens)),
+            "bytes_total": sum(item["bytes_total"] for item in itens),
+            "concluidos": sum(1 for item in itens if item["estado"] in (CONCLUIDO, FALHA)),
+            "total": len(itens),
+            "decorrido": decorrido,
+            "eta": eta,
+            "em_andamento": em_andamento
+        }
+
+    def notificar(self, forcar=False):
+        """Entrega o resumo para ao_atualizar (limitado a INTERVALO_NOTIFICACAO)"""
+        if self.ao_atualizar is None:
+            return
+        agora = time.monotonic()
+        with self._trava:
+            if not forcar and agora - self._ultima_notificacao < INTERVALO_NOTIFICACAO:
+                return
+            self._ultima_notificacao = agora
+        self.ao_atualizar(self.resumo())
+
+
+class LeitorContador:
+    """Envolve um stream (ex: stdout do mongodump) informando a quantidade de bytes lidos"""
+
+    def __init__(self, stream, ao_ler):
+        self.stream = stream
+        self.ao_ler = ao_ler
+
+    def read(self, tamanho=-1):
+        dados = self.stream.read(tamanho)
+        if dados:
+            self.ao_ler(len(dados))
+        return dados
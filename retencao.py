@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Retenção de backups (avô-pai-filho)
+Mantém o backup mais recente de cada uma das últimas N horas, dias, semanas e meses
+e apaga as demais pastas de backup_dir, junto com seus registros no catálogo e os
+blocos do repositório deduplicado que ficarem sem uso
+"""
+
+import os
+import shutil
+import threading
+from datetime import datetime
+
+from catalogo import status_das_execucoes, remover_execucao, formatar_bytes
+from deduplicacao import remover_blocos_orfaos
+from incremental import localizar_base_incremental
+from retomada import ARQUIVO_JORNAL
+
+
+# Formato do nome das pastas de backup (DD-MM-YYYY - HH-MM-SS)
+FORMATO_PASTA = "%d-%m-%Y - %H-%M-%S"
+
+# Níveis da política (chaves de "retencao" no config.json), com o período de cada um
+NIVEIS = (
+    ("horarios", "horário", lambda momento: (momento.date(), momento.hour)),
+    ("diarios", "diário", lambda momento: momento.date()),
+    ("semanais", "semanal", lambda momento: momento.isocalendar()[:2]),
+    ("mensais", "mensal", lambda momento: (momento.year, momento.month)),
+)
+
+# Uma limpeza por vez no mesmo processo (ex: agendamentos próximos na interface)
+_trava_retencao = threading.Lock()
+
+
+def normalizar_politica(politica):
+    """Política {nivel: quantidade} com todos os níveis (vazia/None = nenhuma retenção)"""
+    politica = politica or {}
+    return {nivel: max(0, int(politica.get(nivel) or 0)) for nivel, _, _ in NIVEIS}
+
+
+def politica_ativa(politica):
+    """True se a política mantém algum nível (sem política nenhum backup é apagado)"""
+    return any(normalizar_politica(politica).values())
+
+
+def listar_backups(backup_dir):
+    """
+    Pastas de backup de backup_dir cujo nome é um horário (FORMATO_PASTA)
+
+    Returns:
+        Lista de (momento, nome), da mais recente para a mais antiga
+    """
+    if not os.path.isdir(backup_dir):
+        return []
+
+    backups = []
+    for nome in os.listdir(backup_dir):
+        if not os.path.isdir(os.path.join(backup_dir, nome)):
+            continue
+        try:
+            backups.append((datetime.strptime(nome, FORMATO_PASTA), nome))
+        except ValueError:
+            continue
+    return sorted(backups, reverse=True)
+
+
+def tamanho_total(caminho):
+    """Soma do tamanho dos arquivos de uma pasta (recursivo)"""
+    total = 0
+    for raiz, _, arquivos in os.walk(caminho):
+        for arquivo in arquivos:
+            try:
+                total += os.path.getsize(os.path.join(raiz, arquivo))
+            except OSError:
+                pass
+    return total
+
+
+def planejar_retencao(backup_dir, politica):
+    """
+    Decide quais backups manter e quais apagar (não altera nada)
+
+    Em cada nível fica o backup mais recente de cada um dos N últimos períodos que
+    têm backup. Backups com falha no catálogo não ocupam vagas; o backup mais
+    recente, a base incremental em uso e os backups interrompidos (com diário de
+    retomada) nunca são apagados.
+
+    Returns:
+        Dicionário {"manter": [...], "remover": [...]} com itens {nome, momento,
+        motivos} (e bytes nos removidos), do mais recente para o mais antigo
+    """
+    politica = normalizar_politica(politica)
+    backups = listar_backups(backup_dir)
+    status = status_das_execucoes(backup_dir)
+    base = localizar_base_incremental(backup_dir)
+    base_atual = os.path.basename(base[0]) if base else None
+
+    motivos = {nome: [] for _, nome in backups}
+    if backups:
+        motivos[backups[0][1]].append("mais recente")
+    for _, nome in backups:
+        if os.path.isfile(os.path.join(backup_dir, nome, ARQUIVO_JORNAL)):
+            motivos[nome].append("interrompido")
+        elif nome == base_atual:
+            motivos[nome].append("base incremental atual")
+
+    validos = [(momento, nome) for momento, nome in backups
+               if status.get(nome) != "falha" and "interrompido" not in motivos[nome]]
+    for nivel, rotulo, periodo in NIVEIS:
+        vistos = set()
+        for momento, nome in validos:
+            if len(vistos) >= politica[nivel]:
+                break
+            chave = periodo(momento)
+            if chave not in vistos:
+                vistos.add(chave)
+                motivos[nome].append(rotulo)
+
+    plano = {"manter": [], "remover": []}
+    for momento, nome in backups:
+        item = {"nome": nome, "momento": momento, "motivos": motivos[nome]}
+        if motivos[nome]:
+            plano["manter"].append(item)
+        else:
+            item["bytes"] = tamanho_total(os.path.join(backup_dir, nome))
+            plano["remover"].append(item)
+    return plano
+
+
+def formatar_plano(plano):
+    """Relatório do plano de retenção (uma linha por backup)"""
+    linhas = []
+    for item in sorted(plano["manter"] + plano["remover"], key=lambda item: item["momento"], reverse=True):
+        if item["motivos"]:
+            linhas.append(f"  manter   {item['nome']}  ({', '.join(item['motivos'])})")
+        else:
+            linhas.append(f"  apagar   {item['nome']}  {formatar_bytes(item['bytes']):>10}")
+    liberados = sum(item["bytes"] for item in plano["remover"])
+    linhas.append(f"Manter: {len(plano['manter'])}  Apagar: {len(plano['remover'])}  "
+                  f"Espaço liberado: {formatar_bytes(liberados)}")
+    return "\n".join(linhas)
+
+
+def backup_em_andamento(backup_dir):
+    """True se alguma pasta de backup_dir tem diário de retomada (backup rodando ou interrompido)"""
+    return any(os.path.isfile(os.path.join(backup_dir, nome, ARQUIVO_JORNAL))
+               for _, nome in listar_backups(backup_dir))
+
+
+def aplicar_retencao(backup_dir, politica, simular=False, log=print):
+    """
+    Aplica a política de retenção em backup_dir
+
+    Apaga as pastas do plano, seus registros no catálogo (incluindo os incrementos) e,
+    se nenhum backup estiver em andamento, os blocos órfãos do repositório deduplicado.
+
+    Args:
+        simular: Apenas exibe o relatório, sem apagar nada
+
+    Returns:
+        Tupla (pastas apagadas, bytes liberados)
+    """
+    with _trava_retencao:
+        plano = planejar_retencao(backup_dir, politica)
+        log("\nRetenção de backups" + (" (simulação)" if simular else "") + ":")
+        log(formatar_plano(plano))
+        if simular:
+            if plano["remover"] and not backup_em_andamento(backup_dir):
+                # Os blocos que a remoção deixaria órfãos ainda são referenciados; só os já órfãos aparecem aqui
+                blocos, tamanho = remover_blocos_orfaos(backup_dir, simular=True)
+                if blocos:
+                    log(f"Blocos órfãos no repositório deduplicado: {blocos} ({formatar_bytes(tamanho)})")
+            return 0, 0
+
+        apagadas = 0
+        liberados = 0
+        execucoes = list(status_das_execucoes(backup_dir))
+        for item in plano["remover"]:
+            try:
+                shutil.rmtree(os.path.join(backup_dir, item["nome"]))
+            except OSError as e:
+                log(f"✗ Erro ao apagar {item['nome']}: {e}")
+                continue
+            apagadas += 1
+            liberados += item["bytes"]
+            for execucao in execucoes:
+                if execucao == item["nome"] or execucao.startswith(item["nome"] + os.sep):
+                    try:
+                        remover_execucao(backup_dir, execucao)
+                    except Exception as e:
+                        log(f"⚠ Não foi possível atualizar o catálogo: {e}")
+
+        if apagadas:
+            if backup_em_andamento(backup_dir):
+                log("⚠ Há um backup em andamento ou interrompido; os blocos órfãos serão removidos na próxima limpeza.")
+            else:
+                blocos, tamanho = remover_blocos_orfaos(backup_dir)
+                if blocos:
+                    log(f"Blocos órfãos removidos do repositório: {blocos} ({formatar_bytes(tamanho)})")
+                    liberados += tamanho
+        if plano["remover"]:
+            log(f"✓ {apagadas} backup(s) apagado(s), {formatar_bytes(liberados)} liberado(s).")
+        return apagadas, liberados
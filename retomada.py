@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Retomada de backups e restaurações interrompidos
+Um diário na pasta do backup registra os bancos e coleções já exportados; ao
+retomar, o backup continua na mesma pasta e refaz apenas o que faltava.
+Na restauração, um diário gravado no próprio destino registra o que já foi
+carregado, e uma nova execução (de qualquer máquina) continua da primeira coleção
+incompleta
+"""
+
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+
+# Diário gravado na pasta do backup enquanto ele não termina sem falhas
+ARQUIVO_JORNAL = "retomada.json"
+
+# Coleção do destino com os diários das restaurações não concluídas. O banco padrão,
+# admin, não entra nos backups e não é alterado pelo --drop do mongorestore; outro banco
+# pode ser configurado (restore_banco_diario) quando o usuário não pode gravar no admin
+BANCO_JORNAIS_RESTAURACAO = "admin"
+COLECAO_JORNAIS_RESTAURACAO = "sistema_backup_restauracoes"
+
+
+class JornalBackup:
+    """
+    Diário de um backup completo (thread-safe)
+
+    Cada banco ou coleção concluído é gravado imediatamente (arquivo temporário +
+    rename), então uma interrupção a qualquer momento perde no máximo o trabalho
+    em andamento.
+    """
+
+    def __init__(self, pasta, dados):
+        self.pasta = pasta
+        self.dados = dados
+        self._trava = threading.Lock()
+
+    @classmethod
+    def criar(cls, pasta, formato, compressao, motor, bancos, ts_base=None, ts_snapshot=None):
+        """
+        Cria o diário de um novo backup
+
+        ts_base é o ponto do oplog da base incremental e ts_snapshot o início do oplog do
+        snapshot consistente (se houver)
+        """
+        jornal = cls(pasta, {
+            "criado_em": datetime.now().isoformat(timespec="seconds"),
+            "formato": formato,
+            "compressao": compressao,
+            "motor": motor,
+            "bancos": list(bancos),
+            "ts_base": ts_base,
+            "ts_snapshot": ts_snapshot,
+            "concluidos": {},
+            "colecoes": {},
+            "tentativas": {}
+        })
+        with jornal._trava:
+            jornal._salvar()
+        return jornal
+
+    @classmethod
+    def abrir(cls, pasta):
+        """Lê o diário de uma pasta de backup (None se não houver ou estiver ilegível)"""
+        caminho = os.path.join(pasta, ARQUIVO_JORNAL)
+        if not os.path.isfile(caminho):
+            return None
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                return cls(pasta, json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def banco_concluido(self, nome_banco):
+        """Registro (para o catálogo) de um banco já exportado, ou None"""
+        with self._trava:
+            return self.dados["concluidos"].get(nome_banco)
+
+    def colecoes_concluidas(self, nome_banco):
+        """Coleções do banco já exportadas"""
+        with self._trava:
+            return set(self.dados["colecoes"].get(nome_banco, []))
+
+    def registrar_tentativa(self, nome_banco):
+        """Conta mais uma execução que tentou exportar o banco e retorna o total"""
+        with self._trava:
+            tentativas = self.dados.setdefault("tentativas", {})
+            tentativas[nome_banco] = tentativas.get(nome_banco, 0) + 1
+            self._salvar()
+            return tentativas[nome_banco]
+
+    def concluir_colecao(self, nome_banco, nome_colecao):
+        """Registra uma coleção exportada (formato "pasta")"""
+        with self._trava:
+            self.dados["colecoes"].setdefault(nome_banco, []).append(nome_colecao)
+            self._salvar()
+
+    def concluir_banco(self, registro):
+        """Registra um banco exportado com sucesso (registro de MongoDBBackup.resultados)"""
+        with self._trava:
+            self.dados["concluidos"][registro["nome"]] = dict(registro)
+            self.dados["colecoes"].pop(registro["nome"], None)
+            self._salvar()
+
+    def descartar(self):
+        """Remove o diário (backup concluído sem falhas)"""
+        try:
+            os.remove(os.path.join(self.pasta, ARQUIVO_JORNAL))
+        except OSError:
+            pass
+
+    def _salvar(self):
+        """Grava o diário (chamado com a trava)"""
+        _gravar_json(os.path.join(self.pasta, ARQUIVO_JORNAL), self.dados)
+
+
+def _gravar_json(caminho, dados):
+    """Grava um diário de forma atômica (arquivo temporário + rename)"""
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, indent=4, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def localizar_backup_interrompido(backup_dir):
+    """
+    Procura o backup interrompido (com diário) mais recente em backup_dir
+
+    Returns:
+        JornalBackup ou None se todos os backups terminaram
+    """
+    if not os.path.isdir(backup_dir):
+        return None
+
+    jornais = []
+    for nome in os.listdir(backup_dir):
+        pasta = os.path.join(backup_dir, nome)
+        jornal = JornalBackup.abrir(pasta) if os.path.isdir(pasta) else None
+        if jornal:
+            jornais.append(jornal)
+    if not jornais:
+        return None
+    return max(jornais, key=lambda jornal: jornal.dados.get("criado_em", ""))
+
+
+def padrao_namespace(nome_banco, nome_colecao):
+    """Namespace banco.colecao para --nsInclude/--nsExclude (escapa os curingas do mongorestore)"""
+    return f"{nome_banco}.{nome_colecao}".replace("\\", "\\\\").replace("*", "\\*")
+
+
+class JornalRestauracao:
+    """
+    Diário de uma restauração (thread-safe)
+
+    Gravado no destino (<banco>.sistema_backup_restauracoes, admin por padrão), em um documento
+    identificado pelo backup (ver verificacao.identificar_backup, que não depende da
+    pasta onde ele está), pelo horário alvo da restauração pontual e pelas coleções
+    escolhidas (restauração seletiva). Assim a restauração continua de onde parou
+    mesmo executada de outra máquina, e a pasta do backup não é alterada. Uma
+    coleção é registrada quando o mongorestore (ou o motor nativo) informa que
+    terminou de carregá-la; um banco, quando foi carregado por inteiro; cada arquivo
+    de oplog (snapshot e incrementos), quando foi reaplicado.
+
+    O destino recebe uma gravação por banco (ao fim dele, com ou sem falha, ver gravar)
+    e por arquivo de oplog, não uma por coleção. Se uma gravação falhar, o diário é
+    desativado com um aviso e a restauração segue sem ele.
+    """
+
+    def __init__(self, colecao, identificacao, dados, log=print):
+        self.colecao = colecao
+        self.identificacao = identificacao
+        self.dados = dados
+        self.log = log
+        self.ativo = True
+        self._pendente = False
+        self._trava = threading.Lock()
+
+    @classmethod
+    def abrir(cls, client, backup, pasta_backup, alvo=None, selecao=None, banco=None, log=print):
+        """
+        Abre o diário da restauração do backup no destino, criando-o se não existir
+
+        Args:
+            client: MongoClient do destino
+            backup: Identificação do backup (verificacao.identificar_backup)
+            banco: Banco do destino que guarda os diários (None = BANCO_JORNAIS_RESTAURACAO)
+            log: Função que recebe os avisos de gravação
+
+        Raises:
+            PyMongoError: Diário inacessível (ex: usuário sem permissão no banco)
+        """
+        identificacao = "|".join([backup, alvo or ""] + sorted(selecao or []))
+        identificacao = hashlib.sha1(identificacao.encode("utf-8")).hexdigest()
+        colecao = client[banco or BANCO_JORNAIS_RESTAURACAO][COLECAO_JORNAIS_RESTAURACAO]
+        dados = colecao.find_one({"_id": identificacao})
+        if dados is not None:
+            dados.pop("_id")
+            return cls(colecao, identificacao, dados, log)
+        return cls(colecao, identificacao, {
+            "criado_em": datetime.now().isoformat(timespec="seconds"),
+            "pasta_backup": os.path.abspath(pasta_backup),
+            "alvo": alvo,
+            "selecao": sorted(selecao) if selecao else None,
+            "bancos": [],
+            "colecoes": {},
+            "oplog": []
+        }, log)
+
+    def retomada(self):
+        """True se uma execução anterior já carregou algo no destino"""
+        with self._trava:
+            return bool(self.dados["bancos"] or self.dados["colecoes"] or self.dados.get("oplog"))
+
+    def banco_concluido(self, nome_banco):
+        with self._trava:
+            return nome_banco in self.dados["bancos"]
+
+    def colecoes_concluidas(self, nome_banco):
+        """Coleções do banco já carregadas no destino"""
+        with self._trava:
+            return set(self.dados["colecoes"].get(nome_banco, []))
+
+    def exclusoes(self, nome_banco):
+        """Opções --nsExclude do mongorestore para as coleções já carregadas do banco"""
+        return [f"--nsExclude={padrao_namespace(nome_banco, colecao)}"
+                for colecao in sorted(self.colecoes_concluidas(nome_banco))]
+
+    def concluir_colecao(self, nome_banco, nome_colecao):
+        """Registra a coleção; o destino só a recebe no fim do banco (gravar ou concluir_banco)"""
+        with self._trava:
+            colecoes = self.dados["colecoes"].setdefault(nome_banco, [])
+            if nome_colecao not in colecoes:
+                colecoes.append(nome_colecao)
+                self._pendente = True
+
+    def gravar(self):
+        """Grava as coleções registradas desde a última gravação (fim de um banco com falha)"""
+        with self._trava:
+            if self._pendente:
+                self._salvar()
+
+    def concluir_banco(self, nome_banco):
+        with self._trava:
+            if nome_banco not in self.dados["bancos"]:
+                self.dados["bancos"].append(nome_banco)
+            self.dados["colecoes"].pop(nome_banco, None)
+            self._salvar()
+
+    def oplog_concluido(self, nome):
+        """True se o oplog (nome da pasta do snapshot ou do incremento) já foi reaplicado"""
+        with self._trava:
+            return nome in self.dados.get("oplog", [])
+
+    def concluir_oplog(self, nome):
+        with self._trava:
+            self.dados.setdefault("oplog", []).append(nome)
+            self._salvar()
+
+    def registrar_evento(self, nome_banco, evento):
+        """Registra a coleção de um evento de conclusão do mongorestore (ver ferramentas.interpretar_linha)"""
+        prefixo = nome_banco + "."
+        if evento["concluido"] and evento["colecao"].startswith(prefixo):
+            self.concluir_colecao(nome_banco, evento["colecao"][len(prefixo):])
+
+    def descartar(self):
+        """Remove o diário (restauração concluída sem falhas)"""
+        try:
+            self.colecao.delete_one({"_id": self.identificacao})
+        except PyMongoError:
+            pass
+
+    def _salvar(self):
+        """Grava o diário no destino (chamado com a trava; um documento, substituído de forma atômica)"""
+        if not self.ativo:
+            return
+        try:
+            self.colecao.replace_one({"_id": self.identificacao}, dict(self.dados, _id=self.identificacao),
+                                     upsert=True)
+            self._pendente = False
+        except PyMongoError as e:
+            self.ativo = False
+            self.log(f"⚠ Não foi possível gravar o diário da restauração; seguindo sem ele: {e}")
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários da lógica pura do sistema de backup
+Executar na raiz do projeto: python -m unittest (ou python -m pytest tests)
+"""
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Testes do agendador integrado e da trava de execução"""
+
+import contextlib
+import io
+import tempfile
+import unittest
+from datetime import datetime, time, timedelta
+
+from agendador import (Agendador, TravaExecucao, carregar_agenda, horarios_vencidos, ler_estado_agendador,
+                       proximo_horario, salvar_estado_agendador)
+from backup_mongodb import MongoDBBackup
+
+
+# 15/01/2024 é uma segunda-feira
+SEGUNDA = datetime(2024, 1, 15)
+SEMANAL = {"modo": "semanal", "hora": time(3, 0), "dias": [0, 2]}
+
+
+class TestAgenda(unittest.TestCase):
+
+    def test_carregar(self):
+        self.assertEqual(carregar_agenda({"modo_agendamento": "intervalo", "intervalo_minutos": 15}),
+                         {"modo": "intervalo", "intervalo": timedelta(minutes=15)})
+        agenda = carregar_agenda({"hora_backup": "03:00", "dias_semana": {"Quarta": True, "Segunda": True,
+                                                                         "Sexta": False}})
+        self.assertEqual(agenda, SEMANAL)
+
+    def test_configuracao_invalida(self):
+        for config in ({"modo_agendamento": "mensal"},
+                       {"modo_agendamento": "intervalo", "intervalo_minutos": 0},
+                       {"hora_backup": "3h", "dias_semana": {"Segunda": True}},
+                       {"hora_backup": "03:00", "dias_semana": {"Segunda": False}}):
+            with self.subTest(config=config):
+                with self.assertRaises(ValueError):
+                    carregar_agenda(config)
+
+    def test_proximo_horario(self):
+        self.assertEqual(proximo_horario(SEMANAL, SEGUNDA), SEGUNDA.replace(hour=3))
+        # Estritamente depois: no próprio horário, o próximo é o da quarta
+        self.assertEqual(proximo_horario(SEMANAL, SEGUNDA.replace(hour=3)), datetime(2024, 1, 17, 3, 0))
+        self.assertEqual(proximo_horario(SEMANAL, datetime(2024, 1, 18, 12, 0)), datetime(2024, 1, 22, 3, 0))
+
+    def test_vencidos_intervalo(self):
+        agenda = {"modo": "intervalo", "intervalo": timedelta(minutes=30)}
+        self.assertEqual(horarios_vencidos(agenda, SEGUNDA, SEGUNDA + timedelta(minutes=10)),
+                         (0, None, SEGUNDA + timedelta(minutes=30)))
+        self.assertEqual(horarios_vencidos(agenda, SEGUNDA, SEGUNDA + timedelta(minutes=95)),
+                         (3, SEGUNDA + timedelta(minutes=90), SEGUNDA + timedelta(minutes=120)))
+
+    def test_vencidos_semanal(self):
+        # Parado de segunda 02:00 até a segunda seguinte 10:00: seg, qua e seg perdidos
+        quantidade, vencido, proximo = horarios_vencidos(SEMANAL, SEGUNDA.replace(hour=2),
+                                                         datetime(2024, 1, 22, 10, 0))
+        self.assertEqual((quantidade, vencido, proximo),
+                         (3, datetime(2024, 1, 22, 3, 0), datetime(2024, 1, 24, 3, 0)))
+
+
+class TestAgendador(unittest.TestCase):
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.pasta = self._pasta.name
+        self.mensagens = []
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def test_horarios_perdidos_em_uma_execucao(self):
+        agenda = {"modo": "intervalo", "intervalo": timedelta(minutes=30)}
+        salvar_estado_agendador(self.pasta, {"ultimo_horario": (datetime.now() - timedelta(hours=5)).isoformat()})
+        execucoes = []
+
+        def executar():
+            execucoes.append(datetime.now())
+            agendador.parar.set()
+            return True
+
+        agendador = Agendador(self.pasta, agenda, executar, log=self.mensagens.append)
+        agendador.rodar()
+        self.assertEqual(len(execucoes), 1)
+        self.assertTrue(any("10 horário(s) perdido(s)" in mensagem for mensagem in self.mensagens))
+        estado = ler_estado_agendador(self.pasta)
+        self.assertTrue(estado["sucesso"])
+        # O próximo horário é contado a partir do último vencido, não de agora
+        self.assertLess(datetime.now() - datetime.fromisoformat(estado["ultimo_horario"]), timedelta(minutes=30))
+
+    def test_erro_no_backup(self):
+        def executar():
+            raise RuntimeError("servidor fora do ar")
+
+        agendador = Agendador(self.pasta, SEMANAL, executar, log=self.mensagens.append)
+        self.assertFalse(agendador.executar_horario(SEGUNDA.replace(hour=3)))
+        self.assertEqual(ler_estado_agendador(self.pasta)["ultimo_horario"], "2024-01-15T03:00:00")
+        self.assertIn("servidor fora do ar", self.mensagens[-1])
+
+    def test_sem_estado(self):
+        self.assertEqual(ler_estado_agendador(self.pasta), {})
+        agendador = Agendador(self.pasta, SEMANAL, lambda: True)
+        self.assertLess(datetime.now() - agendador.ultimo_horario(), timedelta(seconds=5))
+
+
+class TestTravaExecucao(unittest.TestCase):
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.pasta = self._pasta.name
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def test_exclusiva(self):
+        primeira = TravaExecucao(self.pasta)
+        segunda = TravaExecucao(self.pasta)
+        self.assertTrue(primeira.adquirir())
+        try:
+            self.assertFalse(segunda.adquirir())
+        finally:
+            primeira.liberar()
+        self.assertTrue(segunda.adquirir())
+        segunda.liberar()
+        # Liberar sem deter a trava não tem efeito
+        segunda.liberar()
+
+    def test_backup_nao_sobrepoe(self):
+        backup = MongoDBBackup(backup_dir=self.pasta)
+        backup.realizar_backup = lambda bancos, retomar: self.fail("o backup não deveria começar")
+        trava = TravaExecucao(self.pasta)
+        self.assertTrue(trava.adquirir())
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as saida:
+                self.assertFalse(backup.executar_backup())
+        finally:
+            trava.liberar()
+        self.assertIn("Já existe um backup em execução", saida.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Testes das partes do benchmark que não dependem de um mongod"""
+
+import random
+import socket
+import unittest
+from unittest import mock
+
+import benchmark
+from benchmark import CENARIOS, PREFIXO_BANCOS, MedidorMemoria, comparar, medir, porta_livre
+
+
+def resultado(modo, operacao, mb_s, segundos, sucesso=True):
+    return {"cenario": "colecao_grande", "modo": modo, "operacao": operacao, "mb_s": mb_s,
+            "segundos": segundos, "sucesso": sucesso}
+
+
+class ColecaoContadora:
+
+    def __init__(self):
+        self.lotes = []
+        self.indices = []
+
+    def insert_many(self, documentos, ordered=True):
+        self.lotes.append(len(documentos))
+
+    def create_index(self, chaves):
+        self.indices.append(chaves)
+
+
+class ClienteContador:
+
+    def __init__(self):
+        self.colecoes = {}
+
+    def __getitem__(self, banco):
+        cliente = self
+
+        class Banco:
+            def __getitem__(self, colecao):
+                return cliente.colecoes.setdefault(f"{banco}.{colecao}", ColecaoContadora())
+        return Banco()
+
+
+class TestComparar(unittest.TestCase):
+
+    def test_variacao(self):
+        anterior = {"resultados": [resultado("dedup-j1", "backup", 50.0, 4.0),
+                                   resultado("archive-gzip-j4", "backup", 80.0, 2.5),
+                                   resultado("pasta-nativo-j4", "backup", 10.0, 20.0, sucesso=False)]}
+        atual = {"resultados": [resultado("dedup-j1", "backup", 60.0, 3.3),
+                                resultado("archive-gzip-j4", "backup", 40.0, 5.0),
+                                resultado("pasta-nativo-j4", "backup", 90.0, 2.0),
+                                resultado("dedup-j1", "restauracao", 70.0, 3.0)]}
+        linhas = comparar(anterior, atual)
+        # Só os resultados bem-sucedidos presentes nas duas execuções são comparados
+        self.assertEqual(len(linhas), 2)
+        self.assertIn("(+20.0%)", linhas[0])
+        self.assertIn("4.00s -> 3.30s", linhas[0])
+        self.assertIn("(-50.0%)", linhas[1])
+
+
+class TestMedir(unittest.TestCase):
+
+    def test_sucesso(self):
+        with mock.patch.object(benchmark.time, "perf_counter", side_effect=[10.0, 12.0]):
+            registro = medir("muitos_bancos", "dedup-j1", "backup", lambda: True, 1000, 4 * 1024 * 1024, ())
+        self.assertTrue(registro["sucesso"])
+        self.assertIsNone(registro["erro"])
+        self.assertEqual((registro["segundos"], registro["mb_s"], registro["documentos_s"]), (2.0, 2.0, 500.0))
+
+    def test_excecao_vira_falha(self):
+        def falhar():
+            raise RuntimeError("mongod caiu")
+        registro = medir("muitos_bancos", "dedup-j1", "restauracao", falhar, 10, 10, ())
+        self.assertFalse(registro["sucesso"])
+        self.assertEqual(registro["erro"], "mongod caiu")
+
+
+class TestMedidorMemoria(unittest.TestCase):
+
+    def test_sem_psutil(self):
+        with mock.patch.object(benchmark, "psutil", None):
+            with MedidorMemoria() as memoria:
+                bytearray(1024)
+        if benchmark.resource is None:
+            self.assertIsNone(memoria.pico)
+        else:
+            self.assertGreater(memoria.pico, 0)
+
+    @unittest.skipIf(benchmark.psutil is None, "psutil não instalado")
+    def test_com_psutil(self):
+        with MedidorMemoria() as memoria:
+            benchmark.time.sleep(benchmark.INTERVALO_MEMORIA * 2)
+        self.assertGreater(memoria.pico, 0)
+
+
+class TestCenarios(unittest.TestCase):
+
+    def test_bancos_sinteticos(self):
+        client = ClienteContador()
+        with mock.patch.object(benchmark, "LOTE_INSERCAO", 150):
+            bancos = CENARIOS["muitos_bancos"](client, 0.03, random.Random(42))
+        self.assertEqual(bancos, [f"{PREFIXO_BANCOS}pequeno_{indice:04d}" for indice in range(3)])
+        # 200 documentos por banco, inseridos em lotes de até LOTE_INSERCAO
+        self.assertEqual(client.colecoes[f"{bancos[0]}.itens"].lotes, [150, 50])
+
+    def test_todos_com_prefixo(self):
+        client = ClienteContador()
+        for nome, criar in CENARIOS.items():
+            with self.subTest(cenario=nome):
+                self.assertTrue(all(banco.startswith(PREFIXO_BANCOS)
+                                    for banco in criar(client, 0.0001, random.Random(42))))
+        self.assertEqual(len(client.colecoes[f"{PREFIXO_BANCOS}indices.registros"].indices), 40)
+
+    def test_porta_livre(self):
+        porta = porta_livre()
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as conexao:
+            conexao.bind(("127.0.0.1", porta))
+
+
+if __name__ == "__main__":
+    unittest.main()
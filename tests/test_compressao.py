@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Testes do modo archive: nomes dos arquivos, codecs e transmissão comprimida"""
+
+import gzip
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from compressao import (abrir_escrita, abrir_leitura, codecs_disponiveis, despejar_para_archive,
+                        identificar_archive, localizar_archive, nome_arquivo_archive,
+                        restaurar_de_archive, validar_codec)
+
+
+# Processos que fazem o papel do mongodump (escreve no stdout) e do mongorestore (lê o stdin)
+ESCREVER = [sys.executable, "-c", "import sys; sys.stdout.buffer.write(bytes(range(256)) * 4096)"]
+FALHAR = [sys.executable, "-c", "import sys; sys.stdout.buffer.write(b'parcial'); sys.stderr.write('falhou'); sys.exit(2)"]
+CONFERIR = [sys.executable, "-c",
+            "import sys; sys.exit(0 if sys.stdin.buffer.read() == bytes(range(256)) * 4096 else 3)"]
+
+
+class TestNomes(unittest.TestCase):
+
+    def test_nome_e_identificacao(self):
+        for codec in ("gzip", "zstd", "lz4", "nenhuma"):
+            nome = nome_arquivo_archive("vendas", codec)
+            self.assertEqual(identificar_archive(nome), ("vendas", codec))
+
+    def test_extensao_mais_longa_primeiro(self):
+        self.assertEqual(nome_arquivo_archive("vendas", "gzip"), "vendas.archive.gz")
+        self.assertEqual(identificar_archive("vendas.archive"), ("vendas", "nenhuma"))
+        self.assertEqual(identificar_archive("a.b.archive.gz"), ("a.b", "gzip"))
+
+    def test_nao_archive(self):
+        self.assertIsNone(identificar_archive(".archive.gz"))
+        self.assertIsNone(identificar_archive("vendas.bson"))
+        self.assertIsNone(identificar_archive("vendas.indice.json"))
+
+    def test_localizar(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            self.assertIsNone(localizar_archive(pasta, "vendas"))
+            caminho = os.path.join(pasta, "vendas.archive.gz")
+            open(caminho, "wb").close()
+            self.assertEqual(localizar_archive(pasta, "vendas"), (caminho, "gzip"))
+
+
+class TestCodecs(unittest.TestCase):
+
+    def test_disponiveis(self):
+        codecs = codecs_disponiveis()
+        self.assertEqual(codecs[0], "gzip")
+        self.assertEqual(codecs[-1], "nenhuma")
+        for codec in codecs:
+            validar_codec(codec)
+
+    def test_codec_desconhecido(self):
+        with self.assertRaises(ValueError):
+            validar_codec("bzip2")
+
+    def test_ida_e_volta(self):
+        dados = os.urandom(1000) + b"x" * 100000
+        with tempfile.TemporaryDirectory() as pasta:
+            for codec in codecs_disponiveis():
+                caminho = os.path.join(pasta, nome_arquivo_archive("b", codec))
+                with abrir_escrita(caminho, codec) as destino:
+                    destino.write(dados)
+                with abrir_leitura(caminho, codec) as origem:
+                    self.assertEqual(origem.read(), dados, codec)
+
+
+class TestTransmissao(unittest.TestCase):
+
+    def test_despejar_e_restaurar(self):
+        esperado = bytes(range(256)) * 4096
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "b.archive.gz")
+            resumo = hashlib.sha256()
+            lidos = []
+            despejar_para_archive(ESCREVER, caminho, "gzip", resumo=resumo, ao_ler=lidos.append)
+            self.assertEqual(resumo.hexdigest(), hashlib.sha256(esperado).hexdigest())
+            self.assertEqual(sum(lidos), len(esperado))
+            with gzip.open(caminho, "rb") as f:
+                self.assertEqual(f.read(), esperado)
+            self.assertLess(os.path.getsize(caminho), len(esperado))
+            restaurar_de_archive(CONFERIR, caminho, "gzip")
+
+    def test_falha_remove_parcial(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "b.archive.gz")
+            with self.assertRaises(subprocess.CalledProcessError) as contexto:
+                despejar_para_archive(FALHAR, caminho, "gzip")
+            self.assertEqual(contexto.exception.returncode, 2)
+            self.assertIn("falhou", contexto.exception.stderr)
+            self.assertFalse(os.path.exists(caminho))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Testes da construção dos índices no fim da restauração rápida"""
+
+import io
+import os
+import tempfile
+import unittest
+
+import bson
+from bson import json_util
+from pymongo.errors import OperationFailure
+
+from construcao_indices import construir_indices, indices_dos_metadados, metadados_da_pasta, opcoes_carga_rapida
+from deduplicacao import TERMINADOR
+from indice import metadados_do_preludio
+
+
+METADADOS = {
+    "pedidos": {"indexes": [{"v": 2, "key": {"_id": 1}, "name": "_id_"},
+                            {"v": 2, "key": {"cliente": 1, "data": -1}, "name": "cliente_1_data_-1"},
+                            {"v": 2, "key": {"codigo": 1}, "name": "codigo_1", "unique": True}]},
+    "clientes": {"indexes": [{"v": 2, "key": {"_id": 1}, "name": "_id_"},
+                             {"v": 2, "key": {"email": 1}, "name": "email_1"}]},
+    "resumo": {"type": "view", "options": {"viewOn": "pedidos", "pipeline": []}},
+    "system.views": {"indexes": [{"v": 2, "key": {"x": 1}, "name": "x_1"}]},
+}
+
+
+class ColecaoIndices:
+    """Coleção do destino que registra os índices criados (ou falha no índice informado)"""
+
+    def __init__(self, criados, falhar=None):
+        self.criados = criados
+        self.falhar = falhar
+
+    def create_indexes(self, modelos):
+        for modelo in modelos:
+            if modelo.document["name"] == self.falhar:
+                raise OperationFailure("E11000 duplicate key error")
+            self.criados.append(modelo.document)
+
+
+class ClienteIndices:
+
+    def __init__(self, falhar=None):
+        self.criados = []
+        self.falhar = falhar
+
+    def __getitem__(self, nome_banco):
+        return {nome: ColecaoIndices(self.criados, self.falhar) for nome in METADADOS}
+
+
+class TestIndices(unittest.TestCase):
+
+    def test_opcoes_carga(self):
+        self.assertEqual(opcoes_carga_rapida(), ["--noIndexRestore", "--writeConcern={w: 1, j: false}"])
+
+    def test_indices_dos_metadados(self):
+        indices = indices_dos_metadados(METADADOS)
+        self.assertEqual([(colecao, indice["name"]) for colecao, indice in indices],
+                         [("clientes", "email_1"), ("pedidos", "cliente_1_data_-1"), ("pedidos", "codigo_1")])
+        self.assertEqual(len(indices_dos_metadados(METADADOS, colecoes={"clientes"})), 1)
+
+    def test_metadados_da_pasta(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            for nome in ("pedidos", "clientes"):
+                with open(os.path.join(pasta, f"{nome}.metadata.json"), "w", encoding="utf-8") as f:
+                    f.write(json_util.dumps(METADADOS[nome]))
+            open(os.path.join(pasta, "avulsa.bson"), "wb").close()
+            metadados = metadados_da_pasta(pasta)
+        self.assertEqual(metadados["avulsa"], {})
+        self.assertEqual(metadados["pedidos"], METADADOS["pedidos"])
+
+    def test_metadados_do_preludio(self):
+        registros = [b"\x6d\xe2\x99\x81", bson.encode({"concurrent_collections": 1})]
+        registros += [bson.encode({"db": "vendas", "collection": nome, "metadata": json_util.dumps(METADADOS[nome])})
+                      for nome in ("pedidos", "clientes")]
+        registros += [bson.encode({"db": "vendas", "collection": "vazia", "metadata": ""}), TERMINADOR]
+        # Os dados depois do prelúdio não são lidos
+        registros.append(b"\x00" * 100)
+        metadados = metadados_do_preludio(io.BytesIO(b"".join(registros)))
+        self.assertEqual(metadados, {"pedidos": METADADOS["pedidos"], "clientes": METADADOS["clientes"]})
+
+    def test_construir_indices(self):
+        client = ClienteIndices()
+        mensagens = []
+        tempos = construir_indices(client, "vendas", indices_dos_metadados(METADADOS), paralelos=2,
+                                   log=mensagens.append)
+        self.assertEqual(sorted(nome for _, nome, _ in tempos), ["cliente_1_data_-1", "codigo_1", "email_1"])
+        self.assertEqual(sorted(indice["name"] for indice in client.criados), ["cliente_1_data_-1", "codigo_1", "email_1"])
+        self.assertTrue(next(indice for indice in client.criados if indice["name"] == "codigo_1")["unique"])
+        self.assertEqual(construir_indices(client, "vendas", []), [])
+
+    def test_falha_nao_interrompe_os_demais(self):
+        client = ClienteIndices(falhar="codigo_1")
+        with self.assertRaises(OperationFailure):
+            construir_indices(client, "vendas", indices_dos_metadados(METADADOS), log=lambda mensagem: None)
+        self.assertEqual(sorted(indice["name"] for indice in client.criados), ["cliente_1_data_-1", "email_1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Testes do repositório deduplicado: registros do archive, blocos e manifestos"""
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import bson
+
+import deduplicacao
+from deduplicacao import (TERMINADOR, LeitorManifesto, armazenar_stream, caminho_bloco, caminho_repositorio,
+                          dividir_em_blocos, gravar_bloco, identificar_manifesto, iterar_registros, ler_bloco,
+                          nome_manifesto, remover_blocos_orfaos)
+
+
+MAGICO = b"\x6d\xe2\x99\x81"
+
+
+def montar_archive(documentos):
+    """Archive no formato do mongodump: número mágico, documentos e terminadores"""
+    registros = [MAGICO, bson.encode({"concurrent_collections": 1}), TERMINADOR]
+    registros += [bson.encode(documento) for documento in documentos]
+    registros.append(TERMINADOR)
+    return registros
+
+
+def documentos(inicio, quantidade):
+    return [{"_id": numero, "texto": f"documento {numero} " * 20} for numero in range(inicio, inicio + quantidade)]
+
+
+# Blocos pequenos para os testes (os cortes dependem só do conteúdo)
+LIMITES = {"TAMANHO_MINIMO": 2 * 1024, "TAMANHO_MEDIO": 8 * 1024, "TAMANHO_MAXIMO": 32 * 1024}
+
+
+class TestRegistros(unittest.TestCase):
+
+    def test_registros_inteiros(self):
+        registros = montar_archive(documentos(0, 50))
+        self.assertEqual(list(iterar_registros(io.BytesIO(b"".join(registros)))), registros)
+
+    def test_leituras_parciais(self):
+        # Documentos maiores que o buffer de leitura são completados antes de serem devolvidos
+        registros = montar_archive([{"_id": 1, "dados": b"x" * 3000}, {"_id": 2}])
+        with mock.patch.object(deduplicacao, "TAMANHO_LEITURA", 100):
+            self.assertEqual(list(iterar_registros(io.BytesIO(b"".join(registros)))), registros)
+
+    def test_dados_fora_do_formato(self):
+        dados = MAGICO + b"\x01\x00\x00\x00" + b"lixo" * 10
+        self.assertEqual(b"".join(iterar_registros(io.BytesIO(dados))), dados)
+
+    def test_stream_vazio(self):
+        self.assertEqual(list(iterar_registros(io.BytesIO(b""))), [])
+
+
+@mock.patch.multiple(deduplicacao, **LIMITES)
+class TestBlocos(unittest.TestCase):
+
+    def dividir(self, registros):
+        return list(dividir_em_blocos(io.BytesIO(b"".join(registros))))
+
+    def test_limites_e_conteudo(self):
+        registros = montar_archive(documentos(0, 2000))
+        blocos = self.dividir(registros)
+        self.assertGreater(len(blocos), 1)
+        self.assertEqual(b"".join(blocos), b"".join(registros))
+        for bloco in blocos[:-1]:
+            self.assertGreaterEqual(len(bloco), deduplicacao.TAMANHO_MINIMO)
+            self.assertLess(len(bloco), deduplicacao.TAMANHO_MAXIMO + 1024)
+
+    def test_cortes_estaveis(self):
+        # Um documento inserido no início só altera os blocos próximos a ele
+        antes = self.dividir(montar_archive(documentos(0, 2000)))
+        depois = self.dividir(montar_archive([{"_id": "novo"}] + documentos(0, 2000)))
+        repetidos = set(antes) & set(depois)
+        self.assertGreaterEqual(len(repetidos), len(antes) - 2)
+
+    def test_ao_registro(self):
+        registros = montar_archive(documentos(0, 10))
+        recebidos = []
+        list(dividir_em_blocos(io.BytesIO(b"".join(registros)), recebidos.append))
+        self.assertEqual(recebidos, registros)
+
+
+@mock.patch.multiple(deduplicacao, **LIMITES)
+class TestRepositorio(unittest.TestCase):
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.backup_dir = self._pasta.name
+        self.repositorio = caminho_repositorio(self.backup_dir)
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def armazenar(self, nome_backup, dados):
+        pasta = os.path.join(self.backup_dir, nome_backup)
+        os.makedirs(pasta)
+        caminho = os.path.join(pasta, nome_manifesto("vendas"))
+        return caminho, armazenar_stream(io.BytesIO(dados), self.repositorio, caminho, "vendas")
+
+    def test_nome_manifesto(self):
+        self.assertEqual(identificar_manifesto(nome_manifesto("vendas")), "vendas")
+        self.assertIsNone(identificar_manifesto(".dedup.json"))
+        self.assertIsNone(identificar_manifesto("vendas.archive.gz"))
+
+    def test_gravar_bloco_uma_vez(self):
+        hash_hex, gravados = gravar_bloco(self.repositorio, b"conteudo")
+        self.assertGreater(gravados, 0)
+        self.assertEqual(gravar_bloco(self.repositorio, b"conteudo"), (hash_hex, 0))
+        self.assertEqual(ler_bloco(self.repositorio, hash_hex), b"conteudo")
+
+    def test_bloco_corrompido(self):
+        hash_hex, _ = gravar_bloco(self.repositorio, b"conteudo")
+        with open(caminho_bloco(self.repositorio, hash_hex), "wb") as f:
+            f.write(deduplicacao.zlib.compress(b"outro"))
+        with self.assertRaises(ValueError):
+            ler_bloco(self.repositorio, hash_hex)
+
+    def test_ida_e_volta_com_deduplicacao(self):
+        primeiro = b"".join(montar_archive(documentos(0, 2000)))
+        segundo = b"".join(montar_archive(documentos(0, 2000) + documentos(5000, 10)))
+        caminho, manifesto = self.armazenar("b1", primeiro)
+        self.assertEqual(manifesto["tamanho"], len(primeiro))
+        _, manifesto2 = self.armazenar("b2", segundo)
+        # O segundo backup só grava os blocos do final, que mudou
+        self.assertLess(manifesto2["bytes_novos"], manifesto["bytes_novos"] / 4)
+        with LeitorManifesto(caminho) as leitor:
+            self.assertEqual(leitor.read(), primeiro)
+
+    def test_remover_blocos_orfaos(self):
+        caminho, manifesto = self.armazenar("b1", b"".join(montar_archive(documentos(0, 500))))
+        self.assertEqual(remover_blocos_orfaos(self.backup_dir), (0, 0))
+        os.remove(caminho)
+        quantidade, liberados = remover_blocos_orfaos(self.backup_dir, simular=True)
+        self.assertEqual(quantidade, len(set(bloco[0] for bloco in manifesto["blocos"])))
+        self.assertGreater(liberados, 0)
+        self.assertEqual(remover_blocos_orfaos(self.backup_dir), (quantidade, liberados))
+        self.assertEqual(remover_blocos_orfaos(self.backup_dir), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
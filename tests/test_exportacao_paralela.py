@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Testes da exportação em paralelo (maiores bancos primeiro, processos limitados)"""
+
+import contextlib
+import io
+import tempfile
+import threading
+import time
+import unittest
+
+from backup_mongodb import MongoDBBackup, ordenar_bancos_por_tamanho
+
+
+class ClienteTamanhos:
+    """Cliente com o listDatabases informado"""
+
+    def __init__(self, tamanhos=None, erro=None):
+        self.tamanhos = tamanhos or {}
+        self.erro = erro
+
+    def list_databases(self):
+        if self.erro:
+            raise self.erro
+        return [{"name": nome, "sizeOnDisk": tamanho} for nome, tamanho in self.tamanhos.items()]
+
+
+class TestOrdenacao(unittest.TestCase):
+
+    def test_maiores_primeiro(self):
+        client = ClienteTamanhos({"pequeno": 10, "grande": 5000, "medio": 300})
+        self.assertEqual(ordenar_bancos_por_tamanho(client, ["pequeno", "medio", "grande", "novo"]),
+                         ["grande", "medio", "pequeno", "novo"])
+
+    def test_sem_listdatabases(self):
+        client = ClienteTamanhos(erro=RuntimeError("not authorized"))
+        self.assertEqual(ordenar_bancos_por_tamanho(client, ["b", "a"]), ["b", "a"])
+
+
+class ExportacaoSimulada:
+    """Substitui o mongodump: registra os bancos e quantos estavam em andamento ao mesmo tempo"""
+
+    def __init__(self, falhas=()):
+        self.falhas = set(falhas)
+        self.exportados = []
+        self.simultaneos = 0
+        self.maximo = 0
+        self._trava = threading.Lock()
+
+    def __call__(self, nome_banco, pasta_destino):
+        with self._trava:
+            self.simultaneos += 1
+            self.maximo = max(self.maximo, self.simultaneos)
+        time.sleep(0.05)
+        with self._trava:
+            self.simultaneos -= 1
+            self.exportados.append(nome_banco)
+        return nome_banco not in self.falhas
+
+
+class TestExportacaoParalela(unittest.TestCase):
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.bancos = [f"banco{numero}" for numero in range(8)]
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def executar(self, paralelismo, exportacao):
+        backup = MongoDBBackup(backup_dir=self._pasta.name, paralelismo=paralelismo)
+        backup.conectar_mongodb = lambda: True
+        backup.listar_bancos_dados = lambda: list(self.bancos)
+        backup.criar_pasta_backup = lambda: self._pasta.name
+        backup.exportar_banco = exportacao
+        with contextlib.redirect_stdout(io.StringIO()):
+            return backup.executar_backup()
+
+    def test_paralelismo_minimo(self):
+        self.assertEqual(MongoDBBackup(paralelismo=0).paralelismo, 1)
+        self.assertEqual(MongoDBBackup(paralelismo="4").paralelismo, 4)
+
+    def test_limite_de_processos(self):
+        exportacao = ExportacaoSimulada()
+        self.assertTrue(self.executar(3, exportacao))
+        self.assertEqual(exportacao.maximo, 3)
+        self.assertEqual(sorted(exportacao.exportados), sorted(self.bancos))
+
+    def test_sequencial(self):
+        exportacao = ExportacaoSimulada()
+        self.assertTrue(self.executar(1, exportacao))
+        self.assertEqual(exportacao.maximo, 1)
+        self.assertEqual(exportacao.exportados, self.bancos)
+
+    def test_falha_nao_interrompe_os_demais(self):
+        exportacao = ExportacaoSimulada(falhas={"banco2"})
+        self.assertFalse(self.executar(4, exportacao))
+        self.assertEqual(sorted(exportacao.exportados), sorted(self.bancos))
+
+
+if __name__ == "__main__":
+    unittest.main()
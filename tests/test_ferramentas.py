@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Testes da leitura do stderr do mongodump/mongorestore e dos eventos de progresso"""
+
+import io
+import subprocess
+import sys
+import unittest
+
+from ferramentas import executar_ferramenta, interpretar_linha, ler_stderr
+from progresso import ProgressoBackup
+
+
+PROGRESSO_DOCUMENTOS = "2024-01-15T10:00:01.123-0300\t[#####...............]  vendas.pedidos  5802/10000  (58.0%)"
+PROGRESSO_BYTES = "2024-01-15T10:00:01.123-0300\t[##..................]  vendas.pedidos  12.5MB/50.0MB  (25.0%)"
+FIM_EXPORTACAO = "2024-01-15T10:00:02.000-0300\tdone dumping vendas.pedidos (10000 documents)"
+FIM_RESTAURACAO = "2024-01-15T10:00:03.000-0300\tfinished restoring vendas.pedidos (10000 documents, 0 failures)"
+
+
+class TestInterpretarLinha(unittest.TestCase):
+
+    def test_progresso_em_documentos(self):
+        self.assertEqual(interpretar_linha(PROGRESSO_DOCUMENTOS), {
+            "colecao": "vendas.pedidos", "feito": 5802, "total": 10000, "unidade": "documentos",
+            "percentual": 58.0, "concluido": False})
+
+    def test_progresso_em_bytes(self):
+        evento = interpretar_linha(PROGRESSO_BYTES)
+        self.assertEqual((evento["feito"], evento["total"], evento["unidade"]),
+                         (int(12.5 * 1024 ** 2), 50 * 1024 ** 2, "bytes"))
+
+    def test_conclusao(self):
+        for linha in (FIM_EXPORTACAO, FIM_RESTAURACAO):
+            with self.subTest(linha=linha):
+                evento = interpretar_linha(linha)
+                self.assertTrue(evento["concluido"])
+                self.assertEqual((evento["colecao"], evento["feito"], evento["total"]), ("vendas.pedidos", 10000, 10000))
+
+    def test_outras_linhas(self):
+        self.assertIsNone(interpretar_linha("2024-01-15T10:00:00.000-0300\twriting vendas.pedidos to archive"))
+        self.assertIsNone(interpretar_linha("Failed: error connecting to db server"))
+
+
+class TestLerStderr(unittest.TestCase):
+
+    def test_progresso_separado_das_mensagens(self):
+        eventos = []
+        stderr = io.BytesIO("\n".join(["inicio", PROGRESSO_DOCUMENTOS, "aviso: índice", FIM_EXPORTACAO, ""])
+                            .encode("utf-8"))
+        self.assertEqual(ler_stderr(stderr, eventos.append), "inicio\naviso: índice")
+        self.assertEqual([evento["feito"] for evento in eventos], [5802, 10000])
+
+    def test_memoria_limitada(self):
+        stderr = io.BytesIO(b"".join(b"linha %d\r\n" % numero for numero in range(1000)))
+        self.assertEqual(ler_stderr(stderr, max_linhas=3), "linha 997\nlinha 998\nlinha 999")
+
+    def test_bytes_invalidos(self):
+        self.assertEqual(ler_stderr(io.BytesIO(b"erro \xff\n")), "erro \ufffd")
+
+
+class TestExecutarFerramenta(unittest.TestCase):
+
+    def comando(self, codigo):
+        script = (f"import sys\n"
+                  f"sys.stderr.write({PROGRESSO_DOCUMENTOS!r} + '\\n')\n"
+                  f"sys.stderr.write('Failed: sem permissao\\n')\n"
+                  f"sys.exit({codigo})\n")
+        return [sys.executable, "-c", script]
+
+    def test_sucesso(self):
+        eventos = []
+        self.assertEqual(executar_ferramenta(self.comando(0), eventos.append), "Failed: sem permissao")
+        self.assertEqual(len(eventos), 1)
+
+    def test_erro(self):
+        with self.assertRaises(subprocess.CalledProcessError) as contexto:
+            executar_ferramenta(self.comando(3))
+        self.assertEqual(contexto.exception.returncode, 3)
+        self.assertEqual(contexto.exception.stderr, "Failed: sem permissao")
+
+
+class TestEventosNoProgresso(unittest.TestCase):
+
+    def test_fracao_pelos_eventos(self):
+        progresso = ProgressoBackup()
+        progresso.registrar("vendas", 20000, 1000)
+        progresso.iniciar("vendas")
+        progresso.registrar_evento("vendas", interpretar_linha(PROGRESSO_DOCUMENTOS))
+        # Coleções que ainda não apareceram no stderr entram pela estimativa do banco
+        self.assertAlmostEqual(progresso.resumo()["fracao"], 5802 / 20000)
+        progresso.registrar_evento("vendas", interpretar_linha(FIM_EXPORTACAO))
+        self.assertAlmostEqual(progresso.resumo()["fracao"], 10000 / 20000)
+
+    def test_conclusao_em_outra_unidade(self):
+        progresso = ProgressoBackup()
+        progresso.registrar("vendas", 10000, 50 * 1024 ** 2)
+        progresso.iniciar("vendas")
+        progresso.registrar_evento("vendas", interpretar_linha(PROGRESSO_BYTES))
+        self.assertAlmostEqual(progresso.resumo()["fracao"], 0.25)
+        progresso.registrar_evento("vendas", interpretar_linha(FIM_RESTAURACAO))
+        self.assertAlmostEqual(progresso.resumo()["fracao"], 0.99)
+        progresso.concluir("vendas")
+        self.assertEqual(progresso.resumo()["fracao"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
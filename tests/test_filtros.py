@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Testes dos filtros de exportação parcial"""
+
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from filtros import (argumentos_mongodump, banco_filtrado, carregar_filtros, descrever_filtro, filtro_da_colecao,
+                     interpretar_duracao, resolver_filtros)
+
+
+AGORA = datetime(2024, 1, 15, 12, 0, tzinfo=timezone.utc)
+
+
+class TestDuracao(unittest.TestCase):
+
+    def test_unidades(self):
+        self.assertEqual(interpretar_duracao("30s"), timedelta(seconds=30))
+        self.assertEqual(interpretar_duracao("30min"), timedelta(minutes=30))
+        self.assertEqual(interpretar_duracao(" 12 h "), timedelta(hours=12))
+        self.assertEqual(interpretar_duracao("1.5d"), timedelta(days=1, hours=12))
+        self.assertEqual(interpretar_duracao("2sem"), timedelta(weeks=2))
+
+    def test_invalida(self):
+        for texto in ("7", "7 dias", "-1d", "d", ""):
+            with self.assertRaises(ValueError, msg=texto):
+                interpretar_duracao(texto)
+
+
+class TestCarregar(unittest.TestCase):
+
+    def test_extended_json(self):
+        filtros = carregar_filtros({
+            "vendas.pedidos": {"consulta": {"cliente": {"$oid": "65a4f0000000000000000000"},
+                                            "criado": {"$gte": {"$date": "2024-01-01T00:00:00Z"}}}},
+            "logs": {"projecao": {"payload": 0}}
+        })
+        consulta = filtros["vendas.pedidos"]["consulta"]
+        self.assertEqual(consulta["cliente"], ObjectId("65a4f0000000000000000000"))
+        self.assertEqual(consulta["criado"]["$gte"].year, 2024)
+        self.assertIsNone(filtros["vendas.pedidos"]["projecao"])
+        self.assertEqual(filtros["logs"], {"consulta": None, "projecao": {"payload": 0}})
+
+    def test_invalidos(self):
+        for filtros in ({"vendas.": {"consulta": {}}}, {"vendas.pedidos": {}}, {"vendas.pedidos": []},
+                        {"vendas.pedidos": {"query": {}}}, {"vendas.pedidos": {"consulta": "x"}},
+                        {"vendas.pedidos": {"consulta": {"criado": {"$agoraMenos": "ontem"}}}},
+                        {"vendas.pedidos": {"consulta": {"criado": {"$agoraMenos": "999999999999sem"}}}}):
+            with self.assertRaises(ValueError, msg=filtros):
+                carregar_filtros(filtros)
+
+    def test_sem_filtros(self):
+        self.assertEqual(carregar_filtros(None), {})
+
+
+class TestAplicacao(unittest.TestCase):
+
+    def setUp(self):
+        self.filtros = carregar_filtros({
+            "vendas.pedidos": {"consulta": {"criado": {"$gte": {"$agoraMenos": "7d"}}}},
+            "loja_*.log_*": {"projecao": {"payload": 0}},
+            "loja_1.log_acesso": {"consulta": {"nivel": "erro"}},
+            "estoque": {"consulta": {"ativo": True}}
+        })
+
+    def test_datas_relativas(self):
+        resolvidos = resolver_filtros(self.filtros, AGORA)
+        self.assertEqual(resolvidos["vendas.pedidos"]["consulta"]["criado"]["$gte"], AGORA - timedelta(days=7))
+        # Os filtros carregados continuam com o operador, resolvidos de novo a cada execução
+        self.assertEqual(self.filtros["vendas.pedidos"]["consulta"]["criado"]["$gte"], {"$agoraMenos": "7d"})
+
+    def test_filtro_da_colecao(self):
+        self.assertIs(filtro_da_colecao(self.filtros, "loja_1", "log_acesso"), self.filtros["loja_1.log_acesso"])
+        self.assertIs(filtro_da_colecao(self.filtros, "loja_2", "log_acesso"), self.filtros["loja_*.log_*"])
+        self.assertIs(filtro_da_colecao(self.filtros, "estoque", "itens"), self.filtros["estoque"])
+        self.assertIsNone(filtro_da_colecao(self.filtros, "vendas", "clientes"))
+        self.assertIsNone(filtro_da_colecao(self.filtros, "loja_1", "pedidos"))
+
+    def test_banco_filtrado(self):
+        self.assertTrue(banco_filtrado(self.filtros, "loja_9"))
+        self.assertTrue(banco_filtrado(self.filtros, "estoque"))
+        self.assertFalse(banco_filtrado(self.filtros, "financeiro"))
+
+    def test_argumentos_mongodump(self):
+        filtro = resolver_filtros(self.filtros, AGORA)["vendas.pedidos"]
+        opcao, consulta = argumentos_mongodump(filtro)
+        self.assertEqual(opcao, "--query")
+        self.assertEqual(json.loads(consulta),
+                         {"criado": {"$gte": {"$date": {"$numberLong": str(int((AGORA - timedelta(days=7)).timestamp() * 1000))}}}})
+        self.assertEqual(argumentos_mongodump(self.filtros["loja_*.log_*"]), [])
+        self.assertEqual(argumentos_mongodump(None), [])
+
+    def test_descrever(self):
+        self.assertEqual(descrever_filtro(self.filtros["loja_*.log_*"]), 'projecao {"payload": 0}')
+        self.assertEqual(descrever_filtro(self.filtros["estoque"]), 'consulta {"ativo": true}')
+
+
+if __name__ == "__main__":
+    unittest.main()
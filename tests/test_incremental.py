@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Testes do estado dos backups incrementais (oplog)"""
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from bson.timestamp import Timestamp
+
+import backup_mongodb
+from backup_mongodb import MongoDBBackup
+from catalogo import listar_execucoes
+
+from incremental import (ARQUIVO_OPLOG, PASTA_INCREMENTOS, consulta_intervalo_oplog, criar_estado,
+                         datetime_para_ts, dict_para_ts, escolher_base_para_alvo, formatar_oplog_limit,
+                         incrementos_ate, interpretar_data_hora, ler_estado, listar_incrementos,
+                         localizar_base_incremental, salvar_estado, ts_para_dict)
+
+
+def criar_base(backup_dir, nome, criado_em, incrementos=(), intervalos=None):
+    """Cria uma base incremental com os incrementos (pastas com oplog.bson) informados"""
+    pasta = os.path.join(backup_dir, nome)
+    os.makedirs(pasta)
+    estado = criar_estado(Timestamp(1000, 1))
+    estado["criado_em"] = criado_em
+    estado["incrementos"] = list(incrementos)
+    estado["intervalos"] = intervalos or {}
+    for incremento in incrementos:
+        os.makedirs(os.path.join(pasta, PASTA_INCREMENTOS, incremento))
+        open(os.path.join(pasta, PASTA_INCREMENTOS, incremento, ARQUIVO_OPLOG), "wb").close()
+    salvar_estado(pasta, estado)
+    return pasta
+
+
+class TestTimestamps(unittest.TestCase):
+
+    def test_ida_e_volta(self):
+        ts = Timestamp(1700000000, 7)
+        self.assertEqual(ts_para_dict(ts), {"t": 1700000000, "i": 7})
+        self.assertEqual(dict_para_ts(json.loads(json.dumps(ts_para_dict(ts)))), ts)
+
+    def test_consulta_intervalo(self):
+        consulta = json.loads(consulta_intervalo_oplog(Timestamp(10, 1), Timestamp(20, 2)))
+        self.assertEqual(consulta, {"ts": {"$gt": {"$timestamp": {"t": 10, "i": 1}},
+                                           "$lte": {"$timestamp": {"t": 20, "i": 2}}}})
+
+
+class TestEstado(unittest.TestCase):
+
+    def test_salvar_e_ler(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            self.assertIsNone(ler_estado(pasta))
+            estado = criar_estado(Timestamp(50, 3))
+            self.assertEqual(estado["base_ts"], estado["ultimo_ts"])
+            salvar_estado(pasta, estado)
+            self.assertEqual(ler_estado(pasta), estado)
+            self.assertEqual(os.listdir(pasta), ["incremental.json"])
+
+    def test_estado_ilegivel(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            with open(os.path.join(pasta, "incremental.json"), "w") as f:
+                f.write("{corrompido")
+            self.assertIsNone(ler_estado(pasta))
+
+    def test_listar_incrementos_ignora_incompletos(self):
+        with tempfile.TemporaryDirectory() as backup_dir:
+            pasta = criar_base(backup_dir, "base", "2024-01-15T10:00:00", ["inc1", "inc2"])
+            estado = ler_estado(pasta)
+            estado["incrementos"].append("inc3")
+            salvar_estado(pasta, estado)
+            nomes = [os.path.basename(caminho) for caminho in listar_incrementos(pasta)]
+            self.assertEqual(nomes, ["inc1", "inc2"])
+
+    def test_base_mais_recente(self):
+        with tempfile.TemporaryDirectory() as backup_dir:
+            self.assertIsNone(localizar_base_incremental(backup_dir))
+            criar_base(backup_dir, "b", "2024-01-16T10:00:00")
+            criar_base(backup_dir, "a", "2024-01-15T10:00:00")
+            os.makedirs(os.path.join(backup_dir, "sem_estado"))
+            pasta, _ = localizar_base_incremental(backup_dir)
+            self.assertEqual(os.path.basename(pasta), "b")
+
+
+class TestIncrementoVazio(unittest.TestCase):
+
+    def test_sem_alteracoes(self):
+        with tempfile.TemporaryDirectory() as backup_dir:
+            pasta = criar_base(backup_dir, "base", "2024-01-15T10:00:00")
+            estado = ler_estado(pasta)
+            backup = MongoDBBackup(backup_dir=backup_dir, log=lambda mensagem: None)
+            with mock.patch.object(backup_mongodb, "ultimo_ts_oplog", return_value=Timestamp(1000, 1)):
+                self.assertTrue(backup.capturar_incremento(pasta, estado))
+            self.assertEqual(backup.resumo, {"sucessos": 1, "falhas": 0, "pasta": pasta, "bytes": 0})
+            # Nenhuma pasta de incremento, mas o estado registra até quando a base foi conferida
+            self.assertFalse(os.path.exists(os.path.join(pasta, PASTA_INCREMENTOS)))
+            estado = ler_estado(pasta)
+            self.assertEqual(estado["incrementos"], [])
+            self.assertIn("sem_alteracoes_ate", estado)
+            execucoes = listar_execucoes(backup_dir)
+            self.assertEqual(len(execucoes), 1)
+            self.assertEqual((execucoes[0]["tipo"], execucoes[0]["status"]), ("incremental", "ok"))
+            self.assertTrue(execucoes[0]["nome"].startswith(os.path.join("base", PASTA_INCREMENTOS)))
+
+
+class TestRestauracaoPontual(unittest.TestCase):
+
+    def test_formatar_oplog_limit(self):
+        self.assertEqual(formatar_oplog_limit(Timestamp(1705323600, 4)), "1705323600:4")
+
+    def test_datetime_para_ts(self):
+        momento = datetime(2024, 1, 15, 10, 30)
+        self.assertEqual(datetime_para_ts(momento), Timestamp(int(momento.timestamp()), 0))
+
+    def test_interpretar_data_hora(self):
+        esperado = datetime(2024, 1, 15, 14, 30, 45)
+        for texto in ("15-01-2024 14:30:45", "15/01/2024 14:30:45", "15-01-2024 - 14-30-45",
+                      "2024-01-15T14:30:45", " 15-01-2024 14:30:45 "):
+            self.assertEqual(interpretar_data_hora(texto), esperado, texto)
+        self.assertEqual(interpretar_data_hora("15/01/2024 14:30"), datetime(2024, 1, 15, 14, 30))
+
+    def test_data_hora_invalida(self):
+        for texto in ("ontem", "32-01-2024 10:00", ""):
+            with self.assertRaises(ValueError):
+                interpretar_data_hora(texto)
+
+    def test_escolher_base_concluida_ate_o_alvo(self):
+        with tempfile.TemporaryDirectory() as backup_dir:
+            criar_base(backup_dir, "a", "2024-01-15T10:00:00")
+            criar_base(backup_dir, "b", "2024-01-16T10:00:00")
+            criar_base(backup_dir, "c", "2024-01-17T10:00:00")
+            pasta, _ = escolher_base_para_alvo(backup_dir, datetime(2024, 1, 16, 23, 0))
+            self.assertEqual(os.path.basename(pasta), "b")
+            pasta, _ = escolher_base_para_alvo(backup_dir, datetime(2024, 1, 16, 10, 0))
+            self.assertEqual(os.path.basename(pasta), "b")
+            self.assertIsNone(escolher_base_para_alvo(backup_dir, datetime(2024, 1, 14)))
+
+    def test_incrementos_ate_o_alvo(self):
+        intervalos = {
+            "inc1": {"inicio": {"t": 100, "i": 0}, "fim": {"t": 200, "i": 0}},
+            "inc2": {"inicio": {"t": 200, "i": 0}, "fim": {"t": 300, "i": 0}},
+            "inc3": {"inicio": {"t": 300, "i": 0}, "fim": {"t": 400, "i": 0}},
+        }
+        with tempfile.TemporaryDirectory() as backup_dir:
+            pasta = criar_base(backup_dir, "base", "2024-01-15T10:00:00", ["inc1", "inc2", "inc3"], intervalos)
+
+            def nomes(alvo):
+                return [os.path.basename(caminho) for caminho in incrementos_ate(pasta, alvo)]
+
+            # O último incremento usado contém o alvo (é cortado pelo --oplogLimit)
+            self.assertEqual(nomes(Timestamp(250, 0)), ["inc1", "inc2"])
+            self.assertEqual(nomes(Timestamp(300, 0)), ["inc1", "inc2"])
+            self.assertEqual(nomes(Timestamp(300, 1)), ["inc1", "inc2", "inc3"])
+            self.assertEqual(nomes(Timestamp(50, 0)), [])
+
+    def test_incrementos_sem_intervalo(self):
+        with tempfile.TemporaryDirectory() as backup_dir:
+            pasta = criar_base(backup_dir, "base", "2024-01-15T10:00:00", ["inc1", "inc2"])
+            self.assertEqual(len(incrementos_ate(pasta, Timestamp(1, 0))), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""Testes do índice das coleções e da leitura por quadros dos archives"""
+
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import bson
+
+import backup_mongodb
+import compressao
+import deduplicacao
+import indice as modulo_indice
+from backup_mongodb import MongoDBRestore
+from compressao import EscritorQuadros, copiar_registros, ler_trechos
+from deduplicacao import TERMINADOR, armazenar_stream, caminho_repositorio, iterar_registros
+from indice import (IndiceArchive, abrir_colecoes, bancos_selecionados, blocos_das_colecoes, colecoes_selecionadas,
+                    corresponde, filtros_namespace, localizar_indice, separar_padroes, trechos_das_colecoes)
+
+
+MAGICO = b"\x6d\xe2\x99\x81"
+
+
+def bloco(colecao, documentos, eof=False):
+    """Bloco de dados de uma coleção no archive: cabeçalho, documentos e terminador"""
+    registros = [bson.encode({"db": "vendas", "collection": colecao, "EOF": eof, "CRC": 0})]
+    registros += [bson.encode(documento) for documento in documentos]
+    return registros + [TERMINADOR]
+
+
+def montar_archive(blocos):
+    """Archive com prelúdio (cabeçalho e metadados das coleções) e os blocos em ordem"""
+    colecoes = sorted({colecao for colecao, _ in blocos})
+    registros = [MAGICO, bson.encode({"concurrent_collections": 2})]
+    registros += [bson.encode({"db": "vendas", "collection": colecao, "metadata": "{}", "size": 0, "type": "collection"})
+                  for colecao in colecoes]
+    registros.append(TERMINADOR)
+    for colecao, documentos in blocos:
+        registros += bloco(colecao, documentos)
+    for colecao in colecoes:
+        registros += bloco(colecao, [], eof=True)
+    return b"".join(registros)
+
+
+def documentos(colecao, inicio, quantidade):
+    return [{"_id": numero, "colecao": colecao, "texto": "x" * 200} for numero in range(inicio, inicio + quantidade)]
+
+
+# Blocos das coleções intercalados, como no mongodump com várias coleções em paralelo
+BLOCOS = [("pedidos", documentos("pedidos", 0, 30)), ("clientes", documentos("clientes", 0, 20)),
+          ("pedidos", documentos("pedidos", 30, 30)), ("log", documentos("log", 0, 50)),
+          ("clientes", documentos("clientes", 20, 20))]
+
+
+def documentos_restaurados(dados):
+    """Documentos (fora do prelúdio e dos cabeçalhos) de um archive, por coleção"""
+    encontrados = {}
+    registros = iterar_registros(io.BytesIO(dados))
+    estado = "preludio"
+    next(registros)
+    for registro in registros:
+        if registro == TERMINADOR:
+            estado = "cabecalho"
+        elif estado == "cabecalho":
+            estado = "dados"
+        elif estado == "dados":
+            documento = bson.decode(registro)
+            encontrados.setdefault(documento["colecao"], []).append(documento["_id"])
+    return encontrados
+
+
+class TestPadroes(unittest.TestCase):
+
+    def test_corresponde(self):
+        self.assertTrue(corresponde("log_2024", "log_*"))
+        self.assertTrue(corresponde("vendas", "*"))
+        self.assertTrue(corresponde("a.b", "a.b"))
+        self.assertFalse(corresponde("axb", "a.b"))
+        self.assertFalse(corresponde("log", "log_*"))
+
+    def test_separar(self):
+        self.assertEqual(separar_padroes(["vendas.pedidos", "loja_*.log_*", "estoque"]),
+                         [("vendas", "pedidos"), ("loja_*", "log_*"), ("estoque", "*")])
+        for invalido in (".pedidos", "vendas."):
+            with self.assertRaises(ValueError):
+                separar_padroes([invalido])
+
+    def test_selecao(self):
+        padroes = ["vendas.pedidos", "loja_*.log_*"]
+        self.assertEqual(bancos_selecionados(["vendas", "loja_1", "estoque"], padroes), ["vendas", "loja_1"])
+        self.assertEqual(colecoes_selecionadas("loja_1", ["log_a", "pedidos", "log_b"], padroes), ["log_a", "log_b"])
+        self.assertEqual(colecoes_selecionadas("vendas", ["log_a", "pedidos"], padroes), ["pedidos"])
+
+    def test_filtros_namespace(self):
+        self.assertEqual(filtros_namespace("vendas"), ["--nsInclude=vendas.*"])
+        self.assertEqual(filtros_namespace("loja_1", ["vendas.pedidos", "loja_*.log_*", "loja_1.clientes"]),
+                         ["--nsInclude=loja_1.log_*", "--nsInclude=loja_1.clientes"])
+
+
+class TestIndiceArchive(unittest.TestCase):
+
+    def indexar(self, dados):
+        indice = IndiceArchive()
+        for registro in iterar_registros(io.BytesIO(dados)):
+            indice.registrar(registro)
+        return indice
+
+    def test_trechos_por_colecao(self):
+        dados = montar_archive(BLOCOS)
+        indice = self.indexar(dados)
+        self.assertTrue(indice.valido)
+        self.assertEqual(indice.posicao, len(dados))
+        self.assertEqual(set(indice.colecoes), {"pedidos", "clientes", "log"})
+        # Dois blocos de dados e o de EOF
+        self.assertEqual(len(indice.colecoes["pedidos"]), 3)
+        for colecao, blocos in indice.colecoes.items():
+            for inicio, tamanho in blocos:
+                fim_cabecalho = inicio + int.from_bytes(dados[inicio:inicio + 4], "little")
+                self.assertEqual(bson.decode(dados[inicio:fim_cabecalho])["collection"], colecao)
+                self.assertEqual(dados[inicio + tamanho - 4:inicio + tamanho], TERMINADOR)
+
+    def test_gravar(self):
+        dados = montar_archive(BLOCOS)
+        with tempfile.TemporaryDirectory() as pasta:
+            self.assertIsNone(localizar_indice(pasta, "vendas"))
+            self.assertTrue(self.indexar(dados).gravar(pasta, "vendas"))
+            indice = localizar_indice(pasta, "vendas")
+            self.assertEqual(indice["tamanho"], len(dados))
+            # Archive incompleto (interrompido no meio de um bloco) não gera índice
+            self.assertFalse(self.indexar(dados[:-10]).gravar(pasta, "outro"))
+
+    def test_formato_inesperado(self):
+        indice = self.indexar(MAGICO + bson.encode({}) + TERMINADOR + b"\x05\x00\x00\x00\x01" + TERMINADOR)
+        self.assertFalse(indice.valido)
+
+    def test_trechos_das_colecoes(self):
+        indice = {"cabecalho": 100, "colecoes": {"a": [[300, 50], [100, 20]], "b": [[120, 180]], "": [[350, 10]]}}
+        self.assertEqual(trechos_das_colecoes(indice, {"a"}), [[0, 100], [100, 20], [300, 50], [350, 10]])
+
+
+@mock.patch.multiple(compressao, TAMANHO_QUADRO=4096, TAMANHO_BLOCO=1024)
+class TestLeituraParcial(unittest.TestCase):
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.pasta = self._pasta.name
+        self.dados = montar_archive(BLOCOS)
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def gravar_archive(self, codec):
+        caminho = os.path.join(self.pasta, compressao.nome_arquivo_archive("vendas", codec))
+        indice = IndiceArchive()
+        with open(caminho, "wb") as arquivo:
+            escritor = EscritorQuadros(arquivo, codec)
+            copiar_registros(io.BytesIO(self.dados), escritor, indice)
+            escritor.close()
+        indice.quadros = escritor.quadros
+        indice.gravar(self.pasta, "vendas")
+        return caminho, localizar_indice(self.pasta, "vendas")
+
+    def test_quadros_independentes(self):
+        caminho, indice = self.gravar_archive("gzip")
+        self.assertGreater(len(indice["quadros"]), 3)
+        with gzip.open(caminho, "rb") as f:
+            self.assertEqual(f.read(), self.dados)
+        with open(caminho, "rb") as f:
+            for posicao, deslocamento in indice["quadros"]:
+                f.seek(deslocamento)
+                with gzip.open(f, "rb") as quadro:
+                    self.assertEqual(quadro.read(100), self.dados[posicao:posicao + 100])
+
+    def test_ler_trechos(self):
+        for codec in ("gzip", "nenhuma"):
+            caminho, indice = self.gravar_archive(codec)
+            trechos = [[10, 20], [5000, 3000], [9000, 10], [len(self.dados) - 4, 4]]
+            lidos = b"".join(ler_trechos(caminho, codec, indice["quadros"], trechos))
+            self.assertEqual(lidos, b"".join(self.dados[inicio:inicio + tamanho] for inicio, tamanho in trechos), codec)
+
+    def test_ler_trechos_fecha_os_quadros(self):
+        caminho, indice = self.gravar_archive("gzip")
+        # As referências guardadas impedem que o coletor de lixo feche os leitores
+        abertos = []
+        original = compressao.abrir_leitura
+
+        def abrir_leitura(arquivo, codec):
+            abertos.append(original(arquivo, codec))
+            return abertos[-1]
+
+        trechos = [[0, 10], [5000, 10], [12000, 10]]
+        with mock.patch.object(compressao, "abrir_leitura", abrir_leitura):
+            partes = ler_trechos(caminho, "gzip", indice["quadros"], trechos)
+            next(partes)
+            next(partes)
+            self.assertEqual([leitor.closed for leitor in abertos], [True, False])
+            list(partes)
+        self.assertEqual(len(abertos), 3)
+        self.assertTrue(all(leitor.closed for leitor in abertos))
+
+    def test_abrir_colecoes_do_archive(self):
+        caminho, indice = self.gravar_archive("gzip")
+        leitor, tamanho = abrir_colecoes(indice, ["clientes"], archive=(caminho, "gzip"))
+        dados = leitor.read()
+        self.assertEqual(len(dados), tamanho)
+        self.assertLess(tamanho, len(self.dados) / 2)
+        self.assertEqual(documentos_restaurados(dados), {"clientes": list(range(40))})
+        self.assertIsNone(abrir_colecoes(dict(indice, quadros=None), ["clientes"], archive=(caminho, "gzip")))
+
+    def gravar_repositorio(self):
+        limites = {"TAMANHO_MINIMO": 1024, "TAMANHO_MEDIO": 4096, "TAMANHO_MAXIMO": 8192}
+        manifesto = os.path.join(self.pasta, "vendas.dedup.json")
+        indice = IndiceArchive()
+        with mock.patch.multiple(deduplicacao, **limites):
+            armazenar_stream(io.BytesIO(self.dados), caminho_repositorio(self.pasta), manifesto, "vendas",
+                             ao_registro=indice.registrar)
+        indice.gravar(self.pasta, "vendas")
+        return manifesto, localizar_indice(self.pasta, "vendas")
+
+    def test_abrir_colecoes_do_repositorio(self):
+        manifesto, indice = self.gravar_repositorio()
+        leitor, _ = abrir_colecoes(indice, ["pedidos", "log"], manifesto=manifesto)
+        partes = iter(lambda: leitor.read(1000), b"")
+        self.assertEqual(documentos_restaurados(b"".join(partes)),
+                         {"pedidos": list(range(60)), "log": list(range(50))})
+
+    def test_blocos_das_colecoes(self):
+        # A verificação seletiva confere exatamente os blocos que a leitura usa
+        manifesto, indice = self.gravar_repositorio()
+        lidos = set()
+        original = modulo_indice.ler_bloco
+
+        def ler_bloco(repositorio, hash_hex):
+            lidos.add(hash_hex)
+            return original(repositorio, hash_hex)
+
+        with mock.patch.object(modulo_indice, "ler_bloco", ler_bloco):
+            leitor, _ = abrir_colecoes(indice, ["clientes"], manifesto=manifesto)
+            leitor.read()
+        blocos = blocos_das_colecoes(indice, ["clientes"], manifesto)
+        self.assertEqual(blocos, lidos)
+        with open(manifesto, encoding="utf-8") as f:
+            self.assertLess(len(blocos), len(json.load(f)["blocos"]))
+
+
+class TestVerificacaoSeletiva(unittest.TestCase):
+
+    def test_bancos_com_indice_sao_verificados(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            with open(os.path.join(pasta, "vendas.archive.gz"), "wb") as f:
+                f.write(gzip.compress(montar_archive(BLOCOS)))
+            with open(os.path.join(pasta, "vendas.indice.json"), "w") as f:
+                json.dump({"tamanho": 1, "cabecalho": 1, "quadros": [[0, 0]], "colecoes": {"clientes": []}}, f)
+            restore = MongoDBRestore(colecoes=["vendas.clientes"], log=lambda mensagem: None)
+            restore.conectar_mongodb = lambda: self.fail("o destino não deveria ser alterado")
+            with mock.patch.object(backup_mongodb, "verificar_backup", return_value=["corrompido"]) as verificar:
+                self.assertFalse(restore.executar_restore(pasta))
+            self.assertEqual(verificar.call_args.args[1], ["vendas"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""Testes da limitação de carga: configuração, limite de vazão e redução adaptativa"""
+
+import sys
+import unittest
+from unittest import mock
+
+import limitacao
+from limitacao import (FATOR_MINIMO, LimitacaoBackup, LimitadorVazao, MonitorServidor, mesclar_limitacao,
+                       normalizar_limitacao)
+
+
+class Relogio:
+    """Substitui o módulo time do limitador: sleep apenas avança o relógio"""
+
+    def __init__(self):
+        self.agora = 1000.0
+        self.esperas = []
+
+    def monotonic(self):
+        return self.agora
+
+    def sleep(self, segundos):
+        self.esperas.append(segundos)
+        self.agora += segundos
+
+
+class TestConfiguracao(unittest.TestCase):
+
+    def test_normalizar(self):
+        normalizada = normalizar_limitacao({"leitura_mb_s": 50, "escrita_mb_s": 0})
+        self.assertEqual(normalizada["leitura_mb_s"], 50)
+        self.assertIsNone(normalizada["escrita_mb_s"])
+        self.assertEqual(set(normalizada), set(limitacao.CHAVES_LIMITACAO))
+        self.assertEqual(normalizar_limitacao(None), dict.fromkeys(limitacao.CHAVES_LIMITACAO))
+
+    def test_valores_invalidos(self):
+        for invalida in ({"leitura": 10}, {"leitura_mb_s": -5}, {"prioridade_cpu": 20},
+                         {"prioridade_io": "alta"}, {"fila_alvo": "-1"}):
+            with self.assertRaises(ValueError, msg=invalida):
+                normalizar_limitacao(invalida)
+
+    def test_mesclar(self):
+        self.assertEqual(mesclar_limitacao({"leitura_mb_s": 10, "prioridade_cpu": 10}, {"leitura_mb_s": 5}),
+                         {"leitura_mb_s": 5, "prioridade_cpu": 10})
+        self.assertEqual(mesclar_limitacao(None, None), {})
+
+    def test_descrever(self):
+        limitacao_backup = LimitacaoBackup({"leitura_mb_s": 20, "prioridade_io": "baixa"})
+        self.assertEqual(limitacao_backup.descrever(), "leitura 20 MB/s, I/O baixa")
+        self.assertTrue(limitacao_backup.limita_vazao)
+        self.assertFalse(limitacao_backup.adaptativa)
+        self.assertEqual(limitacao_backup.leitura.taxa, 20 * 1024 * 1024)
+        self.assertIsNone(limitacao_backup.escrita.taxa)
+
+    @unittest.skipIf(sys.platform == "win32", "prioridade por nice/ionice")
+    def test_preparar_comando(self):
+        with mock.patch.object(limitacao.shutil, "which", return_value="/usr/bin/ionice"):
+            comando, opcoes = LimitacaoBackup({"prioridade_cpu": 10, "prioridade_io": "ocioso"}).preparar_comando(
+                ["mongodump", "--db", "vendas"])
+        self.assertEqual(comando, ["ionice", "-c", "3", "nice", "-n", "10", "mongodump", "--db", "vendas"])
+        self.assertEqual(opcoes, {})
+        with mock.patch.object(limitacao.shutil, "which", return_value=None):
+            comando, _ = LimitacaoBackup({"prioridade_io": "baixa"}).preparar_comando(["mongodump"])
+        self.assertEqual(comando, ["mongodump"])
+
+
+class TestLimitadorVazao(unittest.TestCase):
+
+    def setUp(self):
+        self.relogio = Relogio()
+        self._troca = mock.patch.object(limitacao, "time", self.relogio)
+        self._troca.start()
+
+    def tearDown(self):
+        self._troca.stop()
+
+    def test_sem_limite_so_mede(self):
+        limitador = LimitadorVazao()
+        for _ in range(10):
+            limitador.consumir(1000)
+        self.assertEqual(self.relogio.esperas, [])
+        self.assertEqual(limitador.vazao_recente(), 10000 / limitacao.JANELA_VAZAO)
+
+    def test_respeita_a_taxa(self):
+        limitador = LimitadorVazao(1000)
+        inicio = self.relogio.agora
+        for _ in range(20):
+            limitador.consumir(500)
+        self.assertAlmostEqual(self.relogio.agora - inicio, 10.0)
+
+    def test_rajada_depois_de_pausa(self):
+        limitador = LimitadorVazao(1000)
+        limitador.consumir(1000)
+        self.relogio.agora += 60
+        esperas = len(self.relogio.esperas)
+        # Depois da pausa, até RAJADA_SEGUNDOS de vazão passa sem espera
+        limitador.consumir(1000 * limitacao.RAJADA_SEGUNDOS)
+        self.assertEqual(len(self.relogio.esperas), esperas)
+        limitador.consumir(500)
+        self.assertAlmostEqual(self.relogio.esperas[-1], 0.5)
+
+    def test_fator_reduz_a_taxa(self):
+        limitador = LimitadorVazao(1000)
+        limitador.ajustar(0.5)
+        self.assertEqual(limitador.taxa_efetiva(), 500)
+        inicio = self.relogio.agora
+        for _ in range(10):
+            limitador.consumir(500)
+        self.assertAlmostEqual(self.relogio.agora - inicio, 10.0)
+
+    def test_reducao_sem_limite_fixo(self):
+        # Sem limite, a redução parte da vazão medida quando ela começou
+        limitador = LimitadorVazao()
+        limitador.consumir(5000)
+        self.assertIsNone(limitador.taxa_efetiva())
+        limitador.ajustar(0.5)
+        self.assertEqual(limitador.taxa_efetiva(), 500)
+        limitador.ajustar(0.25)
+        self.assertEqual(limitador.taxa_efetiva(), 250)
+        limitador.ajustar(1.0)
+        self.assertIsNone(limitador.taxa_efetiva())
+
+
+class ClienteStatus:
+    """Cliente que devolve uma sequência de serverStatus"""
+
+    def __init__(self, status):
+        self.status = list(status)
+        self.admin = self
+
+    def command(self, nome):
+        return self.status.pop(0)
+
+
+def server_status(latencia_us, operacoes, fila=0):
+    return {"opLatencies": {"reads": {"latency": latencia_us, "ops": operacoes}},
+            "globalLock": {"currentQueue": {"total": fila}}}
+
+
+class TestMonitorServidor(unittest.TestCase):
+
+    def monitor(self, status, **alvos):
+        monitor = MonitorServidor(ClienteStatus(status), LimitadorVazao(1000), log=lambda mensagem: None, **alvos)
+        # Cada wait do laço é uma leitura; a última encerra o monitor
+        monitor._parar = mock.Mock()
+        monitor._parar.wait.side_effect = [False] * len(status) + [True]
+        return monitor
+
+    def test_medir(self):
+        monitor = self.monitor([server_status(1000, 10), server_status(51000, 20, fila=3)])
+        self.assertEqual(monitor.medir(), (None, 0))
+        self.assertEqual(monitor.medir(), (5.0, 3))
+
+    def test_reducao_e_recuperacao(self):
+        monitor = self.monitor([server_status(0, 0), server_status(100000, 10), server_status(200000, 20),
+                                server_status(200100, 120)], latencia_alvo_ms=5)
+        fatores = []
+        ajustar = monitor.limitador.ajustar
+        monitor.limitador.ajustar = lambda fator: (fatores.append(fator), ajustar(fator))
+        monitor.executar()
+        self.assertEqual(fatores, [1.0, 0.5, 0.25, 0.35])
+
+    def test_fila_e_fator_minimo(self):
+        status = [server_status(0, 0, fila=50) for _ in range(6)]
+        monitor = self.monitor(status, fila_alvo=10)
+        monitor.executar()
+        self.assertEqual(monitor.limitador.fator, FATOR_MINIMO)
+
+
+if __name__ == "__main__":
+    unittest.main()
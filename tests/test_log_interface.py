@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Testes da fila de log da interface (mensagens em lotes e widget limitado)"""
+
+import logging
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import log_interface
+from log_interface import ARQUIVO_LOG, PASTA_LOGS, FilaLog, criar_logger_arquivo
+
+
+class WidgetTexto:
+    """Imita o ScrolledText: uma lista de linhas, com índices "linha.coluna" do Tk"""
+
+    def __init__(self):
+        self.linhas = []
+        self.insercoes = 0
+
+    def insert(self, posicao, texto):
+        self.insercoes += 1
+        self.linhas.extend(texto.rstrip("\n").split("\n"))
+
+    def delete(self, inicio, fim):
+        if str(fim) == "end":
+            self.linhas = []
+        else:
+            del self.linhas[:int(float(fim)) - 1]
+
+    def see(self, posicao):
+        pass
+
+
+class TestFilaLog(unittest.TestCase):
+
+    def test_mensagens_de_varias_threads(self):
+        widget = WidgetTexto()
+        fila = FilaLog(widget, "backup")
+        threads = [threading.Thread(target=lambda n=n: [fila.escrever(f"t{n} m{i}") for i in range(50)])
+                   for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Nada chega ao widget antes de a thread principal drenar a fila
+        self.assertEqual(widget.linhas, [])
+        while not fila.fila.empty():
+            fila.drenar()
+        self.assertEqual(len(widget.linhas), 200)
+        self.assertTrue(all(linha.startswith("[") for linha in widget.linhas))
+
+    def test_lotes(self):
+        widget = WidgetTexto()
+        fila = FilaLog(widget, "backup")
+        with mock.patch.object(log_interface, "LOTE_LINHAS", 10):
+            for numero in range(25):
+                fila.escrever(f"mensagem {numero}")
+            fila.drenar()
+            self.assertEqual((widget.insercoes, len(widget.linhas)), (1, 10))
+            fila.drenar()
+            fila.drenar()
+            fila.drenar()
+        self.assertEqual((widget.insercoes, len(widget.linhas)), (3, 25))
+
+    def test_linhas_antigas_descartadas(self):
+        widget = WidgetTexto()
+        fila = FilaLog(widget, "backup", max_linhas=30)
+        for numero in range(100):
+            fila.escrever(f"mensagem {numero}")
+            if numero % 7 == 0:
+                fila.drenar()
+        fila.drenar()
+        self.assertEqual(len(widget.linhas), 30)
+        self.assertEqual(fila.linhas_widget, 30)
+        self.assertTrue(widget.linhas[-1].endswith("mensagem 99"))
+        self.assertTrue(widget.linhas[0].endswith("mensagem 70"))
+
+    def test_mensagem_longa_truncada(self):
+        widget = WidgetTexto()
+        logger = mock.Mock()
+        fila = FilaLog(widget, "restore", logger=logger)
+        stderr = "\n".join(f"linha {numero}" for numero in range(100))
+        fila.escrever(stderr)
+        fila.drenar()
+        self.assertEqual(len(widget.linhas), log_interface.MAX_LINHAS_MENSAGEM + 1)
+        self.assertIn("80 linha(s) omitida(s)", widget.linhas[-1])
+        # O arquivo de log recebe a mensagem completa
+        logger.info.assert_called_once_with(f"[restore] {stderr}")
+
+    def test_limpar(self):
+        widget = WidgetTexto()
+        fila = FilaLog(widget, "backup")
+        fila.escrever("mensagem")
+        fila.drenar()
+        fila.limpar()
+        self.assertEqual((widget.linhas, fila.linhas_widget), ([], 0))
+
+
+class TestLoggerArquivo(unittest.TestCase):
+
+    def tearDown(self):
+        logger = logging.getLogger("backup_mongodb_gui")
+        for handler in list(logger.handlers):
+            handler.close()
+            logger.removeHandler(handler)
+
+    def test_grava_na_pasta_de_logs(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            logger = criar_logger_arquivo(pasta)
+            logger.info("[backup] ✓ Conexão estabelecida")
+            # Chamadas seguintes reaproveitam o mesmo handler
+            self.assertIs(criar_logger_arquivo(pasta), logger)
+            self.assertEqual(len(logger.handlers), 1)
+            logger.handlers[0].flush()
+            with open(os.path.join(pasta, PASTA_LOGS, ARQUIVO_LOG), encoding="utf-8") as f:
+                self.assertIn("✓ Conexão estabelecida", f.read())
+            self.tearDown()
+
+
+if __name__ == "__main__":
+    unittest.main()
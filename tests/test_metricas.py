@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Testes das métricas das execuções (tempo de CPU por execução e por banco)"""
+
+import subprocess
+import sys
+import threading
+import unittest
+
+from ferramentas import aguardar_processo, cpu_filhos_thread, executar_ferramenta
+from metricas import MetricasExecucao, texto_prometheus
+
+
+# Processo que faz o papel do mongodump, gastando CPU
+QUEIMAR_CPU = [sys.executable, "-c", "total = 0\nfor numero in range(1500000): total += numero"]
+
+
+@unittest.skipIf(cpu_filhos_thread() is None, "CPU dos processos filhos requer os.wait4")
+class TestCpuFerramentas(unittest.TestCase):
+
+    def test_aguardar_processo(self):
+        antes = cpu_filhos_thread()
+        processo = subprocess.Popen([sys.executable, "-c", "import sys; sys.exit(3)"])
+        self.assertEqual(aguardar_processo(processo), 3)
+        self.assertEqual(processo.returncode, 3)
+        self.assertEqual(processo.wait(), 3)
+        self.assertGreater(cpu_filhos_thread(), antes)
+
+    def test_aguardar_com_poll_simultaneo(self):
+        # poll() em outra thread (como a interface faz) não pode recolher o filho no meio do wait4
+        for _ in range(5):
+            processo = subprocess.Popen([sys.executable, "-c", "import sys, time; time.sleep(0.1); sys.exit(3)"])
+            vistos = []
+
+            def consultar():
+                while processo.poll() is None:
+                    pass
+                vistos.append(processo.returncode)
+
+            thread = threading.Thread(target=consultar)
+            thread.start()
+            self.assertEqual(aguardar_processo(processo), 3)
+            thread.join()
+            self.assertEqual(vistos, [3])
+
+    def test_execucoes_simultaneas_nao_se_misturam(self):
+        # Duas execuções ao mesmo tempo (ex: duas origens); cada uma só conta os seus mongodump
+        uma = MetricasExecucao("completo")
+        outra = MetricasExecucao("completo")
+
+        def exportar(metricas, nome_banco, vezes):
+            with metricas.medir_banco(nome_banco, "exportacao"):
+                for _ in range(vezes):
+                    executar_ferramenta(QUEIMAR_CPU)
+
+        threads = [threading.Thread(target=exportar, args=(uma, "vendas", 1)),
+                   threading.Thread(target=exportar, args=(outra, "estoque", 3))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        _, cpu_uma = uma.tempo_cpu()
+        _, cpu_outra = outra.tempo_cpu()
+        self.assertGreater(cpu_uma, 0)
+        self.assertGreater(cpu_outra, 2 * cpu_uma)
+        self.assertEqual(uma.tempo_cpu("vendas")[1], cpu_uma)
+        self.assertEqual(uma.tempo_cpu("estoque"), (None, None))
+
+    def test_bloco_interno_nao_conta_duas_vezes(self):
+        # Como em finalizar_banco_colecoes: o banco é medido dentro da fase da execução
+        metricas = MetricasExecucao("completo")
+        with metricas.fase("exportacao"):
+            with metricas.medir_banco("vendas", "exportacao"):
+                with metricas.medir_colecao("vendas", "pedidos"):
+                    executar_ferramenta(QUEIMAR_CPU)
+            with metricas.medir_banco("estoque", "checksum"):
+                executar_ferramenta(QUEIMAR_CPU)
+        _, cpu_execucao = metricas.tempo_cpu()
+        _, cpu_vendas = metricas.tempo_cpu("vendas")
+        _, cpu_estoque = metricas.tempo_cpu("estoque")
+        self.assertGreater(cpu_vendas, 0)
+        self.assertGreater(cpu_estoque, 0)
+        self.assertAlmostEqual(cpu_vendas + cpu_estoque, cpu_execucao, places=2)
+
+    def test_colecoes_somadas_ao_banco(self):
+        metricas = MetricasExecucao("completo")
+        with metricas.medir_colecao("vendas", "pedidos"):
+            executar_ferramenta(QUEIMAR_CPU)
+        with metricas.medir_colecao("vendas", "clientes"):
+            executar_ferramenta(QUEIMAR_CPU)
+        self.assertEqual(metricas.tempo_cpu("vendas"), metricas.tempo_cpu())
+
+
+class TestRegistros(unittest.TestCase):
+
+    def test_linhas_e_prometheus(self):
+        metricas = MetricasExecucao("completo")
+        with metricas.medir_banco("vendas", "exportacao"):
+            pass
+        bancos = [{"nome": "vendas", "status": "ok", "bytes": 100, "documentos": 10, "duracao": 2.0,
+                   "colecoes": [{"nome": "pedidos", "bytes": 50, "documentos": 10, "duracao": 1.0}]}]
+        linhas = metricas.registros("15-01-2024 - 10-00-00", True, bancos)
+        self.assertEqual([linha["registro"] for linha in linhas], ["execucao", "banco", "colecao"])
+        self.assertIn("cpu_backup", linhas[0])
+        self.assertIn("cpu_ferramentas", linhas[1])
+        self.assertEqual(linhas[1]["documentos_s"], 5.0)
+
+        texto = texto_prometheus(linhas, origem="principal")
+        self.assertIn('mongodb_backup_cpu_segundos{tipo="completo",origem="principal",processo="backup"}', texto)
+        self.assertIn('mongodb_backup_banco_documentos{tipo="completo",origem="principal",banco="vendas"} 10', texto)
+        self.assertEqual(texto.count("# TYPE mongodb_backup_cpu_segundos gauge"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Testes do motor nativo: .bson compatível com o mongodump e restauração em lotes"""
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import bson
+from pymongo.errors import BulkWriteError
+
+import backup_mongodb
+from backup_mongodb import MongoDBRestore
+from motor_nativo import (CODIGO_CHAVE_DUPLICADA, colecoes_no_backup, exportar_colecao, inserir_lote,
+                          iterar_documentos, iterar_lotes, ler_metadados, restaurar_banco)
+
+
+class ColecaoMemoria:
+    """Coleção em memória com o subconjunto da API do pymongo usado pelo motor"""
+
+    def __init__(self, documentos=(), indices=(), tipo="collection"):
+        self.documentos = {documento["_id"]: documento for documento in documentos}
+        self.indices = [{"v": 2, "key": {"_id": 1}, "name": "_id_"}] + list(indices)
+        self.tipo = tipo
+        self.lotes = []
+        self._trava = threading.Lock()
+
+    def find_raw_batches(self, filtro=None, projecao=None, batch_size=101):
+        documentos = list(self.documentos.values())
+        for inicio in range(0, len(documentos), batch_size):
+            yield b"".join(bson.encode(documento) for documento in documentos[inicio:inicio + batch_size])
+
+    def list_indexes(self):
+        return iter(self.indices)
+
+    def insert_many(self, lote, ordered=True):
+        inseridos = []
+        erros = []
+        with self._trava:
+            self.lotes.append(len(lote))
+            for indice, documento in enumerate(lote):
+                documento = bson.decode(documento.raw)
+                if documento["_id"] in self.documentos:
+                    erros.append({"index": indice, "code": CODIGO_CHAVE_DUPLICADA})
+                    continue
+                self.documentos[documento["_id"]] = documento
+                inseridos.append(documento["_id"])
+        if erros:
+            raise BulkWriteError({"writeErrors": erros, "nInserted": len(inseridos)})
+        return type("Resultado", (), {"inserted_ids": inseridos})()
+
+    def create_indexes(self, modelos):
+        self.indices += [modelo.document for modelo in modelos]
+
+
+class BancoMemoria:
+
+    def __init__(self):
+        self.colecoes = {}
+
+    def __getitem__(self, nome):
+        return self.colecoes.setdefault(nome, ColecaoMemoria())
+
+    def get_collection(self, nome, **opcoes):
+        return self[nome]
+
+    def list_collections(self, filter):
+        if filter["name"] in self.colecoes:
+            yield {"name": filter["name"], "type": self.colecoes[filter["name"]].tipo, "options": {}}
+
+    def list_collection_names(self, filter=None):
+        return [nome for nome in self.colecoes if filter is None or nome == filter["name"]]
+
+    def drop_collection(self, nome):
+        self.colecoes.pop(nome, None)
+
+    def command(self, comando):
+        self.colecoes[comando["create"]] = ColecaoMemoria(tipo="view" if "viewOn" in comando else "collection")
+
+
+class ClienteMemoria:
+
+    def __init__(self):
+        self.bancos = {}
+
+    def __getitem__(self, nome):
+        return self.bancos.setdefault(nome, BancoMemoria())
+
+
+def documentos(quantidade):
+    return [{"_id": numero, "nome": f"cliente {numero}", "saldo": numero * 1.5} for numero in range(quantidade)]
+
+
+class TestMotorNativo(unittest.TestCase):
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.pasta = self._pasta.name
+        self.origem = ClienteMemoria()
+        self.origem["vendas"].colecoes["clientes"] = ColecaoMemoria(
+            documentos(120), [{"v": 2, "key": {"nome": 1}, "name": "nome_1", "unique": True}])
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def log(self, mensagem):
+        pass
+
+    def test_exportacao_compativel_com_mongodump(self):
+        gravados = []
+        total = exportar_colecao(self.origem, "vendas", "clientes", self.pasta, ao_gravar=gravados.append,
+                                 tamanho_lote=50)
+        caminho = os.path.join(self.pasta, "vendas", "clientes.bson")
+        self.assertEqual(total, os.path.getsize(caminho))
+        self.assertEqual(len(gravados), 3)
+        self.assertEqual([bson.decode(dados) for dados in iterar_documentos(caminho)], documentos(120))
+        metadados = ler_metadados(os.path.join(self.pasta, "vendas", "clientes.metadata.json"))
+        self.assertEqual((metadados["collectionName"], metadados["type"]), ("clientes", "collection"))
+        self.assertEqual([indice["name"] for indice in metadados["indexes"]], ["_id_", "nome_1"])
+        self.assertFalse(os.path.exists(caminho + ".tmp"))
+
+    def test_view_gera_apenas_metadados(self):
+        self.origem["vendas"].colecoes["resumo"] = ColecaoMemoria(tipo="view")
+        self.assertEqual(exportar_colecao(self.origem, "vendas", "resumo", self.pasta), 0)
+        self.assertEqual(os.listdir(os.path.join(self.pasta, "vendas")), ["resumo.metadata.json"])
+
+    def test_arquivo_truncado(self):
+        caminho = os.path.join(self.pasta, "truncado.bson")
+        with open(caminho, 'wb') as f:
+            f.write(bson.encode({"_id": 1})[:-3])
+        with self.assertRaises(ValueError):
+            list(iterar_documentos(caminho))
+
+    def test_lotes_limitados(self):
+        exportar_colecao(self.origem, "vendas", "clientes", self.pasta)
+        caminho = os.path.join(self.pasta, "vendas", "clientes.bson")
+        self.assertEqual([len(lote) for lote in iterar_lotes(caminho, max_documentos=50)], [50, 50, 20])
+        tamanho = len(bson.encode(documentos(1)[0]))
+        self.assertEqual(len(next(iterar_lotes(caminho, max_bytes=tamanho * 10))), 10)
+
+    def test_chaves_duplicadas_ignoradas(self):
+        colecao = ColecaoMemoria(documentos(5))
+        exportar_colecao(self.origem, "vendas", "clientes", self.pasta)
+        lote = next(iterar_lotes(os.path.join(self.pasta, "vendas", "clientes.bson"), max_documentos=10))
+        self.assertEqual(inserir_lote(colecao, lote), 5)
+
+        colecao.insert_many = lambda lote, ordered: (_ for _ in ()).throw(
+            BulkWriteError({"writeErrors": [{"code": 121}], "nInserted": 0}))
+        with self.assertRaises(BulkWriteError):
+            inserir_lote(colecao, lote)
+
+    def test_restaurar_banco(self):
+        exportar_colecao(self.origem, "vendas", "clientes", self.pasta)
+        self.origem["vendas"].colecoes["pedidos"] = ColecaoMemoria(documentos(10))
+        exportar_colecao(self.origem, "vendas", "pedidos", self.pasta)
+        pasta_banco = os.path.join(self.pasta, "vendas")
+        self.assertEqual(colecoes_no_backup(pasta_banco), ["clientes", "pedidos"])
+
+        for workers in (1, 3):
+            with self.subTest(workers=workers):
+                alvo = ClienteMemoria()
+                lotes = []
+                total = restaurar_banco(alvo, "vendas", pasta_banco, colecoes_paralelas=2, workers_insercao=workers,
+                                        log=self.log, ao_inserir=lambda *lote: lotes.append(lote))
+                self.assertEqual(total, 130)
+                # Cada lote enviado informa documentos e bytes, para o progresso da restauração
+                self.assertEqual(sum(documentos for documentos, _ in lotes), 130)
+                self.assertEqual(sum(tamanho for _, tamanho in lotes),
+                                 sum(os.path.getsize(os.path.join(pasta_banco, f"{nome}.bson"))
+                                     for nome in ("clientes", "pedidos")))
+                clientes = alvo["vendas"].colecoes["clientes"]
+                self.assertEqual(sorted(clientes.documentos.values(), key=lambda d: d["_id"]), documentos(120))
+                # Os índices são recriados depois dos dados (o _id já existe)
+                self.assertEqual([indice["name"] for indice in clientes.indices], ["_id_", "nome_1"])
+                self.assertTrue(clientes.indices[1]["unique"])
+
+    def test_restaurar_com_drop(self):
+        exportar_colecao(self.origem, "vendas", "clientes", self.pasta)
+        alvo = ClienteMemoria()
+        alvo["vendas"].colecoes["clientes"] = ColecaoMemoria([{"_id": "antigo"}])
+        restaurar_banco(alvo, "vendas", os.path.join(self.pasta, "vendas"), drop=True, log=self.log)
+        self.assertNotIn("antigo", alvo["vendas"].colecoes["clientes"].documentos)
+        self.assertEqual(len(alvo["vendas"].colecoes["clientes"].documentos), 120)
+
+    def test_progresso_da_restauracao(self):
+        exportar_colecao(self.origem, "vendas", "clientes", self.pasta)
+        restore = MongoDBRestore(motor="nativo", verificar=False, log=self.log)
+        restore.client = ClienteMemoria()
+        with mock.patch.object(backup_mongodb, "localizar_ferramenta", return_value="mongorestore"), \
+                mock.patch.object(restore.progresso, "concluir"):
+            self.assertTrue(restore.restaurar_banco("vendas", self.pasta))
+        # Os bytes enviados pelo motor nativo alimentam a fração do banco
+        item = restore.progresso.itens["vendas"]
+        self.assertEqual(item["bytes"], os.path.getsize(os.path.join(self.pasta, "vendas", "clientes.bson")))
+        self.assertGreater(restore.progresso.resumo()["fracao"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Testes das origens: configuração, filtros de bancos e limites de concorrência"""
+
+import threading
+import time
+import unittest
+
+from origens import OrquestradorOrigens, carregar_origens, filtrar_bancos, hosts_da_uri, log_da_origem
+
+
+class BackupSimulado:
+    """Substitui o MongoDBBackup de uma origem, registrando o que rodava ao mesmo tempo"""
+
+    def __init__(self, mongo_uri, registro, duracao=0.05, sucesso=True):
+        self.mongo_uri = mongo_uri
+        self.registro = registro
+        self.duracao = duracao
+        self.sucesso = sucesso
+
+    def executar_backup(self, retomar=False):
+        self.registro.iniciar(self)
+        time.sleep(self.duracao)
+        self.registro.terminar(self)
+        if isinstance(self.sucesso, Exception):
+            raise self.sucesso
+        return self.sucesso
+
+
+class Registro:
+
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.ativos = []
+        self.inicios = []
+        self.maximo = 0
+        self.mesmo_host = 0
+
+    def iniciar(self, backup):
+        with self.trava:
+            self.inicios.append(backup)
+            self.ativos.append(backup)
+            self.maximo = max(self.maximo, len(self.ativos))
+            hosts = [host for ativo in self.ativos for host in hosts_da_uri(ativo.mongo_uri)]
+            self.mesmo_host = max(self.mesmo_host, max(hosts.count(host) for host in hosts))
+
+    def terminar(self, backup):
+        with self.trava:
+            self.ativos.remove(backup)
+
+
+class TestConfiguracao(unittest.TestCase):
+
+    def test_carregar(self):
+        origens = carregar_origens({"origens": [
+            {"nome": "erp", "mongo_uri": "mongodb://erp:27017/", "incluir": ["vendas_*"], "formato_backup": "archive",
+             "paralelismo": 2},
+            {"nome": "site.prod", "mongo_uri": "mongodb://site/"}]})
+        self.assertEqual(origens[0], {"nome": "erp", "mongo_uri": "mongodb://erp:27017/", "incluir": ["vendas_*"],
+                                      "excluir": [], "opcoes": {"formato": "archive", "paralelismo": 2}})
+        self.assertEqual(origens[1]["opcoes"], {})
+        self.assertEqual(carregar_origens({}), [])
+
+    def test_invalidas(self):
+        for origens in ([{"nome": "../fora", "mongo_uri": "mongodb://a/"}],
+                        [{"nome": "a", "mongo_uri": "mongodb://a/"}, {"nome": "a", "mongo_uri": "mongodb://b/"}],
+                        [{"nome": "a"}],
+                        [{"nome": "a", "mongo_uri": "mongodb://a/", "backup_dir": "D:\\"}]):
+            with self.subTest(origens=origens):
+                with self.assertRaises(ValueError):
+                    carregar_origens({"origens": origens})
+
+    def test_filtrar_bancos(self):
+        bancos = ["vendas_2023", "vendas_2024", "estoque", "logs"]
+        self.assertEqual(filtrar_bancos(bancos), bancos)
+        self.assertEqual(filtrar_bancos(bancos, incluir=["vendas_*", "logs"], excluir=["*_2023"]),
+                         ["vendas_2024", "logs"])
+
+    def test_hosts_da_uri(self):
+        self.assertEqual(hosts_da_uri("mongodb://u:s@DB1:27017,db2:27018/admin?replicaSet=rs0"), {"db1", "db2"})
+        self.assertEqual(hosts_da_uri("mongodb+srv://u:s@cluster0.exemplo.net/"), {"cluster0.exemplo.net"})
+        self.assertEqual(hosts_da_uri("mongodb://[::1]:27017/"), {"::1"})
+        self.assertEqual(hosts_da_uri("mongodb://localhost/"), {"localhost"})
+
+    def test_log_da_origem(self):
+        mensagens = []
+        log_da_origem("erp", mensagens.append)("\n\nRESUMO")
+        self.assertEqual(mensagens, ["\n\n[erp] RESUMO"])
+
+
+class TestOrquestrador(unittest.TestCase):
+
+    def setUp(self):
+        self.registro = Registro()
+        self.mensagens = []
+
+    def orquestrador(self, uris, **opcoes):
+        backups = {nome: BackupSimulado(uri, self.registro) for nome, uri in uris.items()}
+        return backups, OrquestradorOrigens(backups, log=self.mensagens.append, **opcoes)
+
+    def test_limite_por_host(self):
+        _, orquestrador = self.orquestrador({
+            "a": "mongodb://db1:27017/", "b": "mongodb://db1:27018/", "c": "mongodb://db2/", "d": "mongodb://db1:27019/"},
+            concorrencia_total=4, concorrencia_host=1)
+        self.assertTrue(orquestrador.executar())
+        self.assertEqual(self.registro.mesmo_host, 1)
+        self.assertEqual(self.registro.maximo, 2)
+        self.assertEqual(orquestrador.resultados, {"a": True, "b": True, "c": True, "d": True})
+
+    def test_origem_livre_passa_na_frente(self):
+        backups, orquestrador = self.orquestrador({"a": "mongodb://db1/", "b": "mongodb://db1/", "c": "mongodb://db2/"},
+                                                  concorrencia_total=2, concorrencia_host=1)
+        orquestrador.executar()
+        # "b" espera o host de "a"; "c" começa antes dela
+        self.assertEqual(self.registro.inicios[:2], [backups["a"], backups["c"]])
+
+    def test_limite_global(self):
+        _, orquestrador = self.orquestrador({nome: f"mongodb://{nome}/" for nome in "abcdef"},
+                                            concorrencia_total=3, concorrencia_host=1)
+        orquestrador.executar()
+        self.assertEqual(self.registro.maximo, 3)
+
+    def test_falha_de_uma_origem(self):
+        backups, orquestrador = self.orquestrador({"a": "mongodb://db1/", "b": "mongodb://db2/"})
+        backups["b"].sucesso = RuntimeError("servidor fora do ar")
+        self.assertFalse(orquestrador.executar())
+        self.assertEqual(orquestrador.resultados, {"a": True, "b": False})
+        self.assertIn("✗ b", self.mensagens)
+
+    def test_limites_invalidos(self):
+        with self.assertRaises(ValueError):
+            OrquestradorOrigens({}, concorrencia_total=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Testes do planejamento: estimativa da saída e conferência do espaço livre"""
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import planejamento
+from backup_mongodb import MongoDBBackup
+from catalogo import registrar_execucao
+from planejamento import MARGEM_ESPACO, bancos_que_cabem, espaco_livre, planejar_backup
+
+MB = 1024 * 1024
+
+ESTATISTICAS = {
+    "vendas": [{"nome": "pedidos", "documentos": 10, "bytes": 600 * MB, "armazenamento": 200 * MB},
+               {"nome": "clientes", "documentos": 5, "bytes": 400 * MB, "armazenamento": 100 * MB}],
+    "estoque": [{"nome": "itens", "documentos": 50, "bytes": 100 * MB, "armazenamento": 50 * MB}],
+    # Sem permissão para $collStats: vale o tamanho em disco do banco
+    "logs": [{"nome": "eventos", "documentos": 7, "bytes": None, "armazenamento": None}]
+}
+TAMANHOS = {"vendas": 300 * MB, "estoque": 50 * MB, "logs": 10 * MB}
+
+
+class TestPlanejamento(unittest.TestCase):
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.backup_dir = self._pasta.name
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def planejar(self, livre, formato="pasta", compressao="gzip", **opcoes):
+        with mock.patch.object(planejamento, "espaco_livre", return_value=livre):
+            return planejar_backup(["estoque", "logs", "vendas"], ESTATISTICAS, TAMANHOS, self.backup_dir,
+                                   formato, compressao, **opcoes)
+
+    def test_estimativa_sem_historico(self):
+        plano = self.planejar(10 * 1024 * MB)
+        self.assertEqual([item["nome"] for item in plano["bancos"]], ["vendas", "estoque", "logs"])
+        self.assertEqual([item["dados"] for item in plano["bancos"]], [1000 * MB, 100 * MB, 10 * MB])
+        self.assertEqual(plano["estimativa"], 1110 * MB)
+        self.assertEqual(plano["necessario"], int(1110 * MB * (1 + MARGEM_ESPACO)))
+        self.assertIsNone(plano["duracao"])
+        self.assertTrue(plano["cabe"])
+
+        plano = self.planejar(10 * 1024 * MB, formato="archive")
+        self.assertEqual(plano["taxa"], planejamento.TAXAS_COMPRESSAO_PADRAO["gzip"])
+
+    def test_taxa_e_vazao_do_catalogo(self):
+        execucao = {"nome": "b1", "tipo": "completo", "formato": "archive", "origem": "mongodb://db1/",
+                    "inicio": "2024-01-15T10:00:00", "fim": "2024-01-15T10:01:40", "duracao": 100.0,
+                    "status": "ok", "bytes": 250 * MB}
+        registrar_execucao(self.backup_dir, execucao, [
+            {"nome": "vendas", "status": "ok", "bytes": 250 * MB,
+             "colecoes": [{"nome": "pedidos", "documentos": 10, "bytes": 1000 * MB}]}])
+        plano = self.planejar(10 * 1024 * MB, formato="archive")
+        self.assertAlmostEqual(plano["taxa"], 0.25)
+        self.assertEqual(plano["origem_taxa"], "últimos 1 backup(s)")
+        # 1110 MB de dados a 10 MB/s
+        self.assertAlmostEqual(plano["duracao"], 111.0)
+
+    def test_retomada_desconta_colecoes_concluidas(self):
+        plano = self.planejar(10 * 1024 * MB, concluidas={"vendas": ["pedidos"]})
+        self.assertEqual(plano["bancos"][0], {"nome": "vendas", "dados": 400 * MB, "estimativa": 400 * MB})
+
+    def test_nao_cabe(self):
+        plano = self.planejar(1000 * MB)
+        self.assertFalse(plano["cabe"])
+        # O máximo de bancos que cabe, sempre mantendo a margem
+        self.assertEqual(bancos_que_cabem(plano), (["estoque", "logs"], ["vendas"]))
+
+    def test_espaco_livre_de_pasta_inexistente(self):
+        self.assertEqual(espaco_livre(os.path.join(self.backup_dir, "ainda", "nao", "existe")),
+                         espaco_livre(self.backup_dir))
+
+
+class TestEspacoInsuficiente(unittest.TestCase):
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.backup_dir = os.path.join(self._pasta.name, "backups")
+        self.exportados = []
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def executar(self, modo, livre):
+        backup = MongoDBBackup(backup_dir=self.backup_dir, formato="archive", compressao="nenhuma",
+                               espaco_insuficiente=modo)
+        backup.conectar_mongodb = lambda: True
+        backup.listar_bancos_dados = lambda: ["vendas", "estoque", "logs"]
+        backup.estatisticas_colecoes = lambda banco: backup.estatisticas.setdefault(banco, ESTATISTICAS[banco])
+        backup.exportar_banco = lambda banco, pasta: self.exportados.append(banco) or True
+        with mock.patch.object(planejamento, "espaco_livre", return_value=livre), \
+                mock.patch("backup_mongodb.tamanhos_em_disco", return_value=TAMANHOS), \
+                contextlib.redirect_stdout(io.StringIO()):
+            return backup, backup.executar_backup()
+
+    def test_modo_invalido(self):
+        with self.assertRaises(ValueError):
+            MongoDBBackup(espaco_insuficiente="ignorar")
+
+    def test_recusar(self):
+        _, sucesso = self.executar("recusar", 1000 * MB)
+        self.assertFalse(sucesso)
+        # Nada é exportado e nenhuma pasta de backup é criada
+        self.assertEqual(self.exportados, [])
+        if os.path.isdir(self.backup_dir):
+            self.assertEqual([nome for nome in os.listdir(self.backup_dir)
+                              if os.path.isdir(os.path.join(self.backup_dir, nome))], [])
+
+    def test_parcial(self):
+        backup, sucesso = self.executar("parcial", 1000 * MB)
+        self.assertFalse(sucesso)
+        self.assertEqual(sorted(self.exportados), ["estoque", "logs"])
+        self.assertEqual(backup.resultados["vendas"]["erro"], "Adiado: espaço insuficiente")
+
+    def test_cabe(self):
+        _, sucesso = self.executar("recusar", 10 * 1024 * MB)
+        self.assertTrue(sucesso)
+        self.assertEqual(sorted(self.exportados), ["estoque", "logs", "vendas"])
+
+
+if __name__ == "__main__":
+    unittest.main()
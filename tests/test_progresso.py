@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Testes do progresso do backup e da fila de exportação por coleção"""
+
+import contextlib
+import io
+import tempfile
+import unittest
+from unittest import mock
+
+import progresso
+from backup_mongodb import MongoDBBackup
+from progresso import LeitorContador, ProgressoBackup, formatar_duracao
+
+
+class TestProgresso(unittest.TestCase):
+
+    def test_fracao_ponderada_pelos_bytes(self):
+        atual = ProgressoBackup()
+        atual.registrar("vendas.pedidos", 100, 3000)
+        atual.registrar("vendas.clientes", 10, 1000)
+        self.assertEqual(atual.resumo()["fracao"], 0.0)
+        self.assertIsNone(atual.resumo()["eta"])
+
+        atual.iniciar("vendas.pedidos")
+        atual.atualizar_bytes("vendas.pedidos", 1500)
+        resumo = atual.resumo()
+        self.assertAlmostEqual(resumo["fracao"], 1500 / 4000)
+        self.assertEqual((resumo["documentos"], resumo["documentos_total"]), (50, 110))
+        self.assertEqual([item["chave"] for item in resumo["em_andamento"]], ["vendas.pedidos"])
+        self.assertIsNotNone(resumo["eta"])
+
+        atual.concluir("vendas.pedidos")
+        atual.iniciar("vendas.clientes")
+        atual.concluir("vendas.clientes", sucesso=False)
+        resumo = atual.resumo()
+        self.assertEqual((resumo["fracao"], resumo["concluidos"], resumo["total"]), (1.0, 2, 2))
+        self.assertEqual(resumo["bytes"], 4000)
+        self.assertEqual(atual.executando(), [])
+
+    def test_estimativa_ultrapassada(self):
+        # Dados inseridos durante o backup não levam o item a 100% antes de terminar
+        atual = ProgressoBackup()
+        atual.registrar("vendas", 10, 1000)
+        atual.iniciar("vendas")
+        atual.somar_bytes("vendas", 800)
+        atual.somar_bytes("vendas", 800)
+        self.assertAlmostEqual(atual.resumo()["fracao"], 0.99)
+
+    def test_sem_estimativa(self):
+        atual = ProgressoBackup()
+        atual.registrar("novo", None, None)
+        atual.iniciar("novo")
+        atual.atualizar_bytes("novo", 500)
+        self.assertEqual(atual.resumo()["fracao"], 0.0)
+        atual.concluir("novo")
+        self.assertEqual(atual.resumo()["fracao"], 1.0)
+
+    def test_notificacoes_limitadas(self):
+        resumos = []
+        atual = ProgressoBackup(resumos.append)
+        atual.registrar("vendas", 10, 1000)
+        with mock.patch.object(progresso, "INTERVALO_NOTIFICACAO", 3600):
+            atual.iniciar("vendas")
+            for quantidade in range(100, 1000, 100):
+                atual.atualizar_bytes("vendas", quantidade)
+            self.assertEqual(len(resumos), 1)
+            # A conclusão de um item sempre é notificada
+            atual.concluir("vendas")
+        self.assertEqual(len(resumos), 2)
+        self.assertEqual(resumos[-1]["fracao"], 1.0)
+
+    def test_leitor_contador(self):
+        lidos = []
+        leitor = LeitorContador(io.BytesIO(b"x" * 25), lidos.append)
+        while leitor.read(10):
+            pass
+        self.assertEqual(lidos, [10, 10, 5])
+
+    def test_formatar_duracao(self):
+        self.assertEqual(formatar_duracao(None), "--")
+        self.assertEqual(formatar_duracao(42.7), "42s")
+        self.assertEqual(formatar_duracao(190), "3m10s")
+        self.assertEqual(formatar_duracao(3720), "1h02m")
+
+
+class TestFilaColecoes(unittest.TestCase):
+    """No formato "pasta" as coleções de todos os bancos dividem a mesma fila"""
+
+    ESTATISTICAS = {
+        "vendas": [{"nome": "pedidos", "documentos": 10, "bytes": 500},
+                   {"nome": "clientes", "documentos": 5, "bytes": 50}],
+        "estoque": [{"nome": "itens", "documentos": 50, "bytes": 5000},
+                    {"nome": "lotes", "documentos": 1, "bytes": None}],
+        "vazio": []
+    }
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.backup = MongoDBBackup(backup_dir=self._pasta.name, paralelismo=1, log=lambda mensagem: None)
+        self.backup.estatisticas_colecoes = lambda banco: [dict(colecao) for colecao in self.ESTATISTICAS[banco]]
+        self.ordem = []
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def exportar_colecao(self, nome_banco, nome_colecao, pasta_destino):
+        registro = self.backup.resultados[nome_banco]
+        if registro["inicio"] is None:
+            registro["inicio"] = 0.0
+        self.ordem.append(f"{nome_banco}.{nome_colecao}")
+        return "falhou" if nome_colecao == "lotes" else None
+
+    def exportar_banco(self, nome_banco, pasta_destino):
+        self.ordem.append(nome_banco)
+        return True
+
+    def test_maiores_colecoes_primeiro(self):
+        self.backup.exportar_colecao = self.exportar_colecao
+        self.backup.exportar_banco = self.exportar_banco
+        with contextlib.redirect_stdout(io.StringIO()):
+            sucessos, falhas = self.backup.exportar_por_colecao(["vendas", "estoque", "vazio"], self._pasta.name)
+        # Bancos sem coleções listadas são exportados inteiros, sem estimativa (vão para o fim)
+        self.assertEqual(self.ordem, ["estoque.itens", "vendas.pedidos", "vendas.clientes", "estoque.lotes", "vazio"])
+        # Falha em uma coleção marca o banco inteiro como falho
+        self.assertEqual((sucessos, falhas), (2, 1))
+        self.assertEqual(self.backup.resultados["estoque"]["erro"], "lotes: falhou")
+        self.assertEqual(self.backup.resultados["vendas"]["status"], "ok")
+        self.assertEqual(self.backup.progresso.resumo()["total"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
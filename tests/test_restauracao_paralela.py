@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Testes da restauração em paralelo (limite de workers de inserção)"""
+
+import os
+import tempfile
+import unittest
+
+from backup_mongodb import calcular_processos_restore, tamanho_pasta
+
+
+class TestProcessosRestore(unittest.TestCase):
+
+    def test_limite_total(self):
+        # 4 coleções x 1 worker = 4 conexões por processo; limite 16 -> até 4 processos
+        self.assertEqual(calcular_processos_restore(8, 4, 1, 16), 4)
+        self.assertEqual(calcular_processos_restore(2, 4, 1, 16), 2)
+        self.assertEqual(calcular_processos_restore(8, 4, 2, 16), 2)
+
+    def test_sempre_um_processo(self):
+        self.assertEqual(calcular_processos_restore(4, 8, 8, 16), 1)
+        self.assertEqual(calcular_processos_restore(0, 0, 0, 0), 1)
+
+    def test_valores_minimos(self):
+        # Valores menores que 1 valem 1
+        self.assertEqual(calcular_processos_restore(3, 0, -2, 2), 2)
+
+
+class TestTamanhoPasta(unittest.TestCase):
+
+    def test_recursivo(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            os.makedirs(os.path.join(pasta, "vendas"))
+            with open(os.path.join(pasta, "vendas", "pedidos.bson"), "wb") as f:
+                f.write(b"x" * 1000)
+            with open(os.path.join(pasta, "leia-me.txt"), "wb") as f:
+                f.write(b"x" * 24)
+            self.assertEqual(tamanho_pasta(pasta), 1024)
+            self.assertEqual(tamanho_pasta(os.path.join(pasta, "inexistente")), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Testes da política de retenção (avô-pai-filho)"""
+
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from bson.timestamp import Timestamp
+
+import backup_mongodb
+from agendador import TravaExecucao
+from backup_mongodb import MongoDBBackup
+from catalogo import caminho_catalogo, registrar_execucao, status_das_execucoes
+from incremental import criar_estado, salvar_estado
+from retencao import FORMATO_PASTA, aplicar_retencao, normalizar_politica, planejar_retencao, politica_ativa
+from retomada import ARQUIVO_JORNAL
+
+
+class TestPolitica(unittest.TestCase):
+
+    def test_normalizar(self):
+        self.assertEqual(normalizar_politica(None), {"horarios": 0, "diarios": 0, "semanais": 0, "mensais": 0})
+        self.assertEqual(normalizar_politica({"diarios": "7", "mensais": -2})["diarios"], 7)
+        self.assertEqual(normalizar_politica({"mensais": -2})["mensais"], 0)
+
+    def test_ativa(self):
+        self.assertFalse(politica_ativa(None))
+        self.assertFalse(politica_ativa({"diarios": 0}))
+        self.assertTrue(politica_ativa({"semanais": 1}))
+
+
+class TestPlano(unittest.TestCase):
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.backup_dir = self._pasta.name
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def criar(self, momento, status=None):
+        nome = momento.strftime(FORMATO_PASTA)
+        os.makedirs(os.path.join(self.backup_dir, nome))
+        with open(os.path.join(self.backup_dir, nome, "vendas.archive.gz"), "wb") as f:
+            f.write(b"x" * 100)
+        if status:
+            registrar_execucao(self.backup_dir, {"nome": nome, "tipo": "completo", "inicio": momento.isoformat(),
+                                                 "status": status}, [])
+        return nome
+
+    def plano(self, politica):
+        plano = planejar_retencao(self.backup_dir, politica)
+        return ({item["nome"]: item["motivos"] for item in plano["manter"]},
+                [item["nome"] for item in plano["remover"]])
+
+    def test_sem_politica_mantem_so_o_mais_recente(self):
+        # planejar_retencao não é chamado sem política ativa; com tudo zerado só o mais recente fica
+        nomes = [self.criar(datetime(2024, 1, dia, 10)) for dia in range(1, 4)]
+        manter, remover = self.plano(None)
+        self.assertEqual(list(manter), [nomes[2]])
+        self.assertEqual(remover, [nomes[1], nomes[0]])
+
+    def test_niveis(self):
+        inicio = datetime(2024, 1, 1, 6)
+        nomes = {}
+        # Dois backups por dia durante 70 dias
+        for dia in range(70):
+            for hora in (6, 18):
+                momento = inicio + timedelta(days=dia, hours=hora - 6)
+                nomes[momento] = self.criar(momento)
+        manter, remover = self.plano({"diarios": 7, "semanais": 4, "mensais": 3})
+        mais_recente = max(nomes)
+
+        diarios = [nome for nome, motivos in manter.items() if "diário" in motivos]
+        semanais = [nome for nome, motivos in manter.items() if "semanal" in motivos]
+        mensais = [nome for nome, motivos in manter.items() if "mensal" in motivos]
+        self.assertEqual(len(diarios), 7)
+        self.assertEqual(len(semanais), 4)
+        self.assertEqual(len(mensais), 3)
+        # Em cada período fica o backup mais recente (o das 18h)
+        self.assertTrue(all(nome.endswith("18-00-00") for nome in diarios + semanais + mensais))
+        self.assertIn("mais recente", manter[nomes[mais_recente]])
+        self.assertEqual(set(manter) | set(remover), set(nomes.values()))
+        self.assertFalse(set(manter) & set(remover))
+        # Mensal: último backup de março, fevereiro e janeiro
+        self.assertEqual(sorted(mensais), sorted([nomes[datetime(2024, 3, 10, 18)], nomes[datetime(2024, 2, 29, 18)],
+                                                  nomes[datetime(2024, 1, 31, 18)]]))
+
+    def test_falhas_nao_ocupam_vagas(self):
+        ok = self.criar(datetime(2024, 1, 1, 10), "ok")
+        falha = self.criar(datetime(2024, 1, 2, 10), "falha")
+        recente = self.criar(datetime(2024, 1, 3, 10), "ok")
+        self.assertEqual(status_das_execucoes(self.backup_dir)[falha], "falha")
+        manter, remover = self.plano({"diarios": 2})
+        self.assertEqual(set(manter), {ok, recente})
+        self.assertEqual(remover, [falha])
+
+    def test_protegidos(self):
+        base = self.criar(datetime(2024, 1, 1, 10))
+        salvar_estado(os.path.join(self.backup_dir, base), criar_estado(Timestamp(1, 0)))
+        interrompido = self.criar(datetime(2024, 1, 2, 10))
+        open(os.path.join(self.backup_dir, interrompido, ARQUIVO_JORNAL), "w").close()
+        antigo = self.criar(datetime(2023, 12, 1, 10))
+        recente = self.criar(datetime(2024, 1, 3, 10))
+        os.makedirs(os.path.join(self.backup_dir, "outra pasta"))
+
+        manter, remover = self.plano({"horarios": 0})
+        self.assertEqual(manter, {recente: ["mais recente"], interrompido: ["interrompido"],
+                                  base: ["base incremental atual"]})
+        self.assertEqual(remover, [antigo])
+
+    def test_aplicar(self):
+        nomes = [self.criar(datetime(2024, 1, dia, 10), "ok") for dia in range(1, 6)]
+        mensagens = []
+        self.assertEqual(aplicar_retencao(self.backup_dir, {"diarios": 2}, simular=True, log=mensagens.append), (0, 0))
+        self.assertEqual(len(os.listdir(self.backup_dir)), 6)
+
+        apagadas, liberados = aplicar_retencao(self.backup_dir, {"diarios": 2}, log=mensagens.append)
+        self.assertEqual((apagadas, liberados), (3, 300))
+        self.assertEqual(sorted(os.listdir(self.backup_dir)), sorted(nomes[3:] + [os.path.basename(caminho_catalogo(self.backup_dir))]))
+        self.assertEqual(set(status_das_execucoes(self.backup_dir)), set(nomes[3:]))
+
+
+class TestRetencaoDoBackup(unittest.TestCase):
+
+    def test_trava_liberada_depois_da_limpeza(self):
+        with tempfile.TemporaryDirectory() as backup_dir:
+            backup = MongoDBBackup(backup_dir=backup_dir, retencao={"diarios": 1}, log=lambda mensagem: None)
+            eventos = []
+
+            def aplicar_retencao():
+                time.sleep(0.1)
+                # O próximo backup (outra trava na mesma pasta) não pode começar durante a limpeza
+                eventos.append(("retencao", TravaExecucao(backup_dir).adquirir()))
+
+            def liberar(trava):
+                eventos.append(("liberar", None))
+                liberar_original(trava)
+
+            liberar_original = backup_mongodb.TravaExecucao.liberar
+            backup.aplicar_retencao = aplicar_retencao
+            backup.realizar_backup = lambda bancos, retomar: backup.iniciar_retencao() is not None
+            with mock.patch.object(backup_mongodb.TravaExecucao, "liberar", liberar):
+                self.assertTrue(backup.executar_backup())
+            self.assertEqual(eventos, [("retencao", False), ("liberar", None)])
+            self.assertIsNone(backup.thread_retencao)
+            proxima = TravaExecucao(backup_dir)
+            self.assertTrue(proxima.adquirir())
+            proxima.liberar()
+
+
+if __name__ == "__main__":
+    unittest.main()
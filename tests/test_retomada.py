@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""Testes dos diários de retomada do backup e da restauração"""
+
+import copy
+import json
+import os
+import tempfile
+import unittest
+
+from pymongo.errors import OperationFailure
+
+from retomada import (ARQUIVO_JORNAL, BANCO_JORNAIS_RESTAURACAO, COLECAO_JORNAIS_RESTAURACAO, JornalBackup,
+                      JornalRestauracao, localizar_backup_interrompido, padrao_namespace)
+from verificacao import ARQUIVO_MANIFESTO, identificar_backup
+
+
+class ColecaoMemoria:
+    """Coleção do destino em memória (só as operações usadas pelo diário da restauração)"""
+
+    def __init__(self):
+        self.documentos = {}
+        self.gravacoes = 0
+        self.falhar = False
+
+    def find_one(self, filtro):
+        if self.falhar:
+            raise OperationFailure("not authorized on admin")
+        documento = self.documentos.get(filtro["_id"])
+        return copy.deepcopy(documento) if documento is not None else None
+
+    def replace_one(self, filtro, documento, upsert=False):
+        if self.falhar:
+            raise OperationFailure("not authorized on admin")
+        self.gravacoes += 1
+        self.documentos[filtro["_id"]] = copy.deepcopy(documento)
+
+    def delete_one(self, filtro):
+        self.documentos.pop(filtro["_id"], None)
+
+
+class ClienteMemoria:
+    """MongoClient do destino com a coleção dos diários em memória"""
+
+    def __init__(self):
+        self.bancos = {}
+        self.colecao = self[BANCO_JORNAIS_RESTAURACAO][COLECAO_JORNAIS_RESTAURACAO]
+
+    def __getitem__(self, nome_banco):
+        return self.bancos.setdefault(nome_banco, {COLECAO_JORNAIS_RESTAURACAO: ColecaoMemoria()})
+
+
+class TestJornalBackup(unittest.TestCase):
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.backup_dir = self._pasta.name
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def criar(self, nome, bancos=("vendas", "estoque")):
+        pasta = os.path.join(self.backup_dir, nome)
+        os.makedirs(pasta)
+        return JornalBackup.criar(pasta, "pasta", None, "mongodump", bancos)
+
+    def test_criar_e_reabrir(self):
+        jornal = self.criar("b1")
+        jornal.concluir_colecao("vendas", "pedidos")
+        jornal.concluir_colecao("vendas", "clientes")
+        self.assertEqual(jornal.registrar_tentativa("vendas"), 1)
+
+        reaberto = JornalBackup.abrir(jornal.pasta)
+        self.assertEqual(reaberto.dados["bancos"], ["vendas", "estoque"])
+        self.assertEqual(reaberto.colecoes_concluidas("vendas"), {"pedidos", "clientes"})
+        self.assertIsNone(reaberto.banco_concluido("vendas"))
+        self.assertEqual(reaberto.registrar_tentativa("vendas"), 2)
+
+    def test_concluir_banco(self):
+        jornal = self.criar("b1")
+        jornal.concluir_colecao("vendas", "pedidos")
+        jornal.concluir_banco({"nome": "vendas", "status": "ok", "bytes": 10})
+        reaberto = JornalBackup.abrir(jornal.pasta)
+        self.assertEqual(reaberto.banco_concluido("vendas")["bytes"], 10)
+        self.assertEqual(reaberto.colecoes_concluidas("vendas"), set())
+
+    def test_gravacao_atomica(self):
+        jornal = self.criar("b1")
+        jornal.concluir_colecao("vendas", "pedidos")
+        self.assertEqual(os.listdir(jornal.pasta), [ARQUIVO_JORNAL])
+        with open(os.path.join(jornal.pasta, ARQUIVO_JORNAL), encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["colecoes"], {"vendas": ["pedidos"]})
+
+    def test_descartar(self):
+        jornal = self.criar("b1")
+        jornal.descartar()
+        self.assertIsNone(JornalBackup.abrir(jornal.pasta))
+        jornal.descartar()
+
+    def test_diario_ilegivel(self):
+        pasta = os.path.join(self.backup_dir, "b1")
+        os.makedirs(pasta)
+        with open(os.path.join(pasta, ARQUIVO_JORNAL), "w") as f:
+            f.write("{")
+        self.assertIsNone(JornalBackup.abrir(pasta))
+
+    def test_backup_interrompido_mais_recente(self):
+        self.assertIsNone(localizar_backup_interrompido(self.backup_dir))
+        self.assertIsNone(localizar_backup_interrompido(os.path.join(self.backup_dir, "inexistente")))
+        antigo = self.criar("b1")
+        antigo.dados["criado_em"] = "2024-01-15T10:00:00"
+        antigo.concluir_colecao("vendas", "pedidos")
+        recente = self.criar("b2")
+        self.criar("b3").descartar()
+        self.assertEqual(localizar_backup_interrompido(self.backup_dir).pasta, recente.pasta)
+
+
+class TestJornalRestauracao(unittest.TestCase):
+
+    def setUp(self):
+        self.client = ClienteMemoria()
+
+    def abrir(self, backup="backup1", pasta="/backups/b1", alvo=None, selecao=None, **opcoes):
+        return JornalRestauracao.abrir(self.client, backup, pasta, alvo, selecao, **opcoes)
+
+    def test_padrao_namespace(self):
+        self.assertEqual(padrao_namespace("vendas", "pedidos"), "vendas.pedidos")
+        self.assertEqual(padrao_namespace("vendas", "log*"), "vendas.log\\*")
+        self.assertEqual(padrao_namespace("a", "b\\c"), "a.b\\\\c")
+
+    def test_identificacao(self):
+        base = self.abrir().identificacao
+        # A pasta não faz parte da identificação (o backup pode ser movido ou copiado)
+        self.assertEqual(self.abrir(pasta="D:/copia/b1").identificacao, base)
+        self.assertEqual(self.abrir(selecao=["b.*", "a.x"]).identificacao,
+                         self.abrir(selecao=["a.x", "b.*"]).identificacao)
+        outras = {self.abrir(backup="backup2").identificacao,
+                  self.abrir(alvo="2024-01-15T10:00:00").identificacao,
+                  self.abrir(selecao=["a.x"]).identificacao}
+        self.assertEqual(len(outras | {base}), 4)
+
+    def test_retomar_de_outra_execucao(self):
+        jornal = self.abrir()
+        self.assertFalse(jornal.retomada())
+        self.assertEqual(self.client.colecao.documentos, {})
+
+        jornal.concluir_colecao("vendas", "pedidos")
+        jornal.concluir_colecao("vendas", "pedidos")
+        jornal.concluir_banco("estoque")
+        jornal.concluir_oplog(".oplog")
+
+        retomado = self.abrir(pasta="/outra/maquina/b1")
+        self.assertTrue(retomado.retomada())
+        self.assertTrue(retomado.banco_concluido("estoque"))
+        self.assertFalse(retomado.banco_concluido("vendas"))
+        self.assertEqual(retomado.colecoes_concluidas("vendas"), {"pedidos"})
+        self.assertTrue(retomado.oplog_concluido(".oplog"))
+        self.assertFalse(retomado.oplog_concluido("20240115-100000"))
+        self.assertEqual(retomado.dados["pasta_backup"], os.path.abspath("/backups/b1"))
+
+    def test_exclusoes(self):
+        jornal = self.abrir()
+        self.assertEqual(jornal.exclusoes("vendas"), [])
+        jornal.concluir_colecao("vendas", "pedidos")
+        jornal.concluir_colecao("vendas", "log*")
+        self.assertEqual(jornal.exclusoes("vendas"),
+                         ["--nsExclude=vendas.log\\*", "--nsExclude=vendas.pedidos"])
+        jornal.concluir_banco("vendas")
+        self.assertEqual(jornal.exclusoes("vendas"), [])
+
+    def test_registrar_evento(self):
+        jornal = self.abrir()
+        evento = {"colecao": "vendas.pedidos", "feito": 10, "total": 10, "unidade": "documentos",
+                  "percentual": 100.0, "concluido": False}
+        jornal.registrar_evento("vendas", evento)
+        self.assertEqual(jornal.colecoes_concluidas("vendas"), set())
+        jornal.registrar_evento("vendas", dict(evento, concluido=True))
+        jornal.registrar_evento("vendas", dict(evento, colecao="vendas2.pedidos", concluido=True))
+        self.assertEqual(jornal.colecoes_concluidas("vendas"), {"pedidos"})
+        self.assertEqual(jornal.colecoes_concluidas("vendas2"), set())
+
+    def test_descartar(self):
+        jornal = self.abrir()
+        jornal.concluir_banco("vendas")
+        jornal.descartar()
+        self.assertEqual(self.client.colecao.documentos, {})
+        self.assertFalse(self.abrir().retomada())
+
+    def test_gravacoes_por_banco(self):
+        # As coleções não geram uma gravação cada: vão ao destino no fim do banco
+        jornal = self.abrir()
+        for nome_colecao in ("pedidos", "clientes", "itens"):
+            jornal.concluir_colecao("vendas", nome_colecao)
+        self.assertEqual(self.client.colecao.gravacoes, 0)
+        jornal.gravar()
+        jornal.gravar()
+        self.assertEqual(self.client.colecao.gravacoes, 1)
+        self.assertEqual(self.abrir().colecoes_concluidas("vendas"), {"pedidos", "clientes", "itens"})
+        jornal.concluir_banco("vendas")
+        jornal.concluir_oplog(".oplog")
+        self.assertEqual(self.client.colecao.gravacoes, 3)
+
+    def test_destino_sem_permissao(self):
+        self.client.colecao.falhar = True
+        with self.assertRaises(OperationFailure):
+            self.abrir()
+
+        # Sem permissão de gravação: aviso, diário desativado e a restauração segue
+        self.client.colecao.falhar = False
+        mensagens = []
+        jornal = self.abrir(log=mensagens.append)
+        self.client.colecao.falhar = True
+        jornal.concluir_colecao("vendas", "pedidos")
+        jornal.concluir_banco("vendas")
+        self.assertFalse(jornal.ativo)
+        self.assertEqual(len(mensagens), 1)
+        self.assertTrue(mensagens[0].startswith("⚠ Não foi possível gravar o diário da restauração"))
+        self.client.colecao.falhar = False
+        jornal.concluir_oplog(".oplog")
+        self.assertEqual(self.client.colecao.documentos, {})
+        self.assertTrue(jornal.banco_concluido("vendas"))
+
+    def test_banco_configuravel(self):
+        jornal = self.abrir(banco="sistema_backup")
+        jornal.concluir_banco("vendas")
+        self.assertEqual(self.client.colecao.documentos, {})
+        documentos = self.client["sistema_backup"][COLECAO_JORNAIS_RESTAURACAO].documentos
+        self.assertEqual(list(documentos), [jornal.identificacao])
+        self.assertTrue(self.abrir(banco="sistema_backup").banco_concluido("vendas"))
+
+    def test_identificar_backup(self):
+        with tempfile.TemporaryDirectory() as raiz:
+            pasta = os.path.join(raiz, "15-01-2024 - 10-00-00")
+            os.makedirs(pasta)
+            open(os.path.join(pasta, "vendas.archive.gz"), "wb").close()
+            sem_manifesto = identificar_backup(pasta)
+            self.assertEqual(sem_manifesto, "15-01-2024 - 10-00-00|vendas.archive.gz")
+            # Os incrementos e o estado incremental não mudam a identificação
+            os.makedirs(os.path.join(pasta, "incrementos"))
+            self.assertEqual(identificar_backup(pasta), sem_manifesto)
+
+            with open(os.path.join(pasta, ARQUIVO_MANIFESTO), "w") as f:
+                f.write('{"arquivos": {}}')
+            com_manifesto = identificar_backup(pasta)
+            copia = os.path.join(raiz, "copia")
+            os.rename(pasta, copia)
+            self.assertEqual(identificar_backup(copia), com_manifesto)
+
+
+if __name__ == "__main__":
+    unittest.main()
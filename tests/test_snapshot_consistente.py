@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Testes do snapshot consistente: URI das ferramentas, menor optime e reaplicação única do oplog"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from bson.timestamp import Timestamp
+
+import backup_mongodb
+from backup_mongodb import MongoDBRestore
+from ferramentas import uri_para_ferramenta
+from incremental import ARQUIVO_OPLOG, PASTA_INCREMENTOS, PASTA_OPLOG_SNAPSHOT, criar_estado, salvar_estado, \
+    ts_minimo_replica
+
+
+class AdminStatus:
+
+    def __init__(self, status):
+        self.status = status
+
+    def command(self, nome):
+        if isinstance(self.status, Exception):
+            raise self.status
+        return self.status
+
+
+class ClienteStatus:
+
+    def __init__(self, status):
+        self.admin = AdminStatus(status)
+
+
+def membro(estado, ts, saude=1):
+    return {"stateStr": estado, "health": saude, "optime": {"ts": ts}}
+
+
+class TestUriFerramenta(unittest.TestCase):
+
+    def test_banco_vira_auth_source(self):
+        self.assertEqual(uri_para_ferramenta("mongodb://u:s@db1:27017,db2:27017/vendas?replicaSet=rs0"),
+                         "mongodb://u:s@db1:27017,db2:27017/?replicaSet=rs0&authSource=vendas")
+
+    def test_auth_source_existente(self):
+        self.assertEqual(uri_para_ferramenta("mongodb://db1/vendas?authSource=admin"),
+                         "mongodb://db1/?authSource=admin")
+
+    def test_sem_banco(self):
+        self.assertEqual(uri_para_ferramenta("mongodb://db1:27017/"), "mongodb://db1:27017/")
+
+
+class TestMenorOptime(unittest.TestCase):
+
+    def test_membros_saudaveis(self):
+        client = ClienteStatus({"members": [membro("PRIMARY", Timestamp(200, 1)),
+                                            membro("SECONDARY", Timestamp(150, 3)),
+                                            membro("SECONDARY", Timestamp(10, 1), saude=0),
+                                            membro("ARBITER", Timestamp(1, 1))]})
+        self.assertEqual(ts_minimo_replica(client), Timestamp(150, 3))
+
+    def test_sem_replica_set(self):
+        self.assertIsNone(ts_minimo_replica(ClienteStatus(RuntimeError("not running with --replSet"))))
+
+
+class TestReaplicacaoDoOplog(unittest.TestCase):
+    """O oplog cobre o servidor inteiro: cada arquivo é reaplicado uma única vez para todos os bancos"""
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.pasta = os.path.join(self._pasta.name, "backup_20240115_100000")
+        for banco in ("vendas", "estoque"):
+            os.makedirs(os.path.join(self.pasta, banco, banco))
+        self.gravar(os.path.join(self.pasta, PASTA_OPLOG_SNAPSHOT, ARQUIVO_OPLOG))
+        estado = criar_estado(Timestamp(100, 1))
+        estado["incrementos"] = ["inc1", "inc2"]
+        for nome in estado["incrementos"]:
+            self.gravar(os.path.join(self.pasta, PASTA_INCREMENTOS, nome, ARQUIVO_OPLOG))
+        salvar_estado(self.pasta, estado)
+        self.mensagens = []
+        self.comandos = []
+        self.restore = MongoDBRestore(restore_uri="mongodb://destino/", verificar=False, log=self.mensagens.append)
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    @staticmethod
+    def gravar(caminho):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, 'wb') as f:
+            f.write(b"")
+
+    def executar_ferramenta(self, comando, ao_evento=None):
+        self.comandos.append(comando)
+        return ""
+
+    def reaplicar(self, bancos):
+        with mock.patch.object(backup_mongodb, "localizar_ferramenta", return_value="mongorestore"), \
+                mock.patch.object(backup_mongodb, "executar_ferramenta", self.executar_ferramenta):
+            return self.restore.reaplicar_oplog(self.pasta, bancos)
+
+    def test_snapshot_e_incrementos_uma_vez(self):
+        self.assertTrue(self.reaplicar(["vendas", "estoque"]))
+        self.assertEqual([comando[-1] for comando in self.comandos],
+                         [os.path.join(self.pasta, PASTA_OPLOG_SNAPSHOT),
+                          os.path.join(self.pasta, PASTA_INCREMENTOS, "inc1"),
+                          os.path.join(self.pasta, PASTA_INCREMENTOS, "inc2")])
+        for comando in self.comandos:
+            self.assertIn("--oplogReplay", comando)
+            self.assertIn("--nsInclude=vendas.*", comando)
+            self.assertIn("--nsInclude=estoque.*", comando)
+
+    def test_falha_interrompe(self):
+        def falhar(comando, ao_evento=None):
+            self.comandos.append(comando)
+            raise backup_mongodb.subprocess.CalledProcessError(1, comando, stderr="Failed: applyOps")
+
+        with mock.patch.object(backup_mongodb, "localizar_ferramenta", return_value="mongorestore"), \
+                mock.patch.object(backup_mongodb, "executar_ferramenta", falhar):
+            self.assertFalse(self.restore.reaplicar_oplog(self.pasta, ["vendas"]))
+        self.assertEqual(len(self.comandos), 1)
+
+    def restaurar(self, falhas=()):
+        bancos_restaurados = []
+
+        def restaurar_banco(nome_banco, pasta_backup):
+            bancos_restaurados.append(nome_banco)
+            return nome_banco not in falhas
+
+        reaplicacoes = []
+        self.restore.conectar_mongodb = lambda: True
+        self.restore.restaurar_banco = restaurar_banco
+        self.restore.reaplicar_oplog = lambda pasta, bancos, alvo_ts=None: reaplicacoes.append(sorted(bancos)) or True
+        with mock.patch.object(backup_mongodb.JornalRestauracao, "abrir", side_effect=OSError("sem diário")):
+            sucesso = self.restore.executar_restore(self.pasta)
+        self.assertEqual(sorted(bancos_restaurados), ["estoque", "vendas"])
+        return sucesso, reaplicacoes
+
+    def test_reaplicado_depois_de_todos_os_bancos(self):
+        sucesso, reaplicacoes = self.restaurar()
+        self.assertTrue(sucesso)
+        self.assertEqual(reaplicacoes, [["estoque", "vendas"]])
+        self.assertEqual(self.restore.resumo, {"sucessos": 2, "falhas": 0, "oplog": True})
+
+    def test_banco_com_falha_adia_o_oplog(self):
+        sucesso, reaplicacoes = self.restaurar(falhas={"estoque"})
+        self.assertFalse(sucesso)
+        self.assertEqual(reaplicacoes, [])
+        self.assertIn("⚠ Oplog não reaplicado: há bancos com falha.", self.mensagens)
+
+    def test_diario_removido_antes_de_fechar_a_conexao(self):
+        ordem = []
+        jornal = mock.Mock(retomada=lambda: False, descartar=lambda: ordem.append("descartar"))
+        self.restore.conectar_mongodb = lambda: True
+        self.restore.fechar_conexao = lambda: ordem.append("fechar")
+        self.restore.restaurar_banco = lambda nome_banco, pasta_backup: True
+        self.restore.reaplicar_oplog = lambda pasta, bancos, alvo_ts=None: True
+        with mock.patch.object(backup_mongodb.JornalRestauracao, "abrir", return_value=jornal) as abrir:
+            self.assertTrue(self.restore.executar_restore(self.pasta))
+        self.assertEqual(ordem, ["descartar", "fechar"])
+        self.assertEqual(abrir.call_args.kwargs["banco"], "admin")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Testes do manifesto de checksums e da verificação dos backups"""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import bson
+
+import deduplicacao
+from deduplicacao import TERMINADOR, armazenar_stream, caminho_bloco, caminho_repositorio, nome_manifesto
+from incremental import ARQUIVO_ESTADO
+from verificacao import ARQUIVO_MANIFESTO, gerar_manifesto, ler_manifesto_checksums, verificar_backup
+
+
+def silencioso(mensagem):
+    pass
+
+
+def gravar(caminho, dados):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'wb') as f:
+        f.write(dados)
+
+
+class TestVerificacao(unittest.TestCase):
+
+    def setUp(self):
+        self._pasta = tempfile.TemporaryDirectory()
+        self.pasta = os.path.join(self._pasta.name, "backup_20240115_100000")
+        gravar(os.path.join(self.pasta, "vendas.archive.gz"), b"v" * 5000)
+        gravar(os.path.join(self.pasta, "estoque", "itens.bson"), b"e" * 300)
+        gravar(os.path.join(self.pasta, "vazio.archive"), b"")
+        # O estado incremental muda a cada incremento e fica fora do manifesto
+        gravar(os.path.join(self.pasta, ARQUIVO_ESTADO), b"{}")
+
+    def tearDown(self):
+        self._pasta.cleanup()
+
+    def test_manifesto(self):
+        manifesto = gerar_manifesto(self.pasta, processos=1)
+        self.assertEqual(sorted(manifesto["arquivos"]), ["estoque/itens.bson", "vazio.archive", "vendas.archive.gz"])
+        self.assertEqual(manifesto["arquivos"]["vendas.archive.gz"]["tamanho"], 5000)
+        self.assertEqual(ler_manifesto_checksums(self.pasta), manifesto)
+        self.assertFalse(os.path.exists(os.path.join(self.pasta, ARQUIVO_MANIFESTO + ".tmp")))
+
+    def test_sem_manifesto(self):
+        self.assertIsNone(verificar_backup(self.pasta, log=silencioso))
+
+    def test_integro(self):
+        gerar_manifesto(self.pasta, processos=2)
+        self.assertEqual(verificar_backup(self.pasta, processos=2, log=silencioso), [])
+        # Alterar o estado incremental não invalida o backup
+        gravar(os.path.join(self.pasta, ARQUIVO_ESTADO), b'{"ultimo": 1}')
+        self.assertEqual(verificar_backup(self.pasta, processos=1, log=silencioso), [])
+
+    def test_corrompido_e_ausente(self):
+        gerar_manifesto(self.pasta, processos=1)
+        gravar(os.path.join(self.pasta, "vendas.archive.gz"), b"x" * 5000)
+        os.remove(os.path.join(self.pasta, "estoque", "itens.bson"))
+        problemas = verificar_backup(self.pasta, processos=1, log=silencioso)
+        self.assertEqual(len(problemas), 2)
+        self.assertIn("checksum divergente", " ".join(problemas))
+        self.assertIn("arquivo ausente", " ".join(problemas))
+
+    def test_tamanho_divergente(self):
+        gerar_manifesto(self.pasta, processos=1)
+        gravar(os.path.join(self.pasta, "vendas.archive.gz"), b"v" * 4000)
+        problemas = verificar_backup(self.pasta, processos=1, log=silencioso)
+        self.assertEqual(len(problemas), 1)
+        self.assertIn("tamanho divergente", problemas[0])
+
+    def test_somente_bancos_escolhidos(self):
+        gerar_manifesto(self.pasta, processos=1)
+        os.remove(os.path.join(self.pasta, "vendas.archive.gz"))
+        self.assertEqual(verificar_backup(self.pasta, bancos=["estoque"], processos=1, log=silencioso), [])
+        self.assertEqual(len(verificar_backup(self.pasta, bancos=["vendas"], processos=1, log=silencioso)), 1)
+
+    @mock.patch.multiple(deduplicacao, TAMANHO_MINIMO=2 * 1024, TAMANHO_MEDIO=8 * 1024, TAMANHO_MAXIMO=32 * 1024)
+    def test_blocos_deduplicados(self):
+        registros = [b"\x6d\xe2\x99\x81", bson.encode({"concurrent_collections": 1}), TERMINADOR]
+        registros += [bson.encode({"_id": numero, "texto": f"documento {numero} " * 20}) for numero in range(200)]
+        registros.append(TERMINADOR)
+        backup_dir = self._pasta.name
+        repositorio = caminho_repositorio(backup_dir)
+        caminho = os.path.join(self.pasta, nome_manifesto("clientes"))
+        armazenar_stream(io.BytesIO(b"".join(registros)), repositorio, caminho, "clientes")
+        gerar_manifesto(self.pasta, processos=1)
+        self.assertEqual(verificar_backup(self.pasta, processos=1, log=silencioso), [])
+
+        with open(caminho, 'r', encoding='utf-8') as f:
+            hash_hex = json.load(f)["blocos"][0][0]
+        gravar(caminho_bloco(repositorio, hash_hex), b"corrompido")
+        problemas = verificar_backup(self.pasta, processos=1, log=silencioso)
+        self.assertEqual(len(problemas), 1)
+        self.assertTrue(problemas[0].startswith(f"bloco {hash_hex[:12]}"))
+
+        # Restauração seletiva: só os blocos informados são conferidos
+        self.assertEqual(verificar_backup(self.pasta, processos=1, log=silencioso, blocos={"clientes": set()}), [])
+        self.assertEqual(len(verificar_backup(self.pasta, processos=1, log=silencioso,
+                                              blocos={"clientes": {hash_hex}})), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Verificação de integridade dos backups
+Cada backup recebe um manifesto com o SHA-256 de todos os arquivos; a verificação
+recalcula os hashes em vários processos (leitura por mmap) e compara com o manifesto
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from compressao import identificar_archive
+from deduplicacao import identificar_manifesto, ler_manifesto, resolver_repositorio, ler_bloco
+from indice import identificar_indice
+from incremental import ARQUIVO_ESTADO, PASTA_INCREMENTOS, PASTA_OPLOG_SNAPSHOT, listar_incrementos
+from retomada import ARQUIVO_JORNAL
+
+
+# Manifesto de checksums gravado na pasta de cada backup (e de cada incremento)
+ARQUIVO_MANIFESTO = "manifesto.sha256.json"
+
+# Itens da raiz da pasta que não entram no manifesto: o próprio manifesto, o estado
+# incremental (alterado a cada incremento), os incrementos (têm manifesto próprio) e o
+# diário de retomada (alterado quando o backup é retomado)
+IGNORADOS = {ARQUIVO_MANIFESTO, ARQUIVO_ESTADO, PASTA_INCREMENTOS, ARQUIVO_JORNAL}
+
+# Trecho do arquivo mapeado entregue ao hash de cada vez
+TAMANHO_JANELA = 64 * 1024 * 1024
+
+# Processos usados para calcular hashes (limitado para não saturar a máquina)
+PROCESSOS_VERIFICACAO_PADRAO = min(8, os.cpu_count() or 1)
+
+
+def hash_arquivo(caminho):
+    """
+    SHA-256 de um arquivo lido por mmap
+
+    Executada nos processos do pool. Returns: tupla (tamanho, hash_hex)
+    """
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        tamanho = os.fstat(f.fileno()).st_size
+        # Arquivos vazios não podem ser mapeados
+        if tamanho:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                with memoryview(mapa) as visao:
+                    for inicio in range(0, tamanho, TAMANHO_JANELA):
+                        resumo.update(visao[inicio:inicio + TAMANHO_JANELA])
+    return tamanho, resumo.hexdigest()
+
+
+def conferir_bloco(repositorio, hash_hex):
+    """Lê um bloco do repositório deduplicado conferindo o hash (None se íntegro, senão o erro)"""
+    try:
+        ler_bloco(repositorio, hash_hex)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def listar_arquivos(pasta):
+    """Caminhos relativos (com '/') dos arquivos de um backup que entram no manifesto"""
+    relativos = []
+    for raiz, pastas, arquivos in os.walk(pasta):
+        if raiz == pasta:
+            pastas[:] = [item for item in pastas if item not in IGNORADOS]
+            arquivos = [item for item in arquivos if item not in IGNORADOS]
+        for arquivo in arquivos:
+            if arquivo.endswith(".tmp"):
+                continue
+            relativo = os.path.relpath(os.path.join(raiz, arquivo), pasta)
+            relativos.append(relativo.replace(os.sep, "/"))
+    return sorted(relativos)
+
+
+def banco_do_arquivo(relativo):
+    """
+    Banco ao qual um arquivo do backup pertence (subpasta, archive, manifesto deduplicado
+    ou índice de coleções)
+
+    None para os arquivos que valem para todos os bancos (oplog do snapshot consistente).
+    """
+    if relativo.startswith(PASTA_OPLOG_SNAPSHOT + "/"):
+        return None
+    if "/" in relativo:
+        return relativo.split("/", 1)[0]
+    archive = identificar_archive(relativo)
+    return archive[0] if archive else identificar_manifesto(relativo) or identificar_indice(relativo)
+
+
+def _executar(tarefas, processos):
+    """
+    Executa as tarefas (funcao, args) no pool de processos, na ordem recebida
+
+    Com um único processo (ou uma única tarefa) o cálculo é feito aqui mesmo,
+    sem o custo de iniciar o pool. Retorna os resultados (ou exceções) na ordem das tarefas.
+    """
+    resultados = [None] * len(tarefas)
+    if processos <= 1 or len(tarefas) <= 1:
+        for i, (funcao, args) in enumerate(tarefas):
+            try:
+                resultados[i] = funcao(*args)
+            except Exception as e:
+                resultados[i] = e
+        return resultados
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = {executor.submit(funcao, *args): i for i, (funcao, args) in enumerate(tarefas)}
+        for futuro in as_completed(futuros):
+            try:
+                resultados[futuros[futuro]] = futuro.result()
+            except Exception as e:
+                resultados[futuros[futuro]] = e
+    return resultados
+
+
+def _por_tamanho(pasta, relativos):
+    """Ordena os arquivos do maior para o menor, para equilibrar o pool"""
+    def tamanho(relativo):
+        try:
+            return os.path.getsize(os.path.join(pasta, relativo))
+        except OSError:
+            return 0
+    return sorted(relativos, key=tamanho, reverse=True)
+
+
+def gerar_manifesto(pasta, processos=PROCESSOS_VERIFICACAO_PADRAO):
+    """
+    Calcula o SHA-256 de todos os arquivos da pasta e grava o manifesto
+
+    Lança OSError se algum arquivo não puder ser lido.
+    """
+    relativos = _por_tamanho(pasta, listar_arquivos(pasta))
+    tarefas = [(hash_arquivo, (os.path.join(pasta, relativo),)) for relativo in relativos]
+
+    arquivos = {}
+    for relativo, resultado in zip(relativos, _executar(tarefas, processos)):
+        if isinstance(resultado, Exception):
+            raise resultado
+        arquivos[relativo] = {"tamanho": resultado[0], "sha256": resultado[1]}
+
+    manifesto = {
+        "versao": 1,
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "arquivos": dict(sorted(arquivos.items()))
+    }
+    caminho = os.path.join(pasta, ARQUIVO_MANIFESTO)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=1, ensure_ascii=False)
+    os.replace(temporario, caminho)
+    return manifesto
+
+
+def ler_manifesto_checksums(pasta):
+    """Lê o manifesto de checksums de uma pasta (None se não existir)"""
+    caminho = os.path.join(pasta, ARQUIVO_MANIFESTO)
+    if not os.path.isfile(caminho):
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def identificar_backup(pasta):
+    """
+    Identificação de um backup que não depende de onde a pasta está (outra máquina ou unidade)
+
+    É o SHA-256 do manifesto de checksums (que não muda com os novos incrementos); sem
+    manifesto, o nome da pasta e os itens da sua raiz.
+    """
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MANIFESTO), 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        itens = sorted(nome for nome in os.listdir(pasta) if nome not in IGNORADOS)
+        return os.path.basename(os.path.normpath(pasta)) + "|" + ",".join(itens)
+
+
+def verificar_backup(pasta, bancos=None, processos=PROCESSOS_VERIFICACAO_PADRAO, log=print, blocos=None):
+    """
+    Confere a integridade de uma pasta de backup contra o manifesto de checksums
+
+    Recalcula o hash de cada arquivo (da base e dos incrementos de oplog) e, nos
+    bancos deduplicados, confere também cada bloco referenciado no repositório.
+
+    Args:
+        pasta: Pasta do backup
+        bancos: Verifica apenas os arquivos destes bancos (None = todos)
+        processos: Quantidade de processos usados no cálculo dos hashes
+        log: Função que recebe as mensagens (padrão: print)
+        blocos: Hashes dos blocos a conferir por banco deduplicado (restauração seletiva);
+            os bancos fora do dicionário conferem todos os blocos do manifesto
+
+    Returns:
+        Lista de problemas encontrados (vazia se íntegro) ou None se a pasta não
+        tem manifesto (backups anteriores à verificação)
+    """
+    manifesto = ler_manifesto_checksums(pasta)
+    if manifesto is None:
+        return None
+
+    inicio = time.monotonic()
+    esperados = []
+    for relativo, info in manifesto["arquivos"].items():
+        if bancos is None or banco_do_arquivo(relativo) in (None, *bancos):
+            esperados.append((pasta, relativo, info))
+    # O oplog dos incrementos é reaplicado em todos os bancos
+    for pasta_incremento in listar_incrementos(pasta):
+        manifesto_incremento = ler_manifesto_checksums(pasta_incremento)
+        if manifesto_incremento is None:
+            continue
+        for relativo, info in manifesto_incremento["arquivos"].items():
+            esperados.append((pasta_incremento, relativo, info))
+
+    esperados.sort(key=lambda item: item[2]["tamanho"], reverse=True)
+    log(f"Verificando {len(esperados)} arquivo(s) com {processos} processo(s)...")
+
+    problemas = []
+    verificados = []
+    for base, relativo, info in esperados:
+        caminho = os.path.join(base, relativo)
+        if os.path.isfile(caminho):
+            verificados.append((base, relativo, info))
+        else:
+            problemas.append(f"{os.path.relpath(caminho, pasta)}: arquivo ausente")
+
+    total_bytes = 0
+    tarefas = [(hash_arquivo, (os.path.join(base, relativo),)) for base, relativo, _ in verificados]
+    for (base, relativo, info), resultado in zip(verificados, _executar(tarefas, processos)):
+        nome = os.path.relpath(os.path.join(base, relativo), pasta)
+        if isinstance(resultado, Exception):
+            problemas.append(f"{nome}: erro de leitura ({resultado})")
+        elif resultado[0] != info["tamanho"]:
+            problemas.append(f"{nome}: tamanho divergente ({resultado[0]} bytes, esperado {info['tamanho']})")
+        elif resultado[1] != info["sha256"]:
+            problemas.append(f"{nome}: checksum divergente")
+        else:
+            total_bytes += resultado[0]
+
+    # Bancos deduplicados: os dados estão nos blocos do repositório
+    conferidos = {}
+    for base, relativo, _ in verificados:
+        nome_banco = identificar_manifesto(relativo) if "/" not in relativo else None
+        if nome_banco:
+            caminho = os.path.join(base, relativo)
+            try:
+                manifesto_dedup = ler_manifesto(caminho)
+            except (OSError, ValueError):
+                continue
+            repositorio = resolver_repositorio(caminho, manifesto_dedup)
+            usados = (blocos or {}).get(nome_banco)
+            for hash_hex, _ in manifesto_dedup["blocos"]:
+                if usados is None or hash_hex in usados:
+                    conferidos[hash_hex] = repositorio
+    if conferidos:
+        log(f"Verificando {len(conferidos)} bloco(s) do repositório deduplicado...")
+        tarefas = [(conferir_bloco, (repositorio, hash_hex)) for hash_hex, repositorio in conferidos.items()]
+        for hash_hex, erro in zip(conferidos, _executar(tarefas, processos)):
+            if erro:
+                problemas.append(f"bloco {hash_hex[:12]}: {erro}")
+
+    duracao = max(time.monotonic() - inicio, 0.001)
+    if problemas:
+        log(f"✗ Verificação encontrou {len(problemas)} problema(s):")
+        for problema in problemas:
+            log(f"  - {problema}")
+    else:
+        log(f"✓ Backup íntegro ({len(esperados)} arquivo(s), {total_bytes / (1024 * 1024):.1f} MB "
+            f"em {duracao:.1f}s, {total_bytes / (1024 * 1024) / duracao:.1f} MB/s)")
+    return problemas